@@ -2,22 +2,40 @@ from flask import Flask
 from flask_restx import Api
 from app.database import db
 from app.config import Config
-from app.controllers.usuario_controller import usuario_bp, api as usuario_api
-from app.controllers.endereco_controller import endereco_bp, api as endereco_api
-from app.controllers.cartao_controller import cartao_bp, api as cartao_api
-from app.controllers.produto_controller import produto_bp, api as produto_api
-from app.controllers.pedido_controller import pedido_bp, api as pedido_api
+from app.cli import init_cli
+from app.response.compressao import init_compressao
+from app.services.change_feed import init_change_feed
+from app.services.limites import init_limites
+from app.services.cache_entidades import init_cache_entidades
+from app.services.replicas import init_replicas
+from app.services.fila import init_fila
+from app.services.outbox import init_outbox
+from app.services.estoque import init_estoque
+from app.services.rastreamento import init_rastreamento
 
 def create_app():
+    # Os controllers são importados aqui para que importar o pacote app (models, database,
+    # CLI, workers) não carregue as rotas e os modelos do Swagger
+    from app.controllers.usuario_controller import usuario_bp, api as usuario_api
+    from app.controllers.endereco_controller import endereco_bp, api as endereco_api
+    from app.controllers.cartao_controller import cartao_bp, api as cartao_api
+    from app.controllers.produto_controller import produto_bp, api as produto_api
+    from app.controllers.pedido_controller import pedido_bp, api as pedido_api
+    from app.controllers.frete_controller import api as frete_api
+    from app.controllers.analise_controller import api as analise_api
+    from app.controllers.job_controller import api as job_api
+
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # Configuração do Swagger
+    # Configuração do Swagger (desligado em produção com SWAGGER_HABILITADO=false)
+    swagger_habilitado = app.config.get("SWAGGER_HABILITADO", True)
     api = Api(
         title='E-commerce API',
         version='1.0',
         description='API para sistema de e-commerce',
-        doc='/'
+        doc='/' if swagger_habilitado else False,
+        add_specs=swagger_habilitado
     )
 
     # Adiciona os namespaces ao API
@@ -26,12 +44,45 @@ def create_app():
     api.add_namespace(cartao_api)
     api.add_namespace(produto_api)
     api.add_namespace(pedido_api)
+    api.add_namespace(frete_api)
+    api.add_namespace(analise_api)
+    api.add_namespace(job_api)
 
     # Inicializa o API com a aplicação
     api.init_app(app)
 
     db.init_app(app)
 
+    # Rastreamento: o span raiz abre antes de qualquer outro before_request e fecha no teardown
+    init_rastreamento(app)
+
+    # Rate limiting e descarte de carga (antes de qualquer trabalho)
+    init_limites(app)
+
+    # Cache de segundo nível das buscas por id (Usuario, Endereco, Pedido; nunca Cartao)
+    init_cache_entidades(app)
+
+    # Leituras das rotas SQL GET nas réplicas (binds replica* em SQLALCHEMY_BINDS)
+    init_replicas(app)
+
+    # Compressão gzip/brotli das respostas grandes
+    init_compressao(app)
+
+    # Outbox: alterações SQL de Pedido, Cartao e Endereco espelhadas no Cosmos pelo relay
+    init_outbox(app)
+
+    # Reservas de estoque dos pedidos: varredura das vencidas (ESTOQUE_VARREDURA_INPROCESSO)
+    init_estoque(app)
+
+    # Fila de jobs em segundo plano (respostas 202; FILA_INPROCESSO)
+    init_fila(app)
+
+    # Caches do processo mantidos pelo change feed (CHANGE_FEED_INPROCESSO)
+    init_change_feed(app)
+
+    # Comandos do flask CLI (ex.: flask --app wsgi init-db)
+    init_cli(app)
+
     # Registra os blueprints
     app.register_blueprint(usuario_bp, url_prefix="/usuario")
     app.register_blueprint(endereco_bp, url_prefix="/endereco")
@@ -0,0 +1,235 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database import db
+
+
+@click.command("init-db")
+def init_db():
+    """Cria as tabelas do banco (executar uma vez, fora dos workers)"""
+    db.create_all()
+    click.echo("Tabelas criadas")
+
+
+@click.command("atualizar-esquema")
+@click.option("--sql", "so_sql", is_flag=True, help="Só imprime os comandos, sem executá-los")
+@with_appcontext
+def atualizar_esquema(so_sql):
+    """Cria tabelas, colunas, restrições UNIQUE e índices que faltam num banco já existente"""
+    from app.services.esquema import atualizar, pendencias
+
+    with db.engine.begin() as conexao:
+        lista = pendencias(conexao) if so_sql else atualizar(conexao)
+    for pendencia in lista:
+        if pendencia.bloqueio:
+            click.echo(f"-- {pendencia.descricao} não aplicada: {pendencia.bloqueio}", err=True)
+        elif so_sql:
+            click.echo(f"{pendencia.sql.strip()};")
+        else:
+            click.echo(f"{pendencia.descricao}: ok")
+    if not lista:
+        click.echo("Esquema atualizado")
+    if any(pendencia.bloqueio for pendencia in lista):
+        raise SystemExit(1)
+
+
+@click.command("compilar-ceps")
+@click.argument("origem")
+@click.argument("destino")
+def compilar_ceps(origem, destino):
+    """Compila o CSV de CEPs para o índice binário (.idx) aberto com mmap"""
+    from app.services.cep import compilar_arquivo
+
+    indice = compilar_arquivo(origem, destino)
+    click.echo(f"{len(indice)} CEPs/faixas gravados em {destino}")
+
+
+@click.command("importar")
+@click.argument("tipo", type=click.Choice(["usuarios", "enderecos"]))
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--formato", type=click.Choice(["csv", "ndjson"]), default=None, help="Padrão: pela extensão do arquivo")
+@click.option("--lote", default=None, type=click.IntRange(min=1),
+              help="Linhas por lote, um INSERT executemany por lote (padrão: IMPORTACAO_TAMANHO_LOTE)")
+def importar_arquivo(tipo, arquivo, formato, lote):
+    """Importa usuários ou endereços em massa a partir de CSV/NDJSON"""
+    from app.services.importacao import importar
+
+    formato = formato or ("ndjson" if arquivo.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(arquivo, "rb") as fluxo:
+        relatorio = importar(tipo, fluxo, formato, lote or current_app.config["IMPORTACAO_TAMANHO_LOTE"])
+
+    for erro in relatorio["erros"]:
+        click.echo(f"linha {erro['linha']}: {erro['erro']}", err=True)
+    click.echo(
+        f"{relatorio['inseridos']}/{relatorio['lidos']} linhas inseridas, {relatorio['totalErros']} erros, "
+        f"{relatorio['segundos']} s ({relatorio['linhasPorSegundo']} linhas/s)"
+    )
+
+
+@click.command("provisionar-cosmos")
+def provisionar_cosmos():
+    """Cria os containers do Cosmos com partition keys e unique key policies"""
+    from app.cosmosdb import provisionar_containers
+
+    for nome in provisionar_containers():
+        click.echo(f"container {nome} ok")
+
+
+@click.command("change-feed")
+@click.option("--checkpoints", default=None, help="Arquivo JSON das continuações (padrão: CHANGE_FEED_CHECKPOINTS)")
+@click.option("--intervalo", default=None, type=float, help="Segundos entre leituras (padrão: CHANGE_FEED_INTERVALO)")
+@click.option("--uma-vez", is_flag=True, help="Processa o que estiver pendente e sai")
+@with_appcontext
+def change_feed(checkpoints, intervalo, uma_vez):
+    """Worker standalone do change feed: mantém os read models (resumo de pedidos)"""
+    from app.cosmosdb import container, pedidos_container, resumos_pedidos_container, usuarios_container
+    from app.services.change_feed import ChangeFeedWorker, CheckpointsArquivo, barramento
+    from app.services.resumo_pedidos import assinar_change_feed
+
+    assinar_change_feed(barramento, resumos_pedidos_container)
+    # Sem checkpoint o feed é lido desde o início; reaplicar pedidos não altera os resumos
+    worker = ChangeFeedWorker(
+        {"produtos": container, "usuarios": usuarios_container, "pedidos": pedidos_container},
+        checkpoints=CheckpointsArquivo(checkpoints or current_app.config["CHANGE_FEED_CHECKPOINTS"]),
+        intervalo=intervalo or current_app.config["CHANGE_FEED_INTERVALO"],
+        desde_o_inicio=True
+    )
+    if uma_vez:
+        for nome, lidos in worker.executar_uma_vez().items():
+            click.echo(f"{nome}: {'falhou' if lidos is None else f'{lidos} alterações'}")
+    else:
+        worker.executar()
+
+
+@click.command("reconstruir-resumos")
+@click.option("--usuario", default=None, help="Só o resumo deste usuário (padrão: todos)")
+@with_appcontext
+def reconstruir_resumos(usuario):
+    """Recalcula os resumos de pedidos a partir do container de pedidos (backfill e migração do formato antigo).
+
+    Rode com o worker do change feed parado.
+    """
+    from app.cosmosdb import pedidos_container, resumos_pedidos_container
+    from app.services.resumo_pedidos import reconstruir
+
+    click.echo(f"{reconstruir(pedidos_container, resumos_pedidos_container, usuario)} resumos gravados")
+
+
+@click.command("gerar-recomendacoes")
+@click.option("--saida", default=None, help="Arquivo .npz do índice (padrão: RECOMENDACOES_INDICE_PATH)")
+@click.option("--k", default=20, show_default=True, help="Vizinhos guardados por produto")
+@click.option("--min-suporte", default=2, show_default=True, help="Pedidos em comum mínimos para um par")
+@click.option("--dias", default=None, type=int, help="Considera só os pedidos dos últimos N dias")
+@with_appcontext
+def gerar_recomendacoes(saida, k, min_suporte, dias):
+    """Gera o índice "comprados juntos" a partir dos itens dos pedidos"""
+    import time
+
+    from app.cosmosdb import pedidos_container
+    from app.services.recomendacoes import cestas_cosmos, gerar_indice
+
+    saida = saida or current_app.config["RECOMENDACOES_INDICE_PATH"]
+    inicio = time.perf_counter()
+    indice = gerar_indice(cestas_cosmos(pedidos_container, dias), k, min_suporte)
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    indice.salvar(saida)
+    click.echo(f"{len(indice)} produtos indexados em {saida} ({time.perf_counter() - inicio:.1f} s)")
+
+
+@click.command("liquidar")
+@click.option("--lote", default=None, type=int, help="Lançamentos por lote (padrão: LIQUIDACAO_TAMANHO_LOTE)")
+@click.option("--continuo", is_flag=True, help="Repete a cada LIQUIDACAO_INTERVALO segundos")
+@with_appcontext
+def liquidar(lote, continuo):
+    """Liquida o ledger de transações: totais por cartão a partir da última marca"""
+    import time
+
+    from app.services.transacoes import liquidar as liquidar_pendentes
+
+    config = current_app.config
+    while True:
+        total = liquidar_pendentes(lote or config["LIQUIDACAO_TAMANHO_LOTE"], config["LIQUIDACAO_ATRASO"])
+        click.echo(f"{total['lancamentos']} lançamentos liquidados em {total['lotes']} lotes")
+        for cartao_id in total["divergentes"]:
+            click.echo(f"cartão {cartao_id}: totais divergentes", err=True)
+        if not continuo:
+            break
+        time.sleep(config["LIQUIDACAO_INTERVALO"])
+
+
+@click.command("fila")
+@click.option("--threads", default=None, type=int, help="Threads executando jobs (padrão: FILA_THREADS)")
+@click.option("--uma-vez", is_flag=True, help="Executa os jobs pendentes e sai")
+@with_appcontext
+def fila(threads, uma_vez):
+    """Worker standalone da fila de jobs (mesmo arquivo SQLite da API)"""
+    import time
+
+    fila = current_app.extensions["fila"]
+    if uma_vez:
+        click.echo(f"{fila.executar_pendentes()} jobs executados")
+        return
+    fila.threads = threads or fila.threads
+    fila.iniciar()
+    click.echo(f"fila: {fila.threads} threads em {fila.armazem.caminho}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        fila.parar()
+
+
+@click.command("outbox")
+@click.option("--lote", default=None, type=int, help="Linhas por lote (padrão: OUTBOX_TAMANHO_LOTE)")
+@click.option("--continuo", is_flag=True, help="Repete a cada OUTBOX_INTERVALO segundos")
+@with_appcontext
+def outbox(lote, continuo):
+    """Relay do outbox: encaminha ao Cosmos as alterações de pedidos, cartões e endereços do SQL"""
+    from app.services.outbox import criar_relay, executar_relay
+
+    config = current_app.config
+    relay = criar_relay(config)
+    relay.tamanho_lote = lote or relay.tamanho_lote
+    if continuo:
+        executar_relay(current_app._get_current_object(), relay, config["OUTBOX_INTERVALO"], config["OUTBOX_RETENCAO"])
+    total = relay.encaminhar()
+    click.echo(f"{total['linhas']} linhas ({total['documentos']} documentos) encaminhadas em {total['lotes']} lotes")
+
+
+@click.command("estoque-varredura")
+@click.option("--lote", default=None, type=int, help="Reservas por lote (padrão: ESTOQUE_VARREDURA_LOTE)")
+@click.option("--continuo", is_flag=True, help="Repete a cada ESTOQUE_VARREDURA_INTERVALO segundos")
+@with_appcontext
+def estoque_varredura(lote, continuo):
+    """Devolve ao estoque as unidades das reservas vencidas sem confirmação"""
+    from app.services.estoque import executar_varredura, expirar_vencidas
+
+    config = current_app.config
+    lote = lote or config["ESTOQUE_VARREDURA_LOTE"]
+    if continuo:
+        executar_varredura(current_app._get_current_object(), config["ESTOQUE_VARREDURA_INTERVALO"], lote)
+    total = 0
+    while True:
+        expiradas = expirar_vencidas(lote)
+        total += expiradas
+        if expiradas < lote:
+            break
+    click.echo(f"{total} reservas expiradas")
+
+
+def init_cli(app):
+    app.cli.add_command(init_db)
+    app.cli.add_command(atualizar_esquema)
+    app.cli.add_command(provisionar_cosmos)
+    app.cli.add_command(compilar_ceps)
+    app.cli.add_command(importar_arquivo)
+    app.cli.add_command(change_feed)
+    app.cli.add_command(reconstruir_resumos)
+    app.cli.add_command(gerar_recomendacoes)
+    app.cli.add_command(liquidar)
+    app.cli.add_command(fila)
+    app.cli.add_command(outbox)
+    app.cli.add_command(estoque_varredura)
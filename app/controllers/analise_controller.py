@@ -0,0 +1,85 @@
+from flask import current_app, request
+from flask_restx import Namespace, Resource
+from app.response.serializacao import resposta_json
+
+api = Namespace('analise', description='Relatórios de vendas')
+
+PARAMETROS_JANELA = {
+    'inicio': 'Data inicial (AAAA-MM-DD); padrão: 30 dias antes do fim',
+    'fim': 'Data final, inclusiva (AAAA-MM-DD); padrão: hoje',
+    'fonte': 'Origem dos pedidos: cosmos (padrão) ou sql'
+}
+
+
+def relatorio(nome, **opcoes):
+    """Lê (ou reaproveita do cache) as colunas da janela pedida e aplica o relatório"""
+    # NumPy só é importado quando um relatório é pedido (cold start da API)
+    from app.services import analise_vendas
+    from app.services.analise_vendas import ErroAnalise
+
+    try:
+        inicio, fim = analise_vendas.janela(request.args.get("inicio"), request.args.get("fim"))
+        colunas = analise_vendas.colunas_da_janela(
+            request.args.get("fonte", "cosmos"), inicio, fim,
+            ttl=current_app.config.get("ANALISE_CACHE_TTL", 300),
+            tamanho_bloco=current_app.config.get("ANALISE_TAMANHO_BLOCO", 50000)
+        )
+    except ErroAnalise as e:
+        api.abort(400, str(e))
+    return resposta_json(getattr(analise_vendas, nome)(colunas, **opcoes))
+
+
+def limite():
+    try:
+        return max(1, min(int(request.args.get("limite", 10)), 1000))
+    except ValueError:
+        api.abort(400, "O limite deve ser um número inteiro")
+
+@api.route('/resumo')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseResumo(Resource):
+    @api.doc('resumo_vendas', params={'limite': 'Quantidade de produtos no ranking (padrão 10)'})
+    @api.response(400, 'Janela ou fonte inválida')
+    def get(self):
+        """Todos os relatórios da janela em uma resposta"""
+        return relatorio("resumo", limite=limite())
+
+@api.route('/receita-diaria')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseReceitaDiaria(Resource):
+    @api.doc('receita_diaria')
+    def get(self):
+        """Receita e quantidade de pedidos por dia"""
+        return relatorio("receita_por_dia")
+
+@api.route('/categorias')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseCategorias(Resource):
+    @api.doc('receita_por_categoria')
+    def get(self):
+        """Receita e itens vendidos por categoria de produto"""
+        return relatorio("receita_por_categoria")
+
+@api.route('/produtos-mais-vendidos')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseProdutos(Resource):
+    @api.doc('produtos_mais_vendidos', params={'limite': 'Quantidade de produtos (padrão 10)'})
+    def get(self):
+        """Produtos com maior receita na janela"""
+        return relatorio("produtos_mais_vendidos", limite=limite())
+
+@api.route('/ticket-medio')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseTicket(Resource):
+    @api.doc('ticket_medio')
+    def get(self):
+        """Ticket médio e mediano dos pedidos"""
+        return relatorio("ticket_medio")
+
+@api.route('/status')
+@api.doc(params=PARAMETROS_JANELA)
+class AnaliseStatus(Resource):
+    @api.doc('pedidos_por_status')
+    def get(self):
+        """Pedidos e receita por status"""
+        return relatorio("por_status")
@@ -1,15 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource, fields
 from app.database import db
+from sqlalchemy.exc import IntegrityError
 from app.models.usuario import Usuario
 from app.models.cartao import Cartao
-from app.request.transacao_request import TransacaoRequest
-from app.response.transacao_response import TransacaoResponse
 from datetime import datetime
-import uuid
 from decimal import Decimal
-from dateutil.relativedelta import relativedelta
-from app.cosmosdb import container
+from app.cosmosdb import cartoes_container
+from app.services.unicidade import mensagem_conflito
+from app.services.velocidade import obter_motor
+from app.services.cache_entidades import cache_entidades
+from app.services import transacoes
+from app.services.leitura_lote import consultar_ids, ids_da_requisicao, resultado_lote
+from app.services.cartao_principal import NAO_GUARDA, buscar_cartao_principal, definir_cartao_principal
+from app.response.condicional import etag_documentos, resposta_condicional
+from app.response.serializacao import Projecao, compilar_modelo, mes_ano, para_float, resposta_json, serializar_lista
 
 cartao_bp = Blueprint("cartao", __name__)
 api = Namespace('cartoes', description='Operações relacionadas a cartões')
@@ -27,55 +32,72 @@ cartao_model = api.model('Cartao', {
     'principal': fields.Boolean(description='Indica se é o cartão principal do usuário')
 })
 
+lote_ids_model = api.model('LoteIdsCartoes', {
+    'ids': fields.List(fields.String, required=True, description='IDs dos cartões (até BATCH_GET_MAXIMO)'),
+    'usuarioId': fields.String(description='Dono dos cartões: restringe a consulta à partição do usuário')
+})
+
+lote_cartoes_model = api.model('LoteCartoes', {
+    'itens': fields.List(fields.Nested(api.model('ItemLoteCartao', {
+        'id': fields.String(description='ID pedido'),
+        'encontrado': fields.Boolean(description='Indica se o cartão existe'),
+        'item': fields.Nested(cartao_model, allow_null=True, description='Cartão, ou null se não encontrado')
+    })), description='Um item por id, na ordem da requisição'),
+    'naoEncontrados': fields.List(fields.String, description='IDs sem cartão')
+})
+
+serializar_cartao = compilar_modelo(cartao_model)
+
+# Colunas lidas pela listagem SQL de cartões (sem carregar o objeto ORM completo)
+cartao_projecao = Projecao(
+    ("id", Cartao.id),
+    ("numero", Cartao.numero),
+    ("nome_impresso", Cartao.nome_impresso),
+    ("validade", Cartao.validade, mes_ano),
+    ("cvv", Cartao.cvv),
+    ("bandeira", Cartao.bandeira),
+    ("tipo", Cartao.tipo),
+    ("saldo", Cartao.saldo, para_float)
+)
+
 # Criar um novo cartão
 @cartao_bp.route("/usuario/<int:id_user>", methods=["POST"])
 def create_cartao(id_user):
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({"erro": "O corpo da requisição não pode estar vazio"}), 400
+    # Pydantic só é carregado na primeira escrita, fora do caminho de inicialização
+    from app.request.cartao_request import CartaoRequest
+    from app.request.validacao import validar
 
-        usuario = Usuario.query.get(id_user)
+    # Corpo validado (e validade convertida) antes de qualquer consulta
+    dados = validar(CartaoRequest)
+
+    try:
+        usuario = cache_entidades.buscar(Usuario, id_user)
         if not usuario:
             return jsonify({"erro": "Usuário não encontrado"}), 404
-        
-        # Validar campos obrigatórios
-        campos_obrigatorios = ["numero", "nome_impresso", "validade", "cvv", "bandeira"]
-        for campo in campos_obrigatorios:
-            if not data.get(campo):
-                return jsonify({"erro": f"O campo '{campo}' é obrigatório"}), 400
-        
-        # Verificar se já existe um cartão com o mesmo número para este usuário
-        cartao_existente = Cartao.query.filter_by(
-            usuario_id=id_user,
-            numero=data["numero"]
-        ).first()
-        
-        if cartao_existente:
-            return jsonify({"erro": "Já existe um cartão cadastrado com este número para este usuário"}), 400
-        
-        mes, ano = map(int, data["validade"].split("/"))
-        validade = datetime(ano, mes, 1) + relativedelta(day=31)
 
         novo_cartao = Cartao(
             usuario_id=id_user,
-            numero=data["numero"],
-            nome_impresso=data["nome_impresso"],
-            validade=validade,
-            cvv=data["cvv"],
-            bandeira=data["bandeira"],
-            tipo=data.get("tipo", ""),
-            saldo=data.get("saldo", 0.00),
+            numero=dados.numero,
+            nome_impresso=dados.nome_impresso,
+            validade=dados.validade,
+            cvv=dados.cvv,
+            bandeira=dados.bandeira,
+            tipo=dados.tipo,
+            saldo=dados.saldo,
         )
 
+        # Número duplicado para o mesmo usuário é barrado pelo índice uq_cartao_usuario_numero
         db.session.add(novo_cartao)
         db.session.commit()
 
         return jsonify({"mensagem": "Cartão criado com sucesso", "cartao_id": novo_cartao.id}), 201
         
-    except ValueError:
-        return jsonify({"erro": "Formato de data inválido. Use o formato MM/AAAA"}), 400
+    except IntegrityError as e:
+        db.session.rollback()
+        conflito = mensagem_conflito(e)
+        if conflito:
+            return jsonify({"erro": conflito}), 409
+        return jsonify({"erro": "Erro ao criar cartão"}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({"erro": "Erro ao criar cartão"}), 500
@@ -84,11 +106,16 @@ def create_cartao(id_user):
 # Autorizar uma transação
 @cartao_bp.route("/authorize/usuario/<int:id_user>", methods=["POST"])
 def authorize_transaction(id_user):
-    try:
-        data = request.get_json()
-        transacao = TransacaoRequest(**data)  # Validação automática com Pydantic
+    # Pydantic só é carregado na primeira transação, fora do caminho de inicialização
+    from app.request.transacao_request import TransacaoRequest
+    from app.request.validacao import validar
+    from app.response.transacao_response import TransacaoResponse
 
-        usuario = Usuario.query.get(id_user)
+    # Corpo inválido é 400 com os erros por campo, antes de bloquear o cartão
+    transacao = validar(TransacaoRequest)
+
+    try:
+        usuario = cache_entidades.buscar(Usuario, id_user)
         if not usuario:
             return jsonify(TransacaoResponse(
                 status="NOT_AUTHORIZED",
@@ -97,8 +124,10 @@ def authorize_transaction(id_user):
                 message="Usuário não encontrado"
             ).model_dump()), 404
 
-        # Buscar o cartão do usuário
-        cartao = Cartao.query.filter_by(usuario_id=id_user, numero=transacao.numero, cvv=transacao.cvv).first()
+        # Buscar o cartão do usuário (linha bloqueada até o commit do débito, como nas devoluções)
+        cartao = Cartao.query.filter_by(
+            usuario_id=id_user, numero=transacao.numero, cvv=transacao.cvv
+        ).with_for_update().first()
         if not cartao:
             return jsonify(TransacaoResponse(
                 status="NOT_AUTHORIZED",
@@ -106,10 +135,6 @@ def authorize_transaction(id_user):
                 dt_transacao=datetime.utcnow(),
                 message="Cartão não encontrado"
             ).model_dump()), 404
-        
-         # Pegar a validade informada na requisição
-        mes, ano = map(int, transacao.dt_expiracao.split("/"))
-        validade_requisicao = datetime(ano, mes, 1) + relativedelta(day=31)
 
         # Verificar se o cartão está expirado
         if cartao.validade < datetime.utcnow():
@@ -121,7 +146,7 @@ def authorize_transaction(id_user):
             ).model_dump()), 400
         
         # Verificar se a validade informada na transação bate com a validade cadastrada no banco
-        if cartao.validade != validade_requisicao:
+        if cartao.validade != transacao.dt_expiracao:
             return jsonify(TransacaoResponse(
                 status="NOT_AUTHORIZED",
                 codigo_autorizacao=None,
@@ -129,6 +154,16 @@ def authorize_transaction(id_user):
                 message="Validade incorreta"
             ).model_dump()), 400
 
+        # Regras de velocidade por cartão e por usuário (contadores em memória, microssegundos)
+        velocidade = obter_motor().avaliar(cartao.id, id_user, transacao.valor)
+        if not velocidade.aprovado:
+            return jsonify(TransacaoResponse(
+                status="NOT_AUTHORIZED",
+                codigo_autorizacao=None,
+                dt_transacao=datetime.utcnow(),
+                message=f"Transação bloqueada por regra de velocidade ({velocidade.mensagem()})"
+            ).model_dump()), 400
+
         # Verificar saldo disponível
         if cartao.saldo < Decimal(str(transacao.valor)):
             return jsonify(TransacaoResponse(
@@ -138,36 +173,97 @@ def authorize_transaction(id_user):
                 message="Saldo insuficiente"
             ).model_dump()), 400
 
-        # Deduzir o valor da compra do saldo
+        # Deduzir o valor da compra do saldo e gravar o lançamento no ledger no mesmo commit
+        agora = datetime.utcnow()
         cartao.saldo -= Decimal(str(transacao.valor))
+        codigo = transacoes.registrar_autorizacao(cartao, id_user, transacao.valor, agora)
         db.session.commit()
 
         # Criar resposta com sucesso
         return jsonify(TransacaoResponse(
             status="AUTHORIZED",
-            codigo_autorizacao=uuid.uuid4(),
-            dt_transacao=datetime.utcnow(),
-            message="Compra autorizada"
+            codigo_autorizacao=codigo,
+            dt_transacao=agora,
+            message=f"Compra autorizada ({velocidade.mensagem()})"
         ).model_dump()), 200
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({"status": "ERROR", "message": str(e)}), 500
 
+
+def _operacao_transacao(operacao, *args):
+    try:
+        return jsonify(operacao(*args)), 200
+    except transacoes.ErroTransacao as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "ERROR", "message": str(e)}), 500
+
+
+# Capturar uma autorização pendente
+@cartao_bp.route("/transacao/<uuid:codigo>/captura", methods=["POST"])
+def capturar_transacao(codigo):
+    return _operacao_transacao(transacoes.capturar, codigo)
+
+
+# Cancelar (void) uma autorização ainda não capturada, devolvendo o valor ao saldo
+@cartao_bp.route("/transacao/<uuid:codigo>/cancelamento", methods=["POST"])
+def cancelar_transacao(codigo):
+    return _operacao_transacao(transacoes.cancelar, codigo)
+
+
+# Estornar (refund) uma transação capturada; sem "valor" estorna o restante
+@cartao_bp.route("/transacao/<uuid:codigo>/estorno", methods=["POST"])
+def estornar_transacao(codigo):
+    from app.request.transacao_request import EstornoRequest
+    from app.request.validacao import validar
+
+    return _operacao_transacao(transacoes.estornar, codigo, validar(EstornoRequest).valor)
+
+
+# Lançamentos e status de uma autorização
+@cartao_bp.route("/transacao/<uuid:codigo>", methods=["GET"])
+def buscar_transacao(codigo):
+    lancamentos = transacoes.lancamentos(codigo)
+    if not lancamentos:
+        return jsonify({"message": "Autorização não encontrada"}), 404
+    return resposta_json(transacoes.resumo(lancamentos), 200)
+
+
+# Histórico de lançamentos do cartão, paginado por id (?limite=50&antes_de=<id>)
+@cartao_bp.route("/<int:id_cartao>/transacoes", methods=["GET"])
+def historico_transacoes(id_cartao):
+    try:
+        limite = int(request.args.get("limite", 50))
+        antes_de = int(request.args["antes_de"]) if request.args.get("antes_de") else None
+    except ValueError:
+        return jsonify({"message": "limite e antes_de devem ser números inteiros"}), 400
+    limite = max(1, min(limite, transacoes.LIMITE_HISTORICO))
+
+    lancamentos = transacoes.historico_cartao(id_cartao, limite, antes_de)
+    return resposta_json({
+        "transacoes": [transacoes.para_dict(l) for l in lancamentos],
+        "proximo": lancamentos[-1].id if len(lancamentos) == limite else None
+    }, 200)
+
 # Atualizar o saldo de um cartão
 @cartao_bp.route("/saldo/<int:id_cartao>", methods=["PUT"])
 def update_saldo(id_cartao):
+    from app.request.cartao_request import SaldoRequest
+    from app.request.validacao import validar
+
+    data = validar(SaldoRequest)
+
     try:
-        data = request.get_json()
-        
-        if 'saldo' not in data:
-            return jsonify({"message": "O campo 'saldo' é obrigatório"}), 400
-            
         cartao = Cartao.query.get(id_cartao)
         if not cartao:
             return jsonify({"message": "Cartão não encontrado"}), 404
         
         # Soma o novo valor ao saldo atual do cartão
-        cartao.saldo += Decimal(str(data['saldo']))
+        cartao.saldo += data.saldo
         db.session.commit()
         
         return jsonify({
@@ -192,38 +288,25 @@ def delete_cartao(id_cartao):
         
         return jsonify({"message": "Cartão deletado com sucesso"}), 200
         
+    except IntegrityError:
+        # O ledger é imutável: cartões com transações não são removidos
+        db.session.rollback()
+        return jsonify({"message": "Cartão possui transações registradas e não pode ser deletado"}), 409
     except Exception as e:
         return jsonify({"status": "ERROR", "message": str(e)}), 500
 
 @cartao_bp.route("/usuario/<int:id_user>", methods=["GET"])
 def listar_cartoes_usuario(id_user):
     try:
-        usuario = Usuario.query.get(id_user)
+        usuario = cache_entidades.buscar(Usuario, id_user)
         if not usuario:
             return jsonify({"erro": "Usuário não encontrado"}), 404
             
-        cartoes = Cartao.query.filter_by(usuario_id=id_user).all()
+        cartoes = cartao_projecao.listar(Cartao.query.filter_by(usuario_id=id_user))
         if not cartoes:
             return jsonify({"erro": "Nenhum cartão encontrado para este usuário"}), 404
-            
-        resultado = []
-        for cartao in cartoes:
-            mes = cartao.validade.month
-            ano = cartao.validade.year
-            validade_formatada = f"{mes:02d}/{ano}"
-            
-            resultado.append({
-                "id": cartao.id,
-                "numero": cartao.numero,
-                "nome_impresso": cartao.nome_impresso,
-                "validade": validade_formatada,
-                "cvv": cartao.cvv,
-                "bandeira": cartao.bandeira,
-                "tipo": cartao.tipo,
-                "saldo": float(cartao.saldo)
-            })
-            
-        return jsonify(resultado), 200
+
+        return resposta_json(cartoes, 200)
             
     except Exception as e:
         return jsonify({"erro": "Erro ao listar cartões"}), 500
@@ -231,37 +314,50 @@ def listar_cartoes_usuario(id_user):
 @api.route('')
 class CartaoList(Resource):
     @api.doc('listar_cartoes')
-    @api.marshal_list_with(cartao_model)
+    @api.response(200, 'Sucesso', [cartao_model])
     def get(self):
         """Lista todos os cartões"""
-        query = "SELECT * FROM cartoes"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return cartoes
+        query = f"SELECT * FROM cartoes c WHERE {NAO_GUARDA}"
+        cartoes = list(cartoes_container.query_items(query=query, enable_cross_partition_query=True))
+        return resposta_json(serializar_lista(serializar_cartao, cartoes))
 
     @api.doc('criar_cartao')
     @api.expect(cartao_model)
     @api.marshal_with(cartao_model, code=201)
     def post(self):
         """Cria um novo cartão"""
-        dados = request.json
-        
-        if not dados.get("usuarioId") or not dados.get("numero") or not dados.get("nomeTitular") or not dados.get("dataValidade") or not dados.get("cvv") or not dados.get("bandeira") or not dados.get("tipo"):
-            api.abort(400, "Todos os campos são obrigatórios exceto principal")
+        from app.request.cartao_request import CartaoCosmosRequest
+        from app.request.validacao import validar
+
+        dados = validar(CartaoCosmosRequest)
 
         novo_cartao = Cartao(
-            usuarioId=dados["usuarioId"],
-            numero=dados["numero"],
-            nomeTitular=dados["nomeTitular"],
-            dataValidade=dados["dataValidade"],
-            cvv=dados["cvv"],
-            bandeira=dados["bandeira"],
-            tipo=dados["tipo"],
-            principal=dados.get("principal", False)
+            usuarioId=dados.usuarioId,
+            numero=dados.numero,
+            nomeTitular=dados.nomeTitular,
+            dataValidade=dados.dataValidade,
+            cvv=dados.cvv,
+            bandeira=dados.bandeira,
+            tipo=dados.tipo,
+            principal=dados.principal
         )
 
-        container.create_item(novo_cartao.to_dict())
+        cartoes_container.create_item(novo_cartao.to_dict())
         return novo_cartao.to_dict(), 201
 
+@api.route('/batch-get')
+class CartaoLote(Resource):
+    @api.doc('buscar_cartoes_em_lote')
+    @api.expect(lote_ids_model)
+    @api.response(200, 'Sucesso', lote_cartoes_model)
+    def post(self):
+        """Busca vários cartões pelo ID em uma consulta ARRAY_CONTAINS (na partição do usuarioId, se informado)"""
+        from app.request.lote_request import CartaoLoteRequest
+
+        corpo, ids = ids_da_requisicao(CartaoLoteRequest)
+        encontrados = consultar_ids(cartoes_container, ids, particao=corpo.usuarioId, filtro=NAO_GUARDA)
+        return resposta_json(resultado_lote(corpo.ids, encontrados, serializar_cartao))
+
 @api.route('/<string:cartao_id>')
 @api.param('cartao_id', 'Identificador do cartão')
 @api.response(404, 'Cartão não encontrado')
@@ -270,8 +366,8 @@ class CartaoResource(Resource):
     @api.marshal_with(cartao_model)
     def get(self, cartao_id):
         """Busca um cartão pelo ID"""
-        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}' AND {NAO_GUARDA}"
+        cartoes = list(cartoes_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not cartoes:
             api.abort(404, "Cartão não encontrado")
@@ -283,39 +379,34 @@ class CartaoResource(Resource):
     @api.marshal_with(cartao_model)
     def put(self, cartao_id):
         """Atualiza um cartão existente"""
-        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        from app.request.cartao_request import CartaoCosmosAtualizacaoRequest
+        from app.request.validacao import validar
+
+        dados = validar(CartaoCosmosAtualizacaoRequest)
+
+        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}' AND {NAO_GUARDA}"
+        cartoes = list(cartoes_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not cartoes:
             api.abort(404, "Cartão não encontrado")
 
         cartao = cartoes[0]
-        dados = request.json
-        cartao.update({
-            "usuarioId": dados.get("usuarioId", cartao["usuarioId"]),
-            "numero": dados.get("numero", cartao["numero"]),
-            "nomeTitular": dados.get("nomeTitular", cartao["nomeTitular"]),
-            "dataValidade": dados.get("dataValidade", cartao["dataValidade"]),
-            "cvv": dados.get("cvv", cartao["cvv"]),
-            "bandeira": dados.get("bandeira", cartao["bandeira"]),
-            "tipo": dados.get("tipo", cartao["tipo"]),
-            "principal": dados.get("principal", cartao["principal"])
-        })
-
-        container.replace_item(item=cartao["id"], body=cartao)
+        cartao.update(dados.campos())
+
+        cartoes_container.replace_item(item=cartao["id"], body=cartao)
         return cartao
 
     @api.doc('deletar_cartao')
     @api.response(204, 'Cartão deletado')
     def delete(self, cartao_id):
         """Deleta um cartão"""
-        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}' AND {NAO_GUARDA}"
+        cartoes = list(cartoes_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not cartoes:
             api.abort(404, "Cartão não encontrado")
 
-        container.delete_item(item=cartoes[0]["id"], partition_key=cartoes[0]["usuarioId"])
+        cartoes_container.delete_item(item=cartoes[0]["id"], partition_key=cartoes[0]["usuarioId"])
         return '', 204
 
 @api.route('/usuario/<string:usuario_id>')
@@ -323,16 +414,20 @@ class CartaoResource(Resource):
 @api.response(404, 'Nenhum cartão encontrado')
 class CartaoUsuarioResource(Resource):
     @api.doc('buscar_cartoes_por_usuario')
-    @api.marshal_list_with(cartao_model)
+    @api.response(200, 'Sucesso', [cartao_model])
+    @api.response(304, 'Conteúdo não modificado desde o ETag informado')
     def get(self, usuario_id):
         """Busca todos os cartões de um usuário"""
-        query = f"SELECT * FROM cartoes c WHERE c.usuarioId = '{usuario_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        query = f"SELECT * FROM cartoes c WHERE c.usuarioId = '{usuario_id}' AND {NAO_GUARDA}"
+        cartoes = list(cartoes_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not cartoes:
             api.abort(404, "Nenhum cartão encontrado para este usuário")
 
-        return cartoes
+        return resposta_condicional(
+            etag_documentos(cartoes),
+            lambda: resposta_json(serializar_lista(serializar_cartao, cartoes))
+        )
 
 @api.route('/usuario/<string:usuario_id>/principal')
 @api.param('usuario_id', 'ID do usuário')
@@ -342,41 +437,34 @@ class CartaoPrincipalResource(Resource):
     @api.marshal_with(cartao_model)
     def get(self, usuario_id):
         """Busca o cartão principal de um usuário"""
-        query = f"SELECT * FROM cartoes c WHERE c.usuarioId = '{usuario_id}' AND c.principal = true"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        cartao = buscar_cartao_principal(cartoes_container, usuario_id)
 
-        if not cartoes:
+        if not cartao:
             api.abort(404, "Cartão principal não encontrado")
 
-        return cartoes[0]
+        return cartao
 
     @api.doc('definir_cartao_principal')
     @api.param('cartao_id', 'ID do cartão a ser definido como principal')
     @api.response(204, 'Cartão principal atualizado')
+    @api.response(409, 'Cartão principal alterado concorrentemente')
     def put(self, usuario_id):
         """Define um cartão como principal"""
         cartao_id = request.args.get('cartao_id')
         if not cartao_id:
             api.abort(400, "ID do cartão é obrigatório")
 
-        # Primeiro, remove o status de principal de todos os cartões do usuário
-        query = f"SELECT * FROM cartoes c WHERE c.usuarioId = '{usuario_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
-        
-        for cartao in cartoes:
-            cartao["principal"] = False
-            container.replace_item(item=cartao["id"], body=cartao)
+        from azure.cosmos.exceptions import CosmosBatchOperationError
 
-        # Depois, define o novo cartão principal
-        query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}' AND c.usuarioId = '{usuario_id}'"
-        cartoes = list(container.query_items(query=query, enable_cross_partition_query=True))
+        # Uma consulta na partição do usuário e um batch transacional: no máximo dois patches nos
+        # cartões e a criação ou o patch (com if-match) do documento de guarda
+        try:
+            encontrado = definir_cartao_principal(cartoes_container, usuario_id, cartao_id)
+        except CosmosBatchOperationError:
+            api.abort(409, "O cartão principal foi alterado por outra requisição, tente novamente")
 
-        if not cartoes:
+        if not encontrado:
             api.abort(404, "Cartão não encontrado")
 
-        cartao = cartoes[0]
-        cartao["principal"] = True
-        container.replace_item(item=cartao["id"], body=cartao)
-
         return '', 204
 
@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource, fields
-from app.cosmosdb import container
+from app.database import db
+from app.cosmosdb import enderecos_container
 from app.models.endereco import Endereco
 from app.models.usuario import Usuario
+from app.services.cache_entidades import cache_entidades
+from app.services.cep import completar_endereco, obter_indice
+from app.services.importacao import importar_requisicao
+from app.response.serializacao import Projecao, compilar_modelo, resposta_json, serializar_lista
 
 endereco_bp = Blueprint("endereco", __name__)
 api = Namespace('enderecos', description='Operações relacionadas a endereços')
@@ -21,39 +26,54 @@ endereco_model = api.model('Endereco', {
     'pais': fields.String(required=True, description='País do endereço')
 })
 
+serializar_endereco = compilar_modelo(endereco_model)
+
+# Colunas lidas pela listagem SQL de endereços (sem carregar o objeto ORM completo)
+endereco_projecao = Projecao(
+    ("id", Endereco.id),
+    ("logradouro", Endereco.logradouro),
+    ("complemento", Endereco.complemento),
+    ("bairro", Endereco.bairro),
+    ("cidade", Endereco.cidade),
+    ("uf", Endereco.uf),
+    ("cep", Endereco.cep),
+    ("pais", Endereco.pais),
+    ("tipo", Endereco.tipo)
+)
+
 @api.route('')
 class EnderecoList(Resource):
     @api.doc('listar_enderecos')
-    @api.marshal_list_with(endereco_model)
+    @api.response(200, 'Sucesso', [endereco_model])
     def get(self):
         """Lista todos os endereços"""
         query = "SELECT * FROM enderecos"
-        enderecos = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return enderecos
+        enderecos = list(enderecos_container.query_items(query=query, enable_cross_partition_query=True))
+        return resposta_json(serializar_lista(serializar_endereco, enderecos))
 
     @api.doc('criar_endereco')
     @api.expect(endereco_model)
     @api.marshal_with(endereco_model, code=201)
     def post(self):
         """Cria um novo endereço"""
-        dados = request.json
-        
-        if not dados.get("usuarioId") or not dados.get("cep") or not dados.get("logradouro") or not dados.get("numero") or not dados.get("bairro") or not dados.get("cidade") or not dados.get("estado") or not dados.get("pais"):
-            api.abort(400, "Todos os campos são obrigatórios exceto complemento")
+        from app.request.endereco_request import EnderecoCosmosRequest
+        from app.request.validacao import validar
+
+        dados = validar(EnderecoCosmosRequest)
 
         novo_endereco = Endereco(
-            usuarioId=dados["usuarioId"],
-            cep=dados["cep"],
-            logradouro=dados["logradouro"],
-            numero=dados["numero"],
-            complemento=dados.get("complemento"),
-            bairro=dados["bairro"],
-            cidade=dados["cidade"],
-            estado=dados["estado"],
-            pais=dados["pais"]
+            usuarioId=dados.usuarioId,
+            cep=dados.cep,
+            logradouro=dados.logradouro,
+            numero=dados.numero,
+            complemento=dados.complemento,
+            bairro=dados.bairro,
+            cidade=dados.cidade,
+            estado=dados.estado,
+            pais=dados.pais
         )
 
-        container.create_item(novo_endereco.to_dict())
+        enderecos_container.create_item(novo_endereco.to_dict())
         return novo_endereco.to_dict(), 201
 
 @api.route('/<string:endereco_id>')
@@ -65,7 +85,7 @@ class EnderecoResource(Resource):
     def get(self, endereco_id):
         """Busca um endereço pelo ID"""
         query = f"SELECT * FROM enderecos e WHERE e.id = '{endereco_id}'"
-        enderecos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        enderecos = list(enderecos_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not enderecos:
             api.abort(404, "Endereço não encontrado")
@@ -77,27 +97,21 @@ class EnderecoResource(Resource):
     @api.marshal_with(endereco_model)
     def put(self, endereco_id):
         """Atualiza um endereço existente"""
+        from app.request.endereco_request import EnderecoCosmosAtualizacaoRequest
+        from app.request.validacao import validar
+
+        dados = validar(EnderecoCosmosAtualizacaoRequest)
+
         query = f"SELECT * FROM enderecos e WHERE e.id = '{endereco_id}'"
-        enderecos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        enderecos = list(enderecos_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not enderecos:
             api.abort(404, "Endereço não encontrado")
 
         endereco = enderecos[0]
-        dados = request.json
-        endereco.update({
-            "usuarioId": dados.get("usuarioId", endereco["usuarioId"]),
-            "cep": dados.get("cep", endereco["cep"]),
-            "logradouro": dados.get("logradouro", endereco["logradouro"]),
-            "numero": dados.get("numero", endereco["numero"]),
-            "complemento": dados.get("complemento", endereco["complemento"]),
-            "bairro": dados.get("bairro", endereco["bairro"]),
-            "cidade": dados.get("cidade", endereco["cidade"]),
-            "estado": dados.get("estado", endereco["estado"]),
-            "pais": dados.get("pais", endereco["pais"])
-        })
-
-        container.replace_item(item=endereco["id"], body=endereco)
+        endereco.update(dados.campos())
+
+        enderecos_container.replace_item(item=endereco["id"], body=endereco)
         return endereco
 
     @api.doc('deletar_endereco')
@@ -105,12 +119,12 @@ class EnderecoResource(Resource):
     def delete(self, endereco_id):
         """Deleta um endereço"""
         query = f"SELECT * FROM enderecos e WHERE e.id = '{endereco_id}'"
-        enderecos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        enderecos = list(enderecos_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not enderecos:
             api.abort(404, "Endereço não encontrado")
 
-        container.delete_item(item=enderecos[0]["id"], partition_key=enderecos[0]["usuarioId"])
+        enderecos_container.delete_item(item=enderecos[0]["id"], partition_key=enderecos[0]["usuarioId"])
         return '', 204
 
 @api.route('/usuario/<string:usuario_id>')
@@ -118,25 +132,34 @@ class EnderecoResource(Resource):
 @api.response(404, 'Nenhum endereço encontrado')
 class EnderecoUsuarioResource(Resource):
     @api.doc('buscar_enderecos_por_usuario')
-    @api.marshal_list_with(endereco_model)
+    @api.response(200, 'Sucesso', [endereco_model])
     def get(self, usuario_id):
         """Busca todos os endereços de um usuário"""
         query = f"SELECT * FROM enderecos e WHERE e.usuarioId = '{usuario_id}'"
-        enderecos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        enderecos = list(enderecos_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not enderecos:
             api.abort(404, "Nenhum endereço encontrado para este usuário")
 
-        return enderecos
+        return resposta_json(serializar_lista(serializar_endereco, enderecos))
 
 @endereco_bp.route("/usuario/<int:usuario_id>", methods=["POST"])
 def criar_endereco(usuario_id):
-    dados = request.json
-    
-    if not Usuario.query.get(usuario_id):
+    from app.request.endereco_request import EnderecoRequest
+    from app.request.validacao import validar
+
+    # Formato validado antes da consulta do usuário e do índice de CEPs
+    dados = validar(EnderecoRequest).model_dump()
+
+    if not cache_entidades.buscar(Usuario, usuario_id):
         return jsonify({"erro": "Usuário não encontrado"}), 404
+
+    # Preenche logradouro, bairro, cidade e uf pelo CEP e valida a combinação informada
+    erro_cep = completar_endereco(dados)
+    if erro_cep:
+        return jsonify({"erro": erro_cep}), 400
     
-    # Validar campos obrigatórios
+    # Campos que o CEP não completou continuam obrigatórios
     campos_obrigatorios = ["logradouro", "bairro", "cidade", "uf", "cep"]
     for campo in campos_obrigatorios:
         if not dados.get(campo):
@@ -150,8 +173,8 @@ def criar_endereco(usuario_id):
         cidade=dados["cidade"],
         uf=dados["uf"],
         cep=dados["cep"],
-        pais=dados.get("pais", "Brasil"),
-        tipo=dados.get("tipo")
+        pais=dados["pais"],
+        tipo=dados["tipo"]
     )
     
     try:
@@ -164,34 +187,33 @@ def criar_endereco(usuario_id):
 
 @endereco_bp.route("/usuario/<int:usuario_id>", methods=["GET"])
 def listar_enderecos(usuario_id):
-    if not Usuario.query.get(usuario_id):
+    if not cache_entidades.buscar(Usuario, usuario_id):
         return jsonify({"erro": "Usuário não encontrado"}), 404
         
-    enderecos = Endereco.query.filter_by(usuario_id=usuario_id).all()
+    enderecos = endereco_projecao.listar(Endereco.query.filter_by(usuario_id=usuario_id))
     if not enderecos:
         return jsonify({"erro": "Nenhum endereço encontrado para este usuário"}), 404
-        
-    return jsonify([{
-        "id": e.id,
-        "logradouro": e.logradouro,
-        "complemento": e.complemento,
-        "bairro": e.bairro,
-        "cidade": e.cidade,
-        "uf": e.uf,
-        "cep": e.cep,
-        "pais": e.pais,
-        "tipo": e.tipo
-    } for e in enderecos]), 200
+
+    return resposta_json(enderecos, 200)
 
 @endereco_bp.route("/<int:endereco_id>", methods=["PUT"])
 def atualizar_endereco(endereco_id):
-    endereco = Endereco.query.get(endereco_id)
+    from app.request.endereco_request import EnderecoAtualizacaoRequest
+    from app.request.validacao import validar
+
+    dados = validar(EnderecoAtualizacaoRequest).campos()
+
+    # Escritas partem do banco: o cache de entidades é só para leituras
+    endereco = db.session.get(Endereco, endereco_id)
     if not endereco:
         return jsonify({"erro": "Endereço não encontrado"}), 404
-    
-    dados = request.json
-    if not dados:
-        return jsonify({"erro": "O corpo da requisição não pode estar vazio"}), 400
+
+    # Revalida o CEP (e completa os campos não enviados) quando o CEP, a cidade ou a UF mudam
+    if any(campo in dados for campo in ("cep", "cidade", "uf")):
+        dados.setdefault("cep", endereco.cep)
+        erro_cep = completar_endereco(dados)
+        if erro_cep:
+            return jsonify({"erro": erro_cep}), 400
     
     endereco.logradouro = dados.get("logradouro", endereco.logradouro)
     endereco.complemento = dados.get("complemento", endereco.complemento)
@@ -211,11 +233,28 @@ def atualizar_endereco(endereco_id):
 
 @endereco_bp.route("/<int:endereco_id>", methods=["DELETE"])
 def deletar_endereco(endereco_id):
-    endereco = Endereco.query.get(endereco_id)
+    endereco = db.session.get(Endereco, endereco_id)
     if not endereco:
         return jsonify({"erro": "Endereço não encontrado"}), 404
     
     db.session.delete(endereco)
     db.session.commit()
     
-    return jsonify({"mensagem": "Endereço deletado com sucesso"}), 200
\ No newline at end of file
+    return jsonify({"mensagem": "Endereço deletado com sucesso"}), 200
+
+@endereco_bp.route("/cep/<string:cep>", methods=["GET"])
+def buscar_cep(cep):
+    indice = obter_indice()
+    if indice is None:
+        return jsonify({"erro": "Base de CEPs não configurada"}), 503
+
+    registro = indice.buscar(cep)
+    if not registro:
+        return jsonify({"erro": "CEP não encontrado"}), 404
+
+    return jsonify(registro), 200
+
+# Importação em massa de endereços (CSV ou NDJSON)
+@endereco_bp.route("/importar", methods=["POST"])
+def importar_enderecos():
+    return importar_requisicao("enderecos")
@@ -0,0 +1,68 @@
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
+from app.services.frete import ErroFrete, obter_calculadora
+
+api = Namespace('frete', description='Cotação de frete e prazo de entrega')
+
+# Modelos para documentação Swagger
+item_frete_model = api.model('ItemFrete', {
+    'produtoId': fields.String(description='ID do produto'),
+    'quantidade': fields.Integer(required=True, description='Quantidade do produto'),
+    'peso': fields.Float(description='Peso unitário em kg (usa o peso padrão se omitido)')
+})
+
+carrinho_frete_model = api.model('CarrinhoFrete', {
+    'cep': fields.String(required=True, description='CEP de destino'),
+    'itens': fields.List(fields.Nested(item_frete_model), required=True, description='Itens do carrinho')
+})
+
+lote_frete_model = api.model('LoteFrete', {
+    'carrinhos': fields.List(fields.Nested(carrinho_frete_model), required=True,
+                             description='Carrinhos a cotar (até FRETE_LOTE_MAXIMO)')
+})
+
+cotacao_model = api.model('CotacaoFrete', {
+    'cep': fields.String(description='CEP de destino'),
+    'zona': fields.String(description='Zona de entrega'),
+    'prazoDias': fields.Integer(description='Prazo de entrega em dias úteis'),
+    'pesoTarifado': fields.Float(description='Peso considerado no cálculo (kg)'),
+    'valor': fields.Float(description='Valor do frete'),
+    'erro': fields.String(description='Motivo da falha na cotação, se houver')
+})
+
+@api.route('/cotacao')
+class FreteCotacao(Resource):
+    @api.doc('cotar_frete')
+    @api.expect(carrinho_frete_model)
+    @api.marshal_with(cotacao_model)
+    @api.response(400, 'CEP ou itens inválidos')
+    def post(self):
+        """Cota o frete de um carrinho para um CEP"""
+        from app.request.frete_request import CarrinhoFreteRequest
+        from app.request.validacao import validar
+
+        dados = validar(CarrinhoFreteRequest).model_dump()
+        try:
+            return obter_calculadora().cotar(dados["cep"], dados["itens"])
+        except ErroFrete as e:
+            api.abort(400, str(e))
+
+@api.route('/cotacoes')
+class FreteCotacaoLote(Resource):
+    @api.doc('cotar_frete_lote')
+    @api.expect(lote_frete_model)
+    @api.marshal_list_with(cotacao_model)
+    @api.response(400, 'Corpo malformado ou acima de FRETE_LOTE_MAXIMO carrinhos')
+    def post(self):
+        """Cota o frete de vários carrinhos em uma única chamada"""
+        from app.request.frete_request import LoteFreteRequest
+        from app.request.validacao import ErroValidacao, validar
+
+        carrinhos = validar(LoteFreteRequest).model_dump()["carrinhos"]
+        maximo = current_app.config["FRETE_LOTE_MAXIMO"]
+        if len(carrinhos) > maximo:
+            raise ErroValidacao([{"campo": "carrinhos", "erro": f"Informe no máximo {maximo} carrinhos"}])
+        try:
+            return obter_calculadora().cotar_lote(carrinhos)
+        except ErroFrete as e:
+            api.abort(400, str(e))
@@ -0,0 +1,66 @@
+from flask import current_app, request
+from flask_restx import Namespace, Resource, fields
+from app.response.serializacao import resposta_json
+from app.services.fila import CONCLUIDO, EXECUTANDO, FALHOU, PENDENTE
+
+api = Namespace('jobs', description='Status dos jobs em segundo plano (respostas 202)')
+
+job_model = api.model('Job', {
+    'id': fields.String(description='Identificador do job'),
+    'tipo': fields.String(description='Tarefa executada'),
+    'status': fields.String(description='pendente, executando, concluido ou falhou'),
+    'tentativas': fields.Integer(description='Execuções já iniciadas'),
+    'maxTentativas': fields.Integer(description='Limite de execuções antes de falhar'),
+    'resultado': fields.Raw(description='Resultado da tarefa (quando concluído)'),
+    'erro': fields.String(description='Último erro'),
+    'criadoEm': fields.Float(description='Criação (epoch)'),
+    'atualizadoEm': fields.Float(description='Última mudança de status (epoch)'),
+    'proximaTentativa': fields.Float(description='Quando o job pendente volta a ser executado (epoch)')
+})
+
+STATUS = (PENDENTE, EXECUTANDO, CONCLUIDO, FALHOU)
+
+
+def armazem():
+    return current_app.extensions["fila"].armazem
+
+
+@api.route('')
+class JobList(Resource):
+    @api.doc('listar_jobs', params={'status': 'Filtra pelo status', 'limite': 'Máximo de jobs (padrão 50)'})
+    @api.response(200, 'Sucesso', [job_model])
+    def get(self):
+        """Lista os jobs mais recentes"""
+        status = request.args.get("status")
+        if status and status not in STATUS:
+            api.abort(400, f"Status inválido, use {', '.join(STATUS)}")
+        try:
+            limite = max(1, min(int(request.args.get("limite", 50)), 500))
+        except ValueError:
+            api.abort(400, "O limite deve ser um número inteiro")
+        return resposta_json(armazem().listar(status, limite))
+
+
+@api.route('/estatisticas')
+class JobEstatisticas(Resource):
+    @api.doc('estatisticas_jobs')
+    def get(self):
+        """Quantidade de jobs por status"""
+        return resposta_json({status: 0 for status in STATUS} | armazem().contagens())
+
+
+@api.route('/<string:job_id>')
+@api.param('job_id', 'Identificador do job (Location da resposta 202)')
+@api.response(404, 'Job não encontrado')
+class JobResource(Resource):
+    @api.doc('buscar_job')
+    @api.response(200, 'Sucesso', job_model)
+    def get(self, job_id):
+        """Status, tentativas e resultado de um job"""
+        job = armazem().obter(job_id)
+        if job is None:
+            api.abort(404, "Job não encontrado")
+        resposta = resposta_json(job)
+        if job["status"] in (PENDENTE, EXECUTANDO):
+            resposta.headers["Retry-After"] = "1"
+        return resposta
@@ -1,9 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, abort
 from flask_restx import Namespace, Resource, fields
-from app.cosmosdb import container
+import uuid
+from app.cosmosdb import pedidos_container, resumos_pedidos_container
+from app.database import db
 from app.models.pedido import Pedido
-from datetime import datetime
+from datetime import datetime, timezone
 from app.models.usuario import Usuario
+from app.response.condicional import etag_documentos, resposta_condicional
+from app.response.serializacao import Projecao, compilar_modelo, data_br, resposta_json, serializar_lista
+from app.services import estoque
+from app.services.fila import ErroPermanente, enfileirar, prefere_assincrono, resposta_aceita, tarefa
+from app.services.resumo_pedidos import buscar_resumo, publico, resumo_vazio, valor_pedido
 
 pedido_bp = Blueprint("pedido", __name__)
 api = Namespace('pedidos', description='Operações relacionadas a pedidos')
@@ -26,36 +33,166 @@ pedido_model = api.model('Pedido', {
     'valorTotal': fields.Float(readonly=True, description='Valor total do pedido')
 })
 
+resumo_pedidos_model = api.model('ResumoPedidos', {
+    'usuarioId': fields.String(description='ID do usuário'),
+    'quantidadePedidos': fields.Integer(description='Quantidade de pedidos'),
+    'valorTotal': fields.Float(description='Total gasto em todos os pedidos'),
+    'ultimoPedido': fields.String(description='Data do último pedido'),
+    'porStatus': fields.Raw(description='Quantidade de pedidos por status')
+})
+
+serializar_pedido = compilar_modelo(pedido_model)
+
+# Colunas lidas pelas rotas SQL de pedidos (sem carregar o objeto ORM completo)
+pedido_projecao = Projecao(
+    ("id", Pedido.id_pedido),
+    ("cliente", Pedido.nome_cliente),
+    ("produto", Pedido.nome_produto),
+    ("data", Pedido.data_pedido, data_br),
+    ("valor", Pedido.valor_total),
+    ("status", Pedido.status)
+)
+
+# Pedidos excluídos continuam no container (com ttl) até o change feed processá-los
+NAO_EXCLUIDO = "NOT IS_DEFINED(p.excluido)"
+
+
+@tarefa("pedidos.criar_cosmos")
+def criar_pedido_cosmos(documento):
+    """Job da criação assíncrona: o id já vem no documento, então repetir não duplica o pedido"""
+    from azure.cosmos.exceptions import CosmosResourceExistsError
+
+    # O job pode rodar depois de ESTOQUE_RESERVA_TTL: a reserva vencida é refeita antes da gravação
+    try:
+        estoque.renovar(documento["id"], current_app.config["ESTOQUE_RESERVA_TTL"])
+    except estoque.ErroEstoque as e:
+        raise ErroPermanente(str(e))
+
+    try:
+        return serializar_pedido(pedidos_container.create_item(documento))
+    except CosmosResourceExistsError:
+        return serializar_pedido(documento)
+
+
+@tarefa("pedidos.criar_sql")
+def criar_pedido_sql(dados, chave=None):
+    """Job da criação assíncrona do pedido SQL (dados validados pela rota e revalidados aqui).
+
+    ``chave`` identifica a criação: se o job for repetido depois do commit (o worker
+    morreu antes de concluí-lo), devolve o pedido já criado em vez de outro igual.
+    """
+    from pydantic import ValidationError
+    from sqlalchemy.exc import IntegrityError
+    from app.request.pedido_request import PedidoRequest
+
+    if chave is not None:
+        existente = Pedido.query.filter_by(chave_criacao=chave).first()
+        if existente is not None:
+            return {"id_pedido": existente.id_pedido}
+
+    try:
+        pedido = PedidoRequest.model_validate(dados)
+    except ValidationError as e:
+        raise ErroPermanente(str(e))
+
+    usuario = Usuario.query.filter(Usuario.nome.ilike(pedido.nome_cliente)).first()
+    if not usuario:
+        raise ErroPermanente("Usuário não encontrado para o nome fornecido")
+
+    novo_pedido = novo_pedido_sql(pedido, usuario)
+    novo_pedido.chave_criacao = chave
+    db.session.add(novo_pedido)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A mesma chave gravada por outra execução simultânea do job
+        db.session.rollback()
+        existente = Pedido.query.filter_by(chave_criacao=chave).first() if chave is not None else None
+        if existente is None:
+            raise
+        return {"id_pedido": existente.id_pedido}
+    return {"id_pedido": novo_pedido.id_pedido}
+
+
+def novo_pedido_sql(pedido, usuario):
+    """Pedido SQL a partir do PedidoRequest já validado"""
+    return Pedido(
+        nome_cliente=pedido.nome_cliente,
+        data_pedido=pedido.data_pedido,
+        nome_produto=pedido.nome_produto,
+        valor_total=pedido.valor_total,
+        status=pedido.status,
+        id_usuario=usuario.id
+    )
+
+
+def movimentar_estoque(operacao, *args):
+    """Executa uma operação de estoque, convertendo falta de saldo em 409 com os produtos"""
+    try:
+        return operacao(*args)
+    except estoque.ErroEstoque as e:
+        api.abort(e.status, str(e), produtos=e.produtos)
+
+
+def buscar_pedido_cosmos(pedido_id):
+    query = f"SELECT * FROM pedidos p WHERE p.id = @id AND {NAO_EXCLUIDO}"
+    pedidos = list(pedidos_container.query_items(
+        query=query, parameters=[{"name": "@id", "value": pedido_id}], enable_cross_partition_query=True
+    ))
+    if not pedidos:
+        api.abort(404, "Pedido não encontrado")
+    return pedidos[0]
+
+
 @api.route('')
 class PedidoList(Resource):
     @api.doc('listar_pedidos')
-    @api.marshal_list_with(pedido_model)
+    @api.response(200, 'Sucesso', [pedido_model])
     def get(self):
         """Lista todos os pedidos"""
-        query = "SELECT * FROM pedidos"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return pedidos
+        query = f"SELECT * FROM pedidos p WHERE {NAO_EXCLUIDO}"
+        pedidos = list(pedidos_container.query_items(query=query, enable_cross_partition_query=True))
+        return resposta_json(serializar_lista(serializar_pedido, pedidos))
 
     @api.doc('criar_pedido')
     @api.expect(pedido_model)
-    @api.marshal_with(pedido_model, code=201)
+    @api.response(201, 'Pedido criado', pedido_model)
+    @api.response(202, 'Criação enfileirada (Prefer: respond-async); acompanhe em /jobs/<id>')
+    @api.response(409, 'Estoque insuficiente para algum dos produtos')
     def post(self):
-        """Cria um novo pedido"""
-        dados = request.json
-        
-        if not dados.get("usuarioId") or not dados.get("enderecoId") or not dados.get("cartaoId") or not dados.get("itens"):
-            api.abort(400, "Usuário, endereço, cartão e itens são obrigatórios")
-
-        novo_pedido = Pedido(
-            usuarioId=dados["usuarioId"],
-            enderecoId=dados["enderecoId"],
-            cartaoId=dados["cartaoId"],
-            itens=dados["itens"],
-            status="Pendente"
+        """Cria um novo pedido, reservando o estoque dos itens (com Prefer: respond-async, a gravação vira um job da fila)"""
+        from app.request.pedido_request import PedidoCosmosRequest
+        from app.request.validacao import validar
+
+        dados = validar(PedidoCosmosRequest).model_dump()
+
+        novo_pedido = {
+            "id": str(uuid.uuid4()),
+            "usuarioId": dados["usuarioId"],
+            "enderecoId": dados["enderecoId"],
+            "cartaoId": dados["cartaoId"],
+            "itens": dados["itens"],
+            "status": "Pendente",
+            "dataPedido": datetime.now(timezone.utc).isoformat(timespec="seconds")
+        }
+        novo_pedido["valorTotal"] = valor_pedido(novo_pedido)
+
+        # A reserva vem antes da gravação: um 201/202 garante as unidades até ESTOQUE_RESERVA_TTL
+        # (se o job assíncrono não gravar o pedido, a varredura devolve as unidades no prazo)
+        movimentar_estoque(
+            estoque.reservar, novo_pedido["id"],
+            [(item["produtoId"], item["quantidade"]) for item in novo_pedido["itens"]],
+            current_app.config["ESTOQUE_RESERVA_TTL"]
         )
 
-        container.create_item(novo_pedido.to_dict())
-        return novo_pedido.to_dict(), 201
+        if prefere_assincrono():
+            return resposta_aceita(enfileirar("pedidos.criar_cosmos", documento=novo_pedido))
+        try:
+            criado = pedidos_container.create_item(novo_pedido)
+        except Exception:
+            estoque.liberar(novo_pedido["id"])
+            raise
+        return resposta_json(serializar_pedido(criado), 201)
 
 @api.route('/<string:pedido_id>')
 @api.param('pedido_id', 'Identificador do pedido')
@@ -65,49 +202,65 @@ class PedidoResource(Resource):
     @api.marshal_with(pedido_model)
     def get(self, pedido_id):
         """Busca um pedido pelo ID"""
-        query = f"SELECT * FROM pedidos p WHERE p.id = '{pedido_id}'"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
-
-        if not pedidos:
-            api.abort(404, "Pedido não encontrado")
-
-        return pedidos[0]
+        return buscar_pedido_cosmos(pedido_id)
 
     @api.doc('atualizar_pedido')
     @api.expect(pedido_model)
     @api.marshal_with(pedido_model)
+    @api.response(409, 'Estoque insuficiente para os novos itens ou para confirmar o pedido')
     def put(self, pedido_id):
         """Atualiza um pedido existente"""
-        query = f"SELECT * FROM pedidos p WHERE p.id = '{pedido_id}'"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
-
-        if not pedidos:
-            api.abort(404, "Pedido não encontrado")
-
-        pedido = pedidos[0]
-        dados = request.json
-        pedido.update({
-            "usuarioId": dados.get("usuarioId", pedido["usuarioId"]),
-            "enderecoId": dados.get("enderecoId", pedido["enderecoId"]),
-            "cartaoId": dados.get("cartaoId", pedido["cartaoId"]),
-            "itens": dados.get("itens", pedido["itens"]),
-            "status": dados.get("status", pedido["status"])
-        })
-
-        container.replace_item(item=pedido["id"], body=pedido)
-        return pedido
+        from app.request.pedido_request import PedidoCosmosAtualizacaoRequest
+        from app.request.validacao import validar
+
+        dados = validar(PedidoCosmosAtualizacaoRequest).campos()
+        pedido = buscar_pedido_cosmos(pedido_id)
+
+        # usuarioId é a partition key: o pedido não pode mudar de usuário
+        if dados.pop("usuarioId", pedido["usuarioId"]) != pedido["usuarioId"]:
+            api.abort(400, "Não é possível alterar o usuário do pedido")
+
+        # Confirmação, cancelamento e troca dos itens movimentam a reserva antes da gravação;
+        # se a gravação falhar, a reserva volta ao estado anterior
+        status = dados.get("status", pedido["status"])
+        movimenta = status != pedido["status"] or "itens" in dados
+        if movimenta:
+            anterior = movimentar_estoque(
+                estoque.redefinir, pedido["id"], status,
+                [(item["produtoId"], item["quantidade"]) for item in dados["itens"]] if "itens" in dados else None,
+                current_app.config["ESTOQUE_RESERVA_TTL"]
+            )
+
+        pedido.update(dados)
+        pedido["valorTotal"] = valor_pedido(dict(pedido, valorTotal=None))
+
+        try:
+            return pedidos_container.replace_item(item=pedido["id"], body=pedido)
+        except Exception:
+            if movimenta:
+                estoque.restaurar(pedido["id"], anterior)
+            raise
 
     @api.doc('deletar_pedido')
     @api.response(204, 'Pedido deletado')
     def delete(self, pedido_id):
         """Deleta um pedido"""
-        query = f"SELECT * FROM pedidos p WHERE p.id = '{pedido_id}'"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
-
-        if not pedidos:
-            api.abort(404, "Pedido não encontrado")
+        pedido = buscar_pedido_cosmos(pedido_id)
+
+        # Exclusão lógica: o change feed não mostra exclusões físicas, e o resumo
+        # do usuário precisa ver o pedido sair. O documento expira depois do ttl.
+        pedidos_container.patch_item(
+            item=pedido["id"],
+            partition_key=pedido["usuarioId"],
+            patch_operations=[
+                {"op": "set", "path": "/excluido", "value": True},
+                {"op": "set", "path": "/ttl", "value": current_app.config["PEDIDO_EXCLUIDO_TTL"]}
+            ]
+        )
 
-        container.delete_item(item=pedidos[0]["id"], partition_key=pedidos[0]["usuarioId"])
+        # Só depois da exclusão as unidades ainda reservadas voltam ao estoque (as de pedidos
+        # confirmados não): se o patch falhar, o pedido continua com a reserva e pode ser confirmado
+        estoque.liberar(pedido["id"], confirmadas=False)
         return '', 204
 
 @api.route('/usuario/<string:usuario_id>')
@@ -115,16 +268,34 @@ class PedidoResource(Resource):
 @api.response(404, 'Nenhum pedido encontrado')
 class PedidoUsuarioResource(Resource):
     @api.doc('buscar_pedidos_por_usuario')
-    @api.marshal_list_with(pedido_model)
+    @api.response(200, 'Sucesso', [pedido_model])
+    @api.response(304, 'Conteúdo não modificado desde o ETag informado')
     def get(self, usuario_id):
         """Busca todos os pedidos de um usuário"""
-        query = f"SELECT * FROM pedidos p WHERE p.usuarioId = '{usuario_id}'"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        query = f"SELECT * FROM pedidos p WHERE {NAO_EXCLUIDO}"
+        pedidos = list(pedidos_container.query_items(query=query, partition_key=usuario_id))
 
         if not pedidos:
             api.abort(404, "Nenhum pedido encontrado para este usuário")
 
-        return pedidos
+        return resposta_condicional(
+            etag_documentos(pedidos),
+            lambda: resposta_json(serializar_lista(serializar_pedido, pedidos))
+        )
+
+@api.route('/usuario/<string:usuario_id>/resumo')
+@api.param('usuario_id', 'ID do usuário')
+class PedidoResumoResource(Resource):
+    @api.doc('resumo_pedidos_usuario')
+    @api.response(200, 'Sucesso', resumo_pedidos_model)
+    @api.response(304, 'Conteúdo não modificado desde o ETag informado')
+    def get(self, usuario_id):
+        """Resumo dos pedidos do usuário (um point read, mantido pelo change feed)"""
+        resumo = buscar_resumo(resumos_pedidos_container, usuario_id) or resumo_vazio(usuario_id)
+        return resposta_condicional(
+            etag_documentos([resumo]),
+            lambda: resposta_json(publico(resumo))
+        )
 
 @api.route('/<string:pedido_id>/status')
 @api.param('pedido_id', 'Identificador do pedido')
@@ -133,76 +304,79 @@ class PedidoUsuarioResource(Resource):
 class PedidoStatusResource(Resource):
     @api.doc('atualizar_status_pedido')
     @api.response(204, 'Status do pedido atualizado')
+    @api.response(409, 'Reserva vencida ou liberada e estoque insuficiente para confirmar o pedido')
     def put(self, pedido_id):
-        """Atualiza o status de um pedido"""
+        """Atualiza o status de um pedido (confirmação ou cancelamento movimentam a reserva de estoque)"""
         status = request.args.get('status')
         if not status:
             api.abort(400, "Status é obrigatório")
 
-        query = f"SELECT * FROM pedidos p WHERE p.id = '{pedido_id}'"
-        pedidos = list(container.query_items(query=query, enable_cross_partition_query=True))
-
-        if not pedidos:
-            api.abort(404, "Pedido não encontrado")
-
-        pedido = pedidos[0]
-        pedido["status"] = status
-        container.replace_item(item=pedido["id"], body=pedido)
+        pedido = buscar_pedido_cosmos(pedido_id)
+        movimenta = status != pedido["status"]
+        if movimenta:
+            anterior = movimentar_estoque(estoque.redefinir, pedido["id"], status)
+        try:
+            pedidos_container.patch_item(
+                item=pedido["id"],
+                partition_key=pedido["usuarioId"],
+                patch_operations=[{"op": "set", "path": "/status", "value": status}]
+            )
+        except Exception:
+            if movimenta:
+                estoque.restaurar(pedido["id"], anterior)
+            raise
 
         return '', 204
 
+@api.route('/<string:pedido_id>/reserva')
+@api.param('pedido_id', 'Identificador do pedido')
+@api.response(404, 'Pedido sem reserva de estoque')
+class PedidoReservaResource(Resource):
+    @api.doc('buscar_reserva_pedido')
+    def get(self, pedido_id):
+        """Reserva de estoque do pedido: status, prazo e itens"""
+        reserva = estoque.reserva_do_pedido(pedido_id)
+        if reserva is None:
+            api.abort(404, "Pedido sem reserva de estoque")
+        return resposta_json(reserva)
+
 # Buscar pedidos por ID
 @pedido_bp.route("/<int:id_pedido>", methods=["GET"])
 def buscar_pedido_por_id(id_pedido):
-    pedido = Pedido.query.get_or_404(id_pedido)
+    pedido = pedido_projecao.primeiro(Pedido.query.filter(Pedido.id_pedido == id_pedido))
+    if pedido is None:
+        abort(404)
 
-    return jsonify({
-        "id": pedido.id_pedido,
-        "cliente": pedido.nome_cliente,
-        "produto": pedido.nome_produto,
-        "data": pedido.data_pedido.strftime("%d/%m/%Y"),
-        "valor": pedido.valor_total,
-        "status": pedido.status
-    })
+    return resposta_json(pedido)
 
 # Buscar pedidos de um cliente
 @pedido_bp.route("/nome/<string:nome_cliente>", methods=["GET"])
 def listar_pedidos_por_nome(nome_cliente):
     pedidos = Pedido.query.filter(
         Pedido.nome_cliente.ilike(f"%{nome_cliente}%")
-    ).all()
-
-    return jsonify([
-        {
-            "id": p.id_pedido,
-            "cliente": p.nome_cliente,
-            "produto": p.nome_produto,
-            "data": p.data_pedido.strftime("%d/%m/%Y"),
-            "valor": p.valor_total,
-            "status": p.status
-        } for p in pedidos
-    ])
+    )
+
+    return resposta_json(pedido_projecao.listar(pedidos))
 
 # Criar um pedido
 @pedido_bp.route("/", methods=["POST"])
 def criar_pedido():
-    dados = request.json
-    # Obriga que os campos de nome de cliente, nome do produto e valor total do pedido necessariamente estejam escritos
-    if not dados.get("nome_cliente") or not dados.get("nome_produto") or not dados.get("valor_total"):
-        return jsonify({"erro": "Nome do cliente, nome dos produtos, preço e data da compra são obrigatórios"}), 400
-    usuario = Usuario.query.filter(Usuario.nome.ilike(dados["nome_cliente"])).first()
+    from app.request.pedido_request import PedidoRequest
+    from app.request.validacao import validar
+
+    # Nome do cliente, produto, valor, data (AAAA-MM-DD) e status validados antes da busca do usuário
+    pedido = validar(PedidoRequest)
+    # Com Prefer: respond-async só a validação fica na requisição; a busca do usuário e o insert vão para o job
+    if prefere_assincrono():
+        return resposta_aceita(enfileirar(
+            "pedidos.criar_sql", dados=pedido.model_dump(mode="json"), chave=str(uuid.uuid4())
+        ))
+
+    usuario = Usuario.query.filter(Usuario.nome.ilike(pedido.nome_cliente)).first()
     if not usuario:
         return jsonify({"erro": "Usuário não encontrado para o nome fornecido"}), 404
 
-    novo_pedido = Pedido(
-        nome_cliente=dados["nome_cliente"],
-        data_pedido=datetime.strptime(dados["data_pedido"], "%Y-%m-%d"),
-        nome_produto=dados["nome_produto"],
-        valor_total=dados["valor_total"],
-        status=dados["status"],
-        id_usuario=usuario.id
-    )
-
+    novo_pedido = novo_pedido_sql(pedido, usuario)
     db.session.add(novo_pedido)
     db.session.commit()
     return jsonify({"mensagem": "Pedido criado com sucesso", "id_pedido": novo_pedido.id_pedido}), 201
@@ -210,14 +384,15 @@ def criar_pedido():
 # Atualizar um pedido
 @pedido_bp.route("/<int:id_pedido>", methods=["PUT"])
 def atualizar_pedido(id_pedido):
-    pedido = Pedido.query.get_or_404(id_pedido)
-    data = request.json
+    from app.request.pedido_request import PedidoAtualizacaoRequest
+    from app.request.validacao import validar
+
+    dados = validar(PedidoAtualizacaoRequest).campos()
+    # Escritas partem do banco: o cache de entidades é só para leituras
+    pedido = db.get_or_404(Pedido, id_pedido)
 
-    pedido.nome_cliente = data.get("nome_cliente", pedido.nome_cliente)
-    pedido.data_pedido = datetime.strptime(data["data_pedido"], "%Y-%m-%d")
-    pedido.nome_produto = data.get("nome_produto", pedido.nome_produto)
-    pedido.valor_total = data.get("valor_total", pedido.valor_total)
-    pedido.status = data.get("status", pedido.status)
+    for campo, valor in dados.items():
+        setattr(pedido, campo, valor)
 
     db.session.commit()
     return jsonify({"mensagem": "Pedido atualizado"})
@@ -225,7 +400,7 @@ def atualizar_pedido(id_pedido):
 # Deletar um pedido
 @pedido_bp.route("/<int:id_pedido>", methods=["DELETE"])
 def deletar_pedido(id_pedido):
-    pedido = Pedido.query.get_or_404(id_pedido)
+    pedido = db.get_or_404(Pedido, id_pedido)
     db.session.delete(pedido)
     db.session.commit()
     return jsonify({"mensagem": "Pedido deletado"})
@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_restx import Namespace, Resource, fields
 from app.cosmosdb import container
 from app.models.produto import Produto
+from app.response.condicional import etag_documentos, resposta_condicional
+from app.response.serializacao import compilar_modelo, resposta_json, serializar_lista
+from app.services import estoque
+from app.services.cache_documentos import produtos_cache
+from app.services.leitura_lote import consultar_ids, ids_da_requisicao, resultado_lote
 
 produto_bp = Blueprint("produto", __name__)
 api = Namespace('produtos', description='Operações relacionadas a produtos')
@@ -16,37 +21,100 @@ produto_model = api.model('Produto', {
     'descricao': fields.String(description='Descrição do produto')
 })
 
+estoque_model = api.model('Estoque', {
+    'produtoId': fields.String(description='ID do produto'),
+    'disponivel': fields.Integer(description='Unidades que podem ser reservadas'),
+    'reservado': fields.Integer(description='Unidades em reservas de pedidos ainda não confirmados')
+})
+
+ajuste_estoque_model = api.model('AjusteEstoque', {
+    'ajuste': fields.Integer(required=True, description='Entrada (positiva) ou saída (negativa) de unidades')
+})
+
+recomendacao_model = api.model('Recomendacao', {
+    'produtoId': fields.String(description='ID do produto recomendado'),
+    'pontuacao': fields.Float(description='Similaridade de coocorrência (cosseno) com o produto consultado')
+})
+
+lote_ids_model = api.model('LoteIdsProdutos', {
+    'ids': fields.List(fields.String, required=True, description='IDs dos produtos (até BATCH_GET_MAXIMO)')
+})
+
+lote_produtos_model = api.model('LoteProdutos', {
+    'itens': fields.List(fields.Nested(api.model('ItemLoteProduto', {
+        'id': fields.String(description='ID pedido'),
+        'encontrado': fields.Boolean(description='Indica se o produto existe'),
+        'item': fields.Nested(produto_model, allow_null=True, description='Produto, ou null se não encontrado')
+    })), description='Um item por id, na ordem da requisição'),
+    'naoEncontrados': fields.List(fields.String, description='IDs sem produto')
+})
+
+# A listagem vem do cache como objetos Produto (slots): leitura direta dos atributos
+serializar_produto = compilar_modelo(produto_model, acesso="atributo")
+
+
+def buscar_produto_cosmos(produto_id):
+    query = "SELECT * FROM produtos p WHERE p.id = @id"
+    produtos = Produto.from_rows(container.query_items(
+        query=query, parameters=[{"name": "@id", "value": produto_id}], enable_cross_partition_query=True
+    ))
+    return produtos[0] if produtos else None
+
+
 @api.route('')
 class ProdutoList(Resource):
     @api.doc('listar_produtos')
-    @api.marshal_list_with(produto_model)
+    @api.response(200, 'Sucesso', [produto_model])
+    @api.response(304, 'Conteúdo não modificado desde o ETag informado')
     def get(self):
         """Lista todos os produtos"""
         query = "SELECT * FROM produtos"
-        produtos = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return produtos
+        # O cache guarda objetos Produto (slots), não os dicts do SDK com os metadados do Cosmos
+        produtos = produtos_cache.listar(
+            "todos", lambda: Produto.from_rows(container.query_items(query=query, enable_cross_partition_query=True))
+        )
+        return resposta_condicional(
+            etag_documentos(produtos),
+            lambda: resposta_json(serializar_lista(serializar_produto, produtos))
+        )
 
     @api.doc('criar_produto')
     @api.expect(produto_model)
     @api.marshal_with(produto_model, code=201)
     def post(self):
         """Cria um novo produto"""
-        dados = request.json
-        
-        if not dados.get("produtoCategoria") or not dados.get("nome") or not dados.get("preco"):
-            api.abort(400, "Categoria, nome e preço são obrigatórios")
+        from app.request.produto_request import ProdutoRequest
+        from app.request.validacao import validar
+
+        dados = validar(ProdutoRequest)
 
         novo_produto = Produto(
-            produtoCategoria=dados["produtoCategoria"],
-            nome=dados["nome"],
-            preco=dados["preco"],
-            urlImagem=dados.get("urlImagem"),
-            descricao=dados.get("descricao")
+            produtoCategoria=dados.produtoCategoria,
+            nome=dados.nome,
+            preco=dados.preco,
+            urlImagem=dados.urlImagem,
+            descricao=dados.descricao
         )
 
         container.create_item(novo_produto.to_dict())
+        produtos_cache.invalidar()
         return novo_produto.to_dict(), 201
 
+@api.route('/batch-get')
+class ProdutoLote(Resource):
+    @api.doc('buscar_produtos_em_lote')
+    @api.expect(lote_ids_model)
+    @api.response(200, 'Sucesso', lote_produtos_model)
+    def post(self):
+        """Busca vários produtos pelo ID (cache e uma consulta ARRAY_CONTAINS para o restante)"""
+        from app.request.lote_request import LoteRequest
+
+        corpo, ids = ids_da_requisicao(LoteRequest)
+        encontrados = produtos_cache.obter_lote(
+            ids, lambda restantes: {p.id: p for p in Produto.from_rows(consultar_ids(container, restantes).values())}
+        )
+        return resposta_json(resultado_lote(corpo.ids, encontrados, serializar_produto))
+
 @api.route('/<string:produto_id>')
 @api.param('produto_id', 'Identificador do produto')
 @api.response(404, 'Produto não encontrado')
@@ -55,19 +123,23 @@ class ProdutoResource(Resource):
     @api.marshal_with(produto_model)
     def get(self, produto_id):
         """Busca um produto pelo ID"""
-        query = f"SELECT * FROM produtos p WHERE p.id = '{produto_id}'"
-        produtos = list(container.query_items(query=query, enable_cross_partition_query=True))
+        produto = produtos_cache.obter(produto_id, lambda: buscar_produto_cosmos(produto_id))
 
-        if not produtos:
+        if produto is None:
             api.abort(404, "Produto não encontrado")
 
-        return produtos[0]
+        return produto
 
     @api.doc('atualizar_produto')
     @api.expect(produto_model)
     @api.marshal_with(produto_model)
     def put(self, produto_id):
         """Atualiza um produto existente"""
+        from app.request.produto_request import ProdutoAtualizacaoRequest
+        from app.request.validacao import validar
+
+        dados = validar(ProdutoAtualizacaoRequest)
+
         query = f"SELECT * FROM produtos p WHERE p.id = '{produto_id}'"
         produtos = list(container.query_items(query=query, enable_cross_partition_query=True))
 
@@ -75,16 +147,10 @@ class ProdutoResource(Resource):
             api.abort(404, "Produto não encontrado")
 
         produto = produtos[0]
-        dados = request.json
-        produto.update({
-            "produtoCategoria": dados.get("produtoCategoria", produto["produtoCategoria"]),
-            "nome": dados.get("nome", produto["nome"]),
-            "preco": dados.get("preco", produto["preco"]),
-            "urlImagem": dados.get("urlImagem", produto["urlImagem"]),
-            "descricao": dados.get("descricao", produto["descricao"]),
-        })
+        produto.update(dados.campos())
 
         container.replace_item(item=produto["id"], body=produto)
+        produtos_cache.invalidar(produto["id"])
         return produto
 
     @api.doc('deletar_produto')
@@ -98,8 +164,41 @@ class ProdutoResource(Resource):
             api.abort(404, "Produto não encontrado")
 
         container.delete_item(item=produtos[0]["id"], partition_key=produtos[0]["produtoCategoria"])
+        produtos_cache.invalidar(produtos[0]["id"])
         return '', 204
 
+@api.route('/<string:produto_id>/estoque')
+@api.param('produto_id', 'Identificador do produto')
+class ProdutoEstoqueResource(Resource):
+    @api.doc('buscar_estoque_produto')
+    @api.response(200, 'Sucesso', estoque_model)
+    @api.response(404, 'Produto sem controle de estoque')
+    def get(self, produto_id):
+        """Unidades disponíveis e reservadas do produto"""
+        saldo = estoque.consultar(produto_id)
+        if saldo is None:
+            api.abort(404, "Produto sem controle de estoque")
+        return resposta_json(saldo)
+
+    @api.doc('ajustar_estoque_produto')
+    @api.expect(ajuste_estoque_model)
+    @api.response(200, 'Estoque ajustado', estoque_model)
+    @api.response(404, 'Produto não encontrado')
+    @api.response(409, 'Saída maior que o disponível')
+    def post(self, produto_id):
+        """Entrada ou saída de unidades (a primeira entrada liga o controle de estoque do produto)"""
+        from app.request.estoque_request import AjusteEstoqueRequest
+        from app.request.validacao import validar
+
+        dados = validar(AjusteEstoqueRequest)
+        if produtos_cache.obter(produto_id, lambda: buscar_produto_cosmos(produto_id)) is None:
+            api.abort(404, "Produto não encontrado")
+
+        try:
+            return resposta_json(estoque.ajustar(produto_id, dados.ajuste))
+        except estoque.ErroEstoque as e:
+            api.abort(e.status, str(e), produtos=e.produtos)
+
 @api.route('/nome/<string:nome>')
 @api.param('nome', 'Nome do produto')
 @api.response(404, 'Produto não encontrado')
@@ -115,3 +214,25 @@ class ProdutoNomeResource(Resource):
             api.abort(404, "Produto não encontrado")
 
         return produtos[0]
+
+@api.route('/<string:produto_id>/recomendacoes')
+@api.param('produto_id', 'Identificador do produto')
+@api.param('limite', 'Quantidade máxima de recomendações (padrão 10)')
+class ProdutoRecomendacoesResource(Resource):
+    @api.doc('recomendar_produtos')
+    @api.response(200, 'Sucesso', [recomendacao_model])
+    @api.response(503, 'Índice de recomendações ainda não gerado')
+    def get(self, produto_id):
+        """Produtos frequentemente comprados junto com este (índice pré-calculado em memória)"""
+        # NumPy só é carregado na primeira consulta de recomendações
+        from app.services.recomendacoes import obter_indice
+
+        indice = obter_indice(current_app.config.get("RECOMENDACOES_INDICE_PATH"))
+        if indice is None:
+            api.abort(503, "Índice de recomendações não disponível; execute flask gerar-recomendacoes")
+        try:
+            limite = max(1, min(int(request.args.get("limite", 10)), indice.vizinhos.shape[1]))
+        except ValueError:
+            api.abort(400, "O limite deve ser um número inteiro")
+
+        return resposta_json(indice.recomendar(produto_id, limite))
@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource, fields
-from app.cosmosdb import container
+import uuid
+from app.cosmosdb import usuarios_container
+from app.services.cache_documentos import usuarios_cache
+from app.services.unicidade import buscar_usuario_por_email, id_reserva_email, liberar_email, reservar_email
 from app.models.usuario import Usuario
+from app.services.importacao import importar_requisicao
+from app.services.leitura_lote import consultar_ids, ids_da_requisicao, resultado_lote
+from app.response.serializacao import compilar_modelo, resposta_json, serializar_lista
 
 usuario_bp = Blueprint("usuario", __name__)
 api = Namespace('usuarios', description='Operações relacionadas a usuários')
@@ -17,37 +23,93 @@ usuario_model = api.model('Usuario', {
     'telefone': fields.String(description='Telefone do usuário')
 })
 
+lote_ids_model = api.model('LoteIdsUsuarios', {
+    'ids': fields.List(fields.String, required=True, description='IDs dos usuários (até BATCH_GET_MAXIMO)')
+})
+
+lote_usuarios_model = api.model('LoteUsuarios', {
+    'itens': fields.List(fields.Nested(api.model('ItemLoteUsuario', {
+        'id': fields.String(description='ID pedido'),
+        'encontrado': fields.Boolean(description='Indica se o usuário existe'),
+        'item': fields.Nested(usuario_model, allow_null=True, description='Usuário, ou null se não encontrado')
+    })), description='Um item por id, na ordem da requisição'),
+    'naoEncontrados': fields.List(fields.String, description='IDs sem usuário')
+})
+
+serializar_usuario = compilar_modelo(usuario_model)
+
+
+def buscar_usuario_cosmos(usuario_id):
+    query = "SELECT * FROM usuarios u WHERE u.id = @id"
+    usuarios = list(usuarios_container.query_items(
+        query=query, parameters=[{"name": "@id", "value": usuario_id}], enable_cross_partition_query=True
+    ))
+    return usuarios[0] if usuarios else None
+
+
 @api.route('')
 class UsuarioList(Resource):
     @api.doc('listar_usuarios')
-    @api.marshal_list_with(usuario_model)
+    @api.response(200, 'Sucesso', [usuario_model])
     def get(self):
         """Lista todos os usuários"""
         query = "SELECT * FROM usuarios"
-        usuarios = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return usuarios
+        usuarios = list(usuarios_container.query_items(query=query, enable_cross_partition_query=True))
+        return resposta_json(serializar_lista(serializar_usuario, usuarios))
 
     @api.doc('criar_usuario')
     @api.expect(usuario_model)
     @api.marshal_with(usuario_model, code=201)
+    @api.response(409, 'Email ou CPF já cadastrado')
     def post(self):
         """Cria um novo usuário"""
-        dados = request.json
-        
-        if not dados.get("nome") or not dados.get("email") or not dados.get("senha") or not dados.get("cpf"):
-            api.abort(400, "Nome, email, senha e CPF são obrigatórios")
-
-        novo_usuario = Usuario(
-            nome=dados["nome"],
-            email=dados["email"],
-            senha=dados["senha"],
-            cpf=dados["cpf"],
-            dataNascimento=dados.get("dataNascimento"),
-            telefone=dados.get("telefone")
-        )
-
-        container.create_item(novo_usuario.to_dict())
-        return novo_usuario.to_dict(), 201
+        from app.request.usuario_request import UsuarioRequest
+        from app.request.validacao import validar
+        from azure.cosmos.exceptions import CosmosResourceExistsError
+
+        dados = validar(UsuarioRequest)
+
+        novo_usuario = {
+            "id": str(uuid.uuid4()),
+            "nome": dados.nome,
+            "email": dados.email,
+            "senha": dados.senha,
+            "cpf": dados.cpf,  # Partition Key
+            "dataNascimento": dados.dataNascimento,
+            "telefone": dados.telefone
+        }
+
+        # A unicidade é verificada pelas próprias escritas: reserva do email e unique key de /cpf
+        try:
+            reservar_email(novo_usuario["email"], novo_usuario["id"], novo_usuario["cpf"])
+        except CosmosResourceExistsError:
+            api.abort(409, "Email já cadastrado")
+
+        criado = False
+        try:
+            usuarios_container.create_item(novo_usuario)
+            criado = True
+        except CosmosResourceExistsError:
+            api.abort(409, "CPF já cadastrado")
+        finally:
+            # Qualquer falha na criação (CPF em uso, timeout, erro do Cosmos) devolve o email
+            if not criado:
+                liberar_email(novo_usuario["email"])
+
+        return novo_usuario, 201
+
+@api.route('/batch-get')
+class UsuarioLote(Resource):
+    @api.doc('buscar_usuarios_em_lote')
+    @api.expect(lote_ids_model)
+    @api.response(200, 'Sucesso', lote_usuarios_model)
+    def post(self):
+        """Busca vários usuários pelo ID (cache e uma consulta ARRAY_CONTAINS para o restante)"""
+        from app.request.lote_request import LoteRequest
+
+        corpo, ids = ids_da_requisicao(LoteRequest)
+        encontrados = usuarios_cache.obter_lote(ids, lambda restantes: consultar_ids(usuarios_container, restantes))
+        return resposta_json(resultado_lote(corpo.ids, encontrados, serializar_usuario))
 
 @api.route('/<string:usuario_id>')
 @api.param('usuario_id', 'Identificador do usuário')
@@ -57,37 +119,61 @@ class UsuarioResource(Resource):
     @api.marshal_with(usuario_model)
     def get(self, usuario_id):
         """Busca um usuário pelo ID"""
-        query = f"SELECT * FROM usuarios u WHERE u.id = '{usuario_id}'"
-        usuarios = list(container.query_items(query=query, enable_cross_partition_query=True))
+        usuario = usuarios_cache.obter(usuario_id, lambda: buscar_usuario_cosmos(usuario_id))
 
-        if not usuarios:
+        if usuario is None:
             api.abort(404, "Usuário não encontrado")
 
-        return usuarios[0]
+        return usuario
 
     @api.doc('atualizar_usuario')
     @api.expect(usuario_model)
     @api.marshal_with(usuario_model)
+    @api.response(409, 'Email já cadastrado')
     def put(self, usuario_id):
         """Atualiza um usuário existente"""
+        from app.request.usuario_request import UsuarioAtualizacaoRequest
+        from app.request.validacao import validar
+        from azure.cosmos.exceptions import CosmosResourceExistsError
+
+        dados = validar(UsuarioAtualizacaoRequest).campos()
+
         query = f"SELECT * FROM usuarios u WHERE u.id = '{usuario_id}'"
-        usuarios = list(container.query_items(query=query, enable_cross_partition_query=True))
+        usuarios = list(usuarios_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not usuarios:
             api.abort(404, "Usuário não encontrado")
 
         usuario = usuarios[0]
-        dados = request.json
+        email_anterior = usuario["email"]
         usuario.update({
             "nome": dados.get("nome", usuario["nome"]),
             "email": dados.get("email", usuario["email"]),
             "senha": dados.get("senha", usuario["senha"]),
-            "cpf": dados.get("cpf", usuario["cpf"]),
             "dataNascimento": dados.get("dataNascimento", usuario["dataNascimento"]),
             "telefone": dados.get("telefone", usuario["telefone"])
         })
-
-        container.replace_item(item=usuario["id"], body=usuario)
+        # O CPF é a partition key e não pode ser alterado por replace
+        if dados.get("cpf", usuario["cpf"]) != usuario["cpf"]:
+            api.abort(400, "O CPF não pode ser alterado")
+
+        email_mudou = id_reserva_email(usuario["email"]) != id_reserva_email(email_anterior)
+        if email_mudou:
+            try:
+                reservar_email(usuario["email"], usuario["id"], usuario["cpf"])
+            except CosmosResourceExistsError:
+                api.abort(409, "Email já cadastrado")
+
+        try:
+            usuarios_container.replace_item(item=usuario["id"], body=usuario)
+        except Exception:
+            # O usuário continua com o email anterior: a reserva do novo é desfeita
+            if email_mudou:
+                liberar_email(usuario["email"])
+            raise
+        usuarios_cache.invalidar(usuario["id"])
+        if email_mudou:
+            liberar_email(email_anterior)
         return usuario
 
     @api.doc('deletar_usuario')
@@ -95,12 +181,14 @@ class UsuarioResource(Resource):
     def delete(self, usuario_id):
         """Deleta um usuário"""
         query = f"SELECT * FROM usuarios u WHERE u.id = '{usuario_id}'"
-        usuarios = list(container.query_items(query=query, enable_cross_partition_query=True))
+        usuarios = list(usuarios_container.query_items(query=query, enable_cross_partition_query=True))
 
         if not usuarios:
             api.abort(404, "Usuário não encontrado")
 
-        container.delete_item(item=usuarios[0]["id"], partition_key=usuarios[0]["cpf"])
+        usuarios_container.delete_item(item=usuarios[0]["id"], partition_key=usuarios[0]["cpf"])
+        usuarios_cache.invalidar(usuarios[0]["id"])
+        liberar_email(usuarios[0]["email"])
         return '', 204
 
 @api.route('/email/<string:email>')
@@ -111,10 +199,15 @@ class UsuarioEmailResource(Resource):
     @api.marshal_with(usuario_model)
     def get(self, email):
         """Busca um usuário pelo email"""
-        query = f"SELECT * FROM usuarios u WHERE u.email = '{email}'"
-        usuarios = list(container.query_items(query=query, enable_cross_partition_query=True))
+        usuario = buscar_usuario_por_email(email)
 
-        if not usuarios:
+        if not usuario:
             api.abort(404, "Usuário não encontrado")
 
-        return usuarios[0]
+        return usuario
+
+
+# Importação em massa de usuários (CSV ou NDJSON)
+@usuario_bp.route("/importar", methods=["POST"])
+def importar_usuarios():
+    return importar_requisicao("usuarios")
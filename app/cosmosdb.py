@@ -1,15 +1,121 @@
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import threading
 
-from azure.cosmos import CosmosClient
 from app.config import Config
+from app.services.rastreamento import OPERACOES_COSMOS, instrumentar_cosmos
 
-# Criar o cliente do Cosmos DB
-client = CosmosClient(Config.AZURE_COSMOS_URI, credential=Config.AZURE_COSMOS_KEY)
+# O SDK do Cosmos (e o urllib3) só são importados e o cliente só é criado no primeiro
+# uso de um container, o que mantém o import da aplicação rápido no cold start.
+_client = None
+_lock = threading.Lock()
 
-# Acessar o banco de dados
-database = client.get_database_client(Config.AZURE_COSMOS_DATABASE)
 
-# Criar um container (tabela) chamado "produtos"
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import urllib3
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+                from azure.cosmos import CosmosClient
+
+                # Criar o cliente do Cosmos DB
+                _client = CosmosClient(Config.AZURE_COSMOS_URI, credential=Config.AZURE_COSMOS_KEY)
+    return _client
+
+
+def get_database():
+    # Acessar o banco de dados
+    return get_client().get_database_client(Config.AZURE_COSMOS_DATABASE)
+
+
+class ContainerPreguicoso:
+    """Proxy de ContainerProxy que resolve o container no primeiro acesso.
+
+    As operações de dados chamadas numa requisição amostrada pelo rastreamento ganham
+    um span (com o RU cobrado); nas demais o método do SDK é devolvido como está.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._container = None
+
+    def _resolver(self):
+        if self._container is None:
+            self._container = get_database().get_container_client(self.nome)
+        return self._container
+
+    def __getattr__(self, atributo):
+        container = self._resolver()
+        valor = getattr(container, atributo)
+        if atributo in OPERACOES_COSMOS:
+            return instrumentar_cosmos(self.nome, atributo, valor)
+        return valor
+
+
+_containers = {}
+
+
+def get_container(nome):
+    if nome not in _containers:
+        _containers[nome] = ContainerPreguicoso(nome)
+    return _containers[nome]
+
+
+# Container (tabela) chamado "produtos"
 container_name = "produtos"
-container = database.get_container_client(container_name)
\ No newline at end of file
+container = get_container(container_name)
+
+# Usuários (partition key /cpf) e reservas de email para unicidade global
+usuarios_container = get_container("usuarios")
+emails_container = get_container("usuarios_email")
+
+# Pedidos (partition key /usuarioId) e o resumo por usuário mantido pelo change feed
+pedidos_container = get_container("pedidos")
+resumos_pedidos_container = get_container("pedidos_resumo")
+
+# Cartões e endereços (partition key /usuarioId); os criados pelas rotas SQL chegam pelo outbox
+cartoes_container = get_container("cartoes")
+enderecos_container = get_container("enderecos")
+
+# Partition key e unique keys de cada container, aplicadas por provisionar_containers().
+# Unique keys valem dentro da partição lógica: /cpf é global porque é a partition key;
+# a unicidade global do email vem do container usuarios_email (id = hash do email).
+# default_ttl -1 liga o TTL sem expirar nada por padrão: só documentos com "ttl" expiram.
+DEFINICOES_CONTAINERS = {
+    container_name: {"partition_key": "/produtoCategoria"},
+    "usuarios": {"partition_key": "/cpf", "unique_keys": [["/cpf"], ["/email"]]},
+    "usuarios_email": {"partition_key": "/id"},
+    "pedidos": {"partition_key": "/usuarioId", "default_ttl": -1},
+    "pedidos_resumo": {"partition_key": "/usuarioId"},
+    "cartoes": {"partition_key": "/usuarioId"},
+    "enderecos": {"partition_key": "/usuarioId"},
+}
+
+
+def provisionar_containers():
+    """Cria os containers que ainda não existem (unique keys só podem ser definidas na criação)"""
+    from azure.cosmos import PartitionKey
+
+    database = get_database()
+    criados = []
+    for nome, definicao in DEFINICOES_CONTAINERS.items():
+        opcoes = {}
+        if definicao.get("unique_keys"):
+            opcoes["unique_key_policy"] = {"uniqueKeys": [{"paths": caminhos} for caminhos in definicao["unique_keys"]]}
+        if "default_ttl" in definicao:
+            opcoes["default_ttl"] = definicao["default_ttl"]
+        database.create_container_if_not_exists(
+            id=nome, partition_key=PartitionKey(path=definicao["partition_key"]), **opcoes
+        )
+        criados.append(nome)
+    return criados
+
+
+def __getattr__(nome):
+    # Compatibilidade com quem importava client/database deste módulo
+    if nome == "client":
+        return get_client()
+    if nome == "database":
+        return get_database()
+    raise AttributeError(nome)
@@ -1,3 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+
+class SessaoRoteada(Session):
+    """Sessão que envia as leituras das requisições somente leitura para as réplicas.
+
+    Flush, DML e ``SELECT ... FOR UPDATE`` sempre vão para o primário; a escolha da
+    réplica (e a volta ao primário) fica com o roteador de ``app.services.replicas``.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # O roteador só é colocado em info nas requisições somente leitura (before_request)
+        roteador = self.info.get("leitura")
+        if roteador is not None and bind is None and not self._flushing and not _escrita(clause):
+            replica = roteador.escolher()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _escrita(clause):
+    return clause is not None and (getattr(clause, "is_dml", False) or getattr(clause, "_for_update_arg", None) is not None)
+
+
+db = SQLAlchemy(session_options={"class_": SessaoRoteada})
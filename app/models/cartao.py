@@ -1,6 +1,20 @@
+import calendar
+from datetime import datetime
+
 from app.database import db
 
+
+def fim_do_mes(ano, mes):
+    """Último dia do mês de validade (o cartão vale até o fim do mês impresso)"""
+    return datetime(ano, mes, calendar.monthrange(ano, mes)[1])
+
+
 class Cartao(db.Model):
+    # A unicidade do número por usuário é garantida pelo índice, sem consulta antes do insert
+    __table_args__ = (
+        db.UniqueConstraint("usuario_id", "numero", name="uq_cartao_usuario_numero"),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=False)
     numero = db.Column(db.String(16), nullable=False)
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from app.database import db
+
+# Estados de uma reserva de estoque
+ATIVA = "ATIVA"            # unidades separadas (reservado) até a confirmação ou o prazo
+CONFIRMADA = "CONFIRMADA"  # pedido confirmado: as unidades saíram do estoque
+LIBERADA = "LIBERADA"      # pedido cancelado: as unidades voltaram ao disponível
+EXPIRADA = "EXPIRADA"      # prazo vencido sem confirmação (varredura): as unidades voltaram
+
+
+class Estoque(db.Model):
+    """Saldo de um produto do catálogo (Cosmos), alterado só por UPDATE condicional do contador"""
+    __table_args__ = (
+        # Rede de segurança: as reservas já filtram por disponivel >= quantidade
+        db.CheckConstraint("disponivel >= 0 AND reservado >= 0", name="ck_estoque_nao_negativo"),
+    )
+
+    produto_id = db.Column(db.String(64), primary_key=True)
+    disponivel = db.Column(db.Integer, default=0, nullable=False)
+    reservado = db.Column(db.Integer, default=0, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+
+class ReservaEstoque(db.Model):
+    """Reserva das unidades de um pedido do Cosmos; vence em ``expira_em`` se não for confirmada"""
+    __table_args__ = (
+        # Varredura das reservas vencidas sem varrer a tabela
+        db.Index("ix_reserva_estoque_status_expira_em", "status", "expira_em"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True)
+    pedido_id = db.Column(db.String(64), unique=True, nullable=False)
+    status = db.Column(db.String(12), default=ATIVA, nullable=False)
+    # UTC do servidor da API
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    itens = db.relationship("ItemReservaEstoque", lazy="selectin", cascade="all, delete-orphan",
+                            order_by="ItemReservaEstoque.produto_id")
+
+
+class ItemReservaEstoque(db.Model):
+    reserva_id = db.Column(db.String(36), db.ForeignKey("reserva_estoque.id"), primary_key=True)
+    produto_id = db.Column(db.String(64), primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False)
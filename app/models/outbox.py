@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from app.database import db
+
+# Operações registradas no outbox e como o relay as aplica no Cosmos
+CRIACAO = "criacao"        # upsert do documento completo
+ALTERACAO = "alteracao"    # patch dos campos espelhados (preserva os campos só do Cosmos)
+EXCLUSAO = "exclusao"      # delete do documento (pedidos: patch de excluido + ttl)
+
+
+class Outbox(db.Model):
+    """Alterações de Pedido, Cartao e Endereco a espelhar no Cosmos, gravadas no mesmo commit da entidade"""
+
+    # BIGINT no MySQL; no SQLite só INTEGER PRIMARY KEY é autoincremento
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entidade = db.Column(db.String(20), nullable=False)
+    # id do documento no Cosmos e valor da partition key do container
+    chave = db.Column(db.String(64), nullable=False)
+    particao = db.Column(db.String(64), nullable=False)
+    operacao = db.Column(db.String(10), nullable=False)
+    documento = db.Column(db.Text)
+    # UTC do servidor da API (usado no corte do relay, como na liquidação do ledger)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class MarcaOutbox(db.Model):
+    """Última linha do outbox já enviada ao Cosmos (a linha é bloqueada durante o lote, um relay por vez)"""
+    nome = db.Column(db.String(50), primary_key=True)
+    ultimo_id = db.Column(db.BigInteger, default=0, nullable=False)
+    # JSON [[inicio, fim, desde], ...]: ids abaixo da marca ainda não vistos (transações atrasadas)
+    lacunas = db.Column(db.Text)
+    atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
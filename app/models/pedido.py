@@ -7,6 +7,8 @@ class Pedido(db.Model):
     nome_produto = db.Column(db.String(100), nullable=False)
     valor_total = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), nullable=False)
+    # Chave do job de criação assíncrona: uma repetição do job encontra o pedido já criado
+    chave_criacao = db.Column(db.String(36), unique=True)
 
     criado_em = db.Column(db.DateTime, default=db.func.current_timestamp())
     atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
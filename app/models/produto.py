@@ -1,13 +1,35 @@
+import sys
 import uuid
+from dataclasses import dataclass, field
 
+
+def novo_id():
+    return str(uuid.uuid4())
+
+
+# Metadados do Cosmos guardados no produto (usados no ETag das listagens e no change feed)
+METADADOS = {"_etag": "etag", "_ts": "ts"}
+
+
+@dataclass(slots=True)
 class Produto:
-    def __init__(self, produtoCategoria, nome, preco, urlImagem, descricao):
-        self.id = str(uuid.uuid4())  # Sempre gera um novo UUID
-        self.produtoCategoria = produtoCategoria  # Partition Key
-        self.nome = nome
-        self.preco = preco
-        self.urlImagem = urlImagem
-        self.descricao = descricao
+    """Produto do catálogo (container produtos, partition key produtoCategoria).
+
+    Objeto compacto (``__slots__``, sem ``__dict__``) para o catálogo inteiro caber
+    no cache do processo. ``get`` imita o dict do Cosmos, então os serializadores
+    compilados e o ``etag_documentos`` aceitam tanto o documento quanto o produto.
+    """
+    produtoCategoria: str  # Partition Key
+    nome: str
+    preco: float
+    urlImagem: str = None
+    descricao: str = None
+    id: str = field(default_factory=novo_id)
+    etag: str = None
+    ts: int = None
+
+    def get(self, chave, padrao=None):
+        return getattr(self, METADADOS.get(chave, chave), padrao)
 
     def to_dict(self):
         """Converte o objeto para um dicionário JSON para salvar no CosmosDB."""
@@ -22,11 +44,30 @@ class Produto:
 
     @staticmethod
     def from_dict(data):
-        """Cria um objeto Produto a partir de um dicionário JSON."""
+        """Cria um objeto Produto a partir de um dicionário JSON (mantém o id, se houver)."""
         return Produto(
-            produtoCategoria=data["produtoCategoria"],
-            nome=data["nome"],
-            preco=data["preco"],
-            urlImagem=data["urlImagem"],
-            descricao=data["descricao"],
-        )
\ No newline at end of file
+            data["produtoCategoria"], data["nome"], data["preco"], data.get("urlImagem"), data.get("descricao"),
+            data.get("id") or novo_id(), data.get("_etag"), data.get("_ts")
+        )
+
+    @staticmethod
+    def from_rows(documentos):
+        """Converte documentos do Cosmos em lote (uma chamada de construtor por linha, sem laço sobre campos).
+
+        As categorias se repetem em todo o catálogo: internadas, viram uma string por categoria.
+        """
+        produto, internar = Produto, sys.intern
+        return [
+            produto(internar(d["produtoCategoria"]), d["nome"], d["preco"], d.get("urlImagem"), d.get("descricao"),
+                    d["id"], d.get("_etag"), d.get("_ts"))
+            for d in documentos
+        ]
+
+    @staticmethod
+    def to_rows(produtos):
+        """Documentos para o Cosmos em lote (sem os metadados)"""
+        return [
+            {"id": p.id, "produtoCategoria": p.produtoCategoria, "nome": p.nome, "preco": p.preco,
+             "urlImagem": p.urlImagem, "descricao": p.descricao}
+            for p in produtos
+        ]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.database import db
+
+# Tipos de lançamento e o efeito de cada um no saldo do cartão
+AUTORIZACAO = "AUTORIZACAO"  # debita o saldo
+CAPTURA = "CAPTURA"          # confirma a autorização, sem efeito no saldo
+CANCELAMENTO = "CANCELAMENTO"  # void antes da captura, devolve o valor autorizado
+ESTORNO = "ESTORNO"          # refund depois da captura, devolve até o valor capturado
+
+
+class Transacao(db.Model):
+    """Razão (ledger) das transações: só recebe INSERTs, cada mudança de estado é um novo lançamento"""
+    __table_args__ = (
+        # Histórico do cartão (keyset por id) e lançamentos de uma autorização sem varrer a tabela
+        db.Index("ix_transacao_cartao_id", "cartao_id", "id"),
+        db.Index("ix_transacao_codigo_autorizacao", "codigo_autorizacao"),
+    )
+
+    # BIGINT no MySQL; no SQLite só INTEGER PRIMARY KEY é autoincremento
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
+    codigo_autorizacao = db.Column(db.String(36), nullable=False)
+    cartao_id = db.Column(db.Integer, db.ForeignKey("cartao.id"), nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)
+    valor = db.Column(db.Numeric(10, 2), nullable=False)
+    # UTC do servidor da API, o mesmo dt_transacao devolvido na autorização (e usado no corte da liquidação)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Liquidacao(db.Model):
+    """Totais liquidados por cartão, acumulados pelo job de liquidação (flask liquidar)"""
+    cartao_id = db.Column(db.Integer, db.ForeignKey("cartao.id"), primary_key=True)
+    autorizado = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    capturado = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    cancelado = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    estornado = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    lancamentos = db.Column(db.Integer, default=0, nullable=False)
+    ultimo_lancamento_id = db.Column(db.BigInteger, default=0, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+
+class MarcaLiquidacao(db.Model):
+    """Último lançamento já liquidado (a linha é bloqueada durante o lote, um job por vez)"""
+    nome = db.Column(db.String(50), primary_key=True)
+    ultimo_lancamento_id = db.Column(db.BigInteger, default=0, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+
+@event.listens_for(Transacao, "before_update")
+@event.listens_for(Transacao, "before_delete")
+def _somente_insercao(mapper, connection, lancamento):
+    raise RuntimeError("Lançamentos de transação não podem ser alterados nem removidos")
@@ -1,11 +1,16 @@
 from app.database import db
 
 class Usuario(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint("email", name="uq_usuario_email"),
+        db.UniqueConstraint("cpf", name="uq_usuario_cpf"),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nome = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
+    email = db.Column(db.String(100), nullable=False)
     dt_nascimento = db.Column(db.Date)
-    cpf = db.Column(db.String(11), unique=True)
+    cpf = db.Column(db.String(11))
     telefone = db.Column(db.String(20))
     criado_em = db.Column(db.DateTime, default=db.func.current_timestamp())
     atualizado_em = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
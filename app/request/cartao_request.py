@@ -0,0 +1,64 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated
+
+from pydantic import BeforeValidator, Field, StringConstraints
+from pydantic_core import PydanticCustomError
+
+from app.models.cartao import fim_do_mes
+from app.request.validacao import AtualizacaoRequest, CriacaoRequest, RequestModel, Texto, texto
+
+NumeroCartao = Annotated[str, StringConstraints(strip_whitespace=True, pattern=r"^\d{13,16}$")]
+Cvv = Annotated[str, StringConstraints(strip_whitespace=True, pattern=r"^\d{3,4}$")]
+
+
+def _validade(valor):
+    """MM/AAAA -> último dia do mês (o cartão vale até o fim do mês impresso)"""
+    if not isinstance(valor, str):
+        return valor
+    try:
+        mes, ano = map(int, valor.strip().split("/"))
+        return fim_do_mes(ano, mes)
+    except ValueError:
+        raise PydanticCustomError("validade", "Formato de data inválido. Use o formato MM/AAAA")
+
+
+Validade = Annotated[datetime, BeforeValidator(_validade)]
+
+
+class CartaoRequest(CriacaoRequest):
+    """Cartão das rotas SQL; ``validade`` chega como MM/AAAA e sai como datetime do fim do mês"""
+    numero: NumeroCartao
+    nome_impresso: texto(100)
+    validade: Validade
+    cvv: Cvv
+    bandeira: texto(20)
+    tipo: str | None = ""
+    saldo: Decimal = Field(Decimal("0.00"), ge=0, max_digits=10, decimal_places=2)
+
+
+class SaldoRequest(RequestModel):
+    saldo: Decimal = Field(max_digits=10, decimal_places=2, allow_inf_nan=False)
+
+
+class CartaoCosmosRequest(CriacaoRequest):
+    usuarioId: Texto  # Partition Key
+    numero: NumeroCartao
+    nomeTitular: Texto
+    dataValidade: Texto
+    cvv: Cvv
+    bandeira: Texto
+    tipo: Texto
+    principal: bool = False
+
+
+class CartaoCosmosAtualizacaoRequest(AtualizacaoRequest):
+    usuarioId: Texto = None
+    numero: NumeroCartao = None
+    nomeTitular: Texto = None
+    dataValidade: Texto = None
+    cvv: Cvv = None
+    bandeira: Texto = None
+    tipo: Texto = None
+    principal: bool = None
+
@@ -0,0 +1,65 @@
+from typing import Annotated
+
+from pydantic import AfterValidator, StringConstraints
+from pydantic_core import PydanticCustomError
+
+from app.services.cep import normalizar_cep
+from app.request.validacao import AtualizacaoRequest, CriacaoRequest, Texto, texto
+
+
+def _digitos_cep(cep):
+    numero = normalizar_cep(cep)
+    if numero is None:
+        raise PydanticCustomError("cep", "CEP inválido, informe 8 dígitos")
+    return f"{numero:08d}"
+
+
+Cep = Annotated[str, StringConstraints(strip_whitespace=True), AfterValidator(_digitos_cep)]
+Uf = Annotated[str, StringConstraints(strip_whitespace=True, to_upper=True, pattern=r"^[A-Za-z]{2}$")]
+
+
+class EnderecoRequest(CriacaoRequest):
+    """Endereço das rotas SQL: logradouro, bairro, cidade e uf podem vir do CEP (completar_endereco)"""
+    cep: Cep
+    logradouro: texto(150) = None
+    complemento: str | None = None
+    bairro: texto(100) = None
+    cidade: texto(100) = None
+    uf: Uf = None
+    pais: texto(50) = "Brasil"
+    tipo: str | None = None
+
+
+class EnderecoAtualizacaoRequest(AtualizacaoRequest):
+    cep: Cep = None
+    logradouro: texto(150) = None
+    complemento: str | None = None
+    bairro: texto(100) = None
+    cidade: texto(100) = None
+    uf: Uf = None
+    pais: texto(50) = None
+    tipo: str | None = None
+
+
+class EnderecoCosmosRequest(CriacaoRequest):
+    usuarioId: Texto  # Partition Key
+    cep: Texto
+    logradouro: Texto
+    numero: Texto
+    complemento: str | None = None
+    bairro: Texto
+    cidade: Texto
+    estado: Texto
+    pais: Texto
+
+
+class EnderecoCosmosAtualizacaoRequest(AtualizacaoRequest):
+    usuarioId: Texto = None
+    cep: Texto = None
+    logradouro: Texto = None
+    numero: Texto = None
+    complemento: str | None = None
+    bairro: Texto = None
+    cidade: Texto = None
+    estado: Texto = None
+    pais: Texto = None
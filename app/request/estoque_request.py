@@ -0,0 +1,16 @@
+from pydantic import Field, field_validator
+from pydantic_core import PydanticCustomError
+
+from app.request.validacao import RequestModel
+
+
+class AjusteEstoqueRequest(RequestModel):
+    """Entrada (positiva) ou saída (negativa) de unidades do produto"""
+    ajuste: int = Field(strict=True)
+
+    @field_validator("ajuste")
+    @classmethod
+    def _diferente_de_zero(cls, ajuste):
+        if ajuste == 0:
+            raise PydanticCustomError("ajuste_zero", "O ajuste não pode ser zero")
+        return ajuste
@@ -0,0 +1,21 @@
+from pydantic import Field
+
+from app.request.validacao import RequestModel
+
+
+class ItemFreteRequest(RequestModel):
+    produtoId: str | None = None
+    quantidade: int = Field(1, ge=1)
+    # Sem peso, a calculadora usa FRETE_PESO_PADRAO_KG
+    peso: float | None = Field(None, ge=0, allow_inf_nan=False)
+
+
+class CarrinhoFreteRequest(RequestModel):
+    """Carrinho a cotar; CEP e carrinho vazio são conferidos pela calculadora (erro por carrinho no lote)"""
+    cep: str | None = None
+    itens: list[ItemFreteRequest] = []
+
+
+class LoteFreteRequest(RequestModel):
+    """Carrinhos de uma cotação em lote (o limite vem de FRETE_LOTE_MAXIMO)"""
+    carrinhos: list[CarrinhoFreteRequest] = Field(min_length=1)
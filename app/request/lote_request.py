@@ -0,0 +1,12 @@
+from pydantic import Field
+
+from app.request.validacao import RequestModel, Texto
+
+
+class LoteRequest(RequestModel):
+    """Ids de um batch-get (o limite vem de BATCH_GET_MAXIMO)"""
+    ids: list[Texto] = Field(min_length=1)
+
+
+class CartaoLoteRequest(LoteRequest):
+    usuarioId: Texto = None  # Partition Key: com ela a consulta fica em uma partição
@@ -0,0 +1,43 @@
+from datetime import date
+
+from pydantic import Field
+
+from app.request.validacao import AtualizacaoRequest, CriacaoRequest, RequestModel, Texto, texto
+
+
+class PedidoRequest(CriacaoRequest):
+    """Pedido das rotas SQL (data_pedido em AAAA-MM-DD)"""
+    nome_cliente: texto(50)
+    nome_produto: texto(100)
+    valor_total: float = Field(gt=0, allow_inf_nan=False)
+    data_pedido: date
+    status: texto(20)
+
+
+class PedidoAtualizacaoRequest(AtualizacaoRequest):
+    nome_cliente: texto(50) = None
+    nome_produto: texto(100) = None
+    valor_total: float = Field(None, gt=0, allow_inf_nan=False)
+    data_pedido: date = None
+    status: texto(20) = None
+
+
+class ItemPedidoRequest(RequestModel):
+    produtoId: Texto
+    quantidade: int = Field(ge=1)
+    precoUnitario: float = Field(ge=0, allow_inf_nan=False)
+
+
+class PedidoCosmosRequest(CriacaoRequest):
+    usuarioId: Texto  # Partition Key
+    enderecoId: Texto
+    cartaoId: Texto
+    itens: list[ItemPedidoRequest] = Field(min_length=1)
+
+
+class PedidoCosmosAtualizacaoRequest(AtualizacaoRequest):
+    usuarioId: Texto = None  # só para conferir: a partition key não muda
+    enderecoId: Texto = None
+    cartaoId: Texto = None
+    itens: list[ItemPedidoRequest] = Field(None, min_length=1)
+    status: Texto = None
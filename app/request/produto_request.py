@@ -0,0 +1,19 @@
+from pydantic import Field
+
+from app.request.validacao import AtualizacaoRequest, CriacaoRequest, Texto
+
+
+class ProdutoRequest(CriacaoRequest):
+    produtoCategoria: Texto  # Partition Key
+    nome: Texto
+    preco: float = Field(gt=0, allow_inf_nan=False)
+    urlImagem: str | None = None
+    descricao: str | None = None
+
+
+class ProdutoAtualizacaoRequest(AtualizacaoRequest):
+    produtoCategoria: Texto = None
+    nome: Texto = None
+    preco: float = Field(None, gt=0, allow_inf_nan=False)
+    urlImagem: str | None = None
+    descricao: str | None = None
@@ -1,8 +1,18 @@
-from pydantic import BaseModel
-from datetime import datetime
-
-class TransacaoRequest(BaseModel):
-    numero: str  # Número do cartão (16 dígitos)
-    dt_expiracao: str  # Data de expiração no formato datetime
-    cvv: str  # CVV pode ter 3 ou 4 dígitos
-    valor: float  # Valor da transação
\ No newline at end of file
+from decimal import Decimal
+
+from pydantic import Field
+
+from app.request.cartao_request import Cvv, NumeroCartao, Validade
+from app.request.validacao import RequestModel
+
+
+class TransacaoRequest(RequestModel):
+    numero: NumeroCartao  # Número do cartão (13 a 16 dígitos)
+    dt_expiracao: Validade  # MM/AAAA, convertido para o fim do mês
+    cvv: Cvv  # CVV pode ter 3 ou 4 dígitos
+    valor: float = Field(gt=0, allow_inf_nan=False)  # Valor da transação
+
+
+class EstornoRequest(RequestModel):
+    # Sem valor, estorna o restante; centavos e a precisão da coluna (Numeric(10, 2)), como o saldo
+    valor: Decimal | None = Field(None, gt=0, max_digits=10, decimal_places=2, allow_inf_nan=False)
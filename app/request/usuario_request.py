@@ -0,0 +1,25 @@
+from typing import Annotated
+
+from pydantic import StringConstraints
+
+from app.request.validacao import AtualizacaoRequest, CriacaoRequest, Texto
+
+Email = Annotated[str, StringConstraints(strip_whitespace=True, max_length=254, pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")]
+
+
+class UsuarioRequest(CriacaoRequest):
+    nome: Texto
+    email: Email
+    senha: Texto
+    cpf: Texto  # Partition Key
+    dataNascimento: str | None = None
+    telefone: str | None = None
+
+
+class UsuarioAtualizacaoRequest(AtualizacaoRequest):
+    nome: Texto = None
+    email: Email = None
+    senha: Texto = None
+    cpf: Texto = None  # só para conferir: a partition key não muda
+    dataNascimento: str | None = None
+    telefone: str | None = None
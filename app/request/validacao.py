@@ -0,0 +1,90 @@
+"""Validação dos corpos de requisição com Pydantic, antes de qualquer I/O.
+
+Os modelos são compilados uma vez (na definição da classe, pelo pydantic-core) e
+reutilizados em todas as requisições. ``validar`` lê o corpo cru e valida o JSON
+direto no validador compilado (``model_validate_json``), sem o ``json.loads`` do
+Flask; um corpo inválido vira 400 com a lista de erros por campo, antes de
+qualquer consulta ao banco ou ao Cosmos.
+"""
+from typing import Annotated
+
+from flask import request
+from pydantic import BaseModel, ConfigDict, StringConstraints, ValidationError, model_validator
+from pydantic_core import PydanticCustomError
+from werkzeug.exceptions import BadRequest
+
+from app.response.serializacao import resposta_json
+from app.services.rastreamento import span
+
+# Texto obrigatório (sem espaços nas pontas e não vazio), com limite opcional de tamanho
+Texto = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+
+def texto(tamanho_maximo):
+    return Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=tamanho_maximo)]
+
+
+class ErroValidacao(BadRequest):
+    """400 com os erros por campo: ``{"erro", "erros"}`` nas rotas dos blueprints e
+    ``{"message", "erros"}`` nos namespaces (o flask-restx usa ``data``)."""
+
+    def __init__(self, erros):
+        self.erros = erros
+        primeiro = erros[0] if erros else {"campo": "", "erro": "Corpo da requisição inválido"}
+        mensagem = f"{primeiro['campo']}: {primeiro['erro']}" if primeiro["campo"] else primeiro["erro"]
+        super().__init__(mensagem)
+        self.data = {"message": mensagem, "erros": erros}
+
+    def get_response(self, environ=None, scope=None):
+        return resposta_json({"erro": self.description, "erros": self.erros}, 400)
+
+
+def erros_de(excecao):
+    return [
+        {"campo": ".".join(str(parte) for parte in erro["loc"]), "erro": erro["msg"]}
+        for erro in excecao.errors(include_url=False, include_input=False, include_context=False)
+    ]
+
+
+def validar(modelo, dados=None):
+    """Valida o corpo JSON da requisição (ou ``dados``, já decodificados) e devolve o modelo"""
+    with span("pydantic.validar", {"validacao.modelo": modelo.__name__}) as rastreio:
+        try:
+            if dados is not None:
+                return modelo.model_validate(dados)
+            corpo = request.get_data(cache=True) or b"{}"
+            rastreio.definir("validacao.bytes", len(corpo))
+            return modelo.model_validate_json(corpo)
+        except ValidationError as e:
+            erros = erros_de(e)
+            rastreio.definir("validacao.erros", len(erros))
+            raise ErroValidacao(erros)
+
+
+class RequestModel(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+
+class CriacaoRequest(RequestModel):
+    """Criação: um campo desconhecido (ex.: nome digitado errado) é 400 em vez de ser descartado em silêncio.
+
+    As atualizações continuam ignorando campos a mais: um GET editado e reenviado traz ``id`` e
+    outros campos só de leitura.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+
+class AtualizacaoRequest(RequestModel):
+    """Atualização parcial: os campos são opcionais (mas não aceitam null) e ao menos um é exigido.
+
+    ``campos()`` devolve só o que foi enviado, para aplicar sobre o registro atual.
+    """
+
+    @model_validator(mode="after")
+    def _algum_campo(self):
+        if not self.model_fields_set:
+            raise PydanticCustomError("sem_campos", "Nenhum campo para atualizar")
+        return self
+
+    def campos(self):
+        return self.model_dump(exclude_unset=True)
@@ -0,0 +1,94 @@
+"""Compressão negociada (brotli/gzip) das respostas acima de um tamanho mínimo.
+
+Registrada em ``create_app`` como um ``after_request``. A codificação é escolhida
+pelo ``Accept-Encoding`` do cliente (respeitando os pesos ``q``) e o ETag da
+resposta recebe o sufixo da codificação, já que a representação comprimida é
+outra sequência de bytes.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+SUFIXOS_ETAG = ("-br", "-gzip")
+
+
+def _codificacoes_aceitas(cabecalho):
+    """Converte o Accept-Encoding em {codificacao: peso}"""
+    aceitas = {}
+    for parte in cabecalho.split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        if not nome:
+            continue
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        aceitas[nome.strip().lower()] = peso
+    return aceitas
+
+
+def escolher_codificacao(cabecalho):
+    aceitas = _codificacoes_aceitas(cabecalho or "")
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    melhor = None
+    for codificacao in candidatas:
+        peso = aceitas.get(codificacao, aceitas.get("*", 0.0))
+        if peso > 0 and (melhor is None or peso > melhor[1]):
+            melhor = (codificacao, peso)
+    return melhor[0] if melhor else None
+
+
+def comprimir(dados, codificacao, config):
+    if codificacao == "br":
+        return brotli.compress(dados, quality=config["COMPRESSAO_NIVEL_BROTLI"])
+    # mtime=0 deixa a saída determinística, o que mantém o ETag estável
+    return gzip.compress(dados, compresslevel=config["COMPRESSAO_NIVEL_GZIP"], mtime=0)
+
+
+def init_compressao(app):
+    app.config.setdefault("COMPRESSAO_HABILITADA", True)
+    app.config.setdefault("COMPRESSAO_MIN_BYTES", 1024)
+    app.config.setdefault("COMPRESSAO_NIVEL_GZIP", 6)
+    app.config.setdefault("COMPRESSAO_NIVEL_BROTLI", 5)
+    app.config.setdefault("COMPRESSAO_TIPOS", ("application/json", "text/html", "text/css", "application/javascript"))
+
+    @app.after_request
+    def comprimir_resposta(resposta):
+        config = app.config
+        if not config["COMPRESSAO_HABILITADA"]:
+            return resposta
+
+        if (
+            resposta.status_code < 200
+            or resposta.status_code in (204, 206, 304)
+            or resposta.direct_passthrough
+            or resposta.is_streamed
+            or "Content-Encoding" in resposta.headers
+            or resposta.mimetype not in config["COMPRESSAO_TIPOS"]
+        ):
+            return resposta
+
+        resposta.vary.add("Accept-Encoding")
+        dados = resposta.get_data()
+        if len(dados) < config["COMPRESSAO_MIN_BYTES"]:
+            return resposta
+
+        codificacao = escolher_codificacao(request.headers.get("Accept-Encoding"))
+        if codificacao is None:
+            return resposta
+
+        resposta.set_data(comprimir(dados, codificacao, config))
+        resposta.headers["Content-Encoding"] = codificacao
+
+        etag, fraco = resposta.get_etag()
+        if etag:
+            resposta.set_etag(f"{etag}-{codificacao}", weak=fraco)
+        return resposta
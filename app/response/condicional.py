@@ -0,0 +1,62 @@
+"""GET condicional (ETag / If-None-Match) para catálogo e listagens.
+
+O ETag é forte e vem dos ``_etag``/``_ts`` que o Cosmos mantém em cada documento,
+então não é preciso serializar a lista para saber se ela mudou. Documentos sem
+esses metadados entram no hash pelo conteúdo.
+"""
+import hashlib
+
+from flask import Response, request
+
+from app.response.compressao import SUFIXOS_ETAG
+from app.response.serializacao import dumps
+
+
+def etag_documentos(documentos):
+    """ETag forte de uma lista de documentos do Cosmos"""
+    resumo = hashlib.blake2b(digest_size=16)
+    for documento in documentos:
+        versao = documento.get("_etag") or documento.get("_ts")
+        if versao is not None:
+            resumo.update(f"{documento.get('id')}:{versao};".encode())
+        else:
+            resumo.update(dumps(documento))
+    return resumo.hexdigest()
+
+
+def _etags_do_cliente():
+    """ETags do If-None-Match (comparação fraca, como manda a RFC 9110), sem o sufixo da compressão.
+
+    Devolve {etag sem sufixo: etag enviado}: o 304 repete o ETag que o cliente tem, com
+    o sufixo da codificação que a resposta 200 recebeu.
+    """
+    etags = {}
+    for enviado in request.if_none_match.as_set(include_weak=True):
+        etag = enviado
+        for sufixo in SUFIXOS_ETAG:
+            if etag.endswith(sufixo):
+                etag = etag[:-len(sufixo)]
+                break
+        etags.setdefault(etag, enviado)
+    return etags
+
+
+def resposta_condicional(etag, gerar_resposta):
+    """Devolve 304 se o cliente já tem esta versão; senão gera e marca a resposta.
+
+    ``gerar_resposta`` só é chamado quando o conteúdo precisa ser enviado, o que
+    evita a serialização nos casos de 304.
+    """
+    do_cliente = _etags_do_cliente()
+    if request.if_none_match.star_tag or etag in do_cliente:
+        resposta = Response(status=304)
+        # A compressão não passa pelo 304: o ETag (com sufixo) e o Vary são os que o 200 teria
+        resposta.set_etag(do_cliente.get(etag, etag))
+        resposta.vary.add("Accept-Encoding")
+    else:
+        resposta = gerar_resposta()
+        resposta.set_etag(etag)
+
+    # O cliente pode guardar a resposta, mas deve revalidar a cada uso
+    resposta.cache_control.no_cache = True
+    return resposta
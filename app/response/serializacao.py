@@ -0,0 +1,156 @@
+"""Camada de serialização compartilhada pelas rotas de listagem.
+
+Cada serializador é compilado uma única vez (no import do controller) para uma
+função Python específica do modelo, sem laços sobre os campos a cada linha. Os
+dados podem vir de documentos do Cosmos (dicts), de modelos Swagger do
+flask-restx ou de projeções SQL (``with_entities``), que devolvem tuplas em vez
+de objetos ORM completos. A codificação usa orjson quando disponível.
+"""
+import json
+from decimal import Decimal
+
+from flask import Response
+from flask_restx import fields
+
+from app.services.rastreamento import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+def _padrao_json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def dumps(dados):
+    """Codifica os dados em JSON (bytes), usando orjson se estiver instalado"""
+    if orjson is not None:
+        return orjson.dumps(dados, default=_padrao_json)
+    return json.dumps(dados, default=_padrao_json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def resposta_json(dados, status=200):
+    """Monta a resposta HTTP já codificada, sem passar pelo jsonify/marshal"""
+    with span("json.serializar") as rastreio:
+        corpo = dumps(dados)
+        rastreio.definir("json.bytes", len(corpo))
+    return Response(corpo, status=status, mimetype="application/json")
+
+
+# Conversores usados pelas projeções -------------------------------------------
+
+def data_br(valor):
+    """date -> DD/MM/AAAA (equivalente a strftime('%d/%m/%Y'), sem o custo do strftime)"""
+    return None if valor is None else f"{valor.day:02d}/{valor.month:02d}/{valor.year}"
+
+
+def mes_ano(valor):
+    """datetime -> MM/AAAA, formato da validade dos cartões"""
+    return None if valor is None else f"{valor.month:02d}/{valor.year}"
+
+
+def para_float(valor):
+    return None if valor is None else float(valor)
+
+
+# Compilação dos serializadores ------------------------------------------------
+
+def compilar(campos, acesso="chave"):
+    """Gera uma função que converte uma linha em dict.
+
+    ``campos`` é uma sequência de ``(nome_saida, origem, conversor)``; ``origem``
+    é a chave do dict (acesso="chave"), a posição na tupla (acesso="indice") ou o
+    atributo do objeto (acesso="atributo", ex.: objetos com ``__slots__``). O
+    conversor é opcional e recebe o valor bruto.
+    """
+    ambiente = {}
+    itens = []
+    for posicao, (nome, origem, conversor) in enumerate(campos):
+        if acesso == "chave":
+            valor = f"o.get({origem!r})"
+        elif acesso == "atributo":
+            if not str(origem).isidentifier():
+                raise ValueError(f"Atributo inválido: {origem!r}")
+            valor = f"o.{origem}"
+        else:
+            valor = f"o[{int(origem)}]"
+        if conversor is not None:
+            ambiente[f"_c{posicao}"] = conversor
+            valor = f"_c{posicao}({valor})"
+        itens.append(f"{nome!r}: {valor}")
+
+    codigo = "def serializar(o):\n    return {" + ", ".join(itens) + "}\n"
+    exec(compile(codigo, f"<serializador {', '.join(c[0] for c in campos)}>", "exec"), ambiente)
+    return ambiente["serializar"]
+
+
+def _conversor_campo(campo):
+    """Reproduz a conversão que o marshal do flask-restx aplica em cada tipo de campo"""
+    if isinstance(campo, fields.String):
+        return lambda v: None if v is None else str(v)
+    if isinstance(campo, fields.Float):
+        return lambda v: None if v is None else float(v)
+    if isinstance(campo, fields.Integer):
+        return lambda v: None if v is None else int(v)
+    if isinstance(campo, fields.Boolean):
+        return lambda v: None if v is None else bool(v)
+    if isinstance(campo, fields.Nested):
+        interno = compilar_modelo(campo.nested)
+        vazio = interno({})
+        return lambda v: (None if campo.allow_null else dict(vazio)) if v is None else interno(v)
+    if isinstance(campo, fields.List):
+        container = campo.container() if isinstance(campo.container, type) else campo.container
+        elemento = _conversor_campo(container) or (lambda v: v)
+        return lambda v: None if v is None else [elemento(i) for i in v]
+    return None
+
+
+def compilar_modelo(modelo, acesso="chave"):
+    """Compila um serializador para documentos do Cosmos (ou objetos, com acesso="atributo") a partir de um api.model"""
+    campos = []
+    for nome, campo in modelo.items():
+        if isinstance(campo, type):
+            campo = campo()
+        campos.append((nome, campo.attribute or nome, _conversor_campo(campo)))
+    return compilar(campos, acesso)
+
+
+class Projecao:
+    """Colunas consultadas com ``with_entities`` e o serializador das tuplas resultantes.
+
+    Exemplo::
+
+        projecao = Projecao(("id", Pedido.id_pedido), ("data", Pedido.data_pedido, data_br))
+        projecao.listar(Pedido.query.filter(...))
+    """
+
+    def __init__(self, *campos):
+        self.colunas = [campo[1] for campo in campos]
+        self.serializar = compilar(
+            [(campo[0], posicao, campo[2] if len(campo) > 2 else None) for posicao, campo in enumerate(campos)],
+            acesso="indice"
+        )
+
+    def consultar(self, query):
+        return query.with_entities(*self.colunas)
+
+    def listar(self, query):
+        return list(map(self.serializar, self.consultar(query)))
+
+    def primeiro(self, query):
+        linha = self.consultar(query).first()
+        return None if linha is None else self.serializar(linha)
+
+
+def serializar_lista(serializador, documentos):
+    # Com um iterador de consulta do Cosmos, o span inclui a leitura das páginas
+    with span("serializar.lista") as rastreio:
+        itens = list(map(serializador, documentos))
+        rastreio.definir("serializacao.itens", len(itens))
+    return itens
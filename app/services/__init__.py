@@ -0,0 +1 @@
+# Arquivo __init__.py vazio para que a pasta services seja reconhecida como um pacote Python
@@ -0,0 +1,349 @@
+"""Relatórios de vendas com agregação vetorizada (NumPy).
+
+Os pedidos da janela são lidos em streaming (páginas do Cosmos ou partições do
+``yield_per`` do SQLAlchemy) e convertidos bloco a bloco em colunas NumPy: dia,
+valor e status por pedido; dia, produto, categoria, quantidade e receita por item.
+Textos viram códigos inteiros por dicionário, e os relatórios são group-bys com
+``np.bincount`` sobre as colunas, sem montar um dict por pedido.
+
+As colunas de cada janela (fonte, início, fim) ficam em cache por alguns
+segundos e todos os relatórios da mesma janela reutilizam a mesma leitura.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+SEM_CATEGORIA = "Sem categoria"
+FONTES = ("cosmos", "sql")
+JANELA_PADRAO_DIAS = 30
+JANELA_MAX_DIAS = 731
+
+
+class ErroAnalise(ValueError):
+    pass
+
+
+def janela(inicio=None, fim=None):
+    """(início, fim exclusivo) a partir de datas AAAA-MM-DD; padrão: últimos 30 dias"""
+    try:
+        fim = (datetime.strptime(fim, "%Y-%m-%d").date() if fim else date.today()) + timedelta(days=1)
+        inicio = datetime.strptime(inicio, "%Y-%m-%d").date() if inicio else fim - timedelta(days=JANELA_PADRAO_DIAS)
+    except ValueError:
+        raise ErroAnalise("Datas inválidas, use AAAA-MM-DD")
+    if inicio >= fim:
+        raise ErroAnalise("O início deve ser anterior ao fim")
+    if (fim - inicio).days > JANELA_MAX_DIAS:
+        raise ErroAnalise(f"A janela deve ter no máximo {JANELA_MAX_DIAS} dias")
+    return inicio, fim
+
+
+class Dicionario:
+    """Codificação de textos em inteiros (códigos na ordem em que aparecem)"""
+
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+
+    def codificar(self, textos):
+        codigos, valores = self.codigos, self.valores
+
+        def codigo(texto):
+            c = codigos.get(texto)
+            if c is None:
+                c = codigos[texto] = len(valores)
+                valores.append(texto)
+            return c
+
+        return np.fromiter(map(codigo, textos), dtype=np.int32, count=len(textos))
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class Colunas:
+    """Pedidos e itens de uma janela em colunas NumPy, montadas em blocos.
+
+    Por item só entram produto, quantidade e preço; o dia vem do pedido
+    (``np.repeat`` pela quantidade de itens) e a categoria vem do produto.
+    """
+
+    def __init__(self, inicio, fim, categoria_do_produto=None, nomes_produtos=None):
+        self.inicio = inicio
+        self.fim = fim
+        self.dias = (fim - inicio).days
+        self.status = Dicionario()
+        self.produtos = Dicionario()
+        self.categorias = Dicionario()
+        self.categoria_do_produto = categoria_do_produto or {}
+        self.nomes_produtos = nomes_produtos or {}
+        self._blocos = []
+
+    def adicionar(self, datas, valores, status, itens_por_pedido, produtos, quantidades, precos):
+        """Um bloco de pedidos (uma posição por pedido) e dos seus itens (uma por item)"""
+        if not datas:
+            return
+        dias = (np.array(datas, dtype="datetime64[D]") - np.datetime64(self.inicio, "D")).astype(np.int32)
+        quantidades = np.array(quantidades, dtype=np.int64)
+        self._blocos.append((
+            dias,
+            np.array(valores, dtype=np.float64),
+            self.status.codificar(status),
+            np.repeat(dias, np.array(itens_por_pedido, dtype=np.int64)),
+            self.produtos.codificar(produtos),
+            quantidades,
+            quantidades * np.array(precos, dtype=np.float64)
+        ))
+
+    def finalizar(self):
+        tipos = (np.int32, np.float64, np.int32, np.int32, np.int32, np.int64, np.float64)
+        if self._blocos:
+            colunas = [np.concatenate(coluna) for coluna in zip(*self._blocos)]
+        else:
+            colunas = [np.empty(0, dtype=t) for t in tipos]
+        (self.pedido_dia, self.pedido_valor, self.pedido_status,
+         self.item_dia, self.item_produto, self.item_quantidade, self.item_receita) = colunas
+        self._blocos = None
+
+        # Categoria por código de produto, aplicada aos itens com uma indexação
+        categoria_por_codigo = self.categorias.codificar([
+            self.categoria_do_produto.get(produto, SEM_CATEGORIA) for produto in self.produtos.valores
+        ])
+        self.item_categoria = categoria_por_codigo[self.item_produto]
+        return self
+
+    def __len__(self):
+        return len(self.pedido_valor)
+
+
+# Leitura ---------------------------------------------------------------------
+
+def _valor_pedido(pedido):
+    if pedido.get("valorTotal") is not None:
+        return float(pedido["valorTotal"])
+    return sum(float(i.get("precoUnitario") or 0) * int(i.get("quantidade") or 0) for i in pedido.get("itens") or [])
+
+
+def ler_cosmos(pedidos_container, produtos_container, inicio, fim, tamanho_bloco=50000):
+    """Colunas dos pedidos do Cosmos com dataPedido em [inicio, fim)"""
+    categorias, nomes = {}, {}
+    for produto in produtos_container.query_items(
+        query="SELECT p.id, p.produtoCategoria, p.nome FROM produtos p", enable_cross_partition_query=True
+    ):
+        categorias[produto["id"]] = produto.get("produtoCategoria") or SEM_CATEGORIA
+        nomes[produto["id"]] = produto.get("nome")
+    colunas = Colunas(inicio, fim, categorias, nomes)
+
+    query = (
+        "SELECT p.id, p.dataPedido, p.valorTotal, p.status, p.itens FROM pedidos p "
+        "WHERE p.dataPedido >= @inicio AND p.dataPedido < @fim AND NOT IS_DEFINED(p.excluido)"
+    )
+    parametros = [{"name": "@inicio", "value": inicio.isoformat()}, {"name": "@fim", "value": fim.isoformat()}]
+    pedidos = pedidos_container.query_items(
+        query=query, parameters=parametros, enable_cross_partition_query=True, max_item_count=1000
+    )
+
+    bloco = ([], [], [], [], [], [], [])
+    datas, valores, status, itens_por_pedido, produtos, quantidades, precos = bloco
+    for pedido in pedidos:
+        itens = pedido.get("itens") or []
+        if (not isinstance(pedido.get("dataPedido"), str) or not isinstance(itens, list)
+                or not all(isinstance(item, dict) for item in itens)):
+            raise ErroAnalise(f"Pedido {pedido.get('id')} com dataPedido ou itens inválidos")
+        datas.append(pedido["dataPedido"][:10])
+        try:
+            valores.append(_valor_pedido(pedido))
+        except (TypeError, ValueError):
+            raise ErroAnalise(f"Pedido {pedido.get('id')} com valor, quantidade ou preço inválidos")
+        status.append(pedido.get("status"))
+        itens_por_pedido.append(len(itens))
+        for item in itens:
+            produtos.append(item.get("produtoId"))
+            quantidades.append(item.get("quantidade") or 0)
+            precos.append(item.get("precoUnitario") or 0)
+
+        if len(datas) >= tamanho_bloco:
+            _adicionar(colunas, bloco)
+            bloco = ([], [], [], [], [], [], [])
+            datas, valores, status, itens_por_pedido, produtos, quantidades, precos = bloco
+
+    _adicionar(colunas, bloco)
+    return colunas.finalizar()
+
+
+def _adicionar(colunas, bloco):
+    """Converte o bloco em colunas; um valor que o NumPy não converte vira ErroAnalise (400), não 500"""
+    try:
+        colunas.adicionar(*bloco)
+    except (TypeError, ValueError) as e:
+        raise ErroAnalise(f"Pedidos com dataPedido, quantidade ou preço inválidos: {e}")
+
+
+def ler_sql(inicio, fim, tamanho_bloco=50000):
+    """Colunas dos pedidos do MySQL (um produto por pedido, sem categoria)"""
+    from sqlalchemy import select
+
+    from app.database import db
+    from app.models.pedido import Pedido
+
+    colunas = Colunas(inicio, fim)
+    consulta = select(Pedido.data_pedido, Pedido.valor_total, Pedido.status, Pedido.nome_produto).where(
+        Pedido.data_pedido >= inicio, Pedido.data_pedido < fim
+    ).execution_options(yield_per=tamanho_bloco)
+
+    for linhas in db.session.execute(consulta).partitions():
+        datas, valores, status, produtos = zip(*linhas)
+        um_por_pedido = [1] * len(datas)
+        colunas.adicionar(datas, valores, status, um_por_pedido, produtos, um_por_pedido, valores)
+    return colunas.finalizar()
+
+
+# Relatórios ------------------------------------------------------------------
+
+def _dinheiro(valor):
+    return round(float(valor), 2)
+
+
+def receita_por_dia(colunas):
+    receita = np.bincount(colunas.pedido_dia, weights=colunas.pedido_valor, minlength=colunas.dias)
+    pedidos = np.bincount(colunas.pedido_dia, minlength=colunas.dias)
+    return [
+        {"data": (colunas.inicio + timedelta(days=int(d))).isoformat(),
+         "receita": _dinheiro(receita[d]), "pedidos": int(pedidos[d])}
+        for d in np.flatnonzero(pedidos)
+    ]
+
+
+def receita_por_categoria(colunas):
+    n = len(colunas.categorias)
+    receita = np.bincount(colunas.item_categoria, weights=colunas.item_receita, minlength=n)
+    quantidade = np.bincount(colunas.item_categoria, weights=colunas.item_quantidade, minlength=n)
+    return [
+        {"categoria": colunas.categorias.valores[c], "receita": _dinheiro(receita[c]), "quantidade": int(quantidade[c])}
+        for c in np.argsort(-receita, kind="stable")
+    ]
+
+
+def produtos_mais_vendidos(colunas, limite=10):
+    n = len(colunas.produtos)
+    if not n:
+        return []
+    receita = np.bincount(colunas.item_produto, weights=colunas.item_receita, minlength=n)
+    quantidade = np.bincount(colunas.item_produto, weights=colunas.item_quantidade, minlength=n)
+    limite = min(limite, n)
+    # argpartition separa os k maiores em O(n); só eles são ordenados
+    topo = np.argpartition(-receita, limite - 1)[:limite]
+    topo = topo[np.argsort(-receita[topo], kind="stable")]
+    return [
+        {"produto": colunas.produtos.valores[p], "nome": colunas.nomes_produtos.get(colunas.produtos.valores[p]),
+         "receita": _dinheiro(receita[p]), "quantidade": int(quantidade[p])}
+        for p in topo
+    ]
+
+
+def ticket_medio(colunas):
+    valores = colunas.pedido_valor
+    if not len(valores):
+        return {"pedidos": 0, "receita": 0.0, "ticketMedio": None, "ticketMediano": None}
+    return {
+        "pedidos": int(len(valores)),
+        "receita": _dinheiro(valores.sum()),
+        "ticketMedio": _dinheiro(valores.mean()),
+        "ticketMediano": _dinheiro(np.median(valores))
+    }
+
+
+def por_status(colunas):
+    n = len(colunas.status)
+    pedidos = np.bincount(colunas.pedido_status, minlength=n)
+    receita = np.bincount(colunas.pedido_status, weights=colunas.pedido_valor, minlength=n)
+    return [
+        {"status": colunas.status.valores[s], "pedidos": int(pedidos[s]), "receita": _dinheiro(receita[s])}
+        for s in np.argsort(-pedidos, kind="stable")
+    ]
+
+
+def resumo(colunas, limite=10):
+    return {
+        "inicio": colunas.inicio.isoformat(),
+        "fim": (colunas.fim - timedelta(days=1)).isoformat(),
+        "ticket": ticket_medio(colunas),
+        "status": por_status(colunas),
+        "categorias": receita_por_categoria(colunas),
+        "produtosMaisVendidos": produtos_mais_vendidos(colunas, limite),
+        "receitaDiaria": receita_por_dia(colunas)
+    }
+
+
+# Cache por janela ------------------------------------------------------------
+
+class CacheJanelas:
+    """Colunas por (fonte, início, fim) com TTL; uma única leitura por janela de cada vez.
+
+    O lock de cada janela só existe enquanto há requisições usando-o (contador de
+    usuários), então janelas arbitrárias pedidas uma vez não deixam locks para trás.
+    """
+
+    def __init__(self, maximo=16):
+        self.maximo = maximo
+        self._entradas = {}
+        # chave -> (lock da janela, requisições usando o lock)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _valida(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is not None and entrada[0] > time.monotonic():
+            return entrada[1]
+        return None
+
+    def obter(self, chave, ttl, montar):
+        valor = self._valida(chave)
+        if valor is not None:
+            return valor
+
+        with self._lock:
+            lock, usuarios = self._locks.get(chave) or (threading.Lock(), 0)
+            self._locks[chave] = (lock, usuarios + 1)
+        try:
+            with lock:
+                # Outra requisição pode ter montado a janela enquanto esta esperava
+                valor = self._valida(chave)
+                if valor is None:
+                    valor = montar()
+                    with self._lock:
+                        agora = time.monotonic()
+                        for velha in [c for c, (expira, _) in self._entradas.items() if expira <= agora]:
+                            del self._entradas[velha]
+                        while len(self._entradas) >= self.maximo:
+                            del self._entradas[min(self._entradas, key=lambda c: self._entradas[c][0])]
+                        self._entradas[chave] = (agora + ttl, valor)
+        finally:
+            with self._lock:
+                lock, usuarios = self._locks[chave]
+                if usuarios == 1:
+                    del self._locks[chave]
+                else:
+                    self._locks[chave] = (lock, usuarios - 1)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_janelas = CacheJanelas()
+
+
+def colunas_da_janela(fonte, inicio, fim, ttl=300, tamanho_bloco=50000):
+    if fonte not in FONTES:
+        raise ErroAnalise("Fonte inválida, use cosmos ou sql")
+
+    def montar():
+        if fonte == "sql":
+            return ler_sql(inicio, fim, tamanho_bloco)
+        from app.cosmosdb import container, pedidos_container
+        return ler_cosmos(pedidos_container, container, inicio, fim, tamanho_bloco)
+
+    return cache_janelas.obter((fonte, inicio, fim), ttl, montar)
@@ -0,0 +1,153 @@
+"""Caches de documentos do Cosmos no processo, mantidos pelo change feed.
+
+Cada cache guarda documentos por id (LRU com limite de itens) e resultados de
+listagens. Os eventos do ``barramento`` substituem os documentos alterados e
+descartam as listagens do container; documentos com ``excluido`` saem do cache.
+Exclusões físicas não aparecem no change feed: as escritas feitas pelo próprio
+processo invalidam o cache na hora e as feitas em outros nós ficam limitadas
+pelo TTL das entradas.
+
+Sem o worker do change feed no processo (``CHANGE_FEED_INPROCESSO``) nada mantém
+os caches atualizados, então eles ficam desligados e só repassam as leituras.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app.models.produto import Produto
+from app.services.change_feed import barramento
+
+
+class CacheDocumentos:
+    def __init__(self, nome, capacidade=10000, ttl=300, converter=None):
+        self.nome = nome
+        # Converte os documentos do change feed para a forma guardada pelo cache (ex.: Produto)
+        self.converter = converter
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.ativo = False
+        self.acertos = 0
+        self.falhas = 0
+        self._documentos = OrderedDict()
+        self._listas = {}
+        # Incrementada a cada alteração: uma carga que começou antes dela não é guardada
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def _valido(self, entrada):
+        return entrada is not None and entrada[0] > time.monotonic()
+
+    def obter(self, documento_id, carregar):
+        """Documento do cache ou ``carregar()`` (None não é guardado)"""
+        if not self.ativo:
+            return carregar()
+        with self._lock:
+            entrada = self._documentos.get(documento_id)
+            if self._valido(entrada):
+                self._documentos.move_to_end(documento_id)
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+            geracao = self._geracao
+
+        documento = carregar()
+        if documento is not None:
+            with self._lock:
+                if geracao == self._geracao:
+                    self._guardar(documento_id, documento)
+        return documento
+
+    def obter_lote(self, documento_ids, carregar):
+        """Documentos por id: os do cache e ``carregar(ids_restantes)`` (dict id -> documento) para o resto"""
+        if not self.ativo:
+            return carregar(documento_ids)
+        encontrados = {}
+        restantes = []
+        with self._lock:
+            for documento_id in documento_ids:
+                entrada = self._documentos.get(documento_id)
+                if self._valido(entrada):
+                    self._documentos.move_to_end(documento_id)
+                    encontrados[documento_id] = entrada[1]
+                else:
+                    restantes.append(documento_id)
+            self.acertos += len(encontrados)
+            self.falhas += len(restantes)
+            geracao = self._geracao
+
+        if restantes:
+            carregados = carregar(restantes)
+            with self._lock:
+                if geracao == self._geracao:
+                    for documento_id, documento in carregados.items():
+                        self._guardar(documento_id, documento)
+            encontrados.update(carregados)
+        return encontrados
+
+    def listar(self, chave, carregar):
+        """Resultado de uma listagem, descartado a cada alteração no container"""
+        if not self.ativo:
+            return carregar()
+        with self._lock:
+            entrada = self._listas.get(chave)
+            if self._valido(entrada):
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+            geracao = self._geracao
+
+        documentos = carregar()
+        with self._lock:
+            if geracao == self._geracao:
+                self._listas[chave] = (time.monotonic() + self.ttl, documentos)
+        return documentos
+
+    def _guardar(self, documento_id, documento):
+        self._documentos[documento_id] = (time.monotonic() + self.ttl, documento)
+        self._documentos.move_to_end(documento_id)
+        while len(self._documentos) > self.capacidade:
+            self._documentos.popitem(last=False)
+
+    def invalidar(self, documento_id=None):
+        """Descarta um documento (ou tudo, sem id) e as listagens"""
+        with self._lock:
+            self._geracao += 1
+            self._listas.clear()
+            if documento_id is None:
+                self._documentos.clear()
+            else:
+                self._documentos.pop(documento_id, None)
+
+    def aplicar(self, documentos):
+        """Assinante do barramento: atualiza os documentos em cache e descarta as listagens"""
+        with self._lock:
+            self._geracao += 1
+            self._listas.clear()
+            for documento in documentos:
+                entrada = self._documentos.get(documento["id"])
+                if documento.get("excluido"):
+                    self._documentos.pop(documento["id"], None)
+                elif entrada is not None and (entrada[1].get("_ts") or 0) <= documento.get("_ts", 0):
+                    self._guardar(documento["id"], self.converter(documento) if self.converter else documento)
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {"cache": self.nome, "ativo": self.ativo, "documentos": len(self._documentos),
+                "listas": len(self._listas), "acertos": self.acertos, "falhas": self.falhas,
+                "taxaAcerto": self.acertos / total if total else 0.0}
+
+
+def _criar(nome, converter=None):
+    cache = CacheDocumentos(nome, converter=converter)
+    barramento.assinar(nome, cache.aplicar)
+    return cache
+
+
+produtos_cache = _criar("produtos", Produto.from_dict)
+usuarios_cache = _criar("usuarios")
+
+
+def ativar_caches(ttl=300):
+    for cache in (produtos_cache, usuarios_cache):
+        cache.ttl = ttl
+        cache.ativo = True
@@ -0,0 +1,309 @@
+"""Cache de segundo nível das buscas por chave primária do SQLAlchemy.
+
+Duas camadas: um LRU no processo (entradas com TTL curto) e, opcionalmente, uma
+camada compartilhada entre os workers (Redis com ``CACHE_ENTIDADES_REDIS_URL``;
+``CamadaMemoria`` faz o papel dela nos testes). O cache guarda os valores das
+colunas, não objetos da sessão: um acerto vira uma instância ``detached``
+anexada à sessão sem SQL. É para leituras: rotas que alteram ou removem a
+entidade a buscam no banco (``db.session.get``), para não partir de uma versão
+que outro worker já alterou.
+
+A invalidação segue os eventos da sessão: ``after_flush`` anota as entidades
+alteradas ou removidas (e já as apaga da camada compartilhada) e ``after_commit``
+as descarta das duas camadas; rollback descarta as anotações. Escritas feitas por
+outros workers chegam pela camada compartilhada; a local fica limitada pelo TTL.
+
+``Cartao`` não pode ser registrado: o saldo muda a cada autorização e nunca é
+servido de cache.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import abort
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.database import db
+from app.services.replicas import no_primario
+
+logger = logging.getLogger(__name__)
+
+# Tabelas cujo estado muda fora do controle de uma busca por id (saldo debitado a cada autorização)
+TABELAS_PROIBIDAS = frozenset(("cartao",))
+
+CHAVE_SESSAO = "cache_entidades"
+
+
+class CamadaLocal:
+    """LRU com TTL no processo"""
+
+    def __init__(self, capacidade=10000, ttl=30):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+
+    def obter(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada[0] <= time.monotonic():
+            del self._entradas[chave]
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada[1]
+
+    def guardar(self, chave, valores):
+        self._entradas[chave] = (time.monotonic() + self.ttl, valores)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
+
+    def remover(self, chaves):
+        for chave in chaves:
+            self._entradas.pop(chave, None)
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class CamadaMemoria:
+    """Camada compartilhada em memória, com a interface da CamadaRedis (testes e benchmarks)"""
+
+    def __init__(self):
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+        if entrada is None or entrada[0] <= time.monotonic():
+            return None
+        return entrada[1]
+
+    def guardar(self, chave, dados, ttl):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + ttl, dados)
+
+    def remover(self, chaves):
+        with self._lock:
+            for chave in chaves:
+                self._dados.pop(chave, None)
+
+
+class CamadaRedis:
+    """Camada compartilhada no Redis; falhas viram faltas (a busca vai ao banco)"""
+
+    PAUSA_APOS_FALHA = 5.0
+
+    def __init__(self, url, prefixo="entidades:"):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.prefixo = prefixo
+        self._retomar_em = 0.0
+
+    def _executar(self, operacao, *args):
+        if time.monotonic() < self._retomar_em:
+            return None
+        try:
+            return operacao(*args)
+        except Exception:
+            logger.warning("Redis do cache de entidades indisponível", exc_info=True)
+            self._retomar_em = time.monotonic() + self.PAUSA_APOS_FALHA
+            return None
+
+    def obter(self, chave):
+        return self._executar(self._cliente.get, self.prefixo + chave)
+
+    def guardar(self, chave, dados, ttl):
+        self._executar(self._cliente.set, self.prefixo + chave, dados, int(ttl))
+
+    def remover(self, chaves):
+        if chaves:
+            self._executar(self._cliente.delete, *(self.prefixo + chave for chave in chaves))
+
+
+class CacheEntidades:
+    def __init__(self, capacidade=10000, ttl_local=30, ttl_compartilhado=300, compartilhada=None):
+        self.ativo = False
+        self.local = CamadaLocal(capacidade, ttl_local)
+        self.compartilhada = compartilhada
+        self.ttl_compartilhado = ttl_compartilhado
+        self._tabelas = {}
+        self._contadores = {}
+        # Incrementada a cada invalidação: uma carga que começou antes dela não é guardada
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, *modelos):
+        for modelo in modelos:
+            tabela = modelo.__table__.name
+            if tabela in TABELAS_PROIBIDAS:
+                raise ValueError(f"{modelo.__name__} não pode usar o cache de entidades")
+            self._tabelas[tabela] = modelo
+            self._contadores.setdefault(tabela, {"local": 0, "compartilhado": 0, "falhas": 0})
+
+    def configurar(self, capacidade, ttl_local, ttl_compartilhado, compartilhada=None):
+        self.local = CamadaLocal(capacidade, ttl_local)
+        self.ttl_compartilhado = ttl_compartilhado
+        self.compartilhada = compartilhada
+        self.ativo = True
+
+    @staticmethod
+    def chave(tabela, pk):
+        return f"{tabela}:{pk}"
+
+    def buscar(self, modelo, pk):
+        """Equivalente a ``db.session.get(modelo, pk)``, servido do cache quando possível"""
+        tabela = modelo.__table__.name
+        if not self.ativo or tabela not in self._tabelas:
+            return db.session.get(modelo, pk)
+
+        chave = self.chave(tabela, pk)
+        contadores = self._contadores[tabela]
+        with self._lock:
+            valores = self.local.obter(chave)
+            geracao = self._geracao
+            if valores is not None:
+                contadores["local"] += 1
+        if valores is not None:
+            return self._anexar(modelo, pk, valores)
+
+        if self.compartilhada is not None:
+            dados = self.compartilhada.obter(chave)
+            if dados is not None:
+                valores = pickle.loads(dados)
+                with self._lock:
+                    contadores["compartilhado"] += 1
+                    if geracao == self._geracao:
+                        self.local.guardar(chave, valores)
+                return self._anexar(modelo, pk, valores)
+
+        with self._lock:
+            contadores["falhas"] += 1
+        # Faltas leem do primário: uma réplica atrasada não pode repor no cache a versão anterior a um commit
+        with no_primario():
+            instancia = db.session.get(modelo, pk)
+        if instancia is not None:
+            valores = {atributo.key: getattr(instancia, atributo.key) for atributo in inspect(modelo).column_attrs}
+            with self._lock:
+                if geracao != self._geracao:
+                    return instancia
+                self.local.guardar(chave, valores)
+            if self.compartilhada is not None:
+                self.compartilhada.guardar(chave, pickle.dumps(valores, pickle.HIGHEST_PROTOCOL), self.ttl_compartilhado)
+        return instancia
+
+    def buscar_ou_404(self, modelo, pk):
+        instancia = self.buscar(modelo, pk)
+        if instancia is None:
+            abort(404)
+        return instancia
+
+    @staticmethod
+    def _anexar(modelo, pk, valores):
+        sessao = db.session()
+        mapeamento = inspect(modelo)
+        existente = sessao.identity_map.get(mapeamento.identity_key_from_primary_key((pk,)))
+        if existente is not None:
+            return existente
+        # Monta a instância como o loader do SQLAlchemy (sem o construtor nem os eventos de atributo)
+        instancia = mapeamento.class_manager.new_instance()
+        instancia.__dict__.update(valores)
+        make_transient_to_detached(instancia)
+        sessao.add(instancia)
+        return instancia
+
+    def invalidar(self, chaves):
+        with self._lock:
+            self._geracao += 1
+            self.local.remover(chaves)
+        if self.compartilhada is not None:
+            self.compartilhada.remover(list(chaves))
+
+    # Eventos da sessão -----------------------------------------------------------
+
+    def _anotar(self, sessao):
+        if not self.ativo:
+            return
+        chaves = {
+            self.chave(instancia.__table__.name, inspect(instancia).identity[0])
+            for instancia in list(sessao.dirty) + list(sessao.deleted)
+            if getattr(instancia, "__table__", None) is not None and instancia.__table__.name in self._tabelas
+            and inspect(instancia).identity
+        }
+        if chaves:
+            sessao.info.setdefault(CHAVE_SESSAO, set()).update(chaves)
+            # Apagar antes do commit também encurta a janela de outros workers com a versão anterior
+            if self.compartilhada is not None:
+                self.compartilhada.remover(list(chaves))
+
+    def _confirmar(self, sessao):
+        chaves = sessao.info.pop(CHAVE_SESSAO, None)
+        if chaves:
+            self.invalidar(chaves)
+
+    def _descartar(self, sessao):
+        sessao.info.pop(CHAVE_SESSAO, None)
+
+    def estatisticas(self):
+        tabelas = {}
+        with self._lock:
+            copias = {tabela: dict(contadores) for tabela, contadores in self._contadores.items()}
+        for tabela, contadores in copias.items():
+            acertos = contadores["local"] + contadores["compartilhado"]
+            total = acertos + contadores["falhas"]
+            tabelas[tabela] = {**contadores, "taxaAcerto": acertos / total if total else 0.0}
+        return {"ativo": self.ativo, "compartilhado": self.compartilhada is not None,
+                "entradasLocais": len(self.local), "tabelas": tabelas}
+
+
+cache_entidades = CacheEntidades()
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(sessao, _contexto):
+    cache_entidades._anotar(sessao)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(sessao):
+    cache_entidades._confirmar(sessao)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_soft_rollback(sessao, _transacao):
+    cache_entidades._descartar(sessao)
+
+
+def init_cache_entidades(app):
+    from app.models.endereco import Endereco
+    from app.models.pedido import Pedido
+    from app.models.usuario import Usuario
+
+    app.config.setdefault("CACHE_ENTIDADES_HABILITADO", True)
+    app.config.setdefault("CACHE_ENTIDADES_CAPACIDADE", 10000)
+    app.config.setdefault("CACHE_ENTIDADES_TTL_LOCAL", 30)
+    app.config.setdefault("CACHE_ENTIDADES_TTL", 300)
+    app.config.setdefault("CACHE_ENTIDADES_REDIS_URL", None)
+
+    cache_entidades.registrar(Usuario, Endereco, Pedido)
+    if app.config["CACHE_ENTIDADES_HABILITADO"]:
+        url = app.config["CACHE_ENTIDADES_REDIS_URL"]
+        cache_entidades.configurar(
+            app.config["CACHE_ENTIDADES_CAPACIDADE"], app.config["CACHE_ENTIDADES_TTL_LOCAL"],
+            app.config["CACHE_ENTIDADES_TTL"], CamadaRedis(url) if url else None
+        )
+
+    @app.route("/cache/estatisticas")
+    def estatisticas_cache():
+        """Taxas de acerto dos caches deste processo"""
+        from app.services.cache_documentos import produtos_cache, usuarios_cache
+
+        return {
+            "entidades": cache_entidades.estatisticas(),
+            "documentos": [produtos_cache.estatisticas(), usuarios_cache.estatisticas()]
+        }
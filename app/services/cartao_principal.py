@@ -0,0 +1,90 @@
+"""Troca do cartão principal do usuário no Cosmos DB.
+
+Os cartões ficam particionados por ``usuarioId``, então todos os cartões de um
+usuário estão na mesma partição lógica. Isso permite localizar o principal atual
+com uma consulta restrita à partição e trocar o principal com um único batch
+transacional que altera no máximo dois documentos (o antigo e o novo principal).
+
+Sem principal atual, duas trocas simultâneas para cartões diferentes não teriam
+documento em comum e as duas passariam. Por isso cada partição tem um documento
+de guarda (``ID_GUARDA``, com ``guarda: true``) que entra em todo batch de troca:
+criado no primeiro e alterado com ``if_match`` nos seguintes, de modo que de duas
+trocas concorrentes só uma é gravada. As consultas de cartões excluem a guarda
+com ``NAO_GUARDA``.
+"""
+
+ID_GUARDA = "guarda-cartao-principal"
+
+# Filtro das consultas de cartões (alias c) que não devem devolver o documento de guarda
+NAO_GUARDA = "NOT IS_DEFINED(c.guarda)"
+
+QUERY_CARTAO_PRINCIPAL = "SELECT * FROM cartoes c WHERE c.usuarioId = @usuarioId AND c.principal = true"
+
+QUERY_TROCA_PRINCIPAL = (
+    "SELECT c.id, c.principal, c._etag FROM cartoes c "
+    "WHERE c.usuarioId = @usuarioId AND (c.principal = true OR c.id = @cartaoId OR c.id = @guardaId)"
+)
+
+
+def _patch_principal(cartao, valor):
+    """Monta a operação de batch que altera apenas o campo principal do cartão"""
+    operacoes = [{"op": "set", "path": "/principal", "value": valor}]
+    return ("patch", (cartao["id"], operacoes), {"if_match_etag": cartao["_etag"]})
+
+
+def _operacao_guarda(guarda, usuario_id, cartao_id):
+    """Cria a guarda da partição ou a altera com o ``_etag`` lido (falha se outra troca passou antes)"""
+    if guarda is None:
+        return ("create", ({"id": ID_GUARDA, "usuarioId": usuario_id, "guarda": True, "cartaoId": cartao_id},))
+    operacoes = [{"op": "set", "path": "/cartaoId", "value": cartao_id}]
+    return ("patch", (ID_GUARDA, operacoes), {"if_match_etag": guarda["_etag"]})
+
+
+def buscar_cartao_principal(container, usuario_id):
+    """Busca o cartão principal de um usuário sem consulta cross-partition"""
+    cartoes = list(container.query_items(
+        query=QUERY_CARTAO_PRINCIPAL,
+        parameters=[{"name": "@usuarioId", "value": usuario_id}],
+        partition_key=usuario_id
+    ))
+    return cartoes[0] if cartoes else None
+
+
+def definir_cartao_principal(container, usuario_id, cartao_id):
+    """Define o cartão principal do usuário.
+
+    Faz uma consulta na partição do usuário (cartão alvo + principal atual) e um
+    batch transacional com os patches necessários. Retorna False se o cartão não
+    pertencer ao usuário. Os patches usam o ``_etag`` lido e o batch sempre altera
+    a guarda da partição, então uma troca concorrente faz o batch inteiro falhar
+    sem deixar dois cartões principais.
+    """
+    if cartao_id == ID_GUARDA:
+        return False
+
+    documentos = list(container.query_items(
+        query=QUERY_TROCA_PRINCIPAL,
+        parameters=[
+            {"name": "@usuarioId", "value": usuario_id},
+            {"name": "@cartaoId", "value": cartao_id},
+            {"name": "@guardaId", "value": ID_GUARDA}
+        ],
+        partition_key=usuario_id
+    ))
+    guarda = next((d for d in documentos if d["id"] == ID_GUARDA), None)
+    cartoes = [d for d in documentos if d["id"] != ID_GUARDA]
+
+    alvo = next((c for c in cartoes if c["id"] == cartao_id), None)
+    if alvo is None:
+        return False
+
+    operacoes = [_patch_principal(c, False) for c in cartoes if c["id"] != cartao_id and c.get("principal")]
+    if not alvo.get("principal"):
+        operacoes.append(_patch_principal(alvo, True))
+
+    # Nada a fazer quando o cartão já é o único principal
+    if operacoes:
+        operacoes.append(_operacao_guarda(guarda, usuario_id, cartao_id))
+        container.execute_item_batch(batch_operations=operacoes, partition_key=usuario_id)
+
+    return True
@@ -0,0 +1,230 @@
+"""Índice local de CEPs para preencher e validar endereços sem serviço externo.
+
+O dataset (CSV com ``cep_inicio;cep_fim;logradouro;bairro;cidade;uf``) é compilado
+para um arquivo binário compacto: vetores ordenados de ``uint32`` com os CEPs
+exatos (um logradouro) e as faixas de cada localidade, mais uma tabela de
+strings sem repetição. O arquivo é aberto com mmap e consultado com busca
+binária direto sobre a memória mapeada, sem desserializar nada.
+
+A consulta olha primeiro os CEPs exatos e depois as faixas, que não se sobrepõem
+entre si (um CEP de logradouro pode estar dentro da faixa da sua cidade).
+"""
+import csv
+import io
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+
+MAGICO = b"CEPIDX01"
+# magico, ordem dos bytes, n_exatos, n_faixas, n_strings, bytes_strings
+CABECALHO = struct.Struct("<8s1s3xIIII")
+CAMPOS = ("logradouro", "bairro", "cidade", "uf")
+
+
+def normalizar_cep(cep):
+    """Remove máscara ('20040-002') e devolve o CEP como inteiro, ou None se inválido"""
+    if cep is None:
+        return None
+    digitos = "".join(c for c in str(cep) if c.isdigit())
+    return int(digitos) if len(digitos) == 8 else None
+
+
+def _chave_texto(texto):
+    """Comparação de nomes sem acento e sem diferença de maiúsculas"""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold().strip()
+
+
+def mesmo_nome(a, b):
+    return _chave_texto(a) == _chave_texto(b)
+
+
+def compilar_dataset(linhas):
+    """Compila registros (dicts do CSV) para o formato binário do índice"""
+    strings = {"": 0}
+    exatos, faixas = [], []
+
+    def id_string(valor):
+        valor = (valor or "").strip()
+        if valor not in strings:
+            strings[valor] = len(strings)
+        return strings[valor]
+
+    for linha in linhas:
+        inicio = normalizar_cep(linha["cep_inicio"])
+        fim = normalizar_cep(linha.get("cep_fim")) or inicio
+        if inicio is None or fim < inicio:
+            continue
+        registro = tuple(id_string(linha.get(campo)) for campo in CAMPOS)
+        (exatos if inicio == fim else faixas).append((inicio, fim, registro))
+
+    exatos.sort()
+    faixas.sort()
+    for anterior, atual in zip(faixas, faixas[1:]):
+        if atual[0] <= anterior[1]:
+            raise ValueError(f"Faixas de CEP sobrepostas: {anterior[:2]} e {atual[:2]}")
+
+    textos = [s.encode("utf-8") for s in sorted(strings, key=strings.get)]
+    deslocamentos = array("I", [0])
+    for texto in textos:
+        deslocamentos.append(deslocamentos[-1] + len(texto))
+
+    saida = io.BytesIO()
+    saida.write(CABECALHO.pack(MAGICO, sys.byteorder[0].encode(), len(exatos), len(faixas), len(textos), deslocamentos[-1]))
+    saida.write(array("I", (e[0] for e in exatos)).tobytes())
+    saida.write(array("I", (i for e in exatos for i in e[2])).tobytes())
+    saida.write(array("I", (f[0] for f in faixas)).tobytes())
+    saida.write(array("I", (f[1] for f in faixas)).tobytes())
+    saida.write(array("I", (i for f in faixas for i in f[2])).tobytes())
+    saida.write(deslocamentos.tobytes())
+    saida.write(b"".join(textos))
+    return saida.getvalue()
+
+
+def ler_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        yield from csv.DictReader(arquivo, dialect=dialeto)
+
+
+class IndiceCep:
+    """Consulta sobre o buffer compilado (bytes ou mmap)"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magico, ordem, n_exatos, n_faixas, n_strings, _ = CABECALHO.unpack_from(buffer, 0)
+        if magico != MAGICO:
+            raise ValueError("Arquivo de índice de CEP inválido")
+        if ordem != sys.byteorder[0].encode():
+            raise ValueError("Índice de CEP compilado em máquina com outra ordem de bytes")
+
+        memoria = memoryview(buffer)
+        posicao = CABECALHO.size
+
+        def vetor(quantidade):
+            nonlocal posicao
+            fatia = memoria[posicao:posicao + quantidade * 4].cast("I")
+            posicao += quantidade * 4
+            return fatia
+
+        self.exatos = vetor(n_exatos)
+        self._registros_exatos = vetor(n_exatos * 4)
+        self.faixas_inicio = vetor(n_faixas)
+        self.faixas_fim = vetor(n_faixas)
+        self._registros_faixas = vetor(n_faixas * 4)
+        self._deslocamentos = vetor(n_strings + 1)
+        self._strings = memoria[posicao:]
+        self._cache_strings = {}
+
+    def __len__(self):
+        return len(self.exatos) + len(self.faixas_inicio)
+
+    def _string(self, indice):
+        texto = self._cache_strings.get(indice)
+        if texto is None:
+            texto = bytes(self._strings[self._deslocamentos[indice]:self._deslocamentos[indice + 1]]).decode("utf-8")
+            self._cache_strings[indice] = texto
+        return texto
+
+    def _registro(self, registros, posicao):
+        base = posicao * 4
+        return {campo: self._string(registros[base + i]) for i, campo in enumerate(CAMPOS)}
+
+    def buscar(self, cep):
+        """Devolve {logradouro, bairro, cidade, uf, cep} ou None"""
+        numero = normalizar_cep(cep)
+        if numero is None:
+            return None
+
+        posicao = bisect_right(self.exatos, numero) - 1
+        if posicao >= 0 and self.exatos[posicao] == numero:
+            registro = self._registro(self._registros_exatos, posicao)
+        else:
+            posicao = self.posicao_faixa(numero)
+            if posicao is None:
+                return None
+            registro = self._registro(self._registros_faixas, posicao)
+
+        registro["cep"] = f"{numero:08d}"
+        return registro
+
+    def posicao_faixa(self, numero):
+        """Posição da faixa que contém o CEP (inteiro), ou None"""
+        posicao = bisect_right(self.faixas_inicio, numero) - 1
+        if posicao >= 0 and numero <= self.faixas_fim[posicao]:
+            return posicao
+        return None
+
+
+def carregar_indice(caminho):
+    """Abre o índice compilado (.idx) com mmap, ou compila o CSV em memória"""
+    if caminho.endswith(".idx"):
+        with open(caminho, "rb") as arquivo:
+            return IndiceCep(mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ))
+    return IndiceCep(compilar_dataset(ler_csv(caminho)))
+
+
+def compilar_arquivo(origem, destino):
+    dados = compilar_dataset(ler_csv(origem))
+    temporario = f"{destino}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, destino)
+    return IndiceCep(dados)
+
+
+_indice = None
+_carregado = False
+_lock = threading.Lock()
+
+
+def obter_indice():
+    """Índice do processo, carregado uma única vez; None se não houver dataset configurado"""
+    global _indice, _carregado
+    if not _carregado:
+        with _lock:
+            if not _carregado:
+                from app.config import Config
+
+                caminho = getattr(Config, "CEP_DATASET_PATH", None)
+                _indice = carregar_indice(caminho) if caminho else None
+                _carregado = True
+    return _indice
+
+
+def completar_endereco(dados):
+    """Preenche logradouro/bairro/cidade/uf pelo CEP e confere cidade/uf informados.
+
+    Altera ``dados`` no lugar e devolve uma mensagem de erro ou None. Sem dataset
+    configurado, não faz nada.
+    """
+    indice = obter_indice()
+    if indice is None:
+        return None
+
+    cep = dados.get("cep")
+    if not cep:
+        return None
+    if normalizar_cep(cep) is None:
+        return "CEP inválido, informe 8 dígitos"
+
+    registro = indice.buscar(cep)
+    if registro is None:
+        return "CEP não encontrado"
+
+    for campo in ("cidade", "uf"):
+        if dados.get(campo) and not mesmo_nome(dados[campo], registro[campo]):
+            return f"O campo '{campo}' não corresponde ao CEP informado"
+
+    dados["cep"] = registro["cep"]
+    for campo in CAMPOS:
+        if registro[campo] and not dados.get(campo):
+            dados[campo] = registro[campo]
+    return None
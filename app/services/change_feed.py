@@ -0,0 +1,191 @@
+"""Consumo do change feed do Cosmos DB (modo "latest version").
+
+O feed devolve a versão mais recente de cada documento criado ou alterado depois
+da continuação informada; exclusões físicas não aparecem, por isso quem consome
+o feed depende de exclusão lógica (``excluido`` + ``ttl``) ou de um TTL no cache.
+
+``ChangeFeedWorker`` lê o feed de cada container, publica os documentos alterados
+no ``barramento`` do processo (caches e read models assinam por container) e só
+então grava a continuação no checkpoint. Uma falha em um assinante faz o lote ser
+relido na próxima rodada, então os assinantes devem ser idempotentes.
+"""
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def ler_alteracoes(container, continuacao=None, desde_o_inicio=True, max_itens=None):
+    """Lê as alterações pendentes e devolve (documentos, nova_continuacao).
+
+    Sem continuação, começa do início do feed (``desde_o_inicio``) ou do momento
+    atual. A continuação vem do header ``etag`` da última página lida, recebido
+    pelo ``response_hook`` da chamada: ``last_response_headers`` é do cliente
+    compartilhado e pode já ser o de outra thread.
+    """
+    opcoes = {"max_item_count": max_itens} if max_itens else {}
+    if continuacao is not None:
+        opcoes["continuation"] = continuacao
+    else:
+        opcoes["is_start_from_beginning"] = desde_o_inicio
+
+    respostas = []
+    documentos = list(container.query_items_change_feed(
+        **opcoes, response_hook=lambda cabecalhos, _resultado: respostas.append(cabecalhos or {})
+    ))
+    etags = [cabecalhos["etag"] for cabecalhos in respostas if cabecalhos.get("etag")]
+    return documentos, etags[-1] if etags else continuacao
+
+
+class Barramento:
+    """Eventos de alteração por container, entregues aos assinantes do processo"""
+
+    def __init__(self):
+        self._assinantes = {}
+        self._lock = threading.Lock()
+
+    def assinar(self, container, funcao):
+        with self._lock:
+            self._assinantes.setdefault(container, []).append(funcao)
+
+    def cancelar(self, container, funcao):
+        with self._lock:
+            if funcao in self._assinantes.get(container, []):
+                self._assinantes[container].remove(funcao)
+
+    def publicar(self, container, documentos):
+        for funcao in list(self._assinantes.get(container, [])):
+            funcao(documentos)
+
+
+# Barramento do processo: caches e read models assinam aqui
+barramento = Barramento()
+
+
+class CheckpointsMemoria:
+    """Continuações só em memória (caches do processo, que começam vazios)"""
+
+    def __init__(self):
+        self._continuacoes = {}
+
+    def ler(self, container):
+        return self._continuacoes.get(container)
+
+    def gravar(self, container, continuacao):
+        self._continuacoes[container] = continuacao
+
+
+class CheckpointsArquivo(CheckpointsMemoria):
+    """Continuações em um arquivo JSON local, regravado de forma atômica"""
+
+    def __init__(self, caminho):
+        super().__init__()
+        self.caminho = caminho
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as arquivo:
+                self._continuacoes = json.load(arquivo)
+
+    def gravar(self, container, continuacao):
+        super().gravar(container, continuacao)
+        diretorio = os.path.dirname(os.path.abspath(self.caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self._continuacoes, arquivo)
+        os.replace(temporario, self.caminho)
+
+
+class ChangeFeedWorker:
+    """Lê o change feed de vários containers e publica as alterações no barramento.
+
+    ``containers`` mapeia o nome publicado no barramento para o container (o proxy
+    do Cosmos ou o fake dos benchmarks). Sem checkpoint, cada container é lido
+    desde o início (``desde_o_inicio``) ou a partir do momento em que o worker sobe.
+    """
+
+    def __init__(self, containers, checkpoints=None, barramento=barramento, intervalo=1.0,
+                 max_itens=1000, desde_o_inicio=False):
+        self.containers = containers
+        self.checkpoints = checkpoints or CheckpointsMemoria()
+        self.barramento = barramento
+        self.intervalo = intervalo
+        self.max_itens = max_itens
+        self.desde_o_inicio = desde_o_inicio
+        self._parar = threading.Event()
+        self._thread = None
+
+    def processar(self, nome):
+        """Processa o que estiver pendente no feed de um container; devolve os documentos lidos"""
+        container = self.containers[nome]
+        lidos = 0
+        while True:
+            documentos, continuacao = ler_alteracoes(
+                container, self.checkpoints.ler(nome), self.desde_o_inicio, self.max_itens
+            )
+            if documentos:
+                self.barramento.publicar(nome, documentos)
+                lidos += len(documentos)
+            # O checkpoint só avança depois que os assinantes aplicaram o lote
+            if continuacao is not None:
+                self.checkpoints.gravar(nome, continuacao)
+            if len(documentos) < self.max_itens:
+                return lidos
+
+    def executar_uma_vez(self):
+        lidos = {}
+        for nome in self.containers:
+            try:
+                lidos[nome] = self.processar(nome)
+            except Exception:
+                # O lote será relido na próxima rodada; os outros containers seguem
+                logger.exception("Falha ao processar o change feed de %s", nome)
+                lidos[nome] = None
+        return lidos
+
+    def executar(self):
+        """Laço bloqueante (modo standalone); termina com parar()"""
+        self._parar.clear()
+        while not self._parar.is_set():
+            self.executar_uma_vez()
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        """Executa em uma thread daemon do próprio processo"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.executar, name="change-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, timeout=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def init_change_feed(app):
+    """Com CHANGE_FEED_INPROCESSO, mantém os caches do processo pelo change feed.
+
+    O worker sobe na primeira requisição, já dentro do processo que atende (com
+    preload_app do gunicorn, threads criadas no master não sobrevivem ao fork).
+    """
+    if not app.config.get("CHANGE_FEED_INPROCESSO"):
+        return
+
+    from app.cosmosdb import container, usuarios_container
+    from app.services.cache_documentos import ativar_caches
+
+    ativar_caches(app.config.get("CACHE_DOCUMENTOS_TTL", 300))
+    worker = ChangeFeedWorker(
+        {"produtos": container, "usuarios": usuarios_container},
+        intervalo=app.config.get("CHANGE_FEED_INTERVALO", 1.0)
+    )
+    app.extensions["change_feed"] = worker
+    iniciado = threading.Lock()
+
+    @app.before_request
+    def _iniciar_change_feed():
+        # O lock nunca é liberado: só a primeira requisição sobe o worker
+        if iniciado.acquire(blocking=False):
+            worker.iniciar()
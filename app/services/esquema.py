@@ -0,0 +1,121 @@
+"""Atualização do esquema de bancos criados antes de colunas e restrições novas.
+
+``db.create_all`` só cria as tabelas que não existem. ``flask atualizar-esquema``
+compara os modelos com o banco (inspector do SQLAlchemy) e aplica o que falta:
+tabelas, colunas (``ALTER TABLE ... ADD COLUMN``), restrições ``UNIQUE``
+(``ADD CONSTRAINT`` no MySQL; índice único no SQLite, que não altera restrições)
+e índices. Os comandos são idempotentes: rodar de novo não faz nada.
+
+Uma restrição cujas colunas já têm valores repetidos não é criada; os valores
+repetidos entram no relatório para serem resolvidos antes. Uma coluna obrigatória
+sem valor padrão também fica de fora (as linhas existentes não teriam valor).
+"""
+from sqlalchemy import func, inspect, select
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from app.database import db
+
+MAX_DUPLICADOS = 10
+
+
+class Pendencia:
+    """Um comando de DDL a aplicar, ou o motivo de não poder ser aplicado"""
+
+    __slots__ = ("descricao", "sql", "bloqueio")
+
+    def __init__(self, descricao, sql=None, bloqueio=None):
+        self.descricao = descricao
+        self.sql = sql
+        self.bloqueio = bloqueio
+
+
+def _colunas_unicas(inspetor, tabela):
+    """Conjuntos de colunas já únicos no banco (restrições e índices únicos)"""
+    unicas = {frozenset(r["column_names"]) for r in inspetor.get_unique_constraints(tabela)}
+    unicas |= {frozenset(i["column_names"]) for i in inspetor.get_indexes(tabela) if i.get("unique")}
+    chave = inspetor.get_pk_constraint(tabela).get("constrained_columns") or []
+    if chave:
+        unicas.add(frozenset(chave))
+    return unicas
+
+
+def _duplicados(conexao, tabela, colunas):
+    """Valores repetidos nas colunas (linhas com NULL não contam, como no índice único)"""
+    campos = [tabela.c[nome] for nome in colunas]
+    consulta = (
+        select(*campos, func.count().label("total"))
+        .where(*(campo.isnot(None) for campo in campos))
+        .group_by(*campos)
+        .having(func.count() > 1)
+        .limit(MAX_DUPLICADOS)
+    )
+    return [tuple(linha[:-1]) for linha in conexao.execute(consulta)]
+
+
+def _sql_unica(dialeto, tabela, nome, colunas):
+    preparador = dialeto.identifier_preparer
+    lista = ", ".join(preparador.quote(coluna) for coluna in colunas)
+    if dialeto.name == "sqlite":
+        return f"CREATE UNIQUE INDEX {preparador.quote(nome)} ON {preparador.quote(tabela.name)} ({lista})"
+    return f"ALTER TABLE {preparador.quote(tabela.name)} ADD CONSTRAINT {preparador.quote(nome)} UNIQUE ({lista})"
+
+
+def pendencias(conexao, metadados=None):
+    """O que falta no banco para ficar igual aos modelos, na ordem de aplicação"""
+    metadados = metadados or db.metadata
+    dialeto = conexao.dialect
+    inspetor = inspect(conexao)
+    existentes = set(inspetor.get_table_names())
+    resultado = []
+
+    for tabela in metadados.sorted_tables:
+        if tabela.name not in existentes:
+            resultado.append(Pendencia(f"tabela {tabela.name}", str(CreateTable(tabela).compile(dialect=dialeto))))
+            resultado.extend(
+                Pendencia(f"índice {indice.name}", str(CreateIndex(indice).compile(dialect=dialeto)))
+                for indice in tabela.indexes
+            )
+            continue
+
+        colunas = {coluna["name"] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in colunas:
+                continue
+            descricao = f"coluna {tabela.name}.{coluna.name}"
+            if not coluna.nullable and coluna.server_default is None:
+                resultado.append(Pendencia(descricao, bloqueio="obrigatória e sem valor padrão: adicione manualmente"))
+                continue
+            especificacao = CreateColumn(coluna).compile(dialect=dialeto)
+            resultado.append(Pendencia(descricao, f"ALTER TABLE {dialeto.identifier_preparer.quote(tabela.name)} "
+                                                  f"ADD COLUMN {especificacao}"))
+
+        unicas = _colunas_unicas(inspetor, tabela.name)
+        restricoes = [r for r in tabela.constraints if r.__visit_name__ == "unique_constraint"]
+        for restricao in restricoes:
+            nomes = [coluna.name for coluna in restricao.columns]
+            if frozenset(nomes) in unicas:
+                continue
+            nome = restricao.name or f"uq_{tabela.name}_{'_'.join(nomes)}"
+            descricao = f"restrição {nome}"
+            # Colunas novas (ainda não criadas) não têm duplicados
+            if colunas.issuperset(nomes):
+                repetidos = _duplicados(conexao, tabela, nomes)
+                if repetidos:
+                    resultado.append(Pendencia(descricao, bloqueio=f"valores repetidos em {', '.join(nomes)}: {repetidos}"))
+                    continue
+            resultado.append(Pendencia(descricao, _sql_unica(dialeto, tabela, nome, nomes)))
+
+        indices = {indice["name"] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name not in indices:
+                resultado.append(Pendencia(f"índice {indice.name}", str(CreateIndex(indice).compile(dialect=dialeto))))
+    return resultado
+
+
+def atualizar(conexao, metadados=None):
+    """Aplica as pendências sem bloqueio; devolve todas (as bloqueadas não foram aplicadas)"""
+    lista = pendencias(conexao, metadados)
+    for pendencia in lista:
+        if pendencia.bloqueio is None:
+            conexao.exec_driver_sql(pendencia.sql)
+    return lista
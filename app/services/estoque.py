@@ -0,0 +1,363 @@
+"""Estoque do catálogo e reservas das unidades dos pedidos.
+
+Os produtos ficam no Cosmos, mas o saldo de cada um é um contador na tabela
+``estoque`` do MySQL. Reservar um pedido é um único commit: um UPDATE condicional
+por produto (``disponivel = disponivel - q ... WHERE disponivel >= q``) e a linha
+da reserva. Ninguém lê o saldo antes de escrever: os compradores do mesmo SKU
+são serializados pelo bloqueio da linha durante o UPDATE, o último que couber
+leva a unidade e os demais recebem 409, sem venda a mais e sem novas tentativas.
+Um pedido com vários itens reserva todos ou nenhum, e os contadores são sempre
+alterados em ordem de produto, então dois pedidos com os mesmos itens não entram
+em deadlock. (No Cosmos, o mesmo exigiria um patch com ``_etag`` por comprador,
+repetido a cada corrida perdida, e itens de categorias diferentes ficariam em
+partições diferentes, sem atomicidade entre eles.)
+
+Produtos sem linha em ``estoque`` não têm controle de estoque e não são reservados.
+
+A reserva nasce ATIVA e vence em ``ESTOQUE_RESERVA_TTL`` segundos. A confirmação
+do pedido tira as unidades do estoque, o cancelamento as devolve e a varredura
+(``flask estoque-varredura`` ou, com ``ESTOQUE_VARREDURA_INPROCESSO``, uma thread
+da API) devolve as reservas vencidas. Um pedido confirmado depois do prazo (ou
+depois de cancelado) reserva de novo, se ainda houver saldo; sem saldo, 409.
+
+A alteração de um pedido (status e itens) leva a reserva ao novo estado
+movimentando só a diferença de cada produto e devolve o estado anterior, que
+``restaurar`` reaplica se a gravação do pedido no Cosmos falhar.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import db
+from app.models.estoque import ATIVA, CONFIRMADA, EXPIRADA, LIBERADA, Estoque, ItemReservaEstoque, ReservaEstoque
+
+logger = logging.getLogger(__name__)
+
+# Status do pedido (Cosmos) que confirmam ou cancelam a reserva
+STATUS_CONFIRMACAO = frozenset({"Pago", "Confirmado", "Enviado", "Entregue"})
+STATUS_CANCELAMENTO = frozenset({"Cancelado"})
+
+# Efeito de cada transição da reserva nos contadores, por unidade: (disponivel, reservado)
+TRANSICOES = {
+    (ATIVA, CONFIRMADA): (0, -1),
+    (ATIVA, LIBERADA): (1, -1),
+    (ATIVA, EXPIRADA): (1, -1),
+    (CONFIRMADA, LIBERADA): (1, 0),
+    (EXPIRADA, CONFIRMADA): (-1, 0),
+    (LIBERADA, CONFIRMADA): (-1, 0),
+}
+
+# Unidades que uma reserva em cada status tira dos contadores, por unidade: (disponivel, reservado)
+EFEITOS = {ATIVA: (-1, 1), CONFIRMADA: (-1, 0), LIBERADA: (0, 0), EXPIRADA: (0, 0)}
+
+
+class ErroEstoque(ValueError):
+    def __init__(self, mensagem, status=409, produtos=()):
+        super().__init__(mensagem)
+        self.status = status
+        self.produtos = list(produtos)
+
+
+def _atualizar_contador(produto_id, disponivel, reservado):
+    """Soma os deltas ao contador do produto; quem tira do disponível só atualiza se houver saldo"""
+    condicoes = [Estoque.produto_id == produto_id]
+    if disponivel < 0:
+        condicoes.append(Estoque.disponivel >= -disponivel)
+    resultado = db.session.execute(
+        update(Estoque).where(*condicoes).values(
+            disponivel=Estoque.disponivel + disponivel,
+            reservado=Estoque.reservado + reservado
+        ).execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount > 0
+
+
+def _movimentar(itens, por_disponivel, por_reservado):
+    """Aplica os deltas (por unidade) aos contadores em ordem de produto.
+
+    Devolve o primeiro produto sem saldo (e para ali, o chamador desfaz) ou None.
+    """
+    for produto_id, quantidade in sorted(itens):
+        if not _atualizar_contador(produto_id, por_disponivel * quantidade, por_reservado * quantidade):
+            return produto_id
+    return None
+
+
+def _sem_saldo(produto_id):
+    db.session.rollback()
+    return ErroEstoque(f"Estoque insuficiente para o produto {produto_id}", produtos=[produto_id])
+
+
+def _controlados(itens):
+    """Quantidade por produto dos ``itens`` (pares produto_id, quantidade) que têm controle de estoque"""
+    quantidades = Counter()
+    for produto_id, quantidade in itens:
+        quantidades[produto_id] += quantidade
+
+    controlados = set(db.session.scalars(select(Estoque.produto_id).where(Estoque.produto_id.in_(list(quantidades)))))
+    return {produto_id: quantidade for produto_id, quantidade in quantidades.items() if produto_id in controlados}
+
+
+def reservar(pedido_id, itens, ttl):
+    """Reserva ``itens`` (pares produto_id, quantidade) do pedido; None se nenhum tem controle de estoque"""
+    itens = sorted(_controlados(itens).items())
+    if not itens:
+        return None
+
+    sem_saldo = _movimentar(itens, -1, 1)
+    if sem_saldo is not None:
+        raise _sem_saldo(sem_saldo)
+
+    agora = datetime.utcnow()
+    reserva = ReservaEstoque(
+        id=str(uuid.uuid4()), pedido_id=pedido_id, status=ATIVA, criado_em=agora,
+        expira_em=agora + timedelta(seconds=ttl),
+        itens=[ItemReservaEstoque(produto_id=produto_id, quantidade=quantidade) for produto_id, quantidade in itens]
+    )
+    db.session.add(reserva)
+    db.session.commit()
+    return reserva
+
+
+def _transitar(pedido_id, novo_status, origens=None):
+    """Move a reserva do pedido para ``novo_status``; False se a transição não se aplica"""
+    reserva = ReservaEstoque.query.filter_by(pedido_id=pedido_id).with_for_update().first()
+    if reserva is None:
+        db.session.rollback()
+        return False
+
+    deltas = TRANSICOES.get((reserva.status, novo_status))
+    if deltas is None or (origens is not None and reserva.status not in origens):
+        db.session.rollback()
+        return False
+
+    sem_saldo = _movimentar([(item.produto_id, item.quantidade) for item in reserva.itens], *deltas)
+    if sem_saldo is not None:
+        raise _sem_saldo(sem_saldo)
+    reserva.status = novo_status
+    db.session.commit()
+    return True
+
+
+def confirmar(pedido_id):
+    """Pedido confirmado: as unidades reservadas saem do estoque"""
+    return _transitar(pedido_id, CONFIRMADA)
+
+
+def liberar(pedido_id, confirmadas=True):
+    """Pedido cancelado: as unidades reservadas (e, com ``confirmadas``, as já confirmadas) voltam ao disponível"""
+    return _transitar(pedido_id, LIBERADA, None if confirmadas else (ATIVA,))
+
+
+def _estado(reserva):
+    """(status, quantidades, expira_em) da reserva, ou None sem reserva"""
+    if reserva is None:
+        return None
+    return reserva.status, {item.produto_id: item.quantidade for item in reserva.itens}, reserva.expira_em
+
+
+def _efeito(estado):
+    """Unidades que a reserva no ``estado`` tira de cada contador: {produto_id: (disponivel, reservado)}"""
+    if estado is None:
+        return {}
+    por_disponivel, por_reservado = EFEITOS[estado[0]]
+    return {produto_id: (por_disponivel * q, por_reservado * q) for produto_id, q in estado[1].items()}
+
+
+def _levar(pedido_id, reserva, destino):
+    """Leva a reserva ao ``destino`` (None ou sem itens a remove), movimentando só a diferença nos contadores"""
+    antes, depois = _efeito(_estado(reserva)), _efeito(destino)
+    for produto_id in sorted(set(antes) | set(depois)):
+        de, para = antes.get(produto_id, (0, 0)), depois.get(produto_id, (0, 0))
+        if de != para and not _atualizar_contador(produto_id, para[0] - de[0], para[1] - de[1]):
+            raise _sem_saldo(produto_id)
+
+    if destino is None or not destino[1]:
+        if reserva is not None:
+            db.session.delete(reserva)
+    elif reserva is None:
+        status, quantidades, expira_em = destino
+        db.session.add(ReservaEstoque(
+            id=str(uuid.uuid4()), pedido_id=pedido_id, status=status, criado_em=datetime.utcnow(), expira_em=expira_em,
+            itens=[ItemReservaEstoque(produto_id=p, quantidade=q) for p, q in sorted(quantidades.items())]
+        ))
+    else:
+        reserva.status, quantidades, reserva.expira_em = destino
+        existentes = {item.produto_id: item for item in reserva.itens}
+        for produto_id, item in existentes.items():
+            if produto_id not in quantidades:
+                reserva.itens.remove(item)
+        for produto_id, quantidade in sorted(quantidades.items()):
+            if produto_id in existentes:
+                existentes[produto_id].quantidade = quantidade
+            else:
+                reserva.itens.append(ItemReservaEstoque(produto_id=produto_id, quantidade=quantidade))
+    db.session.commit()
+
+
+def redefinir(pedido_id, status_pedido, itens=None, ttl=900):
+    """Acompanha a alteração do pedido: status (confirmação/cancelamento) e, se vierem, os novos ``itens``.
+
+    Confirmar tira as unidades do estoque (reservando de novo se a reserva venceu ou
+    foi liberada; sem saldo, ErroEstoque 409) e cancelar as devolve. Devolve o estado
+    anterior para ``restaurar``.
+    """
+    reserva = ReservaEstoque.query.filter_by(pedido_id=pedido_id).with_for_update().first()
+    anterior = _estado(reserva)
+    status, quantidades, expira_em = anterior or (ATIVA, {}, datetime.utcnow() + timedelta(seconds=ttl))
+    if status_pedido in STATUS_CONFIRMACAO:
+        status = CONFIRMADA
+    elif status_pedido in STATUS_CANCELAMENTO:
+        status = LIBERADA
+    if itens is not None:
+        quantidades = _controlados(itens)
+    _levar(pedido_id, reserva, (status, quantidades, expira_em))
+    return anterior
+
+
+def restaurar(pedido_id, anterior):
+    """Desfaz ``redefinir`` (a gravação do pedido falhou); False se o saldo já não permite"""
+    reserva = ReservaEstoque.query.filter_by(pedido_id=pedido_id).with_for_update().first()
+    try:
+        _levar(pedido_id, reserva, anterior)
+    except ErroEstoque:
+        logger.exception("Não foi possível restaurar a reserva do pedido %s", pedido_id)
+        return False
+    return True
+
+
+def renovar(pedido_id, ttl):
+    """Gravação tardia do pedido (job assíncrono): a reserva passa a valer ``ttl`` a partir de agora.
+
+    Se a varredura já a expirou, reserva de novo; sem saldo, ErroEstoque 409. Reservas
+    já confirmadas ou liberadas ficam como estão (job repetido depois da gravação).
+    """
+    reserva = ReservaEstoque.query.filter_by(pedido_id=pedido_id).with_for_update().first()
+    if reserva is None or reserva.status not in (ATIVA, EXPIRADA):
+        db.session.rollback()
+        return False
+    _, quantidades, _ = _estado(reserva)
+    _levar(pedido_id, reserva, (ATIVA, quantidades, datetime.utcnow() + timedelta(seconds=ttl)))
+    return True
+
+
+def expirar_vencidas(limite=500):
+    """Devolve as unidades das reservas ATIVAS vencidas (até ``limite``); devolve quantas expiraram.
+
+    Várias varreduras em paralelo não disputam as mesmas reservas (SKIP LOCKED), e as
+    unidades de todas as reservas do lote voltam com um UPDATE por produto.
+    """
+    reservas = (
+        ReservaEstoque.query
+        .filter(ReservaEstoque.status == ATIVA, ReservaEstoque.expira_em < datetime.utcnow())
+        .order_by(ReservaEstoque.expira_em)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not reservas:
+        db.session.rollback()
+        return 0
+
+    quantidades = Counter()
+    for reserva in reservas:
+        for item in reserva.itens:
+            quantidades[item.produto_id] += item.quantidade
+        reserva.status = EXPIRADA
+    _movimentar(quantidades.items(), *TRANSICOES[(ATIVA, EXPIRADA)])
+    db.session.commit()
+    return len(reservas)
+
+
+def ajustar(produto_id, ajuste):
+    """Entrada (positiva) ou saída (negativa) de unidades no disponível; cria o controle na primeira entrada"""
+    for _ in range(2):
+        condicoes = [Estoque.produto_id == produto_id]
+        if ajuste < 0:
+            condicoes.append(Estoque.disponivel >= -ajuste)
+        resultado = db.session.execute(
+            update(Estoque).where(*condicoes).values(disponivel=Estoque.disponivel + ajuste)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount:
+            db.session.commit()
+            return consultar(produto_id)
+
+        if db.session.scalar(select(Estoque.produto_id).where(Estoque.produto_id == produto_id)) is not None:
+            raise _sem_saldo(produto_id)
+        if ajuste < 0:
+            db.session.rollback()
+            raise ErroEstoque("Produto sem controle de estoque", status=404, produtos=[produto_id])
+        try:
+            db.session.add(Estoque(produto_id=produto_id, disponivel=ajuste, reservado=0))
+            db.session.commit()
+            return consultar(produto_id)
+        except IntegrityError:
+            # Outra requisição criou o controle do produto ao mesmo tempo: aplica como UPDATE
+            db.session.rollback()
+    raise ErroEstoque("Não foi possível ajustar o estoque, tente novamente", produtos=[produto_id])
+
+
+def consultar(produto_id):
+    estoque = db.session.execute(
+        select(Estoque.disponivel, Estoque.reservado).where(Estoque.produto_id == produto_id)
+    ).first()
+    if estoque is None:
+        return None
+    return {"produtoId": produto_id, "disponivel": estoque.disponivel, "reservado": estoque.reservado}
+
+
+def reserva_do_pedido(pedido_id):
+    reserva = ReservaEstoque.query.filter_by(pedido_id=pedido_id).first()
+    if reserva is None:
+        return None
+    return {
+        "id": reserva.id,
+        "pedidoId": reserva.pedido_id,
+        "status": reserva.status,
+        "criadoEm": reserva.criado_em.isoformat(),
+        "expiraEm": reserva.expira_em.isoformat(),
+        "itens": [{"produtoId": item.produto_id, "quantidade": item.quantidade} for item in reserva.itens]
+    }
+
+
+def executar_varredura(app, intervalo, limite):
+    """Laço da varredura: expira lotes até não sobrar reserva vencida e espera ``intervalo``"""
+    while True:
+        with app.app_context():
+            try:
+                while expirar_vencidas(limite) == limite:
+                    pass
+            except Exception:
+                logger.exception("Falha na varredura das reservas de estoque")
+            finally:
+                db.session.remove()
+        time.sleep(intervalo)
+
+
+def init_estoque(app):
+    app.config.setdefault("ESTOQUE_RESERVA_TTL", 900)
+    app.config.setdefault("ESTOQUE_VARREDURA_INPROCESSO", True)
+    app.config.setdefault("ESTOQUE_VARREDURA_INTERVALO", 30.0)
+    app.config.setdefault("ESTOQUE_VARREDURA_LOTE", 500)
+
+    if not app.config["ESTOQUE_VARREDURA_INPROCESSO"]:
+        return
+
+    iniciado = threading.Lock()
+
+    @app.before_request
+    def _iniciar_varredura():
+        # Como no relay do outbox: a thread nasce no processo que atende, não no master do gunicorn
+        if iniciado.acquire(blocking=False):
+            threading.Thread(
+                target=executar_varredura,
+                args=(app, app.config["ESTOQUE_VARREDURA_INTERVALO"], app.config["ESTOQUE_VARREDURA_LOTE"]),
+                name="estoque-varredura", daemon=True
+            ).start()
@@ -0,0 +1,339 @@
+"""Fila de jobs em segundo plano com armazenamento durável local (SQLite).
+
+Efeitos colaterais lentos (escrita no Cosmos, importações em massa) viram jobs:
+a rota grava o job e responde 202 com o endereço de ``GET /jobs/<id>``, e um pool
+de threads do processo (ou o worker standalone ``flask fila``) executa as tarefas
+registradas com ``@tarefa``. O arquivo SQLite fica em modo WAL e pode ser
+compartilhado pelos workers do gunicorn na mesma máquina: cada job é reservado
+numa transação ``BEGIN IMMEDIATE`` com um prazo (``locado_ate``); se o processo
+morrer no meio, o job volta para a fila quando o prazo vence.
+
+Falhas são repetidas com backoff exponencial (com jitter) até ``max_tentativas``;
+``ErroPermanente`` marca o job como falho na hora. A entrega é pelo menos uma
+vez: tarefas devem tolerar ser executadas de novo. O traceback de uma falha vai
+para o log; ``GET /jobs`` mostra só o tipo do erro (ou a mensagem do
+``ErroPermanente``, escrita para o cliente).
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app, request
+
+from app.response.serializacao import resposta_json
+
+logger = logging.getLogger(__name__)
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+TAREFAS = {}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL,
+    executar_em REAL NOT NULL,
+    locado_ate REAL,
+    resultado TEXT,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_executar_em ON jobs (status, executar_em);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_locado_ate ON jobs (status, locado_ate);
+"""
+
+
+class ErroPermanente(Exception):
+    """Falha que não adianta repetir (dados inválidos): o job vai direto para ``falhou``"""
+
+
+def tarefa(nome, max_tentativas=5, ao_desistir=None):
+    """Registra a função como tarefa da fila; ela recebe o payload como argumentos nomeados.
+
+    ``ao_desistir`` (com o mesmo payload) roda quando o job vai para ``falhou``, por
+    erro permanente ou por esgotar as tentativas: é onde a tarefa libera o que
+    guardava para as repetições.
+    """
+    def registrar(funcao):
+        TAREFAS[nome] = (funcao, max_tentativas, ao_desistir)
+        return funcao
+    return registrar
+
+
+class ArmazemJobs:
+    """Tabela de jobs no SQLite; uma conexão por thread (e por processo, depois do fork)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        self._local = threading.local()
+        self._conexao().executescript(ESQUEMA)
+
+    def _conexao(self):
+        atual = getattr(self._local, "conexao", None)
+        if atual is None or atual[0] != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            atual = self._local.conexao = (os.getpid(), conexao)
+        return atual[1]
+
+    def enfileirar(self, tipo, payload, max_tentativas, atraso=0.0):
+        agora = time.time()
+        job_id = str(uuid.uuid4())
+        self._conexao().execute(
+            "INSERT INTO jobs (id, tipo, payload, status, max_tentativas, executar_em, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, tipo, json.dumps(payload), PENDENTE, max_tentativas, agora + atraso, agora, agora)
+        )
+        return job_id
+
+    def reservar(self, visibilidade):
+        """Reserva o próximo job vencido (ou com prazo de execução expirado); None se não houver"""
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                "SELECT * FROM jobs WHERE status = ? AND executar_em <= ? ORDER BY executar_em LIMIT 1",
+                (PENDENTE, agora)
+            ).fetchone() or conexao.execute(
+                "SELECT * FROM jobs WHERE status = ? AND locado_ate < ? ORDER BY locado_ate LIMIT 1",
+                (EXECUTANDO, agora)
+            ).fetchone()
+            if linha is None:
+                conexao.execute("COMMIT")
+                return None
+            conexao.execute(
+                "UPDATE jobs SET status = ?, tentativas = tentativas + 1, locado_ate = ?, atualizado_em = ? WHERE id = ?",
+                (EXECUTANDO, agora + visibilidade, agora, linha["id"])
+            )
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        job = dict(linha)
+        job["tentativas"] += 1
+        return job
+
+    def concluir(self, job_id, resultado):
+        self._conexao().execute(
+            "UPDATE jobs SET status = ?, resultado = ?, erro = NULL, locado_ate = NULL, atualizado_em = ? WHERE id = ?",
+            (CONCLUIDO, json.dumps(resultado, default=str), time.time(), job_id)
+        )
+
+    def falhar(self, job_id, erro, repetir_em=None):
+        """Registra a falha; com ``repetir_em`` o job volta a ficar pendente a partir desse instante"""
+        agora = time.time()
+        status = PENDENTE if repetir_em is not None else FALHOU
+        self._conexao().execute(
+            "UPDATE jobs SET status = ?, erro = ?, executar_em = COALESCE(?, executar_em), locado_ate = NULL, "
+            "atualizado_em = ? WHERE id = ?",
+            (status, erro, repetir_em, agora, job_id)
+        )
+
+    def obter(self, job_id):
+        linha = self._conexao().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return publico(dict(linha)) if linha else None
+
+    def listar(self, status=None, limite=50):
+        if status:
+            linhas = self._conexao().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY executar_em DESC LIMIT ?", (status, limite)
+            )
+        else:
+            linhas = self._conexao().execute("SELECT * FROM jobs ORDER BY criado_em DESC LIMIT ?", (limite,))
+        return [publico(dict(linha)) for linha in linhas]
+
+    def contagens(self):
+        return dict(self._conexao().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def expurgar(self, idade):
+        """Remove jobs concluídos há mais de ``idade`` segundos (os falhos ficam para análise)"""
+        return self._conexao().execute(
+            "DELETE FROM jobs WHERE status = ? AND atualizado_em < ?", (CONCLUIDO, time.time() - idade)
+        ).rowcount
+
+
+def publico(job):
+    return {
+        "id": job["id"],
+        "tipo": job["tipo"],
+        "status": job["status"],
+        "tentativas": job["tentativas"],
+        "maxTentativas": job["max_tentativas"],
+        "resultado": json.loads(job["resultado"]) if job["resultado"] else None,
+        "erro": job["erro"],
+        "criadoEm": job["criado_em"],
+        "atualizadoEm": job["atualizado_em"],
+        "proximaTentativa": job["executar_em"] if job["status"] == PENDENTE else None
+    }
+
+
+class Fila:
+    def __init__(self, armazem, app=None, threads=2, intervalo=1.0, visibilidade=300.0,
+                 backoff_base=2.0, backoff_max=300.0, retencao=7 * 24 * 3600):
+        self.armazem = armazem
+        self.app = app
+        self.threads = threads
+        self.intervalo = intervalo
+        self.visibilidade = visibilidade
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retencao = retencao
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._threads = []
+
+    def enfileirar(self, tipo, payload=None, atraso=0.0):
+        if tipo not in TAREFAS:
+            raise ValueError(f"Tarefa desconhecida: {tipo}")
+        job_id = self.armazem.enfileirar(tipo, payload or {}, TAREFAS[tipo][1], atraso)
+        self._acordar.set()
+        return job_id
+
+    def espera(self, tentativas):
+        """Backoff exponencial com jitter: metade fixa, metade aleatória"""
+        atraso = min(self.backoff_max, self.backoff_base * 2 ** (tentativas - 1))
+        return atraso / 2 + random.uniform(0, atraso / 2)
+
+    def _executar(self, funcao, payload):
+        if self.app is not None:
+            with self.app.app_context():
+                return funcao(**payload)
+        return funcao(**payload)
+
+    def processar(self, job):
+        funcao, _, ao_desistir = TAREFAS.get(job["tipo"], (None, None, None))
+        payload = None
+        try:
+            if funcao is None:
+                raise ErroPermanente(f"Tarefa desconhecida: {job['tipo']}")
+            payload = json.loads(job["payload"])
+            resultado = self._executar(funcao, payload)
+        except ErroPermanente as e:
+            self.armazem.falhar(job["id"], str(e))
+            self._desistir(job, ao_desistir, payload)
+            return False
+        except Exception as e:
+            # O traceback fica no log: o status do job é público
+            erro = f"Erro interno ({type(e).__name__})"
+            if job["tentativas"] >= job["max_tentativas"]:
+                logger.exception("Job %s (%s) falhou após %s tentativas", job["id"], job["tipo"], job["tentativas"])
+                self.armazem.falhar(job["id"], erro)
+                self._desistir(job, ao_desistir, payload)
+            else:
+                logger.warning("Job %s (%s) falhou na tentativa %s", job["id"], job["tipo"], job["tentativas"],
+                               exc_info=True)
+                self.armazem.falhar(job["id"], erro, time.time() + self.espera(job["tentativas"]))
+            return False
+        self.armazem.concluir(job["id"], resultado)
+        return True
+
+    def _desistir(self, job, ao_desistir, payload):
+        if ao_desistir is None or payload is None:
+            return
+        try:
+            self._executar(ao_desistir, payload)
+        except Exception:
+            logger.exception("Falha ao liberar os recursos do job %s (%s)", job["id"], job["tipo"])
+
+    def executar_pendentes(self, limite=None):
+        """Processa jobs até a fila esvaziar (ou ``limite``); devolve quantos foram executados"""
+        executados = 0
+        while limite is None or executados < limite:
+            job = self.armazem.reservar(self.visibilidade)
+            if job is None:
+                break
+            self.processar(job)
+            executados += 1
+        return executados
+
+    def _laco(self):
+        proxima_limpeza = 0.0
+        while not self._parar.is_set():
+            try:
+                if self.executar_pendentes(limite=100):
+                    continue
+                if time.monotonic() >= proxima_limpeza:
+                    self.armazem.expurgar(self.retencao)
+                    proxima_limpeza = time.monotonic() + 3600
+            except Exception:
+                logger.exception("Erro no worker da fila")
+            # Acorda com um job enfileirado neste processo ou a cada intervalo (jobs de outros processos)
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def iniciar(self):
+        self._parar.clear()
+        for indice in range(self.threads):
+            thread = threading.Thread(target=self._laco, name=f"fila-{indice}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        self._acordar.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+# Integração com as rotas --------------------------------------------------------
+
+def prefere_assincrono():
+    """O cliente pediu processamento assíncrono (``Prefer: respond-async`` ou ``?assincrono=true``)"""
+    return "respond-async" in request.headers.get("Prefer", "") or request.args.get("assincrono") == "true"
+
+
+def enfileirar(tipo, /, **payload):
+    return current_app.extensions["fila"].enfileirar(tipo, payload)
+
+
+def resposta_aceita(job_id):
+    """202 com o endereço do status do job"""
+    resposta = resposta_json({"job": job_id, "status": PENDENTE, "statusUrl": f"/jobs/{job_id}"}, 202)
+    resposta.headers["Location"] = f"/jobs/{job_id}"
+    return resposta
+
+
+def init_fila(app):
+    """Cria a fila do processo; com FILA_INPROCESSO as threads sobem na primeira requisição
+    (com preload_app do gunicorn, threads criadas no master não sobrevivem ao fork)."""
+    app.config.setdefault("FILA_DB_PATH", "instance/fila.db")
+    app.config.setdefault("FILA_INPROCESSO", True)
+    app.config.setdefault("FILA_THREADS", 2)
+    app.config.setdefault("FILA_INTERVALO", 1.0)
+    app.config.setdefault("FILA_VISIBILIDADE", 300.0)
+
+    fila = Fila(
+        ArmazemJobs(app.config["FILA_DB_PATH"]), app,
+        threads=app.config["FILA_THREADS"], intervalo=app.config["FILA_INTERVALO"],
+        visibilidade=app.config["FILA_VISIBILIDADE"]
+    )
+    app.extensions["fila"] = fila
+    if not app.config["FILA_INPROCESSO"]:
+        return
+
+    iniciado = threading.Lock()
+
+    @app.before_request
+    def _iniciar_fila():
+        # O lock nunca é liberado: só a primeira requisição sobe as threads
+        if iniciado.acquire(blocking=False):
+            fila.iniciar()
@@ -0,0 +1,170 @@
+"""Cálculo de frete e prazo por zona de entrega.
+
+As faixas de CEP de destino são mapeadas para zonas por um índice de intervalos
+(vetores ordenados + busca binária) e o valor sai da tabela da zona e do peso do
+carrinho. Como as faixas começam e terminam em múltiplos de 1000, o prefixo de 5
+dígitos do CEP basta para achar a zona; as cotações ficam memorizadas por
+(prefixo do CEP, assinatura do carrinho), onde a assinatura é o peso tarifado.
+"""
+import json
+import math
+import threading
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+from flask import current_app
+
+from app.services.cep import normalizar_cep
+
+# Tabela padrão, com origem em São Paulo. Pode ser substituída por FRETE_TABELA_PATH.
+TABELA_PADRAO = {
+    "zonas": [
+        {"nome": "LOCAL", "base": 12.90, "porKg": 1.50, "pesoIncluso": 1.0, "prazoDias": 1},
+        {"nome": "ESTADUAL", "base": 16.90, "porKg": 2.20, "pesoIncluso": 1.0, "prazoDias": 3},
+        {"nome": "SUDESTE", "base": 19.90, "porKg": 2.90, "pesoIncluso": 1.0, "prazoDias": 4},
+        {"nome": "SUL", "base": 22.90, "porKg": 3.40, "pesoIncluso": 1.0, "prazoDias": 5},
+        {"nome": "CENTRO_OESTE", "base": 26.90, "porKg": 4.10, "pesoIncluso": 1.0, "prazoDias": 6},
+        {"nome": "NORDESTE", "base": 29.90, "porKg": 4.80, "pesoIncluso": 1.0, "prazoDias": 8},
+        {"nome": "NORTE", "base": 34.90, "porKg": 5.90, "pesoIncluso": 1.0, "prazoDias": 10}
+    ],
+    "faixas": [
+        {"cepInicio": "01000000", "cepFim": "09999999", "zona": "LOCAL"},
+        {"cepInicio": "11000000", "cepFim": "19999999", "zona": "ESTADUAL"},
+        {"cepInicio": "20000000", "cepFim": "39999999", "zona": "SUDESTE"},
+        {"cepInicio": "40000000", "cepFim": "65999999", "zona": "NORDESTE"},
+        {"cepInicio": "66000000", "cepFim": "69999999", "zona": "NORTE"},
+        {"cepInicio": "70000000", "cepFim": "79999999", "zona": "CENTRO_OESTE"},
+        {"cepInicio": "80000000", "cepFim": "99999999", "zona": "SUL"}
+    ]
+}
+
+# Peso arredondado para cima em degraus de 0,5 kg
+DEGRAU_PESO_KG = 0.5
+
+
+class ErroFrete(ValueError):
+    pass
+
+
+class IndiceZonas:
+    """Índice de intervalos de CEP -> zona, com granularidade de prefixo de 5 dígitos"""
+
+    def __init__(self, faixas, zonas):
+        ordenadas = sorted(
+            (normalizar_cep(f["cepInicio"]), normalizar_cep(f["cepFim"]), zonas.index(f["zona"]))
+            for f in faixas
+        )
+        for inicio, fim, _ in ordenadas:
+            if inicio is None or fim is None or inicio % 1000 or (fim + 1) % 1000:
+                raise ErroFrete("As faixas de frete devem começar e terminar em prefixos de 5 dígitos")
+        for anterior, atual in zip(ordenadas, ordenadas[1:]):
+            if atual[0] <= anterior[1]:
+                raise ErroFrete(f"Faixas de frete sobrepostas: {anterior[:2]} e {atual[:2]}")
+
+        # Guardados em prefixos de 5 dígitos
+        self.inicios = array("I", (f[0] // 1000 for f in ordenadas))
+        self.fins = array("I", (f[1] // 1000 for f in ordenadas))
+        self.zonas = array("H", (f[2] for f in ordenadas))
+
+    def zona(self, prefixo):
+        posicao = bisect_right(self.inicios, prefixo) - 1
+        if posicao >= 0 and prefixo <= self.fins[posicao]:
+            return self.zonas[posicao]
+        return None
+
+
+class CalculadoraFrete:
+    def __init__(self, tabela=None, peso_padrao_kg=0.5, tamanho_cache=65536):
+        tabela = tabela or TABELA_PADRAO
+        self.zonas = tabela["zonas"]
+        self.peso_padrao_kg = peso_padrao_kg
+        self.indice = IndiceZonas(tabela["faixas"], [z["nome"] for z in self.zonas])
+        self._cotar = lru_cache(maxsize=tamanho_cache)(self._cotar_sem_cache)
+
+    def peso_tarifado(self, itens):
+        """Soma o peso dos itens (peso x quantidade) e arredonda para o degrau de tarifação"""
+        total = 0.0
+        for item in itens:
+            if not isinstance(item, dict):
+                raise ErroFrete("Cada item deve ser um objeto com quantidade e peso")
+            try:
+                quantidade = int(item.get("quantidade", 1))
+                peso = self.peso_padrao_kg if item.get("peso") is None else float(item["peso"])
+            except (TypeError, ValueError):
+                raise ErroFrete("Peso e quantidade dos itens devem ser numéricos")
+            if quantidade <= 0:
+                raise ErroFrete("A quantidade de cada item deve ser positiva")
+            if not math.isfinite(peso) or peso < 0:
+                raise ErroFrete("O peso de cada item deve ser um número não negativo")
+            total += peso * quantidade
+        return max(DEGRAU_PESO_KG, math.ceil(round(total / DEGRAU_PESO_KG, 6)) * DEGRAU_PESO_KG)
+
+    def _cotar_sem_cache(self, prefixo, peso):
+        posicao = self.indice.zona(prefixo)
+        if posicao is None:
+            return None
+        zona = self.zonas[posicao]
+        excedente = max(0.0, peso - zona["pesoIncluso"])
+        return {
+            "zona": zona["nome"],
+            "prazoDias": zona["prazoDias"],
+            "pesoTarifado": peso,
+            "valor": round(zona["base"] + excedente * zona["porKg"], 2)
+        }
+
+    def cotar(self, cep, itens):
+        """Cotação de um carrinho para um CEP de destino"""
+        numero = normalizar_cep(cep)
+        if numero is None:
+            raise ErroFrete("CEP inválido, informe 8 dígitos")
+        if not itens:
+            raise ErroFrete("O carrinho não possui itens")
+        if not isinstance(itens, list):
+            raise ErroFrete("Os itens do carrinho devem ser uma lista")
+
+        cotacao = self._cotar(numero // 1000, self.peso_tarifado(itens))
+        if cotacao is None:
+            raise ErroFrete("Não há entrega para o CEP informado")
+        return dict(cotacao, cep=f"{numero:08d}")
+
+    def cotar_lote(self, carrinhos):
+        """Cotação de vários carrinhos ({cep, itens}); erros são devolvidos por carrinho.
+
+        Um carrinho que não é objeto invalida o lote inteiro (ErroFrete), como um corpo malformado.
+        """
+        if any(not isinstance(carrinho, dict) for carrinho in carrinhos):
+            raise ErroFrete("Cada carrinho deve ser um objeto com cep e itens")
+        resultados = []
+        for carrinho in carrinhos:
+            try:
+                resultados.append(self.cotar(carrinho.get("cep"), carrinho.get("itens") or []))
+            except ErroFrete as e:
+                resultados.append({"cep": carrinho.get("cep"), "erro": str(e)})
+        return resultados
+
+    def estatisticas_cache(self):
+        info = self._cotar.cache_info()
+        total = info.hits + info.misses
+        return {"acertos": info.hits, "falhas": info.misses, "tamanho": info.currsize,
+                "taxaAcerto": info.hits / total if total else 0.0}
+
+
+_lock = threading.Lock()
+
+
+def obter_calculadora():
+    """Calculadora da aplicação, montada uma única vez a partir de ``current_app.config``"""
+    calculadora = current_app.extensions.get("frete")
+    if calculadora is None:
+        with _lock:
+            calculadora = current_app.extensions.get("frete")
+            if calculadora is None:
+                caminho = current_app.config.get("FRETE_TABELA_PATH")
+                tabela = None
+                if caminho:
+                    with open(caminho, encoding="utf-8") as arquivo:
+                        tabela = json.load(arquivo)
+                calculadora = CalculadoraFrete(tabela, peso_padrao_kg=current_app.config.get("FRETE_PESO_PADRAO_KG", 0.5))
+                current_app.extensions["frete"] = calculadora
+    return calculadora
@@ -0,0 +1,346 @@
+"""Importação em massa de usuários e endereços (CSV ou NDJSON).
+
+O arquivo é lido em streaming e processado em lotes: cada lote é validado em
+memória, confere as chaves no banco com uma única consulta ``IN`` e é gravado com
+``bulk_insert_mappings`` (executemany) e um commit. Linhas inválidas não derrubam
+o lote; entram no relatório com o número da linha e o motivo. O insert do lote
+roda num savepoint: se um duplicado gravado por outra requisição depois da
+conferência o derrubar, o lote é regravado linha a linha (um savepoint por linha)
+e só as linhas em conflito vão para o relatório. Endereços são espelhados no
+Cosmos: o insert devolve os ids (``return_defaults``; no MySQL, um INSERT por
+linha) e as linhas do outbox entram no mesmo savepoint.
+
+Na importação assíncrona o arquivo salvo fica em disco até o job terminar ou
+desistir, e cada commit grava ao lado dele a última linha importada e o
+relatório parcial: uma repetição do job retoma do lote seguinte em vez de
+reimportar (e duplicar) o que já foi gravado.
+"""
+import codecs
+import csv
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app, jsonify, request
+
+from app.database import db
+from app.models.endereco import Endereco
+from app.models.usuario import Usuario
+from app.services.cep import completar_endereco
+from app.services import outbox
+from app.services.fila import ErroPermanente, enfileirar, prefere_assincrono, resposta_aceita, tarefa
+from app.services.unicidade import mensagem_conflito
+from sqlalchemy.exc import IntegrityError
+
+MAX_ERROS_RELATORIO = 1000
+
+
+def ler_registros(fluxo, formato):
+    """Itera (numero_linha, registro) de um fluxo binário em CSV ou NDJSON"""
+    texto = codecs.getreader("utf-8-sig")(fluxo)
+    if formato == "csv":
+        for numero, linha in enumerate(csv.DictReader(texto), start=2):
+            yield numero, linha
+    elif formato == "ndjson":
+        for numero, linha in enumerate(texto, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except ValueError:
+                yield numero, None
+    else:
+        raise ValueError("Formato inválido, use csv ou ndjson")
+
+
+def _lotes(registros, tamanho):
+    iterador = iter(registros)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+class Relatorio:
+    def __init__(self, tipo, anterior=None):
+        """``anterior``: relatório parcial (``to_dict``) de uma execução interrompida, que continua neste"""
+        anterior = anterior or {}
+        self.tipo = tipo
+        self.lidos = anterior.get("lidos", 0)
+        self.inseridos = anterior.get("inseridos", 0)
+        self.total_erros = anterior.get("totalErros", 0)
+        self.erros = list(anterior.get("erros", []))
+        self._inicio = time.perf_counter()
+
+    def erro(self, linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATORIO:
+            self.erros.append({"linha": linha, "erro": mensagem})
+
+    def to_dict(self):
+        segundos = time.perf_counter() - self._inicio
+        return {
+            "tipo": self.tipo,
+            "lidos": self.lidos,
+            "inseridos": self.inseridos,
+            "totalErros": self.total_erros,
+            "erros": self.erros,
+            "segundos": round(segundos, 3),
+            "linhasPorSegundo": round(self.lidos / segundos, 1) if segundos else None
+        }
+
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _validar_usuario(registro):
+    nome, email = _texto(registro, "nome"), _texto(registro, "email")
+    if not nome or not email:
+        raise ValueError("Nome e email são obrigatórios")
+
+    cpf = _texto(registro, "cpf")
+    if cpf is not None:
+        cpf = "".join(c for c in cpf if c.isdigit())
+        if len(cpf) != 11:
+            raise ValueError("CPF deve ter 11 dígitos")
+
+    dt_nascimento = _texto(registro, "dt_nascimento")
+    if dt_nascimento is not None:
+        try:
+            dt_nascimento = datetime.strptime(dt_nascimento, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Data de nascimento inválida, use AAAA-MM-DD")
+
+    return {
+        "nome": nome,
+        "email": email,
+        "cpf": cpf,
+        "dt_nascimento": dt_nascimento,
+        "telefone": _texto(registro, "telefone")
+    }
+
+
+def _validar_endereco(registro):
+    dados = {campo: _texto(registro, campo) for campo in (
+        "logradouro", "complemento", "bairro", "cidade", "uf", "cep", "pais", "tipo"
+    )}
+    try:
+        dados["usuario_id"] = int(registro.get("usuario_id"))
+    except (TypeError, ValueError):
+        raise ValueError("usuario_id inválido")
+
+    erro_cep = completar_endereco(dados)
+    if erro_cep:
+        raise ValueError(erro_cep)
+
+    for campo in ("logradouro", "bairro", "cidade", "uf", "cep"):
+        if not dados.get(campo):
+            raise ValueError(f"O campo '{campo}' é obrigatório")
+    dados["pais"] = dados["pais"] or "Brasil"
+    return dados
+
+
+def _inserir(modelo, mapeamentos):
+    """Insert em massa num savepoint, com os eventos do outbox das entidades espelhadas no Cosmos"""
+    espelhado = outbox.espelhado(modelo)
+    # Cópias: com return_defaults os ids entram nos dicts, e um savepoint desfeito não pode deixá-los
+    mapeamentos = [dict(mapeamento) for mapeamento in mapeamentos] if espelhado else mapeamentos
+    with db.session.begin_nested():
+        db.session.bulk_insert_mappings(modelo, mapeamentos, return_defaults=espelhado)
+        outbox.registrar_em_massa(modelo, mapeamentos)
+
+
+def _gravar_lote(modelo, linhas, relatorio):
+    """Grava as linhas (numero, mapeamento) e devolve quantas entraram; conflitos vão para o relatório"""
+    try:
+        try:
+            _inserir(modelo, [mapeamento for _, mapeamento in linhas])
+            inseridos = len(linhas)
+        except IntegrityError:
+            inseridos = 0
+            for numero, mapeamento in linhas:
+                try:
+                    _inserir(modelo, [mapeamento])
+                    inseridos += 1
+                except IntegrityError as e:
+                    relatorio.erro(numero, mensagem_conflito(e) or "Erro de integridade")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return inseridos
+
+
+def importar_usuarios(registros, tamanho_lote=1000, relatorio=None, ao_gravar=None):
+    relatorio = relatorio or Relatorio("usuarios")
+    for lote in _lotes(registros, tamanho_lote):
+        validos = []
+        for numero, registro in lote:
+            relatorio.lidos += 1
+            try:
+                validos.append((numero, _validar_usuario(registro or {})))
+            except (ValueError, AttributeError) as e:
+                relatorio.erro(numero, str(e))
+
+        # Uma consulta por lote para os emails/CPFs que já existem no banco
+        emails = {u["email"] for _, u in validos}
+        cpfs = {u["cpf"] for _, u in validos if u["cpf"]}
+        existentes = db.session.query(Usuario.email, Usuario.cpf).filter(
+            db.or_(Usuario.email.in_(emails), Usuario.cpf.in_(cpfs))
+        ).all() if validos else []
+        emails_usados = {e for e, _ in existentes}
+        cpfs_usados = {c for _, c in existentes if c}
+
+        linhas = []
+        for numero, usuario in validos:
+            if usuario["email"] in emails_usados:
+                relatorio.erro(numero, "Email já cadastrado")
+            elif usuario["cpf"] and usuario["cpf"] in cpfs_usados:
+                relatorio.erro(numero, "CPF já cadastrado")
+            else:
+                emails_usados.add(usuario["email"])
+                if usuario["cpf"]:
+                    cpfs_usados.add(usuario["cpf"])
+                linhas.append((numero, usuario))
+
+        if linhas:
+            relatorio.inseridos += _gravar_lote(Usuario, linhas, relatorio)
+        if ao_gravar is not None:
+            ao_gravar(lote[-1][0], relatorio)
+    return relatorio
+
+
+def importar_enderecos(registros, tamanho_lote=1000, relatorio=None, ao_gravar=None):
+    relatorio = relatorio or Relatorio("enderecos")
+    for lote in _lotes(registros, tamanho_lote):
+        validos = []
+        for numero, registro in lote:
+            relatorio.lidos += 1
+            try:
+                validos.append((numero, _validar_endereco(registro or {})))
+            except (ValueError, AttributeError) as e:
+                relatorio.erro(numero, str(e))
+
+        # Existência dos usuários conferida com um único IN por lote
+        ids = {e["usuario_id"] for _, e in validos}
+        existentes = {i for (i,) in db.session.query(Usuario.id).filter(Usuario.id.in_(ids))} if ids else set()
+
+        linhas = []
+        for numero, endereco in validos:
+            if endereco["usuario_id"] in existentes:
+                linhas.append((numero, endereco))
+            else:
+                relatorio.erro(numero, "Usuário não encontrado")
+
+        if linhas:
+            relatorio.inseridos += _gravar_lote(Endereco, linhas, relatorio)
+        if ao_gravar is not None:
+            ao_gravar(lote[-1][0], relatorio)
+    return relatorio
+
+
+IMPORTADORES = {
+    "usuarios": importar_usuarios,
+    "enderecos": importar_enderecos
+}
+
+
+def importar(tipo, fluxo, formato="csv", tamanho_lote=1000, progresso=None, ao_gravar=None):
+    """Importa o fluxo; com ``progresso`` ({"linha", "relatorio"}) pula as linhas já importadas"""
+    if tipo not in IMPORTADORES:
+        raise ValueError("Tipo de importação inválido, use usuarios ou enderecos")
+    registros = ler_registros(fluxo, formato)
+    relatorio = Relatorio(tipo, progresso["relatorio"]) if progresso else None
+    if progresso:
+        registros = ((numero, registro) for numero, registro in registros if numero > progresso["linha"])
+    return IMPORTADORES[tipo](registros, tamanho_lote, relatorio, ao_gravar).to_dict()
+
+
+def _caminho_progresso(caminho):
+    return caminho + ".progresso"
+
+
+def _ler_progresso(caminho):
+    try:
+        with open(_caminho_progresso(caminho), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+
+def _gravar_progresso(caminho, linha, relatorio):
+    temporario = _caminho_progresso(caminho) + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump({"linha": linha, "relatorio": relatorio.to_dict()}, arquivo)
+    os.replace(temporario, _caminho_progresso(caminho))
+
+
+def remover_upload(tipo, caminho, formato, lote):
+    """Remove o arquivo salvo e o progresso (job concluído ou desistência da fila)"""
+    for arquivo in (caminho, _caminho_progresso(caminho)):
+        if os.path.exists(arquivo):
+            os.remove(arquivo)
+
+
+@tarefa("importacao", max_tentativas=3, ao_desistir=remover_upload)
+def importar_arquivo(tipo, caminho, formato, lote):
+    """Job da importação assíncrona: importa o arquivo salvo pela requisição, retomando do último lote gravado.
+
+    Falhas transitórias (banco fora do ar) deixam o arquivo para a próxima tentativa;
+    ele é removido no sucesso ou quando a fila desiste do job.
+    """
+    try:
+        with open(caminho, "rb") as fluxo:
+            relatorio = importar(tipo, fluxo, formato, lote, _ler_progresso(caminho),
+                                 lambda linha, parcial: _gravar_progresso(caminho, linha, parcial))
+    except FileNotFoundError:
+        raise ErroPermanente("Arquivo da importação não encontrado")
+    except (ValueError, IntegrityError) as e:
+        # Dados inválidos ou duplicados: repetir não muda o resultado
+        raise ErroPermanente(str(e))
+    remover_upload(tipo, caminho, formato, lote)
+    return relatorio
+
+
+def _salvar_upload(fluxo):
+    diretorio = current_app.config.get("IMPORTACAO_DIRETORIO", "instance/importacoes")
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{uuid.uuid4()}.upload")
+    with open(caminho, "wb") as destino:
+        shutil.copyfileobj(fluxo, destino, 1024 * 1024)
+    return caminho
+
+
+def importar_requisicao(tipo):
+    """Importa o arquivo da requisição (multipart 'arquivo' ou corpo cru) e devolve o relatório.
+
+    Com ``Prefer: respond-async`` o arquivo é salvo em disco, a importação vira um job
+    da fila e a resposta é 202 com o endereço do status (o relatório fica no job).
+    """
+    arquivo = request.files.get("arquivo")
+    fluxo = arquivo.stream if arquivo else request.stream
+    formato = request.args.get("formato") or ("ndjson" if "ndjson" in (request.mimetype or "") else "csv")
+    try:
+        lote = max(1, int(request.args.get("lote", current_app.config.get("IMPORTACAO_TAMANHO_LOTE", 1000))))
+        if prefere_assincrono():
+            if formato not in ("csv", "ndjson"):
+                raise ValueError("Formato inválido, use csv ou ndjson")
+            return resposta_aceita(enfileirar(
+                "importacao", tipo=tipo, caminho=_salvar_upload(fluxo), formato=formato, lote=lote
+            ))
+        return jsonify(importar(tipo, fluxo, formato, lote)), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    except IntegrityError as e:
+        # Duplicado inserido por outra requisição entre a checagem do lote e o insert
+        return jsonify({"erro": mensagem_conflito(e) or "Erro de integridade na importação"}), 409
@@ -0,0 +1,59 @@
+"""Leitura em lote por id (batch-get) nos containers do Cosmos.
+
+Os clientes que montam um carrinho ou um histórico pediam um documento por vez,
+cada um com a sua consulta cross-partition. Aqui os ids viram uma única consulta
+parametrizada ``ARRAY_CONTAINS(@ids, r.id)`` (em blocos de ``TAMANHO_CONSULTA``
+ids), restrita à partição quando ela é conhecida. O resultado volta na ordem do
+pedido, com os ids não encontrados marcados.
+"""
+from flask import current_app
+
+TAMANHO_CONSULTA = 100
+
+
+def consultar_ids(container, ids, particao=None, filtro=None):
+    """Documentos de ``ids`` por id, uma consulta por bloco (single-partition com ``particao``).
+
+    ``filtro`` é uma condição a mais sobre o documento ``c`` (ex.: ``NAO_GUARDA`` nos cartões).
+    """
+    opcoes = {"partition_key": particao} if particao is not None else {"enable_cross_partition_query": True}
+    consulta = "SELECT * FROM root c WHERE ARRAY_CONTAINS(@ids, c.id)"
+    if filtro:
+        consulta += f" AND {filtro}"
+    encontrados = {}
+    for inicio in range(0, len(ids), TAMANHO_CONSULTA):
+        for documento in container.query_items(
+            query=consulta,
+            parameters=[{"name": "@ids", "value": ids[inicio:inicio + TAMANHO_CONSULTA]}],
+            **opcoes
+        ):
+            encontrados[documento["id"]] = documento
+    return encontrados
+
+
+def ids_da_requisicao(modelo):
+    """Corpo validado e os ids sem repetição (na ordem do pedido), até BATCH_GET_MAXIMO"""
+    # Pydantic só é carregado na primeira leitura em lote, fora do caminho de inicialização
+    from app.request.validacao import ErroValidacao, validar
+
+    corpo = validar(modelo)
+    maximo = current_app.config.get("BATCH_GET_MAXIMO", 100)
+    if len(corpo.ids) > maximo:
+        raise ErroValidacao([{"campo": "ids", "erro": f"Informe no máximo {maximo} ids"}])
+    return corpo, list(dict.fromkeys(corpo.ids))
+
+
+def resultado_lote(ids, encontrados, serializar):
+    """Um item por id pedido (repetidos inclusive), na ordem do pedido"""
+    itens = []
+    nao_encontrados = []
+    for documento_id in ids:
+        documento = encontrados.get(documento_id)
+        if documento is None:
+            nao_encontrados.append(documento_id)
+        itens.append({
+            "id": documento_id,
+            "encontrado": documento is not None,
+            "item": serializar(documento) if documento is not None else None
+        })
+    return {"itens": itens, "naoEncontrados": list(dict.fromkeys(nao_encontrados))}
@@ -0,0 +1,247 @@
+"""Rate limiting (token bucket) e descarte de carga das requisições.
+
+Registrado em ``create_app`` como um ``before_request``. Cada requisição consome um
+token do balde do cliente (``X-API-Key`` cadastrada em ``LIMITES_CHAVES_API``, ou o
+IP: uma chave desconhecida não dá balde novo, então trocar de chave a cada
+requisição não contorna o limite nem enche o armazém) e, se a rota tiver
+orçamento próprio em ``LIMITES_ROTAS``, um token do balde cliente+rota; sem token
+a resposta é 429 com ``Retry-After``. Os baldes ficam no processo
+(``ArmazemLocal``) ou, com ``LIMITES_REDIS_URL``, no Redis, atualizados por um
+script Lua atômico e compartilhados entre os workers; se o Redis falhar, o limite
+volta a ser por processo em vez de derrubar a API.
+
+O descarte de carga responde 503 antes de qualquer trabalho quando a rota já tem
+``LIMITES_CONCORRENCIA`` requisições em andamento no processo (``"*"`` limita o
+processo inteiro) ou, nas rotas SQL (blueprints), quando o pool de conexões está
+acima de ``LIMITES_POOL_OCUPACAO``. Rejeitar cedo mantém a latência de quem é
+atendido em vez de enfileirar todos atrás de um recurso esgotado.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+# Orçamento padrão por cliente em todas as rotas: (capacidade do balde, tokens por segundo)
+LIMITE_CLIENTE_PADRAO = (200, 100.0)
+
+# Orçamentos por rota ("METODO endpoint" ou só "endpoint"), além do orçamento do cliente
+LIMITES_ROTAS_PADRAO = {
+    "GET produtos_produto_list": (10, 2.0),  # varredura completa do container
+    "cartao.authorize_transaction": (20, 10.0),
+}
+
+# Requisições simultâneas por rota no processo ("*" = processo inteiro)
+CONCORRENCIA_PADRAO = {
+    "GET produtos_produto_list": 2,
+}
+
+ENDPOINTS_LIVRES = frozenset(("static", "specs", "doc", "root", "restx_doc.static"))
+
+# Chaves no armazém local acima disso disparam a remoção dos baldes cheios (e, se não
+# bastar, dos parados há mais tempo, até sobrar esta fração do máximo)
+MAX_CHAVES_LOCAIS = 100_000
+FRACAO_APOS_LIMPEZA = 0.9
+
+
+class ArmazemLocal:
+    """Baldes no processo; também serve de substituto do Redis nos testes"""
+
+    def __init__(self, relogio=time.monotonic):
+        self.relogio = relogio
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa, custo=1):
+        """Retira ``custo`` tokens; devolve (permitido, segundos até haver tokens)"""
+        agora = self.relogio()
+        with self._lock:
+            tokens, ultimo, _ = self._baldes.get(chave, (capacidade, agora, capacidade))
+            tokens = min(capacidade, tokens + (agora - ultimo) * taxa)
+            if tokens >= custo:
+                self._baldes[chave] = (tokens - custo, agora, capacidade)
+                permitido, espera = True, 0.0
+            else:
+                self._baldes[chave] = (tokens, agora, capacidade)
+                permitido, espera = False, (custo - tokens) / taxa
+            if len(self._baldes) > MAX_CHAVES_LOCAIS:
+                self._remover_cheios(agora, taxa)
+        return permitido, espera
+
+    def _remover_cheios(self, agora, taxa):
+        # Um balde cheio equivale a um ausente; a taxa da requisição atual serve de estimativa
+        for chave in [c for c, (tokens, ultimo, capacidade) in self._baldes.items()
+                      if tokens + (agora - ultimo) * taxa >= capacidade]:
+            del self._baldes[chave]
+        # Muitos clientes ativos ao mesmo tempo: sem folga, a varredura rodaria a cada requisição
+        excesso = len(self._baldes) - int(MAX_CHAVES_LOCAIS * FRACAO_APOS_LIMPEZA)
+        if excesso > 0:
+            for chave in heapq.nsmallest(excesso, self._baldes, key=lambda c: self._baldes[c][1]):
+                del self._baldes[chave]
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+# Mesmo algoritmo do ArmazemLocal, executado de forma atômica no Redis
+SCRIPT_BALDE = """
+local capacidade = tonumber(ARGV[1])
+local taxa = tonumber(ARGV[2])
+local agora = tonumber(ARGV[3])
+local custo = tonumber(ARGV[4])
+local estado = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(estado[1]) or capacidade
+local ultimo = tonumber(estado[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - ultimo) * taxa)
+local permitido = 0
+if tokens >= custo then
+    tokens = tokens - custo
+    permitido = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return {permitido, tostring(tokens)}
+"""
+
+
+class ArmazemRedis:
+    """Baldes compartilhados entre processos; cai para o ArmazemLocal se o Redis falhar"""
+
+    # Depois de uma falha o Redis só é tentado de novo após este intervalo (sem pagar o timeout a cada requisição)
+    PAUSA_APOS_FALHA = 5.0
+
+    def __init__(self, url, prefixo="limites:", reserva=None):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._script = self._cliente.register_script(SCRIPT_BALDE)
+        self.prefixo = prefixo
+        self.reserva = reserva or ArmazemLocal()
+        self._retomar_em = 0.0
+
+    def consumir(self, chave, capacidade, taxa, custo=1):
+        if time.monotonic() < self._retomar_em:
+            return self.reserva.consumir(chave, capacidade, taxa, custo)
+        try:
+            permitido, tokens = self._script(
+                keys=[self.prefixo + chave], args=[capacidade, taxa, time.time(), custo]
+            )
+        except Exception:
+            logger.warning("Redis dos limites indisponível, usando baldes do processo", exc_info=True)
+            self._retomar_em = time.monotonic() + self.PAUSA_APOS_FALHA
+            return self.reserva.consumir(chave, capacidade, taxa, custo)
+        return bool(permitido), 0.0 if permitido else (custo - float(tokens)) / taxa
+
+
+class Concorrencia:
+    """Contadores de requisições em andamento por rota"""
+
+    def __init__(self, limites):
+        self.limites = dict(limites)
+        self._em_andamento = dict.fromkeys(self.limites, 0)
+        self._lock = threading.Lock()
+
+    def entrar(self, rotas):
+        """Ocupa uma vaga em cada rota limitada; devolve as ocupadas ou None se alguma estiver cheia"""
+        rotas = [r for r in rotas if r in self.limites]
+        with self._lock:
+            if any(self._em_andamento[r] >= self.limites[r] for r in rotas):
+                return None
+            for r in rotas:
+                self._em_andamento[r] += 1
+        return rotas
+
+    def sair(self, rotas):
+        with self._lock:
+            for r in rotas:
+                self._em_andamento[r] -= 1
+
+
+def pool_ocupacao():
+    """Fração das conexões do pool em uso (0 se o pool não tem tamanho, ex.: SQLite)"""
+    try:
+        pool = db.engine.pool
+        capacidade = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+        return pool.checkedout() / capacidade if capacidade > 0 else 0.0
+    except (AttributeError, RuntimeError):
+        return 0.0
+
+
+def _orcamentos(valor, padrao):
+    if not valor:
+        return padrao
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+def _chaves_api(valor):
+    """Chave de API -> identificador do cliente nos baldes (um hash: a chave não vai para o Redis)"""
+    if not valor:
+        return {}
+    chaves = valor.split(",") if isinstance(valor, str) else valor
+    return {
+        chave.strip(): "k:" + hashlib.sha256(chave.strip().encode()).hexdigest()[:16]
+        for chave in chaves if chave.strip()
+    }
+
+
+def _erro(status, mensagem, espera):
+    resposta = jsonify({"erro": mensagem})
+    resposta.status_code = status
+    resposta.headers["Retry-After"] = str(max(1, math.ceil(espera)))
+    return resposta
+
+
+def init_limites(app):
+    app.config.setdefault("LIMITES_HABILITADO", True)
+    app.config.setdefault("LIMITES_REDIS_URL", None)
+    app.config.setdefault("LIMITES_POOL_OCUPACAO", 0.9)
+    if not app.config["LIMITES_HABILITADO"]:
+        return
+
+    cliente_padrao = tuple(_orcamentos(app.config.get("LIMITE_CLIENTE"), LIMITE_CLIENTE_PADRAO))
+    rotas = {rota: tuple(orcamento) for rota, orcamento in
+             _orcamentos(app.config.get("LIMITES_ROTAS"), LIMITES_ROTAS_PADRAO).items()}
+    concorrencia = Concorrencia(_orcamentos(app.config.get("LIMITES_CONCORRENCIA"), CONCORRENCIA_PADRAO))
+    chaves_api = _chaves_api(app.config.get("LIMITES_CHAVES_API"))
+    url = app.config["LIMITES_REDIS_URL"]
+    armazem = ArmazemRedis(url) if url else ArmazemLocal()
+    app.extensions["limites"] = armazem
+
+    @app.before_request
+    def limitar_requisicao():
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in ENDPOINTS_LIVRES:
+            return None
+        rota = f"{request.method} {endpoint}"
+
+        # Descarte de carga primeiro: é só um contador, sem I/O
+        ocupadas = concorrencia.entrar(("*", rota, endpoint))
+        if ocupadas is None:
+            return _erro(503, "Servidor sobrecarregado, tente novamente em instantes", 1)
+        g.limites_ocupadas = ocupadas
+        if request.blueprint and pool_ocupacao() >= app.config["LIMITES_POOL_OCUPACAO"]:
+            return _erro(503, "Banco de dados sobrecarregado, tente novamente em instantes", 1)
+
+        chave = request.headers.get("X-API-Key")
+        cliente = (chaves_api.get(chave) if chave else None) or request.remote_addr or "anonimo"
+        permitido, espera = armazem.consumir(f"c:{cliente}", *cliente_padrao)
+        orcamento = rotas.get(rota) or rotas.get(endpoint)
+        if permitido and orcamento:
+            permitido, espera = armazem.consumir(f"r:{cliente}:{rota}", *orcamento)
+        if not permitido:
+            return _erro(429, "Limite de requisições excedido", espera)
+        return None
+
+    @app.teardown_request
+    def liberar_vagas(_erro_requisicao):
+        ocupadas = g.pop("limites_ocupadas", None)
+        if ocupadas:
+            concorrencia.sair(ocupadas)
@@ -0,0 +1,469 @@
+"""Outbox transacional: espelha no Cosmos o que as rotas SQL gravam no MySQL.
+
+``Pedido``, ``Cartao`` e ``Endereco`` são escritos pelas rotas dos blueprints no
+MySQL e lidos (e escritos) pelos namespaces no Cosmos. Em vez de a requisição
+gravar nos dois lados, o ``after_flush`` da sessão grava na tabela ``outbox`` uma
+linha por entidade alterada, na mesma conexão e portanto no mesmo commit: ou a
+entidade e o evento são confirmados juntos, ou nenhum dos dois.
+
+O relay (``flask outbox`` ou, com ``OUTBOX_INPROCESSO``, uma thread da API) lê as
+linhas depois da marca em lotes, consolida várias alterações do mesmo documento
+numa só, agrupa por container e partition key e envia cada grupo como batch
+(``execute_item_batch``, até 100 operações), com os grupos em paralelo. A marca
+só avança depois do lote inteiro; uma falha faz o lote ser reenviado, o que não
+muda o resultado (upsert, patch e delete são idempotentes).
+
+Ids do outbox são atribuídos no insert, não no commit: um id menor pode ficar
+visível depois de um maior. A marca só passa por um buraco na sequência depois
+de ``atraso`` segundos; aí o buraco vira uma lacuna registrada na marca, e os
+lotes seguintes continuam procurando as linhas dela até ``retencao_lacunas``
+(ids de transações desfeitas nunca aparecem).
+
+Documentos vindos do SQL usam o id ``sql-<id>``. Criações são upserts do
+documento completo; alterações são patches dos campos espelhados, que preservam
+os campos mantidos só pelo Cosmos (ex.: ``principal`` do cartão). Pedidos são
+excluídos logicamente (``excluido`` + ``ttl``), como no ``delete`` do namespace:
+o change feed não mostra exclusões físicas e o resumo do usuário precisa vê-las. O número
+completo e o CVV do cartão não saem do MySQL. Importações em massa
+(``bulk_insert_mappings``) não passam pelo flush da unidade de trabalho: gravam
+os eventos com ``registrar_em_massa``, no mesmo savepoint do lote.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.models.cartao import Cartao
+from app.models.endereco import Endereco
+from app.models.outbox import ALTERACAO, CRIACAO, EXCLUSAO, MarcaOutbox, Outbox
+from app.models.pedido import Pedido
+
+logger = logging.getLogger(__name__)
+
+MARCA = "cosmos"
+MAX_OPERACOES_BATCH = 100
+
+
+def documento_pedido(pedido):
+    return {
+        "id": f"sql-{pedido.id_pedido}",
+        "usuarioId": str(pedido.id_usuario),
+        "nomeCliente": pedido.nome_cliente,
+        # O SQL não tem catálogo: o produto é identificado pelo nome, como em analise_vendas.ler_sql
+        "itens": [{
+            "produtoId": pedido.nome_produto, "nomeProduto": pedido.nome_produto,
+            "quantidade": 1, "precoUnitario": pedido.valor_total
+        }],
+        "status": pedido.status,
+        "dataPedido": pedido.data_pedido.isoformat() if pedido.data_pedido else None,
+        "valorTotal": pedido.valor_total
+    }
+
+
+def documento_cartao(cartao):
+    return {
+        "id": f"sql-{cartao.id}",
+        "usuarioId": str(cartao.usuario_id),
+        "numero": "*" * 12 + (cartao.numero or "")[-4:],
+        "nomeTitular": cartao.nome_impresso,
+        "dataValidade": cartao.validade.strftime("%m/%Y") if cartao.validade else None,
+        "bandeira": cartao.bandeira,
+        "tipo": cartao.tipo
+    }
+
+
+def documento_endereco(endereco):
+    return {
+        "id": f"sql-{endereco.id}",
+        "usuarioId": str(endereco.usuario_id),
+        "cep": endereco.cep,
+        "logradouro": endereco.logradouro,
+        "complemento": endereco.complemento,
+        "bairro": endereco.bairro,
+        "cidade": endereco.cidade,
+        "estado": endereco.uf,
+        "pais": endereco.pais,
+        "tipo": endereco.tipo
+    }
+
+
+class Entidade:
+    __slots__ = ("nome", "container", "documento", "colunas", "coluna_particao", "padroes", "exclusao_logica")
+
+    def __init__(self, nome, container, documento, colunas, coluna_particao, padroes=None, exclusao_logica=False):
+        self.nome = nome
+        self.container = container
+        self.documento = documento
+        # Só alterações nestas colunas geram evento (o saldo do cartão, por exemplo, não vai ao Cosmos)
+        self.colunas = colunas
+        self.coluna_particao = coluna_particao
+        # Campos só do Cosmos, preenchidos na criação e depois preservados pelos patches
+        self.padroes = padroes or {}
+        # Exclusão vira patch de ``excluido`` + ``ttl`` em vez de delete
+        self.exclusao_logica = exclusao_logica
+
+
+ENTIDADES = {
+    Pedido: Entidade(
+        "pedido", "pedidos", documento_pedido,
+        ("id_usuario", "nome_cliente", "nome_produto", "valor_total", "status", "data_pedido"), "id_usuario",
+        exclusao_logica=True
+    ),
+    Cartao: Entidade(
+        "cartao", "cartoes", documento_cartao,
+        ("usuario_id", "numero", "nome_impresso", "validade", "bandeira", "tipo"), "usuario_id",
+        padroes={"principal": False}
+    ),
+    Endereco: Entidade(
+        "endereco", "enderecos", documento_endereco,
+        ("usuario_id", "logradouro", "complemento", "bairro", "cidade", "uf", "cep", "pais", "tipo"), "usuario_id"
+    ),
+}
+POR_NOME = {entidade.nome: entidade for entidade in ENTIDADES.values()}
+
+
+# Captura (mesma transação da entidade) -------------------------------------------
+
+def _linha(entidade, operacao, documento, particao=None):
+    return {
+        "entidade": entidade.nome,
+        "chave": documento["id"],
+        "particao": str(particao if particao is not None else documento["usuarioId"]),
+        "operacao": operacao,
+        "documento": None if operacao == EXCLUSAO else json.dumps(documento, default=str)
+    }
+
+
+def eventos_do_flush(sessao):
+    linhas = []
+    for instancia in sessao.new:
+        entidade = ENTIDADES.get(type(instancia))
+        if entidade is not None:
+            linhas.append(_linha(entidade, CRIACAO, entidade.documento(instancia)))
+
+    for instancia in sessao.dirty:
+        entidade = ENTIDADES.get(type(instancia))
+        if entidade is None:
+            continue
+        atributos = inspect(instancia).attrs
+        if not any(atributos[coluna].history.has_changes() for coluna in entidade.colunas):
+            continue
+        documento = entidade.documento(instancia)
+        anterior = atributos[entidade.coluna_particao].history.deleted
+        if anterior and anterior[0] is not None and str(anterior[0]) != documento["usuarioId"]:
+            # Mudou de partition key: o documento sai da partição antiga e é recriado na nova
+            linhas.append(_linha(entidade, EXCLUSAO, documento, anterior[0]))
+            linhas.append(_linha(entidade, CRIACAO, documento))
+        else:
+            linhas.append(_linha(entidade, ALTERACAO, documento))
+
+    for instancia in sessao.deleted:
+        entidade = ENTIDADES.get(type(instancia))
+        if entidade is not None:
+            linhas.append(_linha(entidade, EXCLUSAO, entidade.documento(instancia)))
+    return linhas
+
+
+def ativo():
+    """Se a aplicação atual grava eventos no outbox (``OUTBOX_HABILITADO``, registrado por ``init_outbox``)"""
+    return has_app_context() and current_app.extensions.get("outbox", False)
+
+
+def espelhado(modelo):
+    """Se inserts de ``modelo`` geram eventos (os ids gerados precisam voltar do insert)"""
+    return modelo in ENTIDADES and ativo()
+
+
+def registrar_em_massa(modelo, mapeamentos):
+    """Eventos de criação de um insert em massa, na transação corrente.
+
+    ``mapeamentos`` já trazem os ids gerados (``bulk_insert_mappings`` com ``return_defaults``).
+    """
+    if not (mapeamentos and espelhado(modelo)):
+        return
+    entidade = ENTIDADES[modelo]
+    db.session.execute(Outbox.__table__.insert(), [
+        _linha(entidade, CRIACAO, entidade.documento(modelo(**mapeamento))) for mapeamento in mapeamentos
+    ])
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_outbox(sessao, _contexto):
+    if not ativo():
+        return
+    linhas = eventos_do_flush(sessao)
+    if linhas:
+        # Mesma conexão do flush: as linhas do outbox entram no commit da entidade
+        conexao = sessao.connection(bind_arguments={"mapper": inspect(Outbox)})
+        conexao.execute(Outbox.__table__.insert(), linhas)
+
+
+# Relay -----------------------------------------------------------------------------
+
+def consolidar(linhas):
+    """Uma operação por documento: (entidade, particao, chave) -> (operacao, documento)"""
+    operacoes = {}
+    for linha in linhas:
+        chave = (linha.entidade, linha.particao, linha.chave)
+        anterior = operacoes.get(chave)
+        if linha.operacao == EXCLUSAO:
+            operacoes[chave] = (EXCLUSAO, None)
+        elif linha.operacao == CRIACAO or (anterior is not None and anterior[0] != ALTERACAO):
+            # Criado (ou recriado depois de excluído) dentro do lote: vai o documento completo
+            operacoes[chave] = (CRIACAO, json.loads(linha.documento))
+        else:
+            operacoes[chave] = (ALTERACAO, json.loads(linha.documento))
+    return operacoes
+
+
+def remover_de_lacunas(lacunas, ids):
+    """Tira das lacunas ``[inicio, fim, desde]`` os ids que apareceram, dividindo as faixas"""
+    restantes = []
+    for inicio, fim, desde in lacunas:
+        for id_ in sorted(i for i in ids if inicio <= i <= fim):
+            if id_ > inicio:
+                restantes.append([inicio, id_ - 1, desde])
+            inicio = id_ + 1
+        if inicio <= fim:
+            restantes.append([inicio, fim, desde])
+    return restantes
+
+
+class Relay:
+    def __init__(self, containers, tamanho_lote=500, atraso=2.0, paralelismo=8,
+                 ttl_exclusao=7 * 24 * 3600, retencao_lacunas=3600):
+        self.containers = containers
+        self.tamanho_lote = tamanho_lote
+        self.atraso = atraso
+        self.paralelismo = paralelismo
+        self.ttl_exclusao = ttl_exclusao
+        self.retencao_lacunas = retencao_lacunas
+        self._executor = ThreadPoolExecutor(paralelismo, thread_name_prefix="outbox")
+
+    def selecionar(self, marca, lacunas):
+        """Linhas a enviar e o novo ``ultimo_id``; ``lacunas`` é atualizada no lugar.
+
+        Entram as linhas que preencheram lacunas e as seguintes à marca enquanto a
+        sequência de ids for contínua. Um buraco com menos de ``atraso`` segundos
+        para o lote ali (pode ser uma transação ainda não confirmada); um mais
+        antigo vira lacuna e a marca segue.
+        """
+        filtro = Outbox.id > marca.ultimo_id
+        if lacunas:
+            filtro = or_(filtro, *(Outbox.id.between(inicio, fim) for inicio, fim, _ in lacunas))
+        linhas = Outbox.query.filter(filtro).order_by(Outbox.id).limit(self.tamanho_lote).all()
+
+        enviar = [linha for linha in linhas if linha.id <= marca.ultimo_id]
+        lacunas[:] = remover_de_lacunas(lacunas, {linha.id for linha in enviar})
+
+        corte = datetime.utcnow() - timedelta(seconds=self.atraso)
+        ultimo_id = marca.ultimo_id
+        for linha in linhas[len(enviar):]:
+            if linha.id > ultimo_id + 1:
+                if linha.criado_em > corte:
+                    break
+                lacunas.append([ultimo_id + 1, linha.id - 1, time.time()])
+            enviar.append(linha)
+            ultimo_id = linha.id
+        return enviar, ultimo_id
+
+    def encaminhar_lote(self):
+        """Envia até ``tamanho_lote`` linhas pendentes; devolve o relatório ou None sem pendências"""
+        marca = MarcaOutbox.query.filter_by(nome=MARCA).with_for_update().first()
+        if marca is None:
+            marca = MarcaOutbox(nome=MARCA, ultimo_id=0)
+            db.session.add(marca)
+            db.session.flush()
+
+        anteriores = json.loads(marca.lacunas or "[]")
+        expira = time.time() - self.retencao_lacunas
+        lacunas = [lacuna for lacuna in anteriores if lacuna[2] > expira]
+        linhas, ultimo_id = self.selecionar(marca, lacunas)
+        if not linhas:
+            if lacunas != anteriores:
+                marca.lacunas = json.dumps(lacunas)
+                db.session.commit()
+            else:
+                db.session.rollback()
+            return None
+
+        grupos = {}
+        for (nome, particao, chave), (operacao, documento) in consolidar(linhas).items():
+            entidade = POR_NOME[nome]
+            grupos.setdefault((entidade.container, particao), []).append(
+                (entidade, operacao, chave, documento)
+            )
+        try:
+            # A primeira falha de um grupo é propagada: a marca não avança e o lote inteiro é reenviado
+            enviados = sum(self._executor.map(lambda item: self._enviar_grupo(*item), grupos.items()))
+        except Exception:
+            db.session.rollback()
+            raise
+
+        marca.ultimo_id = ultimo_id
+        marca.lacunas = json.dumps(lacunas)
+        db.session.commit()
+        return {"linhas": len(linhas), "documentos": enviados, "grupos": len(grupos), "ate_id": ultimo_id}
+
+    def _operacao_batch(self, entidade, operacao, chave, documento):
+        if operacao == EXCLUSAO:
+            if entidade.exclusao_logica:
+                return ("patch", (chave, [
+                    {"op": "set", "path": "/excluido", "value": True},
+                    {"op": "set", "path": "/ttl", "value": self.ttl_exclusao}
+                ]))
+            return ("delete", (chave,))
+        if operacao == CRIACAO:
+            return ("upsert", ({**entidade.padroes, **documento},))
+        campos = [{"op": "set", "path": f"/{campo}", "value": valor}
+                  for campo, valor in documento.items() if campo not in ("id", "usuarioId")]
+        return ("patch", (chave, campos))
+
+    def _enviar_grupo(self, grupo, operacoes):
+        from azure.cosmos.exceptions import CosmosBatchOperationError
+
+        nome_container, particao = grupo
+        container = self.containers[nome_container]
+        for inicio in range(0, len(operacoes), MAX_OPERACOES_BATCH):
+            parte = operacoes[inicio:inicio + MAX_OPERACOES_BATCH]
+            try:
+                container.execute_item_batch(
+                    batch_operations=[self._operacao_batch(*operacao) for operacao in parte], partition_key=particao
+                )
+            except CosmosBatchOperationError:
+                # O batch é atômico: um patch/delete de documento inexistente derruba todos; repete um a um
+                for operacao in parte:
+                    self._enviar_individual(container, particao, *operacao)
+        return len(operacoes)
+
+    def _enviar_individual(self, container, particao, entidade, operacao, chave, documento):
+        from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+        if operacao == EXCLUSAO:
+            try:
+                if entidade.exclusao_logica:
+                    container.patch_item(item=chave, partition_key=particao,
+                                         patch_operations=self._operacao_batch(entidade, operacao, chave, None)[1][1])
+                else:
+                    container.delete_item(item=chave, partition_key=particao)
+            except CosmosResourceNotFoundError:
+                pass
+            return
+        if operacao == ALTERACAO:
+            try:
+                container.patch_item(item=chave, partition_key=particao,
+                                     patch_operations=self._operacao_batch(entidade, operacao, chave, documento)[1][1])
+                return
+            except CosmosResourceNotFoundError:
+                # Documento anterior ao outbox (ou removido no Cosmos): recria a partir do SQL
+                pass
+        container.upsert_item({**entidade.padroes, **documento})
+
+    def encaminhar(self):
+        """Encaminha lotes até não haver pendências; devolve os totais"""
+        total = {"linhas": 0, "documentos": 0, "lotes": 0}
+        while True:
+            relatorio = self.encaminhar_lote()
+            if relatorio is None:
+                return total
+            total["linhas"] += relatorio["linhas"]
+            total["documentos"] += relatorio["documentos"]
+            total["lotes"] += 1
+
+
+def expurgar(retencao):
+    """Remove linhas já enviadas com mais de ``retencao`` segundos"""
+    marca = db.session.get(MarcaOutbox, MARCA)
+    if marca is None:
+        return 0
+    corte = datetime.utcnow() - timedelta(seconds=retencao)
+    removidas = Outbox.query.filter(Outbox.id <= marca.ultimo_id, Outbox.criado_em < corte).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return removidas
+
+
+def situacao():
+    """Marca, linhas pendentes e idade da mais antiga (atraso do lado Cosmos)"""
+    marca = db.session.get(MarcaOutbox, MARCA)
+    ultimo_id = marca.ultimo_id if marca else 0
+    lacunas = json.loads(marca.lacunas or "[]") if marca else []
+    pendentes, mais_antiga = db.session.query(func.count(Outbox.id), func.min(Outbox.criado_em)).filter(
+        Outbox.id > ultimo_id
+    ).one()
+    return {
+        "ultimoId": ultimo_id,
+        "pendentes": pendentes,
+        "lacunas": sum(fim - inicio + 1 for inicio, fim, _ in lacunas),
+        "atrasoSegundos": round((datetime.utcnow() - mais_antiga).total_seconds(), 3) if mais_antiga else 0.0
+    }
+
+
+def criar_relay(config):
+    from app.cosmosdb import get_container
+
+    return Relay(
+        {entidade.container: get_container(entidade.container) for entidade in ENTIDADES.values()},
+        config["OUTBOX_TAMANHO_LOTE"], config["OUTBOX_ATRASO"], config["OUTBOX_PARALELISMO"],
+        config["PEDIDO_EXCLUIDO_TTL"], config["OUTBOX_RETENCAO_LACUNAS"]
+    )
+
+
+def executar_relay(app, relay, intervalo, retencao):
+    """Laço do relay: lotes até esvaziar, espera ``intervalo`` e expurga de hora em hora"""
+    proxima_limpeza = 0.0
+    while True:
+        with app.app_context():
+            try:
+                relay.encaminhar()
+                if time.monotonic() >= proxima_limpeza:
+                    expurgar(retencao)
+                    proxima_limpeza = time.monotonic() + 3600
+            except Exception:
+                logger.exception("Falha ao encaminhar o outbox ao Cosmos")
+            finally:
+                db.session.remove()
+        time.sleep(intervalo)
+
+
+def init_outbox(app):
+    app.config.setdefault("OUTBOX_HABILITADO", True)
+    app.config.setdefault("OUTBOX_INPROCESSO", False)
+    app.config.setdefault("OUTBOX_TAMANHO_LOTE", 500)
+    app.config.setdefault("OUTBOX_ATRASO", 2.0)
+    app.config.setdefault("OUTBOX_PARALELISMO", 8)
+    app.config.setdefault("OUTBOX_INTERVALO", 1.0)
+    app.config.setdefault("OUTBOX_RETENCAO", 7 * 24 * 3600)
+    app.config.setdefault("OUTBOX_RETENCAO_LACUNAS", 3600)
+    app.config.setdefault("PEDIDO_EXCLUIDO_TTL", 7 * 24 * 3600)
+
+    app.extensions["outbox"] = app.config["OUTBOX_HABILITADO"]
+
+    @app.route("/outbox/estado")
+    def estado_outbox():
+        """Marca do relay e atraso do espelhamento no Cosmos"""
+        return situacao()
+
+    if not (app.config["OUTBOX_HABILITADO"] and app.config["OUTBOX_INPROCESSO"]):
+        return
+
+    iniciado = threading.Lock()
+
+    @app.before_request
+    def _iniciar_relay():
+        # Com preload_app do gunicorn, threads criadas no master não sobrevivem ao fork;
+        # vários processos com o relay se revezam pela marca bloqueada (FOR UPDATE)
+        if iniciado.acquire(blocking=False):
+            threading.Thread(
+                target=executar_relay,
+                args=(app, criar_relay(app.config), app.config["OUTBOX_INTERVALO"], app.config["OUTBOX_RETENCAO"]),
+                name="outbox-relay", daemon=True
+            ).start()
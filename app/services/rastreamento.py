@@ -0,0 +1,527 @@
+"""Rastreamento (tracing) do caminho quente: spans das requisições, do SQL, do Cosmos,
+da validação Pydantic e da serialização JSON.
+
+Segue o modelo do OpenTelemetry sem depender do SDK: trace id e span id de 16 e 8
+bytes em hexadecimal, propagação W3C (``traceparent`` recebido e devolvido na
+resposta), atributos com os nomes das convenções semânticas (``http.route``,
+``db.system``, ``db.statement``, ``db.cosmosdb.request_charge``...) e exportação no
+formato OTLP/JSON, um ``ExportTraceServiceRequest`` por linha, que o receiver
+``otlpjsonfile`` do OpenTelemetry Collector lê como está. O exportador ``arquivo``
+grava essas linhas em RASTREAMENTO_ARQUIVO e o ``console`` escreve um span por linha
+no stderr; nenhum dos dois precisa de coletor.
+
+Amostragem na cabeça (head-based): a decisão é tomada uma vez, no span raiz da
+requisição, comparando o trace id com RASTREAMENTO_AMOSTRAGEM (como o
+TraceIdRatioBased), e a de quem chamou é respeitada quando vem um ``traceparent``
+(ParentBased). Numa requisição não amostrada nenhum span é criado: a instrumentação
+só lê uma ContextVar. Os spans terminados vão para uma fila e são gravados em lote
+por uma thread, fora do tempo da requisição.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, request
+from werkzeug.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# SpanKind e StatusCode do OTLP
+INTERNO = 1
+SERVIDOR = 2
+CLIENTE = 3
+STATUS_ERRO = 2
+
+# Operações do ContainerProxy que viram spans (o change feed é lido pelas threads, sem requisição)
+OPERACOES_COSMOS = frozenset({
+    "query_items", "read_all_items", "read_item", "create_item", "upsert_item", "replace_item",
+    "patch_item", "delete_item", "execute_item_batch",
+})
+CONSULTAS_COSMOS = frozenset({"query_items", "read_all_items"})
+
+_MASCARA_64 = (1 << 64) - 1
+_aleatorio = random.Random()
+_atual = ContextVar("rastreamento_span", default=None)
+
+
+def _novo_trace_id():
+    return f"{_aleatorio.getrandbits(128) or 1:032x}"
+
+
+def _novo_span_id():
+    return f"{_aleatorio.getrandbits(64) or 1:016x}"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "pai_id", "nome", "tipo", "inicio", "fim", "atributos", "eventos",
+                 "status", "mensagem")
+
+    amostrado = True
+
+    def __init__(self, trace_id, pai_id, nome, tipo=INTERNO, atributos=None):
+        self.trace_id = trace_id
+        self.span_id = _novo_span_id()
+        self.pai_id = pai_id
+        self.nome = nome
+        self.tipo = tipo
+        self.atributos = atributos if atributos is not None else {}
+        self.eventos = []
+        self.status = 0
+        self.mensagem = ""
+        self.fim = None
+        self.inicio = time.time_ns()
+
+    def definir(self, chave, valor):
+        if valor is not None:
+            self.atributos[chave] = valor
+
+    def somar(self, chave, valor):
+        self.atributos[chave] = self.atributos.get(chave, 0) + valor
+
+    def erro(self, excecao):
+        self.status = STATUS_ERRO
+        self.mensagem = str(excecao)
+        self.eventos.append((time.time_ns(), "exception", {
+            "exception.type": type(excecao).__qualname__, "exception.message": str(excecao)
+        }))
+
+    def encerrar(self):
+        if self.fim is None:
+            self.fim = time.time_ns()
+            rastreador.registrar(self)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _SpanNulo:
+    """Span das requisições não amostradas (e de fora de uma requisição): não registra nada"""
+    __slots__ = ()
+
+    amostrado = False
+
+    def definir(self, chave, valor):
+        pass
+
+    def somar(self, chave, valor):
+        pass
+
+    def erro(self, excecao):
+        pass
+
+    def encerrar(self):
+        pass
+
+
+SPAN_NULO = _SpanNulo()
+
+
+def iniciar_span(nome, tipo=INTERNO, atributos=None):
+    """Span filho do span atual, sem torná-lo o atual (folhas como consultas); o chamador encerra"""
+    pai = _atual.get()
+    if pai is None:
+        return SPAN_NULO
+    return Span(pai.trace_id, pai.span_id, nome, tipo, atributos)
+
+
+@contextmanager
+def span(nome, atributos=None, tipo=INTERNO):
+    """Span filho do atual durante o bloco; os spans abertos dentro dele ficam como filhos"""
+    filho = iniciar_span(nome, tipo, atributos)
+    if filho is SPAN_NULO:
+        yield filho
+        return
+    token = _atual.set(filho)
+    try:
+        yield filho
+    except BaseException as e:
+        # Erros do cliente (4xx) são respostas normais, não falhas do trecho rastreado
+        if not (isinstance(e, HTTPException) and (e.code or 500) < 500):
+            filho.erro(e)
+        raise
+    finally:
+        _atual.reset(token)
+        filho.encerrar()
+
+
+# Amostragem e propagação -------------------------------------------------------
+
+def ler_traceparent(cabecalho):
+    """(trace_id, span_id, amostrado) do cabeçalho W3C, ou None se ausente ou inválido"""
+    if not cabecalho:
+        return None
+    partes = cabecalho.strip().lower().split("-")
+    if len(partes) < 4 or partes[0] == "ff" or len(partes[0]) != 2:
+        return None
+    versao, trace_id, span_id, flags = partes[:4]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2 or (versao == "00" and len(partes) != 4):
+        return None
+    try:
+        if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+            return None
+        return trace_id, span_id, bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+
+
+def amostrar(trace_id, razao):
+    """Decisão determinística pelos 64 bits baixos do trace id (a mesma em todo serviço com a mesma razão)"""
+    if razao >= 1:
+        return True
+    if razao <= 0:
+        return False
+    return (int(trace_id[16:], 16) & _MASCARA_64) < int(razao * (1 << 64))
+
+
+def abrir_raiz(nome, traceparent=None, atributos=None, tipo=SERVIDOR):
+    """Abre o span raiz (da requisição ou de um job) e o torna o atual; devolve (span, token)"""
+    pai = ler_traceparent(traceparent)
+    if pai is not None:
+        trace_id, pai_id, amostrado = pai
+    else:
+        trace_id, pai_id = _novo_trace_id(), ""
+        amostrado = amostrar(trace_id, rastreador.razao)
+    if not amostrado or rastreador.exportador is None:
+        return SPAN_NULO, _atual.set(None)
+    raiz = Span(trace_id, pai_id, nome, tipo, atributos)
+    return raiz, _atual.set(raiz)
+
+
+def fechar_raiz(raiz, token):
+    _atual.reset(token)
+    raiz.encerrar()
+
+
+# Exportação --------------------------------------------------------------------
+
+def _valor_otlp(valor):
+    if isinstance(valor, bool):
+        return {"boolValue": valor}
+    if isinstance(valor, int):
+        return {"intValue": str(valor)}
+    if isinstance(valor, float):
+        return {"doubleValue": valor}
+    return {"stringValue": str(valor)}
+
+
+def _atributos_otlp(atributos):
+    return [{"key": chave, "value": _valor_otlp(valor)} for chave, valor in atributos.items()]
+
+
+def span_otlp(s):
+    return {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "parentSpanId": s.pai_id,
+        "name": s.nome,
+        "kind": s.tipo,
+        "startTimeUnixNano": str(s.inicio),
+        "endTimeUnixNano": str(s.fim),
+        "attributes": _atributos_otlp(s.atributos),
+        "events": [
+            {"timeUnixNano": str(quando), "name": nome, "attributes": _atributos_otlp(atributos)}
+            for quando, nome, atributos in s.eventos
+        ],
+        "status": {"code": s.status, "message": s.mensagem} if s.status else {},
+    }
+
+
+class Exportador:
+    """Fila dos spans terminados, gravada em lotes por uma thread (como o BatchSpanProcessor).
+
+    Com a fila cheia os spans novos são descartados (e contados), sem bloquear a requisição.
+    """
+
+    def __init__(self, servico, intervalo=1.0, fila_maxima=10000, lote=512):
+        self.servico = servico
+        self.intervalo = intervalo
+        self.lote = lote
+        self.fila = queue.Queue(fila_maxima)
+        self.descartados = 0
+        self._escrita = threading.Lock()
+
+    def registrar(self, s):
+        try:
+            self.fila.put_nowait(s)
+        except queue.Full:
+            self.descartados += 1
+
+    def descarregar(self):
+        """Grava tudo o que está na fila; devolve quantos spans foram gravados"""
+        gravados = 0
+        with self._escrita:
+            while True:
+                spans = []
+                try:
+                    while len(spans) < self.lote:
+                        spans.append(self.fila.get_nowait())
+                except queue.Empty:
+                    pass
+                if not spans:
+                    return gravados
+                self.escrever(spans)
+                gravados += len(spans)
+
+    def executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.descarregar()
+            except Exception:
+                logger.exception("Falha ao exportar os spans do rastreamento")
+
+    def iniciar(self):
+        threading.Thread(target=self.executar, name="rastreamento-exportador", daemon=True).start()
+        atexit.register(self.descarregar)
+
+    def escrever(self, spans):
+        raise NotImplementedError
+
+
+class ExportadorArquivo(Exportador):
+    """Um ExportTraceServiceRequest do OTLP/JSON por linha (lido pelo receiver otlpjsonfile)"""
+
+    def __init__(self, caminho, servico, **opcoes):
+        super().__init__(servico, **opcoes)
+        self.caminho = caminho
+
+    def escrever(self, spans):
+        linha = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _atributos_otlp({"service.name": self.servico})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span_otlp(s) for s in spans]}],
+        }]}, ensure_ascii=False, separators=(",", ":"))
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with open(self.caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha + "\n")
+
+
+class ExportadorConsole(Exportador):
+    """Um span por linha no stderr: trace, span <- pai, nome, duração e atributos"""
+
+    def __init__(self, servico, saida=None, **opcoes):
+        super().__init__(servico, **opcoes)
+        self.saida = saida or sys.stderr
+
+    def escrever(self, spans):
+        for s in spans:
+            status = " ERRO" if s.status == STATUS_ERRO else ""
+            self.saida.write(
+                f"[{self.servico}] {s.trace_id} {s.span_id} <- {s.pai_id or '-'} {s.nome} "
+                f"{(s.fim - s.inicio) / 1e6:.2f} ms{status} "
+                f"{json.dumps(s.atributos, ensure_ascii=False, default=str)}\n"
+            )
+        self.saida.flush()
+
+
+class Rastreador:
+    def __init__(self):
+        self.razao = 0.0
+        self.exportador = None
+        self.sql_maximo = 1000
+
+    def configurar(self, exportador, razao, sql_maximo=1000):
+        self.exportador = exportador
+        self.razao = razao
+        self.sql_maximo = sql_maximo
+
+    def registrar(self, s):
+        if self.exportador is not None:
+            self.exportador.registrar(s)
+
+
+rastreador = Rastreador()
+
+
+def criar_exportador(config):
+    opcoes = {"intervalo": config["RASTREAMENTO_INTERVALO"], "fila_maxima": config["RASTREAMENTO_FILA_MAXIMA"]}
+    tipo = config["RASTREAMENTO_EXPORTADOR"]
+    if tipo == "console":
+        return ExportadorConsole(config["RASTREAMENTO_SERVICO"], **opcoes)
+    if tipo == "arquivo":
+        return ExportadorArquivo(config["RASTREAMENTO_ARQUIVO"], config["RASTREAMENTO_SERVICO"], **opcoes)
+    raise ValueError(f"RASTREAMENTO_EXPORTADOR desconhecido: {tipo} (use arquivo ou console)")
+
+
+# Instrumentação do SQLAlchemy --------------------------------------------------
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if _atual.get() is None:
+        return
+    operacao = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    url = conn.engine.url
+    s = iniciar_span(f"{operacao} {url.database or conn.dialect.name}", CLIENTE, {
+        "db.system": conn.dialect.name,
+        "db.name": url.database,
+        "db.operation.name": operacao,
+    })
+    s.definir("server.address", url.host)
+    if rastreador.sql_maximo:
+        # Só o texto parametrizado: os valores dos parâmetros nunca vão para o span
+        s.definir("db.statement", statement[:rastreador.sql_maximo])
+    if executemany:
+        s.definir("db.operation.batch.size", len(parameters))
+    conn.info.setdefault("rastreamento_spans", []).append(s)
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("rastreamento_spans")
+    if not spans:
+        return
+    s = spans.pop()
+    # rowcount: linhas alteradas no DML e, no MySQL (cursor com buffer), linhas devolvidas no SELECT
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        chave = "db.response.returned_rows" if s.atributos["db.operation.name"] == "SELECT" else "db.rows_affected"
+        s.definir(chave, cursor.rowcount)
+    s.encerrar()
+
+
+def _erro_sql(contexto):
+    conn = contexto.connection
+    spans = conn.info.get("rastreamento_spans") if conn is not None else None
+    if spans:
+        s = spans.pop()
+        s.erro(contexto.original_exception)
+        s.encerrar()
+
+
+def instrumentar_sqlalchemy():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    # Na classe Engine: vale para o primário, as réplicas e os binds criados depois
+    if not event.contains(Engine, "before_cursor_execute", _antes_sql):
+        event.listen(Engine, "before_cursor_execute", _antes_sql)
+        event.listen(Engine, "after_cursor_execute", _depois_sql)
+        event.listen(Engine, "handle_error", _erro_sql)
+
+
+# Instrumentação do Cosmos ------------------------------------------------------
+
+def _somar_ru(s, cabecalhos):
+    cobranca = (cabecalhos or {}).get("x-ms-request-charge")
+    if cobranca:
+        s.somar("db.cosmosdb.request_charge", float(cobranca))
+
+
+def _gancho_ru(s, gancho=None):
+    """``response_hook`` da chamada: headers da própria resposta, não os últimos do cliente compartilhado"""
+    def ao_responder(cabecalhos, resultado):
+        _somar_ru(s, cabecalhos)
+        if gancho is not None:
+            gancho(cabecalhos, resultado)
+
+    return ao_responder
+
+
+def _iterar_consulta(s, resultado):
+    """Repassa os documentos da consulta; o span vai até o fim da leitura (as páginas vêm sob demanda)"""
+    linhas = 0
+    try:
+        for documento in resultado:
+            linhas += 1
+            yield documento
+    except Exception as e:
+        s.erro(e)
+        raise
+    finally:
+        s.definir("db.response.returned_rows", linhas)
+        s.encerrar()
+
+
+def instrumentar_cosmos(nome_container, operacao, metodo):
+    """Método do ContainerProxy com span; fora de uma requisição amostrada devolve o próprio método"""
+    if _atual.get() is None:
+        return metodo
+
+    def chamar(*args, **kwargs):
+        s = iniciar_span(f"{operacao} {nome_container}", CLIENTE, {
+            "db.system": "cosmosdb",
+            "db.operation.name": operacao,
+            "db.collection.name": nome_container,
+        })
+        s.definir("db.query.text", kwargs.get("query"))
+        if operacao == "execute_item_batch":
+            s.definir("db.operation.batch.size", len(kwargs.get("batch_operations", args[0] if args else ())))
+        # O RU vem no hook de cada resposta (as consultas chamam uma vez por página)
+        kwargs["response_hook"] = _gancho_ru(s, kwargs.get("response_hook"))
+        try:
+            resultado = metodo(*args, **kwargs)
+        except Exception as e:
+            s.definir("db.response.status_code", getattr(e, "status_code", None))
+            s.erro(e)
+            s.encerrar()
+            raise
+        if operacao in CONSULTAS_COSMOS:
+            return _iterar_consulta(s, resultado)
+        s.encerrar()
+        return resultado
+
+    return chamar
+
+
+# Requisições -------------------------------------------------------------------
+
+def init_rastreamento(app):
+    app.config.setdefault("RASTREAMENTO_HABILITADO", False)
+    app.config.setdefault("RASTREAMENTO_AMOSTRAGEM", 0.1)
+    app.config.setdefault("RASTREAMENTO_EXPORTADOR", "arquivo")
+    app.config.setdefault("RASTREAMENTO_ARQUIVO", "instance/spans.jsonl")
+    app.config.setdefault("RASTREAMENTO_SERVICO", "ibmec-mall-api")
+    app.config.setdefault("RASTREAMENTO_INTERVALO", 1.0)
+    app.config.setdefault("RASTREAMENTO_FILA_MAXIMA", 10000)
+    app.config.setdefault("RASTREAMENTO_SQL_MAXIMO", 1000)
+
+    if not app.config["RASTREAMENTO_HABILITADO"]:
+        return
+
+    exportador = criar_exportador(app.config)
+    rastreador.configurar(exportador, app.config["RASTREAMENTO_AMOSTRAGEM"], app.config["RASTREAMENTO_SQL_MAXIMO"])
+    instrumentar_sqlalchemy()
+    iniciado = threading.Lock()
+
+    @app.before_request
+    def _abrir_span_requisicao():
+        # Como no relay do outbox: a thread nasce no processo que atende, não no master do gunicorn
+        if iniciado.acquire(blocking=False):
+            exportador.iniciar()
+        rota = request.url_rule.rule if request.url_rule is not None else None
+        raiz, token = abrir_raiz(
+            f"{request.method} {rota}" if rota else request.method,
+            request.headers.get("traceparent"),
+            {"http.request.method": request.method, "url.path": request.path}
+        )
+        raiz.definir("http.route", rota)
+        g._rastreamento = (raiz, token)
+
+    @app.after_request
+    def _status_span_requisicao(resposta):
+        raiz = g.get("_rastreamento", (SPAN_NULO,))[0]
+        if raiz.amostrado:
+            raiz.definir("http.response.status_code", resposta.status_code)
+            raiz.definir("http.response.body.size", resposta.content_length)
+            if resposta.status_code >= 500:
+                raiz.status = STATUS_ERRO
+            # Quem chamou encontra o trace pelo traceparent da resposta
+            resposta.headers["traceparent"] = raiz.traceparent
+        return resposta
+
+    @app.teardown_request
+    def _fechar_span_requisicao(excecao=None):
+        rastreamento = g.pop("_rastreamento", None)
+        if rastreamento is None:
+            return
+        raiz, token = rastreamento
+        if excecao is not None:
+            raiz.erro(excecao)
+        fechar_raiz(raiz, token)
@@ -0,0 +1,171 @@
+"""Recomendações "comprados juntos" a partir do histórico de pedidos.
+
+Job offline: as cestas (``produtoId`` distintos de cada pedido) viram uma matriz
+esparsa pedidos x produtos, e a coocorrência sai de ``B.T @ B`` calculada em
+lotes de linhas com SciPy. A pontuação de cada par é o cosseno
+``c(i, j) / sqrt(f(i) * f(j))``, que não favorece só os produtos mais vendidos,
+e pares com menos de ``min_suporte`` pedidos em comum são descartados.
+
+O resultado fica em um índice compacto (``.npz``): os ids dos produtos e, por
+produto, os k vizinhos (int32) e as pontuações (float32). A API carrega o
+índice uma vez e responde da memória.
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+K_PADRAO = 20
+MIN_SUPORTE_PADRAO = 2
+
+
+class IndiceRecomendacoes:
+    def __init__(self, ids, vizinhos, pontuacoes):
+        self.ids = ids
+        self.vizinhos = vizinhos
+        self.pontuacoes = pontuacoes
+        self._ids = ids.tolist()
+        self._posicao = {produto_id: i for i, produto_id in enumerate(self._ids)}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def recomendar(self, produto_id, limite=10):
+        """Vizinhos do produto em ordem de pontuação; lista vazia se ele não tem coocorrências"""
+        posicao = self._posicao.get(produto_id)
+        if posicao is None:
+            return []
+        vizinhos = self.vizinhos[posicao, :limite].tolist()
+        pontuacoes = self.pontuacoes[posicao, :limite].tolist()
+        return [
+            {"produtoId": self._ids[v], "pontuacao": round(p, 4)}
+            for v, p in zip(vizinhos, pontuacoes) if v >= 0
+        ]
+
+    def salvar(self, caminho):
+        temporario = f"{caminho}.tmp.npz"
+        np.savez(temporario, ids=self.ids, vizinhos=self.vizinhos, pontuacoes=self.pontuacoes)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho) as dados:
+            return cls(dados["ids"], dados["vizinhos"], dados["pontuacoes"])
+
+
+def matriz_cestas(cestas):
+    """Matriz CSR pedidos x produtos (1 se o pedido contém o produto) e os ids dos produtos"""
+    from scipy import sparse
+
+    posicoes = {}
+    indices, tamanhos = [], []
+    for cesta in cestas:
+        distintos = {posicoes.setdefault(produto_id, len(posicoes)) for produto_id in cesta if produto_id}
+        # Cestas com um produto só não formam pares
+        if len(distintos) > 1:
+            indices.extend(distintos)
+            tamanhos.append(len(distintos))
+
+    indptr = np.zeros(len(tamanhos) + 1, dtype=np.int64)
+    np.cumsum(tamanhos, out=indptr[1:])
+    indices = np.array(indices, dtype=np.int32)
+    matriz = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(tamanhos), len(posicoes))
+    )
+    ids = np.array(list(posicoes), dtype=str) if posicoes else np.empty(0, dtype="<U1")
+    return matriz, ids
+
+
+def coocorrencia(cestas_csr, tamanho_lote=50000):
+    """``B.T @ B`` somado por lotes de pedidos, para limitar a memória intermediária"""
+    from scipy import sparse
+
+    produtos = cestas_csr.shape[1]
+    total = sparse.csr_matrix((produtos, produtos), dtype=np.float32)
+    for inicio in range(0, cestas_csr.shape[0], tamanho_lote):
+        lote = cestas_csr[inicio:inicio + tamanho_lote]
+        total = total + (lote.T @ lote).tocsr()
+    return total
+
+
+def top_k(coocorrencias, k=K_PADRAO, min_suporte=MIN_SUPORTE_PADRAO):
+    """Vizinhos (int32, -1 onde não há) e pontuações (float32) por produto"""
+    frequencia = coocorrencias.diagonal().astype(np.float64)
+    matriz = coocorrencias.tocsr(copy=True)
+    matriz.setdiag(0)
+    matriz.data[matriz.data < min_suporte] = 0
+    matriz.eliminate_zeros()
+
+    # Cosseno calculado de uma vez sobre os valores não nulos
+    linhas = np.repeat(np.arange(matriz.shape[0]), np.diff(matriz.indptr))
+    matriz.data = (matriz.data / np.sqrt(frequencia[linhas] * frequencia[matriz.indices])).astype(np.float32)
+
+    produtos = matriz.shape[0]
+    vizinhos = np.full((produtos, k), -1, dtype=np.int32)
+    pontuacoes = np.zeros((produtos, k), dtype=np.float32)
+    indptr, indices, dados = matriz.indptr, matriz.indices, matriz.data
+    for linha in range(produtos):
+        inicio, fim = indptr[linha], indptr[linha + 1]
+        if inicio == fim:
+            continue
+        valores = dados[inicio:fim]
+        if fim - inicio > k:
+            melhores = np.argpartition(-valores, k - 1)[:k]
+        else:
+            melhores = np.arange(fim - inicio)
+        melhores = melhores[np.argsort(-valores[melhores], kind="stable")]
+        vizinhos[linha, :len(melhores)] = indices[inicio:fim][melhores]
+        pontuacoes[linha, :len(melhores)] = valores[melhores]
+    return vizinhos, pontuacoes
+
+
+def gerar_indice(cestas, k=K_PADRAO, min_suporte=MIN_SUPORTE_PADRAO):
+    cestas_csr, ids = matriz_cestas(cestas)
+    vizinhos, pontuacoes = top_k(coocorrencia(cestas_csr), k, min_suporte)
+    return IndiceRecomendacoes(ids, vizinhos, pontuacoes)
+
+
+def cestas_cosmos(pedidos_container, dias=None):
+    """``produtoId`` dos itens de cada pedido não excluído (opcionalmente só dos últimos dias)"""
+    # Pedidos espelhados do SQL (outbox, id sql-*) identificam o produto pelo nome, fora do catálogo
+    query = "SELECT VALUE p.itens FROM pedidos p WHERE NOT IS_DEFINED(p.excluido) AND NOT STARTSWITH(p.id, 'sql-')"
+    parametros = []
+    if dias:
+        query += " AND p.dataPedido >= @inicio"
+        parametros.append({"name": "@inicio", "value": (date.today() - timedelta(days=dias)).isoformat()})
+    for itens in pedidos_container.query_items(
+        query=query, parameters=parametros, enable_cross_partition_query=True, max_item_count=1000
+    ):
+        yield [item["produtoId"] for item in itens or [] if item.get("produtoId")]
+
+
+# Índice do processo ----------------------------------------------------------
+
+_indice = None
+_modificado = None
+_verificado = 0.0
+_lock = threading.Lock()
+
+# Intervalo mínimo entre verificações do arquivo (o job pode regravá-lo a qualquer momento)
+INTERVALO_VERIFICACAO = 60.0
+
+
+def obter_indice(caminho):
+    """Índice carregado de ``caminho``, recarregado quando o arquivo muda; None se não existir"""
+    global _indice, _modificado, _verificado
+    agora = time.monotonic()
+    if _indice is not None and agora - _verificado < INTERVALO_VERIFICACAO:
+        return _indice
+
+    with _lock:
+        _verificado = agora
+        try:
+            modificado = os.stat(caminho).st_mtime
+        except (OSError, TypeError):
+            return _indice
+        if modificado != _modificado:
+            _indice = IndiceRecomendacoes.carregar(caminho)
+            _modificado = modificado
+    return _indice
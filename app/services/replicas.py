@@ -0,0 +1,244 @@
+"""Roteamento das leituras SQL para réplicas (``SQLALCHEMY_BINDS``).
+
+Os binds ``replica*`` são as réplicas de leitura do banco principal. Requisições
+GET/HEAD das rotas SQL marcam a sessão como somente leitura e a ``SessaoRoteada``
+(app/database.py) envia as consultas para uma réplica saudável, em rodízio; flush,
+DML e ``SELECT ... FOR UPDATE`` continuam no primário.
+
+Leia-o-que-escreveu: depois de um commit com escritas a resposta leva o cookie
+``LEITURA_PRIMARIO_COOKIE`` e o cliente (também lembrado no processo pela
+``X-API-Key``/IP) lê do primário durante ``LEITURA_PROPRIA_JANELA`` segundos.
+
+Atraso das réplicas: uma thread do processo verifica cada réplica a cada
+``REPLICA_VERIFICACAO_INTERVALO`` segundos (``SHOW REPLICA STATUS`` no MySQL),
+fora das requisições, e a réplica sai do rodízio se estiver acima de
+``REPLICA_ATRASO_MAXIMO``, se não estiver replicando ou se a conexão cair; sem
+réplica disponível, tudo vai ao primário.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_BIND = "replica"
+METODOS_LEITURA = frozenset(("GET", "HEAD"))
+
+
+def atraso_mysql(conexao):
+    """Segundos de atraso da réplica MySQL; None se não estiver replicando"""
+    for comando in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+        try:
+            linha = conexao.exec_driver_sql(comando).mappings().first()
+        except DBAPIError:
+            continue
+        if linha is None:
+            return None
+        atraso = linha.get("Seconds_Behind_Source", linha.get("Seconds_Behind_Master"))
+        return None if atraso is None else float(atraso)
+    return None
+
+
+def medir_atraso(engine):
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conexao:
+            return atraso_mysql(conexao)
+    # Outros bancos (ex.: as duas instâncias SQLite de desenvolvimento) não informam atraso
+    return 0.0
+
+
+class Replica:
+    __slots__ = ("nome", "engine", "disponivel", "atraso", "verificada_em")
+
+    def __init__(self, nome, engine):
+        self.nome = nome
+        self.engine = engine
+        self.disponivel = False
+        self.atraso = None
+        self.verificada_em = float("-inf")
+
+
+class Roteador:
+    def __init__(self, engines, atraso_maximo=2.0, intervalo=5.0, medir=medir_atraso, relogio=time.monotonic):
+        self.replicas = [Replica(nome, engine) for nome, engine in sorted(engines.items())]
+        self.atraso_maximo = atraso_maximo
+        self.intervalo = intervalo
+        self.medir = medir
+        self.relogio = relogio
+        self.leituras = dict.fromkeys([r.nome for r in self.replicas] + ["primario"], 0)
+        self._proxima = 0
+        self._verificando = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica.engine, "handle_error", self._erro_conexao(replica))
+
+    def _erro_conexao(self, replica):
+        def marcar(contexto):
+            if contexto.is_disconnect:
+                logger.warning("Réplica %s desconectada, leituras voltam ao primário", replica.nome)
+                replica.disponivel = False
+                replica.verificada_em = self.relogio()
+        return marcar
+
+    def verificar(self, forcar=False):
+        """Mede o atraso das réplicas vencidas; só uma thread verifica por vez"""
+        agora = self.relogio()
+        vencidas = [r for r in self.replicas if forcar or agora - r.verificada_em >= self.intervalo]
+        if not vencidas or not self._verificando.acquire(blocking=False):
+            return
+        try:
+            for replica in vencidas:
+                try:
+                    replica.atraso = self.medir(replica.engine)
+                except Exception:
+                    logger.warning("Falha ao verificar a réplica %s", replica.nome, exc_info=True)
+                    replica.atraso = None
+                replica.disponivel = replica.atraso is not None and replica.atraso <= self.atraso_maximo
+                replica.verificada_em = self.relogio()
+        finally:
+            self._verificando.release()
+
+    def iniciar_verificacao(self):
+        """Thread que verifica as réplicas a cada ``intervalo`` (o roteador vive tanto quanto o processo)"""
+        thread = threading.Thread(
+            target=_verificar_continuamente, args=(self,),
+            name="replicas-verificacao", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def escolher(self):
+        """Engine de uma réplica disponível (rodízio) ou None para usar o primário"""
+        total = len(self.replicas)
+        for deslocamento in range(total):
+            replica = self.replicas[(self._proxima + deslocamento) % total]
+            if replica.disponivel:
+                self._proxima = (self._proxima + deslocamento + 1) % total
+                self.leituras[replica.nome] += 1
+                return replica.engine
+        self.leituras["primario"] += 1
+        return None
+
+    def estado(self):
+        return {
+            "replicas": [{"nome": r.nome, "disponivel": r.disponivel, "atraso": r.atraso} for r in self.replicas],
+            "leituras": dict(self.leituras)
+        }
+
+
+def _verificar_continuamente(roteador):
+    while True:
+        try:
+            roteador.verificar()
+        except Exception:
+            logger.exception("Falha na verificação das réplicas")
+        time.sleep(roteador.intervalo)
+
+
+@contextmanager
+def no_primario():
+    """Executa o bloco com as consultas no primário, mesmo numa requisição somente leitura"""
+    sessao = db.session()
+    roteador = sessao.info.pop("leitura", None)
+    try:
+        yield
+    finally:
+        if roteador is not None:
+            sessao.info["leitura"] = roteador
+
+
+@event.listens_for(Session, "after_commit")
+def _marcar_escrita(sessao):
+    # Commits sem flush (só leituras) não contam como escrita
+    if sessao.info.pop("escrita_pendente", False):
+        sessao.info["escreveu"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_escrita(sessao, _contexto):
+    sessao.info["escrita_pendente"] = True
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_escrita(sessao, _transacao):
+    sessao.info.pop("escrita_pendente", None)
+
+
+def init_replicas(app):
+    app.config.setdefault("REPLICA_ATRASO_MAXIMO", 2.0)
+    app.config.setdefault("REPLICA_VERIFICACAO_INTERVALO", 5.0)
+    app.config.setdefault("LEITURA_PROPRIA_JANELA", 5.0)
+    app.config.setdefault("LEITURA_PRIMARIO_COOKIE", "leitura_primario")
+
+    binds = [nome for nome in (app.config.get("SQLALCHEMY_BINDS") or {}) if nome.startswith(PREFIXO_BIND)]
+    if not binds:
+        return
+
+    estado = {}
+    criando = threading.Lock()
+    janela = app.config["LEITURA_PROPRIA_JANELA"]
+    cookie = app.config["LEITURA_PRIMARIO_COOKIE"]
+    escritas_por_cliente = {}
+    escritas_lock = threading.Lock()
+
+    def roteador():
+        # Os engines dos binds só existem dentro do contexto da aplicação
+        if "roteador" not in estado:
+            with criando, app.app_context():
+                if "roteador" not in estado:
+                    novo = Roteador(
+                        {nome: db.engines[nome] for nome in binds},
+                        app.config["REPLICA_ATRASO_MAXIMO"], app.config["REPLICA_VERIFICACAO_INTERVALO"]
+                    )
+                    # Só a primeira verificação acontece numa requisição; as seguintes ficam na thread
+                    novo.verificar(forcar=True)
+                    novo.iniciar_verificacao()
+                    estado["roteador"] = novo
+        return estado["roteador"]
+
+    def cliente():
+        return request.headers.get("X-API-Key") or request.remote_addr or "anonimo"
+
+    @app.before_request
+    def rotear_leitura():
+        if request.method not in METODOS_LEITURA or not request.blueprint:
+            return None
+        agora = time.time()
+        try:
+            primario_ate = float(request.cookies.get(cookie, 0))
+        except ValueError:
+            primario_ate = 0.0
+        with escritas_lock:
+            escrita_ate = escritas_por_cliente.get(cliente(), 0)
+        if max(primario_ate, escrita_ate) > agora:
+            return None
+        db.session.info["leitura"] = roteador()
+        return None
+
+    @app.after_request
+    def lembrar_escrita(resposta):
+        if not db.session.info.get("escreveu"):
+            return resposta
+        primario_ate = time.time() + janela
+        with escritas_lock:
+            escritas_por_cliente[cliente()] = primario_ate
+            if len(escritas_por_cliente) > 10000:
+                agora = time.time()
+                for chave in [c for c, ate in escritas_por_cliente.items() if ate <= agora]:
+                    del escritas_por_cliente[chave]
+        resposta.set_cookie(cookie, f"{primario_ate:.3f}", max_age=int(janela) + 1, httponly=True, samesite="Lax")
+        return resposta
+
+    @app.route("/replicas/estado")
+    def estado_replicas():
+        """Réplicas no rodízio, atraso medido e leituras por destino neste processo"""
+        return roteador().estado()
+
+    app.extensions["replicas"] = roteador
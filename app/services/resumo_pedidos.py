@@ -0,0 +1,256 @@
+"""Resumo de pedidos por usuário: quantidade, total gasto, último pedido e contagem por status.
+
+O resumo é um documento por usuário (``id`` = ``usuarioId``) no container
+``pedidos_resumo`` e é mantido de forma incremental pelos eventos do change
+feed do container de pedidos (``ChangeFeedWorker``). O documento do resumo só
+tem os agregados; o que cada pedido soma a eles (status, valor, data) fica num
+documento de contribuição pequeno na mesma partição, que só existe enquanto o
+pedido existe. Cada versão lida do feed troca a contribuição anterior do pedido
+pela nova, então reaplicar um lote não altera o resultado e o worker pode reler
+o feed depois de uma falha. Resumo e contribuições de um lote são gravados num
+batch transacional, com o ``_etag`` do resumo para não perder atualizações
+concorrentes.
+
+``reconstruir`` recalcula os resumos a partir do container de pedidos: é o
+backfill de usuários sem resumo e a migração dos resumos no formato anterior
+(contribuições dentro do documento, em ``pedidos``), que o worker também
+converte ao encontrar.
+"""
+# Tentativas de gravar o resumo quando outro processo o alterou (412/409)
+MAX_TENTATIVAS = 5
+# Operações por batch transacional do Cosmos: o resumo e até 99 contribuições
+MAX_OPERACOES_BATCH = 100
+TIPO_CONTRIBUICAO = "contribuicao"
+
+
+def valor_pedido(pedido):
+    if pedido.get("valorTotal") is not None:
+        return round(float(pedido["valorTotal"]), 2)
+    return round(sum(
+        float(item.get("precoUnitario") or 0) * int(item.get("quantidade") or 0)
+        for item in pedido.get("itens") or []
+    ), 2)
+
+
+def contribuicao(pedido):
+    """[status, valor, data] do pedido no resumo, ou None se ele foi excluído"""
+    if pedido.get("excluido"):
+        return None
+    return [pedido.get("status"), valor_pedido(pedido), pedido.get("dataPedido")]
+
+
+def id_contribuicao(pedido_id):
+    return f"{TIPO_CONTRIBUICAO}-{pedido_id}"
+
+
+def documento_contribuicao(usuario_id, pedido_id, valores):
+    return {
+        "id": id_contribuicao(pedido_id),
+        "usuarioId": usuario_id,
+        "tipo": TIPO_CONTRIBUICAO,
+        "pedidoId": pedido_id,
+        "contribuicao": valores,
+        # Fora da lista para a consulta das datas quando o último pedido deixa de valer
+        "dataPedido": valores[2]
+    }
+
+
+def resumo_vazio(usuario_id):
+    return {
+        "id": usuario_id,
+        "usuarioId": usuario_id,
+        "quantidadePedidos": 0,
+        "valorTotal": 0.0,
+        "ultimoPedido": None,
+        "porStatus": {}
+    }
+
+
+def aplicar_contribuicao(resumo, anterior, nova):
+    """Troca a contribuição do pedido nos agregados (o último pedido é recalculado por quem chama)"""
+    por_status = resumo["porStatus"]
+    if anterior is not None:
+        status, valor, _ = anterior
+        por_status[status] -= 1
+        if not por_status[status]:
+            del por_status[status]
+        resumo["quantidadePedidos"] -= 1
+        resumo["valorTotal"] = round(resumo["valorTotal"] - valor, 2)
+    if nova is not None:
+        status, valor, _ = nova
+        por_status[status] = por_status.get(status, 0) + 1
+        resumo["quantidadePedidos"] += 1
+        resumo["valorTotal"] = round(resumo["valorTotal"] + valor, 2)
+
+
+def _conflito(erro):
+    return getattr(erro, "status_code", None) in (409, 412)
+
+
+def _nao_encontrado(erro):
+    return getattr(erro, "status_code", None) == 404
+
+
+def _ler_contribuicoes(resumos_container, usuario_id, pedido_ids):
+    documentos = resumos_container.query_items(
+        query="SELECT * FROM resumos r WHERE ARRAY_CONTAINS(@ids, r.id)",
+        parameters=[{"name": "@ids", "value": [id_contribuicao(pedido_id) for pedido_id in pedido_ids]}],
+        partition_key=usuario_id
+    )
+    return {documento["pedidoId"]: documento["contribuicao"] for documento in documentos}
+
+
+def _datas_gravadas(resumos_container, usuario_id, exceto):
+    """Datas das contribuições gravadas do usuário, fora as dos pedidos em ``exceto``"""
+    documentos = resumos_container.query_items(
+        query="SELECT r.pedidoId, r.dataPedido FROM resumos r WHERE r.tipo = @tipo",
+        parameters=[{"name": "@tipo", "value": TIPO_CONTRIBUICAO}], partition_key=usuario_id
+    )
+    return [d["dataPedido"] for d in documentos if d["pedidoId"] not in exceto and d.get("dataPedido")]
+
+
+def _gravar_resumo(resumos_container, usuario_id, original, resumo, operacoes):
+    """Contribuições e resumo num batch transacional; o resumo só é gravado se não mudou desde a leitura"""
+    if original is None:
+        operacoes.append(("create", (resumo,)))
+    else:
+        operacoes.append(("replace", (usuario_id, resumo), {"if_match_etag": original["_etag"]}))
+    resumos_container.execute_item_batch(batch_operations=operacoes, partition_key=usuario_id)
+
+
+def _migrar(resumos_container, usuario_id, resumo):
+    """Resumo no formato anterior: as contribuições saem do documento e viram documentos próprios"""
+    contribuicoes = resumo.pop("pedidos")
+    for pedido_id, valores in contribuicoes.items():
+        resumos_container.upsert_item(documento_contribuicao(usuario_id, pedido_id, valores))
+    resumos_container.replace_item(item=usuario_id, body=resumo, if_match_etag=resumo["_etag"])
+
+
+def _atualizar_resumo(resumos_container, usuario_id, pedidos):
+    for _ in range(MAX_TENTATIVAS):
+        try:
+            resumo = resumos_container.read_item(item=usuario_id, partition_key=usuario_id)
+        except Exception as e:
+            if not _nao_encontrado(e):
+                raise
+            resumo = None
+
+        try:
+            if resumo is not None and "pedidos" in resumo:
+                _migrar(resumos_container, usuario_id, dict(resumo))
+                continue
+
+            atual = dict(resumo, porStatus=dict(resumo["porStatus"])) if resumo is not None else resumo_vazio(usuario_id)
+            anteriores = _ler_contribuicoes(resumos_container, usuario_id, [pedido["id"] for pedido in pedidos])
+            operacoes = []
+            alteradas = {}
+            for pedido in pedidos:
+                anterior, nova = anteriores.get(pedido["id"]), contribuicao(pedido)
+                if anterior == nova:
+                    continue
+                aplicar_contribuicao(atual, anterior, nova)
+                alteradas[pedido["id"]] = (anterior, nova)
+                if nova is not None:
+                    operacoes.append(("upsert", (documento_contribuicao(usuario_id, pedido["id"], nova),)))
+                else:
+                    operacoes.append(("delete", (id_contribuicao(pedido["id"]),)))
+            if not operacoes:
+                return False
+
+            # Só consulta as datas gravadas quando o último pedido deixou de valer
+            ultimo = atual["ultimoPedido"]
+            novas = [nova[2] for _, nova in alteradas.values() if nova is not None and nova[2]]
+            if any(anterior is not None and anterior[2] == ultimo for anterior, _ in alteradas.values()):
+                datas = _datas_gravadas(resumos_container, usuario_id, alteradas)
+                atual["ultimoPedido"] = max(datas + novas, default=None)
+            elif novas:
+                atual["ultimoPedido"] = max(novas + ([ultimo] if ultimo else []))
+
+            _gravar_resumo(resumos_container, usuario_id, resumo, atual, operacoes)
+            return True
+        except Exception as e:
+            if not _conflito(e):
+                raise
+    raise RuntimeError(f"Resumo de pedidos do usuário {usuario_id} alterado concorrentemente")
+
+
+def processar_pedidos(resumos_container, pedidos):
+    """Aplica um lote do change feed; uma leitura e um batch por usuário afetado (e a cada 99 pedidos)"""
+    por_usuario = {}
+    for pedido in pedidos:
+        if pedido.get("usuarioId") is not None:
+            # Dentro do lote vale a versão mais recente de cada pedido
+            por_usuario.setdefault(pedido["usuarioId"], {})[pedido["id"]] = pedido
+
+    alterados = 0
+    for usuario_id, versoes in por_usuario.items():
+        versoes = list(versoes.values())
+        for inicio in range(0, len(versoes), MAX_OPERACOES_BATCH - 1):
+            alterados += _atualizar_resumo(resumos_container, usuario_id, versoes[inicio:inicio + MAX_OPERACOES_BATCH - 1])
+    return alterados
+
+
+def reconstruir(pedidos_container, resumos_container, usuario_id=None):
+    """Recalcula os resumos (de um usuário ou de todos) a partir dos pedidos; devolve quantos foram gravados.
+
+    Backfill e migração: as contribuições são regravadas, as de pedidos que não existem
+    mais são removidas e o resumo é substituído. Rode com o worker do change feed parado.
+    """
+    por_usuario = {}
+    for pedido in pedidos_container.query_items(
+        query="SELECT * FROM pedidos p", partition_key=usuario_id, enable_cross_partition_query=usuario_id is None
+    ):
+        por_usuario.setdefault(pedido["usuarioId"], []).append(pedido)
+    if usuario_id is not None:
+        por_usuario.setdefault(usuario_id, [])
+
+    for usuario, pedidos in por_usuario.items():
+        resumo = resumo_vazio(usuario)
+        validas = {}
+        for pedido in pedidos:
+            valores = contribuicao(pedido)
+            if valores is not None:
+                aplicar_contribuicao(resumo, None, valores)
+                validas[pedido["id"]] = valores
+        resumo["ultimoPedido"] = max((valores[2] for valores in validas.values() if valores[2]), default=None)
+
+        gravadas = resumos_container.query_items(
+            query="SELECT VALUE r.pedidoId FROM resumos r WHERE r.tipo = @tipo",
+            parameters=[{"name": "@tipo", "value": TIPO_CONTRIBUICAO}], partition_key=usuario
+        )
+        for pedido_id in set(gravadas) - set(validas):
+            resumos_container.delete_item(item=id_contribuicao(pedido_id), partition_key=usuario)
+        for pedido_id, valores in validas.items():
+            resumos_container.upsert_item(documento_contribuicao(usuario, pedido_id, valores))
+        resumos_container.upsert_item(resumo)
+    return len(por_usuario)
+
+
+def assinar_change_feed(barramento, resumos_container):
+    """Liga o resumo aos eventos do container de pedidos publicados pelo ChangeFeedWorker"""
+    def aplicar(pedidos):
+        processar_pedidos(resumos_container, pedidos)
+
+    barramento.assinar("pedidos", aplicar)
+    return aplicar
+
+
+def publico(resumo):
+    """Resumo sem os metadados do Cosmos"""
+    return {
+        "usuarioId": resumo["usuarioId"],
+        "quantidadePedidos": resumo["quantidadePedidos"],
+        "valorTotal": resumo["valorTotal"],
+        "ultimoPedido": resumo["ultimoPedido"],
+        "porStatus": resumo["porStatus"]
+    }
+
+
+def buscar_resumo(resumos_container, usuario_id):
+    """Point read do resumo do usuário; None se ele ainda não tem pedidos processados"""
+    try:
+        return resumos_container.read_item(item=usuario_id, partition_key=usuario_id)
+    except Exception as e:
+        if _nao_encontrado(e):
+            return None
+        raise
@@ -0,0 +1,242 @@
+"""Razão (ledger) das transações de cartão e liquidação assíncrona.
+
+A autorização grava um lançamento ``AUTORIZACAO`` no mesmo commit do débito do
+saldo. Captura, cancelamento (void) e estorno (refund) são novos lançamentos com o
+mesmo ``codigo_autorizacao``: o estado de uma autorização é derivado dos seus
+lançamentos, lidos pelo índice do código. Toda leitura das operações é com
+bloqueio (``SELECT ... FOR UPDATE``): a primeira trava a linha da autorização e
+depois a do cartão, e os lançamentos são relidos com bloqueio. No REPEATABLE READ
+do MySQL uma leitura comum antes do bloqueio fixaria o snapshot e os lançamentos
+gravados por outra operação não apareceriam; com leituras bloqueantes, duas
+devoluções simultâneas da mesma autorização são serializadas e a segunda vê a
+primeira, sem creditar o saldo duas vezes.
+
+A liquidação roda fora da API (``flask liquidar``): lê os lançamentos depois da
+marca d'água em lotes por faixa de id, soma por cartão e tipo com um ``GROUP BY``
+e acumula os totais em ``Liquidacao``, avançando a marca no mesmo commit.
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from app.database import db
+from app.models.cartao import Cartao
+from app.models.transacao import (AUTORIZACAO, CANCELAMENTO, CAPTURA, ESTORNO, Liquidacao, MarcaLiquidacao,
+                                  Transacao)
+
+logger = logging.getLogger(__name__)
+
+# Coluna de Liquidacao acumulada por tipo de lançamento
+TOTAIS_POR_TIPO = {AUTORIZACAO: "autorizado", CAPTURA: "capturado", CANCELAMENTO: "cancelado", ESTORNO: "estornado"}
+
+MARCA = "transacoes"
+LIMITE_HISTORICO = 200
+
+
+class ErroTransacao(ValueError):
+    def __init__(self, mensagem, status=409):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def centavos(valor):
+    return Decimal(str(valor)).quantize(Decimal("0.01"))
+
+
+def registrar_autorizacao(cartao, usuario_id, valor, agora):
+    """Adiciona o lançamento da autorização à sessão; o commit é o mesmo do débito"""
+    codigo = uuid.uuid4()
+    db.session.add(Transacao(
+        codigo_autorizacao=str(codigo), cartao_id=cartao.id, usuario_id=usuario_id,
+        tipo=AUTORIZACAO, valor=centavos(valor), criado_em=agora
+    ))
+    return codigo
+
+
+def consulta_lancamentos(codigo, bloquear=False):
+    query = Transacao.query.filter_by(codigo_autorizacao=str(codigo)).order_by(Transacao.id)
+    if bloquear:
+        # Leitura bloqueante (o último commit, não o snapshot) e objetos da sessão recarregados
+        query = query.with_for_update().populate_existing()
+    return query
+
+
+def lancamentos(codigo, bloquear=False):
+    return consulta_lancamentos(codigo, bloquear).all()
+
+
+def estado(lancamentos_codigo):
+    """Totais e status de uma autorização a partir dos seus lançamentos"""
+    totais = dict.fromkeys(TOTAIS_POR_TIPO.values(), Decimal("0.00"))
+    for lancamento in lancamentos_codigo:
+        totais[TOTAIS_POR_TIPO[lancamento.tipo]] += lancamento.valor
+
+    if totais["cancelado"]:
+        status = "CANCELADA"
+    elif not totais["capturado"]:
+        status = "AUTORIZADA"
+    elif not totais["estornado"]:
+        status = "CAPTURADA"
+    else:
+        status = "ESTORNADA" if totais["estornado"] >= totais["capturado"] else "ESTORNADA_PARCIAL"
+    return status, totais
+
+
+def para_dict(lancamento):
+    return {
+        "id": lancamento.id,
+        "codigo_autorizacao": lancamento.codigo_autorizacao,
+        "cartao_id": lancamento.cartao_id,
+        "tipo": lancamento.tipo,
+        "valor": float(lancamento.valor),
+        "criado_em": lancamento.criado_em.isoformat()
+    }
+
+
+def resumo(lancamentos_codigo):
+    status, totais = estado(lancamentos_codigo)
+    return {
+        "codigo_autorizacao": lancamentos_codigo[0].codigo_autorizacao,
+        "cartao_id": lancamentos_codigo[0].cartao_id,
+        "status": status,
+        **{nome: float(total) for nome, total in totais.items()},
+        "lancamentos": [para_dict(lancamento) for lancamento in lancamentos_codigo]
+    }
+
+
+def _operar(codigo, tipo, valor=None):
+    # Nenhuma leitura sem bloqueio antes desta: a linha da autorização serializa as
+    # operações do mesmo código, e a do cartão (sempre depois dela) as do saldo
+    autorizacao = (
+        Transacao.query.filter_by(codigo_autorizacao=str(codigo), tipo=AUTORIZACAO)
+        .with_for_update().populate_existing().first()
+    )
+    if autorizacao is None:
+        raise ErroTransacao("Autorização não encontrada", 404)
+
+    cartao = Cartao.query.filter_by(id=autorizacao.cartao_id).with_for_update().populate_existing().one()
+    status, totais = estado(lancamentos(codigo, bloquear=True))
+
+    if tipo == CAPTURA:
+        if status != "AUTORIZADA":
+            raise ErroTransacao(f"Só autorizações pendentes podem ser capturadas (status {status})")
+        valor, credito = totais["autorizado"], Decimal("0.00")
+    elif tipo == CANCELAMENTO:
+        if status != "AUTORIZADA":
+            raise ErroTransacao(f"Só autorizações pendentes podem ser canceladas (status {status})")
+        valor = credito = totais["autorizado"]
+    else:
+        if status not in ("CAPTURADA", "ESTORNADA_PARCIAL"):
+            raise ErroTransacao(f"Só transações capturadas podem ser estornadas (status {status})")
+        disponivel = totais["capturado"] - totais["estornado"]
+        valor = disponivel if valor is None else centavos(valor)
+        if valor <= 0 or valor > disponivel:
+            raise ErroTransacao(f"Valor do estorno deve estar entre 0,01 e {disponivel}", 400)
+        credito = valor
+
+    db.session.add(Transacao(
+        codigo_autorizacao=autorizacao.codigo_autorizacao, cartao_id=cartao.id, usuario_id=autorizacao.usuario_id,
+        tipo=tipo, valor=valor, criado_em=datetime.utcnow()
+    ))
+    cartao.saldo += credito
+    db.session.commit()
+    return resumo(lancamentos(codigo))
+
+
+def capturar(codigo):
+    return _operar(codigo, CAPTURA)
+
+
+def cancelar(codigo):
+    return _operar(codigo, CANCELAMENTO)
+
+
+def estornar(codigo, valor=None):
+    return _operar(codigo, ESTORNO, valor)
+
+
+def historico_cartao(cartao_id, limite=50, antes_de=None):
+    """Lançamentos do cartão do mais recente para o mais antigo (keyset pelo índice cartao_id, id)"""
+    query = Transacao.query.filter(Transacao.cartao_id == cartao_id)
+    if antes_de:
+        query = query.filter(Transacao.id < antes_de)
+    return query.order_by(Transacao.id.desc()).limit(max(1, min(limite, LIMITE_HISTORICO))).all()
+
+
+# Liquidação -------------------------------------------------------------------
+
+def liquidar_lote(tamanho_lote=1000, atraso=5.0):
+    """Liquida até ``tamanho_lote`` lançamentos depois da marca; devolve o relatório ou None sem pendências.
+
+    Só entram lançamentos com mais de ``atraso`` segundos: um id menor ainda não
+    confirmado por outra transação do banco não fica para trás da marca.
+    """
+    marca = MarcaLiquidacao.query.filter_by(nome=MARCA).with_for_update().first()
+    if marca is None:
+        marca = MarcaLiquidacao(nome=MARCA, ultimo_lancamento_id=0)
+        db.session.add(marca)
+        db.session.flush()
+
+    corte = datetime.utcnow() - timedelta(seconds=atraso)
+    ids = (
+        db.session.query(Transacao.id)
+        .filter(Transacao.id > marca.ultimo_lancamento_id, Transacao.criado_em <= corte)
+        .order_by(Transacao.id)
+        .limit(tamanho_lote)
+        .subquery()
+    )
+    limite = db.session.query(func.max(ids.c.id)).scalar()
+    if limite is None:
+        db.session.rollback()
+        return None
+
+    somas = (
+        db.session.query(Transacao.cartao_id, Transacao.tipo, func.sum(Transacao.valor), func.count())
+        .filter(Transacao.id > marca.ultimo_lancamento_id, Transacao.id <= limite)
+        .group_by(Transacao.cartao_id, Transacao.tipo)
+        .all()
+    )
+    cartoes = {cartao_id for cartao_id, _, _, _ in somas}
+    liquidacoes = {l.cartao_id: l for l in Liquidacao.query.filter(Liquidacao.cartao_id.in_(cartoes))}
+
+    lidos = 0
+    for cartao_id, tipo, soma, quantidade in somas:
+        liquidacao = liquidacoes.get(cartao_id)
+        if liquidacao is None:
+            liquidacao = liquidacoes[cartao_id] = Liquidacao(
+                cartao_id=cartao_id, autorizado=0, capturado=0, cancelado=0, estornado=0, lancamentos=0
+            )
+            db.session.add(liquidacao)
+        coluna = TOTAIS_POR_TIPO[tipo]
+        setattr(liquidacao, coluna, Decimal(getattr(liquidacao, coluna)) + Decimal(soma))
+        liquidacao.lancamentos += quantidade
+        liquidacao.ultimo_lancamento_id = limite
+        lidos += quantidade
+
+    # Conciliação dos totais acumulados: nada é capturado/cancelado além do autorizado nem estornado além do capturado
+    divergentes = sorted(
+        l.cartao_id for l in liquidacoes.values()
+        if Decimal(l.capturado) + Decimal(l.cancelado) > Decimal(l.autorizado) or Decimal(l.estornado) > Decimal(l.capturado)
+    )
+    for cartao_id in divergentes:
+        logger.warning("Liquidação do cartão %s com totais divergentes", cartao_id)
+
+    marca.ultimo_lancamento_id = limite
+    db.session.commit()
+    return {"lancamentos": lidos, "cartoes": len(cartoes), "ate_id": limite, "divergentes": divergentes}
+
+
+def liquidar(tamanho_lote=1000, atraso=5.0):
+    """Liquida lotes até não haver pendências; devolve o total do ciclo"""
+    total = {"lotes": 0, "lancamentos": 0, "cartoes": 0, "divergentes": []}
+    while True:
+        relatorio = liquidar_lote(tamanho_lote, atraso)
+        if relatorio is None:
+            return total
+        total["lotes"] += 1
+        total["lancamentos"] += relatorio["lancamentos"]
+        total["cartoes"] += relatorio["cartoes"]
+        total["divergentes"].extend(relatorio["divergentes"])
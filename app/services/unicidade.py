@@ -0,0 +1,78 @@
+"""Unicidade garantida pelos índices do banco, sem consultas antes do insert.
+
+No MySQL, as restrições UNIQUE (``uq_*``) rejeitam duplicados e o
+``IntegrityError`` é traduzido para uma mensagem de conflito (409).
+
+No Cosmos, a unique key policy do container de usuários cobre ``/cpf`` (que é a
+partition key, portanto única no container inteiro). Unique keys valem só dentro
+da partição lógica, então o email é reservado em um container próprio
+particionado pelo próprio documento (``usuarios_email``): criar a reserva é a
+verificação de unicidade global, e ela também serve de índice para a busca por
+email com point reads, sem varrer partições.
+"""
+import hashlib
+
+from sqlalchemy.exc import IntegrityError
+
+from app.cosmosdb import emails_container, usuarios_container
+
+# Nome da restrição / colunas (formato do SQLite) -> mensagem devolvida ao cliente
+RESTRICOES = {
+    "uq_cartao_usuario_numero": ("cartao.usuario_id, cartao.numero", "Já existe um cartão cadastrado com este número para este usuário"),
+    "uq_usuario_email": ("usuario.email", "Email já cadastrado"),
+    "uq_usuario_cpf": ("usuario.cpf", "CPF já cadastrado"),
+}
+
+# Código de erro do MySQL para chave duplicada
+MYSQL_ENTRADA_DUPLICADA = 1062
+
+
+def mensagem_conflito(erro):
+    """Mensagem de conflito para um IntegrityError de chave única, ou None se for outro erro"""
+    if not isinstance(erro, IntegrityError):
+        return None
+    original = getattr(erro, "orig", None)
+    texto = str(original or erro)
+    codigo = original.args[0] if original is not None and original.args else None
+
+    if codigo != MYSQL_ENTRADA_DUPLICADA and "UNIQUE constraint failed" not in texto:
+        return None
+    for nome, (colunas, mensagem) in RESTRICOES.items():
+        if nome in texto or colunas in texto:
+            return mensagem
+    return "Registro duplicado"
+
+
+# Cosmos DB -----------------------------------------------------------------
+
+def id_reserva_email(email):
+    # O id do Cosmos não aceita '/', '\\', '?' e '#', que podem aparecer em emails
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()
+
+
+def reservar_email(email, usuario_id, cpf):
+    """Cria a reserva do email; levanta CosmosResourceExistsError se já estiver em uso"""
+    chave = id_reserva_email(email)
+    emails_container.create_item({"id": chave, "email": email, "usuarioId": usuario_id, "cpf": cpf})
+
+
+def liberar_email(email):
+    from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+    chave = id_reserva_email(email)
+    try:
+        emails_container.delete_item(item=chave, partition_key=chave)
+    except CosmosResourceNotFoundError:
+        pass
+
+
+def buscar_usuario_por_email(email):
+    """Dois point reads (reserva -> usuário) em vez de uma consulta cross-partition"""
+    from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+    chave = id_reserva_email(email)
+    try:
+        reserva = emails_container.read_item(item=chave, partition_key=chave)
+        return usuarios_container.read_item(item=reserva["usuarioId"], partition_key=reserva["cpf"])
+    except CosmosResourceNotFoundError:
+        return None
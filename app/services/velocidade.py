@@ -0,0 +1,234 @@
+"""Regras de velocidade na autorização de cartões (antifraude).
+
+Cada cartão e cada usuário têm contadores de janela deslizante (quantidade e
+valor) de 1 minuto e de 1 hora, em memória. A janela é um anel de buckets com
+totais corridos: avançar o relógio subtrai só os buckets que expiraram, então
+avaliar e registrar uma tentativa custa O(1) amortizado. As chaves ficam em
+shards, cada um com o seu lock, para que threads diferentes quase nunca disputem
+o mesmo lock; tentativas do mesmo cartão são serializadas, o que mantém os
+limites exatos mesmo com requisições simultâneas.
+
+Toda tentativa que chega à verificação é registrada, inclusive as recusadas:
+repetir tentativas contra um cartão bloqueado mantém o bloqueio. Os contadores
+são por processo (cada worker do gunicorn tem os seus).
+
+As chaves ociosas são descartadas por uma thread do motor, um shard por vez, fora
+das requisições: a limpeza não entra na latência de nenhuma autorização.
+"""
+import threading
+import time
+import weakref
+from array import array
+
+# (escopo, janela em segundos, máximo de tentativas, valor máximo)
+REGRAS_PADRAO = (
+    ("cartao", 60, 5, 2000.0),
+    ("cartao", 3600, 30, 10000.0),
+    ("usuario", 60, 10, 5000.0),
+    ("usuario", 3600, 60, 20000.0),
+)
+
+# Resolução das janelas: 12 buckets de 5 s em 1 minuto, 60 buckets de 1 min em 1 hora
+BUCKETS_POR_JANELA = {60: 12, 3600: 60}
+
+# Chaves conferidas pela thread de limpeza entre duas liberações do lock do shard
+BLOCO_VARREDURA = 64
+
+
+class JanelaDeslizante:
+    __slots__ = ("duracao_bucket", "quantidade_buckets", "ultimo_bucket", "contagens", "valores",
+                 "total_contagem", "total_valor")
+
+    def __init__(self, duracao, buckets):
+        self.duracao_bucket = duracao / buckets
+        self.quantidade_buckets = buckets
+        self.ultimo_bucket = 0
+        # array não é rastreado pelo coletor de ciclos (milhares de chaves sem pausas de GC)
+        self.contagens = array("l", bytes(8 * buckets))
+        self.valores = array("d", bytes(8 * buckets))
+        self.total_contagem = 0
+        self.total_valor = 0.0
+
+    def avancar(self, agora):
+        bucket = int(agora / self.duracao_bucket)
+        passados = bucket - self.ultimo_bucket
+        if passados <= 0:
+            return
+        if passados >= self.quantidade_buckets:
+            for i in range(self.quantidade_buckets):
+                self.contagens[i] = 0
+                self.valores[i] = 0.0
+            self.total_contagem = 0
+            self.total_valor = 0.0
+        else:
+            for b in range(self.ultimo_bucket + 1, bucket + 1):
+                i = b % self.quantidade_buckets
+                self.total_contagem -= self.contagens[i]
+                self.total_valor -= self.valores[i]
+                self.contagens[i] = 0
+                self.valores[i] = 0.0
+        self.ultimo_bucket = bucket
+
+    def contar(self, agora, valor):
+        """avancar + registrar numa chamada (o caminho de cada tentativa)"""
+        if int(agora / self.duracao_bucket) > self.ultimo_bucket:
+            self.avancar(agora)
+        self.registrar(valor)
+
+    def registrar(self, valor):
+        i = self.ultimo_bucket % self.quantidade_buckets
+        self.contagens[i] += 1
+        self.valores[i] += valor
+        self.total_contagem += 1
+        self.total_valor += valor
+
+
+class Resultado:
+    __slots__ = ("violacoes",)
+
+    def __init__(self, violacoes):
+        self.violacoes = violacoes
+
+    @property
+    def aprovado(self):
+        return not self.violacoes
+
+    def mensagem(self):
+        if not self.violacoes:
+            return "velocidade: ok"
+        return "velocidade: " + ", ".join(self.violacoes)
+
+
+def _rotulo(duracao):
+    return f"{duracao // 60}min" if duracao < 3600 else f"{duracao // 3600}h"
+
+
+class MotorVelocidade:
+    def __init__(self, regras=REGRAS_PADRAO, shards=64, relogio=time.monotonic):
+        self.regras = tuple(regras)
+        self.relogio = relogio
+        self._janelas_por_escopo = {}
+        # Regras de cada escopo com os rótulos prontos: avaliar não percorre as dos outros escopos
+        self._regras_por_escopo = {}
+        for escopo, duracao, maximo, valor_maximo in self.regras:
+            self._janelas_por_escopo.setdefault(escopo, [])
+            if duracao not in self._janelas_por_escopo[escopo]:
+                self._janelas_por_escopo[escopo].append(duracao)
+            self._regras_por_escopo.setdefault(escopo, []).append(
+                (duracao, maximo, valor_maximo, f"{escopo}_qtd_{_rotulo(duracao)}", f"{escopo}_valor_{_rotulo(duracao)}")
+            )
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        # Tentativas por shard, contadas sob o lock do shard
+        self._operacoes = [0] * shards
+        # Chaves sem uso por mais que a maior janela são descartadas na varredura
+        self._ociosidade = max(duracao for _, duracao, _, _ in self.regras)
+
+    def _janelas(self, chaves, escopo, chave):
+        janelas = chaves.get(chave)
+        if janelas is None:
+            janelas = chaves[chave] = {
+                duracao: JanelaDeslizante(duracao, BUCKETS_POR_JANELA.get(duracao, 60))
+                for duracao in self._janelas_por_escopo[escopo]
+            }
+        return janelas
+
+    def avaliar(self, cartao_id, usuario_id, valor):
+        """Registra a tentativa e devolve o Resultado das regras (contando esta tentativa)"""
+        agora = self.relogio()
+        valor = float(valor)
+        violacoes = []
+        for escopo, chave in (("cartao", cartao_id), ("usuario", usuario_id)):
+            regras = self._regras_por_escopo.get(escopo)
+            if regras is None:
+                # VELOCIDADE_REGRAS pode ter regras só de um dos escopos
+                continue
+            indice = hash((escopo, chave)) % len(self._shards)
+            chaves, lock = self._shards[indice]
+            with lock:
+                self._operacoes[indice] += 1
+                janelas = self._janelas(chaves, escopo, (escopo, chave))
+                for janela in janelas.values():
+                    janela.contar(agora, valor)
+                for duracao, maximo, valor_maximo, rotulo_qtd, rotulo_valor in regras:
+                    janela = janelas[duracao]
+                    if janela.total_contagem > maximo:
+                        violacoes.append(f"{rotulo_qtd} {janela.total_contagem}/{maximo}")
+                    if janela.total_valor > valor_maximo:
+                        violacoes.append(f"{rotulo_valor} {janela.total_valor:.2f}/{valor_maximo:.2f}")
+        return Resultado(violacoes)
+
+    @property
+    def operacoes(self):
+        """Registros feitos (cada tentativa conta uma vez por escopo)"""
+        return sum(self._operacoes)
+
+    def _varrer_shard(self, shard, agora, bloco=None):
+        """Remove as chaves ociosas do shard; com ``bloco``, solta o lock (e o GIL) a cada ``bloco`` chaves"""
+        chaves, lock = shard
+        with lock:
+            candidatas = list(chaves)
+        passo = bloco or len(candidatas) or 1
+        for inicio in range(0, len(candidatas), passo):
+            with lock:
+                for chave in candidatas[inicio:inicio + passo]:
+                    # Reconferida sob o lock: a chave pode ter recebido uma tentativa depois da cópia
+                    janelas = chaves.get(chave)
+                    if janelas is not None and all((agora - j.ultimo_bucket * j.duracao_bucket) > self._ociosidade
+                                                   for j in janelas.values()):
+                        del chaves[chave]
+            if bloco:
+                time.sleep(0)
+
+    def varrer(self, agora=None):
+        """Remove as chaves ociosas (sem tentativas dentro da maior janela) de todos os shards"""
+        agora = self.relogio() if agora is None else agora
+        for shard in self._shards:
+            self._varrer_shard(shard, agora)
+
+    def iniciar_varredura(self, intervalo):
+        """Thread que percorre os shards a cada ``intervalo`` segundos; termina quando o motor é descartado"""
+        thread = threading.Thread(
+            target=_varrer_continuamente, args=(weakref.ref(self), intervalo),
+            name="velocidade-varredura", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def __len__(self):
+        return sum(len(chaves) for chaves, _ in self._shards)
+
+
+def _varrer_continuamente(referencia, intervalo):
+    """Um shard por vez, com pausa entre eles: cada lock fica preso só pela varredura de um shard"""
+    indice = 0
+    while True:
+        motor = referencia()
+        if motor is None:
+            return
+        motor._varrer_shard(motor._shards[indice], motor.relogio(), BLOCO_VARREDURA)
+        indice = (indice + 1) % len(motor._shards)
+        pausa = intervalo / len(motor._shards)
+        # Sem referência forte durante a pausa, para o motor poder ser coletado
+        del motor
+        time.sleep(pausa)
+
+
+_motor = None
+_lock = threading.Lock()
+
+
+def obter_motor():
+    """Motor do processo; regras de VELOCIDADE_REGRAS (JSON) ou as padrão, com a thread de limpeza"""
+    global _motor
+    if _motor is None:
+        with _lock:
+            if _motor is None:
+                import json
+
+                from app.config import Config
+
+                regras = getattr(Config, "VELOCIDADE_REGRAS", None)
+                motor = MotorVelocidade(tuple(map(tuple, json.loads(regras))) if regras else REGRAS_PADRAO)
+                motor.iniciar_varredura(getattr(Config, "VELOCIDADE_VARREDURA_INTERVALO", 300.0))
+                _motor = motor
+    return _motor
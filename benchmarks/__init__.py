@@ -0,0 +1 @@
+# Benchmarks executados a partir da raiz do projeto: python -m benchmarks.<nome>
@@ -0,0 +1,134 @@
+"""Benchmark dos relatórios de vendas (colunas NumPy + bincount).
+
+Primeiro confere os relatórios de ``ler_cosmos`` sobre o container em memória
+contra uma agregação em Python puro. Depois mede a leitura em streaming de
+milhões de pedidos gerados sob demanda (sem lista de documentos em memória), o
+tempo dos relatórios sobre as colunas e a agregação equivalente com dicts. O
+custo de gerar os documentos (que no Cosmos seria a rede) é medido à parte e
+descontado das duas leituras.
+
+Uso: python -m benchmarks.bench_analise [pedidos]
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app.services import analise_vendas
+from benchmarks.cosmos_fake import ContainerFake
+
+INICIO = date(2024, 1, 1)
+DIAS = 365
+PRODUTOS = 5000
+CATEGORIAS = 40
+STATUS = ("Pendente", "Pago", "Enviado", "Entregue", "Cancelado")
+
+
+def gerar_pedidos(quantidade, semente=11):
+    aleatorio = random.Random(semente)
+    for i in range(quantidade):
+        itens = [
+            {"produtoId": f"prod-{aleatorio.randrange(PRODUTOS)}", "quantidade": aleatorio.randint(1, 4),
+             "precoUnitario": round(aleatorio.uniform(5, 300), 2)}
+            for _ in range(aleatorio.randint(1, 3))
+        ]
+        yield {
+            "id": f"ped-{i}",
+            "usuarioId": f"u-{i % 1000}",
+            "dataPedido": f"{INICIO + timedelta(days=aleatorio.randrange(DIAS))}T12:00:00",
+            "status": STATUS[aleatorio.randrange(len(STATUS))],
+            "itens": itens,
+            "valorTotal": round(sum(i["quantidade"] * i["precoUnitario"] for i in itens), 2)
+        }
+
+
+def produtos_fake():
+    produtos = ContainerFake(partition_key="produtoCategoria")
+    for p in range(PRODUTOS):
+        produtos.create_item({"id": f"prod-{p}", "produtoCategoria": f"cat-{p % CATEGORIAS}", "nome": f"Produto {p}"})
+    return produtos
+
+
+class PedidosGerados:
+    """Fonte que gera os pedidos a cada consulta, como as páginas do Cosmos"""
+
+    def __init__(self, quantidade):
+        self.quantidade = quantidade
+
+    def query_items(self, **kwargs):
+        return gerar_pedidos(self.quantidade)
+
+
+def agregar_com_dicts(pedidos, categorias):
+    por_dia, por_categoria, por_produto, por_status = defaultdict(float), defaultdict(float), defaultdict(float), defaultdict(int)
+    total, quantidade = 0.0, 0
+    for pedido in pedidos:
+        por_dia[pedido["dataPedido"][:10]] += pedido["valorTotal"]
+        por_status[pedido["status"]] += 1
+        total += pedido["valorTotal"]
+        quantidade += 1
+        for item in pedido["itens"]:
+            receita = item["quantidade"] * item["precoUnitario"]
+            por_categoria[categorias[item["produtoId"]]] += receita
+            por_produto[item["produtoId"]] += receita
+    topo = sorted(por_produto.items(), key=lambda p: -p[1])[:10]
+    return por_dia, por_categoria, topo, por_status, total / quantidade
+
+
+def conferir(produtos):
+    pedidos = ContainerFake(partition_key="usuarioId")
+    for pedido in gerar_pedidos(3000, semente=5):
+        pedidos.create_item(pedido)
+    fim = INICIO + timedelta(days=DIAS)
+    colunas = analise_vendas.ler_cosmos(pedidos, produtos, INICIO, fim, tamanho_bloco=700)
+
+    categorias = {f"prod-{p}": f"cat-{p % CATEGORIAS}" for p in range(PRODUTOS)}
+    por_dia, por_categoria, topo, por_status, media = agregar_com_dicts(gerar_pedidos(3000, semente=5), categorias)
+
+    assert {d["data"]: d["receita"] for d in analise_vendas.receita_por_dia(colunas)} == {
+        k: round(v, 2) for k, v in por_dia.items()}
+    assert {c["categoria"]: c["receita"] for c in analise_vendas.receita_por_categoria(colunas)} == {
+        k: round(v, 2) for k, v in por_categoria.items()}
+    assert [p["produto"] for p in analise_vendas.produtos_mais_vendidos(colunas, 10)] == [p for p, _ in topo]
+    assert {s["status"]: s["pedidos"] for s in analise_vendas.por_status(colunas)} == dict(por_status)
+    assert analise_vendas.ticket_medio(colunas)["ticketMedio"] == round(media, 2)
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    produtos = produtos_fake()
+    conferir(produtos)
+    print("relatórios conferidos com a agregação em Python puro (3000 pedidos)")
+
+    fim = INICIO + timedelta(days=DIAS)
+    inicio = time.perf_counter()
+    for _ in gerar_pedidos(quantidade):
+        pass
+    geracao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    colunas = analise_vendas.ler_cosmos(PedidosGerados(quantidade), produtos, INICIO, fim)
+    leitura = time.perf_counter() - inicio - geracao
+
+    inicio = time.perf_counter()
+    analise_vendas.resumo(colunas)
+    relatorios = time.perf_counter() - inicio
+
+    categorias = {f"prod-{p}": f"cat-{p % CATEGORIAS}" for p in range(PRODUTOS)}
+    inicio = time.perf_counter()
+    agregar_com_dicts(gerar_pedidos(quantidade), categorias)
+    dicts = time.perf_counter() - inicio - geracao
+
+    colunas_mb = sum(getattr(colunas, c).nbytes for c in (
+        "pedido_dia", "pedido_valor", "pedido_status", "item_dia", "item_produto",
+        "item_categoria", "item_quantidade", "item_receita")) / 2 ** 20
+    print(f"{len(colunas)} pedidos, {len(colunas.item_receita)} itens em {DIAS} dias")
+    print(f"geração dos documentos (descontada abaixo): {geracao:.2f} s")
+    print(f"leitura em streaming para colunas: {leitura:.2f} s (colunas: {colunas_mb:.0f} MiB)")
+    print(f"todos os relatórios sobre as colunas (cache quente): {relatorios * 1000:.1f} ms")
+    print(f"agregação com dicts em Python, refeita a cada chamada: {dicts:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
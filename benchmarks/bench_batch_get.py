@@ -0,0 +1,80 @@
+"""Benchmark da leitura em lote (batch-get) de produtos de um carrinho.
+
+Compara um GET por produto (uma consulta cross-partition por id, como os
+clientes faziam) com ``consultar_ids`` (uma consulta ARRAY_CONTAINS por bloco de
+ids) e com o batch-get passando pelo cache de documentos, usando o container em
+memória com latência simulada por ida ao servidor.
+
+Uso: python -m benchmarks.bench_batch_get [latencia_ms]
+"""
+import random
+import sys
+import time
+
+from app.models.produto import Produto
+from app.services.cache_documentos import CacheDocumentos
+from app.services.leitura_lote import consultar_ids, resultado_lote
+from benchmarks.cosmos_fake import ContainerFake
+
+PRODUTOS = 5000
+
+
+def popular(container):
+    for i in range(PRODUTOS):
+        container.create_item({
+            "id": f"produto-{i}", "produtoCategoria": f"categoria-{i % 40}", "nome": f"Produto {i}",
+            "preco": round(10 + i * 0.37, 2), "urlImagem": None, "descricao": None
+        })
+    container.zerar_contadores()
+
+
+def um_por_id(container, ids):
+    """Forma anterior: ProdutoResource.get para cada produtoId"""
+    encontrados = {}
+    for produto_id in ids:
+        produtos = list(container.query_items(
+            query="SELECT * FROM produtos p WHERE p.id = @id",
+            parameters=[{"name": "@id", "value": produto_id}], enable_cross_partition_query=True
+        ))
+        if produtos:
+            encontrados[produto_id] = produtos[0]
+    return encontrados
+
+
+def em_lote(container, ids):
+    return consultar_ids(container, list(dict.fromkeys(ids)))
+
+
+def main():
+    latencia = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.002
+    container = ContainerFake(partition_key="produtoCategoria", latencia=latencia)
+    popular(container)
+    cache = CacheDocumentos("bench")
+    cache.ativo = True
+
+    def com_cache(container, ids):
+        return cache.obter_lote(
+            list(dict.fromkeys(ids)),
+            lambda restantes: {p.id: p for p in Produto.from_rows(consultar_ids(container, restantes).values())}
+        )
+
+    aleatorio = random.Random(42)
+    print(f"latência simulada por chamada: {latencia * 1000:.1f} ms")
+    print(f"{'ids':>5} | {'versão':>14} | {'chamadas':>8} | {'tempo (ms)':>10}")
+    for quantidade in (10, 50, 100, 250):
+        # Um id inexistente no fim: precisa voltar marcado, na posição pedida
+        ids = [f"produto-{aleatorio.randrange(PRODUTOS)}" for _ in range(quantidade - 1)] + ["produto-x"]
+        for nome, funcao in (("um por id", um_por_id), ("batch-get", em_lote),
+                             ("cache (frio)", com_cache), ("cache (quente)", com_cache)):
+            container.zerar_contadores()
+            inicio = time.perf_counter()
+            resultado = resultado_lote(ids, funcao(container, ids), lambda d: d.get("id"))
+            decorrido = time.perf_counter() - inicio
+
+            assert [item["id"] for item in resultado["itens"]] == ids
+            assert resultado["naoEncontrados"] == ["produto-x"]
+            print(f"{quantidade:>5} | {nome:>14} | {container.total_chamadas():>8} | {decorrido * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
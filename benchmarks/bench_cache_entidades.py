@@ -0,0 +1,94 @@
+"""Benchmark do cache de segundo nível das buscas por id.
+
+Usa um SQLite em memória (o MySQL real ainda soma a ida e volta da rede a cada
+falta). Confere que uma alteração confirmada invalida a entrada nas duas camadas,
+mede a latência de ``Usuario.query.get`` contra ``cache_entidades.buscar`` com
+acessos concentrados em poucos usuários (como na API) e mostra a taxa de acerto.
+
+Uso: python -m benchmarks.bench_cache_entidades [usuarios] [buscas]
+"""
+import random
+import sys
+import time
+
+from flask import Flask
+
+from app.database import db
+from app.models.cartao import Cartao
+from app.models.endereco import Endereco  # noqa: F401 - relacionamentos do Usuario
+from app.models.pedido import Pedido  # noqa: F401
+from app.models.usuario import Usuario
+from app.services.cache_entidades import CamadaMemoria, cache_entidades, init_cache_entidades
+
+
+def criar_app(usuarios):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    init_cache_entidades(app)
+    cache_entidades.compartilhada = CamadaMemoria()
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(Usuario, [
+            {"id": i, "nome": f"usuario {i}", "email": f"u{i}@exemplo.com"} for i in range(1, usuarios + 1)
+        ])
+        db.session.commit()
+    return app
+
+
+def conferir_invalidacao(app):
+    with app.app_context():
+        assert cache_entidades.buscar(Usuario, 1).nome == "usuario 1"
+        db.session.remove()
+        usuario = cache_entidades.buscar(Usuario, 1)
+        usuario.nome = "alterado"
+        db.session.commit()
+        db.session.remove()
+        assert cache_entidades.buscar(Usuario, 1).nome == "alterado"
+        db.session.remove()
+        try:
+            cache_entidades.registrar(Cartao)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Cartao não deveria ser aceito no cache")
+
+
+def medir(app, buscar, ids):
+    tempos = []
+    with app.app_context():
+        for usuario_id in ids:
+            t = time.perf_counter()
+            buscar(usuario_id)
+            tempos.append(time.perf_counter() - t)
+            db.session.remove()  # uma sessão por requisição, como na API
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1e6, tempos[int(len(tempos) * 0.99)] * 1e6
+
+
+def main():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    buscas = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    app = criar_app(usuarios)
+    conferir_invalidacao(app)
+    print("invalidação no commit conferida; Cartao recusado")
+
+    # Acessos concentrados: ~80% das buscas em 20% dos usuários
+    aleatorio = random.Random(7)
+    quentes = max(1, usuarios // 5)
+    ids = [aleatorio.randint(1, quentes) if aleatorio.random() < 0.8 else aleatorio.randint(1, usuarios)
+           for _ in range(buscas)]
+
+    for nome, buscar in (("Usuario.query.get", lambda i: Usuario.query.get(i)),
+                         ("cache_entidades.buscar", lambda i: cache_entidades.buscar(Usuario, i))):
+        mediana, p99 = medir(app, buscar, ids)
+        print(f"{nome}: mediana {mediana:.1f} µs, p99 {p99:.1f} µs")
+
+    estatisticas = cache_entidades.estatisticas()["tabelas"]["usuario"]
+    print(f"acertos locais {estatisticas['local']}, compartilhados {estatisticas['compartilhado']}, "
+          f"faltas {estatisticas['falhas']}, taxa de acerto {estatisticas['taxaAcerto']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
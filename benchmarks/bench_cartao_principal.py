@@ -0,0 +1,65 @@
+"""Benchmark da troca de cartão principal para usuários com muitos cartões.
+
+Compara o algoritmo antigo (ler todos os cartões, um replace por cartão e uma
+nova consulta) com ``definir_cartao_principal`` usando o container em memória
+com latência simulada por ida ao servidor.
+
+Uso: python -m benchmarks.bench_cartao_principal [latencia_ms]
+"""
+import sys
+import time
+
+from app.services.cartao_principal import definir_cartao_principal
+from benchmarks.cosmos_fake import ContainerFake
+
+USUARIO_ID = "usuario-1"
+
+
+def popular(container, quantidade):
+    for i in range(quantidade):
+        container.create_item({
+            "id": f"cartao-{i}",
+            "usuarioId": USUARIO_ID,
+            "numero": f"{i:016d}",
+            "principal": i == 0
+        })
+    container.zerar_contadores()
+
+
+def definir_principal_antigo(container, usuario_id, cartao_id):
+    """Implementação anterior de CartaoPrincipalResource.put"""
+    query = f"SELECT * FROM cartoes c WHERE c.usuarioId = '{usuario_id}'"
+    for cartao in list(container.query_items(query=query, enable_cross_partition_query=True)):
+        cartao["principal"] = False
+        container.replace_item(item=cartao["id"], body=cartao)
+
+    query = f"SELECT * FROM cartoes c WHERE c.id = '{cartao_id}' AND c.usuarioId = '{usuario_id}'"
+    cartao = list(container.query_items(query=query, enable_cross_partition_query=True))[0]
+    cartao["principal"] = True
+    container.replace_item(item=cartao["id"], body=cartao)
+
+
+def medir(funcao, quantidade, latencia):
+    container = ContainerFake(partition_key="usuarioId", latencia=latencia)
+    popular(container, quantidade)
+    inicio = time.perf_counter()
+    funcao(container, USUARIO_ID, f"cartao-{quantidade - 1}")
+    decorrido = time.perf_counter() - inicio
+
+    principais = [d["id"] for d in container.itens.values() if d.get("principal")]
+    assert principais == [f"cartao-{quantidade - 1}"], principais
+    return container.total_chamadas(), container.documentos_escritos, decorrido
+
+
+def main():
+    latencia = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.002
+    print(f"latência simulada por chamada: {latencia * 1000:.1f} ms")
+    print(f"{'cartões':>8} | {'versão':>7} | {'chamadas':>8} | {'escritas':>8} | {'tempo (ms)':>10}")
+    for quantidade in (1, 10, 100, 500):
+        for nome, funcao in (("antiga", definir_principal_antigo), ("batch", definir_cartao_principal)):
+            chamadas, escritas, decorrido = medir(funcao, quantidade, latencia)
+            print(f"{quantidade:>8} | {nome:>7} | {chamadas:>8} | {escritas:>8} | {decorrido * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark de memória do catálogo de produtos no cache do processo.
+
+Compara o catálogo inteiro guardado como os dicts devolvidos pelo SDK do Cosmos
+(com ``_rid``, ``_self``, ``_attachments``...), como objetos da classe anterior
+(com ``__dict__``) e como ``Produto`` com ``__slots__``. Mede também a conversão
+em lote (``from_rows``/``to_rows``) e a serialização da listagem a partir de cada
+forma.
+
+Uso: python -m benchmarks.bench_catalogo_produtos [produtos]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from app.models.produto import Produto
+from app.response.serializacao import compilar_modelo, dumps
+
+
+class ProdutoComDict:
+    """Forma anterior do modelo: classe comum, um ``__dict__`` por instância"""
+
+    def __init__(self, produtoCategoria, nome, preco, urlImagem, descricao, id, etag, ts):
+        self.id = id
+        self.produtoCategoria = produtoCategoria
+        self.nome = nome
+        self.preco = preco
+        self.urlImagem = urlImagem
+        self.descricao = descricao
+        self.etag = etag
+        self.ts = ts
+
+
+def catalogo_json(quantidade):
+    """Catálogo no formato devolvido pelo Cosmos, como texto (o SDK decodifica a cada consulta)"""
+    return json.dumps([
+        {
+            "id": f"{i:08d}-0000-4000-8000-{i:012d}", "produtoCategoria": f"categoria-{i % 40}",
+            "nome": f"Produto {i}", "preco": round(10 + i * 0.37, 2),
+            "urlImagem": f"https://cdn.exemplo.com/produtos/{i}.jpg", "descricao": f"Descrição do produto {i}",
+            "_rid": f"AbCdEf{i:010d}==", "_self": f"dbs/AbC==/colls/AbCdE=/docs/AbCdEf{i:010d}==/",
+            "_etag": f"\"{i:08x}-0000-0000-0000-000000000000\"", "_attachments": "attachments/", "_ts": 1700000000 + i
+        }
+        for i in range(quantidade)
+    ])
+
+
+def medir(construir):
+    """Bytes retidos pelo resultado de ``construir()`` (pico e retido, via tracemalloc)"""
+    gc.collect()
+    tracemalloc.start()
+    resultado = construir()
+    gc.collect()
+    retido = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return resultado, retido
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    texto = catalogo_json(quantidade)
+
+    documentos, bytes_dicts = medir(lambda: json.loads(texto))
+    com_dict, bytes_com_dict = medir(lambda: [
+        ProdutoComDict(d["produtoCategoria"], d["nome"], d["preco"], d["urlImagem"], d["descricao"], d["id"],
+                       d["_etag"], d["_ts"])
+        for d in json.loads(texto)
+    ])
+    produtos, bytes_slots = medir(lambda: Produto.from_rows(json.loads(texto)))
+
+    print(f"catálogo com {quantidade} produtos no cache do processo:")
+    for nome, total in (("dicts do SDK", bytes_dicts), ("classe com __dict__", bytes_com_dict),
+                        ("Produto com __slots__", bytes_slots)):
+        print(f"  {nome:>22}: {total / 2**20:7.1f} MiB ({total / quantidade:.0f} bytes/produto)")
+    assert [p.id for p in produtos[:3]] == [d["id"] for d in documentos[:3]]
+    assert Produto.from_dict(produtos[0].to_dict()).id == produtos[0].id  # id mantido na ida e volta
+    del com_dict
+
+    inicio = time.perf_counter()
+    Produto.from_rows(documentos)
+    de_linhas = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    Produto.to_rows(produtos)
+    para_linhas = time.perf_counter() - inicio
+    print(f"from_rows: {de_linhas / quantidade * 1e9:.0f} ns/produto, to_rows: {para_linhas / quantidade * 1e9:.0f} ns/produto")
+
+    from app.controllers.produto_controller import produto_model
+
+    for nome, linhas, acesso in (("dicts", documentos, "chave"), ("Produto", produtos, "atributo")):
+        serializar = compilar_modelo(produto_model, acesso)
+        inicio = time.perf_counter()
+        dumps([serializar(linha) for linha in linhas])
+        print(f"listagem serializada a partir de {nome}: {(time.perf_counter() - inicio) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
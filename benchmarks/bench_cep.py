@@ -0,0 +1,70 @@
+"""Benchmark do índice local de CEPs.
+
+Gera um dataset sintético (faixas por localidade + CEPs de logradouro), compila
+para o formato .idx, abre com mmap e mede o tempo por consulta.
+
+Uso: python -m benchmarks.bench_cep [ceps_exatos] [faixas]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.services.cep import carregar_indice, compilar_dataset
+
+UFS = ("SP", "RJ", "MG", "ES", "BA", "PR", "SC", "RS", "PE", "CE")
+
+
+def gerar_dataset(ceps_exatos, faixas):
+    tamanho = 100_000_000 // faixas
+    for i in range(faixas):
+        yield {
+            "cep_inicio": f"{i * tamanho:08d}", "cep_fim": f"{(i + 1) * tamanho - 1:08d}",
+            "logradouro": "", "bairro": "", "cidade": f"Cidade {i}", "uf": UFS[i % len(UFS)]
+        }
+    aleatorio = random.Random(42)
+    for cep in aleatorio.sample(range(100_000_000), ceps_exatos):
+        faixa = cep // tamanho
+        yield {
+            "cep_inicio": f"{cep:08d}", "cep_fim": "",
+            "logradouro": f"Rua {cep % 5000}", "bairro": f"Bairro {cep % 300}",
+            "cidade": f"Cidade {faixa}", "uf": UFS[faixa % len(UFS)]
+        }
+
+
+def main():
+    ceps_exatos = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    faixas = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+
+    inicio = time.perf_counter()
+    dados = compilar_dataset(gerar_dataset(ceps_exatos, faixas))
+    print(f"compilação: {time.perf_counter() - inicio:.2f} s, {len(dados) / 1024 / 1024:.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "ceps.idx")
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(dados)
+
+        inicio = time.perf_counter()
+        indice = carregar_indice(caminho)
+        print(f"abertura com mmap: {(time.perf_counter() - inicio) * 1e6:.0f} µs ({len(indice)} registros)")
+
+        aleatorio = random.Random(7)
+        exatos = [f"{aleatorio.choice(indice.exatos):08d}" for _ in range(10_000)]
+        quaisquer = [f"{aleatorio.randrange(100_000_000):08d}" for _ in range(100_000)]
+
+        for nome, consultas in (("CEPs de logradouro", exatos), ("CEPs aleatórios (faixas)", quaisquer)):
+            inicio = time.perf_counter()
+            for cep in consultas:
+                indice.buscar(cep)
+            decorrido = time.perf_counter() - inicio
+            print(f"{nome:>26}: {decorrido / len(consultas) * 1e6:.2f} µs/consulta")
+
+        # Conferência: o CEP de logradouro devolve a cidade da faixa que o contém
+        registro = indice.buscar(exatos[0])
+        assert registro["logradouro"] and registro["cidade"] == indice.buscar(f"{indice.faixas_inicio[indice.posicao_faixa(int(exatos[0]))]:08d}")["cidade"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark do cache de documentos mantido pelo change feed.
+
+Um "nó" lê produtos por id através de ``CacheDocumentos`` enquanto outro nó altera
+preços direto no container (em memória). O ``ChangeFeedWorker`` roda em uma thread
+do processo leitor e atualiza o cache; o benchmark mede a taxa de acerto, quanto
+tempo cada alteração leva para aparecer no cache e as leituras que ainda viram o
+preço antigo. No fim confere a retomada pelo checkpoint em arquivo.
+
+Uso: python -m benchmarks.bench_change_feed [produtos] [alteracoes] [intervalo_ms]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.services.cache_documentos import CacheDocumentos
+from app.services.change_feed import Barramento, ChangeFeedWorker, CheckpointsArquivo
+from benchmarks.cosmos_fake import ContainerFake
+
+
+def popular(container, quantidade):
+    for i in range(quantidade):
+        container.create_item({"id": f"p-{i}", "produtoCategoria": f"c-{i % 10}", "nome": f"Produto {i}", "preco": 10.0})
+
+
+def carregar(container, produto_id):
+    query = "SELECT * FROM produtos p WHERE p.id = @id"
+    produtos = list(container.query_items(query=query, parameters=[{"name": "@id", "value": produto_id}]))
+    return produtos[0] if produtos else None
+
+
+def medir_propagacao(container, cache, quantidade, alteracoes, intervalo):
+    barramento = Barramento()
+    barramento.assinar("produtos", cache.aplicar)
+    worker = ChangeFeedWorker({"produtos": container}, barramento=barramento, intervalo=intervalo).iniciar()
+    time.sleep(intervalo * 2)
+
+    aleatorio = random.Random(3)
+    atrasos, leituras_antigas = [], 0
+    for preco in range(alteracoes):
+        produto_id = f"p-{aleatorio.randrange(quantidade)}"
+        cache.obter(produto_id, lambda: carregar(container, produto_id))
+
+        # Outro nó grava direto no Cosmos; o cache deste nó só sabe pelo change feed
+        documento = carregar(container, produto_id)
+        documento["preco"] = 100.0 + preco
+        container.replace_item(item=produto_id, body=documento)
+        gravado = time.perf_counter()
+        while cache.obter(produto_id, lambda: carregar(container, produto_id))["preco"] != documento["preco"]:
+            leituras_antigas += 1
+            time.sleep(0.0005)
+        atrasos.append(time.perf_counter() - gravado)
+
+        for _ in range(50):
+            i = f"p-{aleatorio.randrange(quantidade)}"
+            cache.obter(i, lambda: carregar(container, i))
+
+    worker.parar()
+    atrasos.sort()
+    return atrasos, leituras_antigas
+
+
+def conferir_checkpoint(container):
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "checkpoints.json")
+        lidos = []
+        barramento = Barramento()
+        barramento.assinar("produtos", lidos.extend)
+
+        ChangeFeedWorker({"produtos": container}, CheckpointsArquivo(caminho), barramento,
+                         desde_o_inicio=True).executar_uma_vez()
+        total = len(lidos)
+        container.upsert_item({"id": "p-novo", "produtoCategoria": "c-0", "nome": "Novo", "preco": 1.0})
+        # Um novo worker (reinício do processo) retoma do checkpoint gravado em arquivo
+        ChangeFeedWorker({"produtos": container}, CheckpointsArquivo(caminho), barramento,
+                         desde_o_inicio=True).executar_uma_vez()
+        assert [d["id"] for d in lidos[total:]] == ["p-novo"], lidos[total:]
+        return total
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    alteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    intervalo = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.01
+
+    container = ContainerFake(partition_key="produtoCategoria")
+    popular(container, quantidade)
+    cache = CacheDocumentos("produtos", ttl=3600)
+    cache.ativo = True
+
+    inicio = time.perf_counter()
+    atrasos, leituras_antigas = medir_propagacao(container, cache, quantidade, alteracoes, intervalo)
+    decorrido = time.perf_counter() - inicio
+    estatisticas = cache.estatisticas()
+
+    print(f"{quantidade} produtos, {alteracoes} alterações feitas por outro nó, feed lido a cada {intervalo * 1000:.0f} ms")
+    print(f"taxa de acerto do cache: {estatisticas['taxaAcerto']:.1%} ({estatisticas['acertos']} acertos, "
+          f"{estatisticas['falhas']} falhas) em {decorrido:.2f} s")
+    print(f"propagação até o cache: p50 {atrasos[len(atrasos) // 2] * 1000:.1f} ms, "
+          f"p99 {atrasos[int(len(atrasos) * 0.99)] * 1000:.1f} ms, máx {atrasos[-1] * 1000:.1f} ms")
+    print(f"leituras com o preço antigo durante a propagação: {leituras_antigas}")
+    print(f"checkpoint em arquivo: {conferir_checkpoint(container)} documentos na primeira leitura, "
+          "reinício retomou só a alteração nova")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark de contenção das reservas de estoque: milhares de compradores, um SKU.
+
+Compara ``estoque.reservar`` (UPDATE condicional ``disponivel >= q``, sem leitura
+antes da escrita) com o controle otimista que um patch com ``_etag`` faria no
+Cosmos: ler o saldo e gravar só se ele não mudou (``WHERE disponivel = lido``),
+repetindo a cada corrida perdida. Confere que nenhuma das duas vende a mais e
+mede vazão, latência por comprador e tentativas por compra. Mede também a
+varredura das reservas vencidas.
+
+Usa SQLite em um diretório temporário, ou ``BENCH_DATABASE_URL`` (ex.: MySQL,
+onde os compradores disputam o bloqueio da linha).
+Uso: python -m benchmarks.bench_estoque [compradores] [unidades] [threads]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import select, update
+
+from app.database import db
+from app.models.cartao import Cartao  # noqa: F401 - mapeadores relacionados (configurados juntos)
+from app.models.endereco import Endereco  # noqa: F401
+from app.models.usuario import Usuario  # noqa: F401
+from app.models.estoque import ATIVA, EXPIRADA, Estoque, ItemReservaEstoque, ReservaEstoque
+from app.services import estoque
+
+SKU = "produto-flash"
+
+
+def criar_app(diretorio, threads):
+    app = Flask(__name__)
+    url = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{diretorio}/estoque.db"
+    opcoes = {"pool_size": threads, "max_overflow": 0}
+    if url.startswith("sqlite"):
+        opcoes["connect_args"] = {"timeout": 60}
+    app.config.update(SQLALCHEMY_DATABASE_URI=url, SQLALCHEMY_ENGINE_OPTIONS=opcoes)
+    db.init_app(app)
+    # Só as tabelas do estoque (o resto do esquema não participa)
+    tabelas = [Estoque.__table__, ReservaEstoque.__table__, ItemReservaEstoque.__table__]
+    with app.app_context():
+        db.metadata.drop_all(db.engine, tables=tabelas)
+        db.metadata.create_all(db.engine, tables=tabelas)
+    return app
+
+
+def preparar(app, unidades):
+    with app.app_context():
+        db.session.query(ItemReservaEstoque).delete()
+        db.session.query(ReservaEstoque).delete()
+        db.session.query(Estoque).delete()
+        db.session.add(Estoque(produto_id=SKU, disponivel=unidades, reservado=0))
+        db.session.commit()
+
+
+def comprar_condicional(indice):
+    """Um comprador pela reserva do serviço: 1 tentativa, vende ou recebe 409"""
+    try:
+        estoque.reservar(f"pedido-{indice}", [(SKU, 1)], ttl=900)
+        return True, 1
+    except estoque.ErroEstoque:
+        return False, 1
+
+
+def comprar_otimista(indice):
+    """Um comprador com leitura + gravação condicional à versão lida (como o _etag do Cosmos)"""
+    tentativas = 0
+    while True:
+        tentativas += 1
+        disponivel = db.session.scalar(select(Estoque.disponivel).where(Estoque.produto_id == SKU))
+        db.session.rollback()
+        if disponivel < 1:
+            return False, tentativas
+        resultado = db.session.execute(
+            update(Estoque).where(Estoque.produto_id == SKU, Estoque.disponivel == disponivel)
+            .values(disponivel=disponivel - 1, reservado=Estoque.reservado + 1)
+        )
+        db.session.commit()
+        if resultado.rowcount:
+            return True, tentativas
+
+
+def executar(app, comprar, compradores, threads):
+    latencias = [0.0] * compradores
+
+    def comprador(indice):
+        with app.app_context():
+            inicio = time.perf_counter()
+            try:
+                return comprar(indice)
+            finally:
+                latencias[indice] = time.perf_counter() - inicio
+                db.session.remove()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        resultados = list(executor.map(comprador, range(compradores)))
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    vendidos = sum(1 for vendeu, _ in resultados if vendeu)
+    tentativas = sum(t for _, t in resultados)
+    return vendidos, tentativas, decorrido, latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.99)]
+
+
+def conferir(app, unidades, compradores, vendidos, com_reservas):
+    with app.app_context():
+        saldo = db.session.get(Estoque, SKU)
+        assert vendidos == min(unidades, compradores), "venda a mais (ou a menos)"
+        assert saldo.disponivel == unidades - vendidos and saldo.reservado == vendidos
+        if com_reservas:
+            assert ReservaEstoque.query.filter_by(status=ATIVA).count() == vendidos
+
+
+def medir_varredura(app, quantidade):
+    with app.app_context():
+        preparar(app, 0)
+        vencimento = datetime.utcnow() - timedelta(seconds=1)
+        saldo = db.session.get(Estoque, SKU)
+        saldo.reservado = quantidade
+        for indice in range(quantidade):
+            db.session.add(ReservaEstoque(id=f"r-{indice}", pedido_id=f"p-{indice}", status=ATIVA, expira_em=vencimento,
+                                          itens=[ItemReservaEstoque(produto_id=SKU, quantidade=1)]))
+        db.session.commit()
+
+        inicio = time.perf_counter()
+        expiradas = 0
+        while (lote := estoque.expirar_vencidas(500)):
+            expiradas += lote
+        decorrido = time.perf_counter() - inicio
+
+        saldo = db.session.get(Estoque, SKU)
+        assert expiradas == quantidade and saldo.disponivel == quantidade and saldo.reservado == 0
+        assert ReservaEstoque.query.filter_by(status=EXPIRADA).count() == quantidade
+        return decorrido
+
+
+def main():
+    compradores = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    unidades = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(diretorio, threads)
+        print(f"{compradores} compradores, {unidades} unidades de um SKU, {threads} threads "
+              f"({app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]})")
+        print(f"{'versão':>12} | {'vendidos':>8} | {'tentativas':>10} | {'compras/s':>9} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+        for nome, comprar, com_reservas in (("condicional", comprar_condicional, True),
+                                            ("otimista", comprar_otimista, False)):
+            preparar(app, unidades)
+            vendidos, tentativas, decorrido, p50, p99 = executar(app, comprar, compradores, threads)
+            conferir(app, unidades, compradores, vendidos, com_reservas)
+            print(f"{nome:>12} | {vendidos:>8} | {tentativas:>10} | {compradores / decorrido:>9.0f} | "
+                  f"{p50 * 1000:>8.1f} | {p99 * 1000:>8.1f}")
+
+        quantidade = min(unidades, 5000)
+        print(f"varredura de {quantidade} reservas vencidas: {medir_varredura(app, quantidade) * 1000:.0f} ms")
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
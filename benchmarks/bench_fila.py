@@ -0,0 +1,130 @@
+"""Benchmark da fila de jobs (respostas 202).
+
+Compara a latência de uma rota que faz o efeito colateral lento na requisição
+(simulado com ``TEMPO_EFEITO``) com a mesma rota enfileirando o job e respondendo
+202: a segunda fica no custo de um INSERT no SQLite, independente do efeito.
+Confere também as repetições com backoff, a falha permanente e a retomada de um
+job cujo worker morreu (prazo de execução vencido).
+
+Uso: python -m benchmarks.bench_fila [requisicoes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+
+from app.services.fila import CONCLUIDO, FALHOU, ErroPermanente, enfileirar, init_fila, resposta_aceita, tarefa
+
+TEMPO_EFEITO = 0.02
+falhas_restantes = {"instavel": 2}
+
+
+@tarefa("bench.efeito")
+def efeito(indice):
+    time.sleep(TEMPO_EFEITO)
+    return {"indice": indice}
+
+
+@tarefa("bench.instavel", max_tentativas=4)
+def instavel():
+    if falhas_restantes["instavel"]:
+        falhas_restantes["instavel"] -= 1
+        raise ConnectionError("serviço indisponível")
+    return "ok"
+
+
+@tarefa("bench.invalido")
+def invalido():
+    raise ErroPermanente("dados inválidos")
+
+
+def criar_app(diretorio):
+    app = Flask(__name__)
+    app.config.update(FILA_DB_PATH=os.path.join(diretorio, "fila.db"), FILA_THREADS=4, FILA_INTERVALO=0.05)
+    init_fila(app)
+    app.extensions["fila"].backoff_base = 0.05
+
+    @app.route("/inline/<int:indice>", methods=["POST"])
+    def inline(indice):
+        return jsonify(efeito(indice)), 201
+
+    @app.route("/assincrono/<int:indice>", methods=["POST"])
+    def assincrono(indice):
+        return resposta_aceita(enfileirar("bench.efeito", indice=indice))
+
+    return app
+
+
+def percentis(tempos):
+    tempos = sorted(tempos)
+    return tempos[len(tempos) // 2] * 1e3, tempos[int(len(tempos) * 0.99)] * 1e3
+
+
+def esperar(armazem, job_id, limite=10.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        job = armazem.obter(job_id)
+        if job["status"] in (CONCLUIDO, FALHOU):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} não terminou")
+
+
+def conferir(app):
+    fila = app.extensions["fila"]
+    with app.app_context():
+        instavel_id = enfileirar("bench.instavel")
+        invalido_id = enfileirar("bench.invalido")
+    job = esperar(fila.armazem, instavel_id)
+    assert job["status"] == CONCLUIDO and job["tentativas"] == 3 and job["resultado"] == "ok"
+    job = esperar(fila.armazem, invalido_id)
+    assert job["status"] == FALHOU and job["tentativas"] == 1
+
+    # Worker que reservou o job e morreu: o job volta quando o prazo vence
+    fila.parar()
+    with app.app_context():
+        orfao_id = enfileirar("bench.efeito", indice=-1)
+    assert fila.armazem.reservar(visibilidade=0.05)["id"] == orfao_id
+    assert fila.armazem.reservar(visibilidade=0.05) is None
+    time.sleep(0.06)
+    retomado = fila.armazem.reservar(visibilidade=60)
+    assert retomado["id"] == orfao_id and retomado["tentativas"] == 2
+    fila.processar(retomado)
+    assert fila.armazem.obter(orfao_id)["status"] == CONCLUIDO
+    fila.iniciar()
+
+
+def main():
+    requisicoes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(diretorio)
+        app.extensions["fila"].iniciar()
+        conferir(app)
+        print("fila conferida: repetição com backoff, falha permanente e retomada após prazo vencido")
+
+        cliente = app.test_client()
+        for rota in ("inline", "assincrono"):
+            tempos = []
+            inicio = time.perf_counter()
+            for indice in range(requisicoes):
+                t = time.perf_counter()
+                resposta = cliente.post(f"/{rota}/{indice}")
+                tempos.append(time.perf_counter() - t)
+            total = time.perf_counter() - inicio
+            p50, p99 = percentis(tempos)
+            print(f"{rota:>10}: HTTP {resposta.status_code}, p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+                  f"{requisicoes / total:.0f} req/s")
+
+        fila = app.extensions["fila"]
+        inicio = time.perf_counter()
+        while fila.armazem.contagens().get("pendente") or fila.armazem.contagens().get("executando"):
+            time.sleep(0.01)
+        print(f"jobs drenados {time.perf_counter() - inicio:.2f} s depois das requisições "
+              f"({fila.threads} threads, {TEMPO_EFEITO * 1e3:.0f} ms por job): {fila.armazem.contagens()}")
+        fila.parar()
+
+
+if __name__ == "__main__":
+    main()
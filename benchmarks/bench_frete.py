@@ -0,0 +1,35 @@
+"""Benchmark da cotação de frete (índice de zonas + memorização).
+
+Uso: python -m benchmarks.bench_frete [carrinhos] [itens_por_carrinho]
+"""
+import random
+import sys
+import time
+
+from app.services.frete import CalculadoraFrete
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    itens_por_carrinho = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    aleatorio = random.Random(1)
+    carrinhos = [{
+        "cep": f"{aleatorio.randrange(1_000_000, 99_999_999):08d}",
+        "itens": [{"produtoId": str(j), "quantidade": aleatorio.randint(1, 3), "peso": aleatorio.choice((0.2, 0.5, 1.3))}
+                  for j in range(itens_por_carrinho)]
+    } for _ in range(quantidade)]
+
+    calculadora = CalculadoraFrete()
+    for rodada in ("fria", "quente"):
+        inicio = time.perf_counter()
+        resultados = calculadora.cotar_lote(carrinhos)
+        decorrido = time.perf_counter() - inicio
+        print(f"rodada {rodada:>6}: {decorrido / quantidade * 1e6:6.2f} µs/carrinho ({itens_por_carrinho} itens)")
+
+    erros = sum(1 for r in resultados if "erro" in r)
+    print(f"cache: {calculadora.estatisticas_cache()} | carrinhos sem entrega: {erros}")
+
+
+if __name__ == "__main__":
+    main()
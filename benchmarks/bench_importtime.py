@@ -0,0 +1,63 @@
+"""Perfil de inicialização no estilo ``python -X importtime``.
+
+Roda ``create_app()`` em um processo novo com ``-X importtime`` e resume o custo
+cumulativo por pacote de topo e os módulos mais caros, para acompanhar o cold
+start (ex.: garantir que azure.cosmos e pydantic não entram no caminho de boot).
+
+Uso: python -m benchmarks.bench_importtime [quantidade_de_modulos]
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+SCRIPT = "from app import create_app; create_app()"
+
+# Pacotes que devem ser carregados sob demanda, não na inicialização
+PREGUICOSOS = ("azure", "pydantic", "urllib3", "dateutil", "numpy", "scipy")
+
+
+def coletar(swagger_habilitado):
+    ambiente = dict(os.environ, SWAGGER_HABILITADO="true" if swagger_habilitado else "false")
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        capture_output=True, text=True, env=ambiente, check=True
+    )
+    modulos = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, nome = linha[len("import time:"):].split("|")
+        modulos.append((nome.strip(), int(proprio), int(cumulativo)))
+    return modulos
+
+
+def relatorio(modulos, quantidade):
+    por_pacote = defaultdict(int)
+    for nome, proprio, _ in modulos:
+        por_pacote[nome.split(".")[0]] += proprio
+
+    total = sum(por_pacote.values())
+    print(f"total importado: {total / 1000:.1f} ms em {len(modulos)} módulos")
+    print("por pacote (tempo próprio somado):")
+    for pacote, tempo in sorted(por_pacote.items(), key=lambda i: -i[1])[:quantidade]:
+        print(f"  {pacote:<30} {tempo / 1000:8.1f} ms")
+
+    print("módulos mais caros (cumulativo):")
+    for nome, _, cumulativo in sorted(modulos, key=lambda m: -m[2])[:quantidade]:
+        print(f"  {nome:<50} {cumulativo / 1000:8.1f} ms")
+
+    carregados = sorted({p for p in por_pacote if p in PREGUICOSOS})
+    print("SDKs pesados carregados no boot:", ", ".join(carregados) if carregados else "nenhum")
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    for swagger in (True, False):
+        print(f"=== SWAGGER_HABILITADO={str(swagger).lower()}")
+        relatorio(coletar(swagger), quantidade)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark do rate limiting e do descarte de carga.
+
+Confere o token bucket com um relógio controlado, mede o custo de
+``ArmazemLocal.consumir`` e simula uma sobrecarga: clientes concorrentes
+disputam um recurso com poucas vagas (como o pool de conexões), com e sem o
+limite de concorrência da rota. Sem o limite, todos esperam na fila e o p99
+cresce com a carga; com ele, o excedente recebe 503 na hora e quem é atendido
+mantém a latência do recurso.
+
+Uso: python -m benchmarks.bench_limites [clientes] [segundos]
+"""
+import sys
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from app.services.limites import ArmazemLocal, init_limites
+
+VAGAS_RECURSO = 4
+TEMPO_RECURSO = 0.02
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def conferir_balde():
+    relogio = Relogio()
+    armazem = ArmazemLocal(relogio)
+    resultados = [armazem.consumir("c", 10, 2.0)[0] for _ in range(11)]
+    assert resultados == [True] * 10 + [False], resultados
+    assert armazem.consumir("c", 10, 2.0) == (False, 0.5)
+    relogio.agora += 1.0
+    assert [armazem.consumir("c", 10, 2.0)[0] for _ in range(3)] == [True, True, False]
+    relogio.agora += 3600
+    assert armazem.consumir("outro", 10, 2.0)[0] and armazem.consumir("c", 10, 2.0)[0]
+
+
+def custo_consumir(chamadas=200_000):
+    armazem = ArmazemLocal()
+    chaves = [f"c:{i % 5000}" for i in range(chamadas)]
+    inicio = time.perf_counter()
+    for chave in chaves:
+        armazem.consumir(chave, 1_000_000, 1_000_000.0)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+
+def criar_app(concorrencia):
+    app = Flask(__name__)
+    app.config.update(
+        LIMITE_CLIENTE=[10 ** 9, 10 ** 9],
+        LIMITES_ROTAS={},
+        LIMITES_CONCORRENCIA={"GET consultar": concorrencia} if concorrencia else {},
+    )
+    init_limites(app)
+    recurso = threading.Semaphore(VAGAS_RECURSO)
+
+    @app.route("/consulta")
+    def consultar():
+        with recurso:
+            time.sleep(TEMPO_RECURSO)
+        return jsonify({"ok": True})
+
+    return app
+
+
+def sobrecarga(concorrencia, clientes, segundos):
+    app = criar_app(concorrencia)
+    atendidas, recusadas = [], []
+    lock = threading.Lock()
+    fim = time.perf_counter() + segundos
+
+    def executar():
+        cliente = app.test_client()
+        locais_ok, locais_recusadas = [], 0
+        while time.perf_counter() < fim:
+            t = time.perf_counter()
+            resposta = cliente.get("/consulta")
+            if resposta.status_code == 200:
+                locais_ok.append(time.perf_counter() - t)
+            else:
+                locais_recusadas += 1
+                time.sleep(0.005)  # o cliente respeita um pequeno intervalo antes de tentar de novo
+        with lock:
+            atendidas.extend(locais_ok)
+            recusadas.append(locais_recusadas)
+
+    grupo = [threading.Thread(target=executar) for _ in range(clientes)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    atendidas.sort()
+    return (
+        len(atendidas) / segundos,
+        atendidas[len(atendidas) // 2] * 1000,
+        atendidas[int(len(atendidas) * 0.99)] * 1000,
+        sum(recusadas)
+    )
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    conferir_balde()
+    print("token bucket conferido (rajada, reposição e espera do Retry-After)")
+    print(f"ArmazemLocal.consumir(): {custo_consumir():.2f} µs por chamada")
+
+    print(f"{clientes} clientes, recurso com {VAGAS_RECURSO} vagas de {TEMPO_RECURSO * 1000:.0f} ms:")
+    for nome, concorrencia in (("sem limite", None), ("limite de concorrência", VAGAS_RECURSO)):
+        vazao, mediana, p99, recusadas = sobrecarga(concorrencia, clientes, segundos)
+        print(f"  {nome}: {vazao:.0f} req/s atendidas, mediana {mediana:.1f} ms, p99 {p99:.1f} ms, "
+              f"{recusadas} recusadas com 503")
+
+
+if __name__ == "__main__":
+    main()
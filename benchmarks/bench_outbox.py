@@ -0,0 +1,186 @@
+"""Benchmark do outbox SQL -> Cosmos.
+
+Mede o custo que o outbox acrescenta ao commit de uma rota SQL (a linha extra na
+mesma transação) e a vazão do relay contra um container em memória com latência
+por chamada (``LATENCIA_COSMOS``), comparada com uma escrita por documento.
+Confere também a captura: criação, alteração, mudança de partição e exclusão
+viram as operações certas, e o saldo do cartão não gera evento.
+
+Requer o pacote azure-cosmos (exceções do SDK usadas pelo relay).
+Uso: python -m benchmarks.bench_outbox [pedidos] [usuarios]
+"""
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+from flask import Flask
+
+from app.database import db
+from app.models.cartao import Cartao
+from app.models.endereco import Endereco  # noqa: F401 - relacionamentos do Usuario
+from app.models.outbox import Outbox
+from app.models.pedido import Pedido
+from app.models.usuario import Usuario
+from app.services.outbox import Relay, init_outbox
+
+LATENCIA_COSMOS = 0.005
+
+
+class ContainerMemoria:
+    """Container do Cosmos em memória com a latência de uma chamada de rede"""
+
+    def __init__(self):
+        self.documentos = {}
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def _chamada(self):
+        time.sleep(LATENCIA_COSMOS)
+        with self._lock:
+            self.chamadas += 1
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        self._chamada()
+        with self._lock:
+            for tipo, argumentos, *_ in batch_operations:
+                if tipo == "upsert":
+                    self.documentos[(partition_key, argumentos[0]["id"])] = dict(argumentos[0])
+                elif tipo == "patch":
+                    documento = self.documentos[(partition_key, argumentos[0])]
+                    for operacao in argumentos[1]:
+                        documento[operacao["path"][1:]] = operacao["value"]
+                elif tipo == "delete":
+                    self.documentos.pop((partition_key, argumentos[0]), None)
+
+    def upsert_item(self, documento):
+        self._chamada()
+        with self._lock:
+            self.documentos[(documento["usuarioId"], documento["id"])] = dict(documento)
+
+
+def criar_app(diretorio):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{diretorio}/outbox.db", OUTBOX_ATRASO=0.0)
+    db.init_app(app)
+    init_outbox(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def novo_pedido(usuario_id, indice):
+    return Pedido(nome_cliente=f"cliente {usuario_id}", data_pedido=date(2024, 1, 1 + indice % 28),
+                  nome_produto=f"produto {indice}", valor_total=10.0 + indice, status="Pendente",
+                  id_usuario=usuario_id)
+
+
+def conferir(app):
+    containers = {"pedidos": ContainerMemoria(), "cartoes": ContainerMemoria(), "enderecos": ContainerMemoria()}
+    relay = Relay(containers, atraso=0.0)
+    with app.app_context():
+        db.session.add_all([Usuario(id=1, nome="a", email="a@x"), Usuario(id=2, nome="b", email="b@x")])
+        pedido = novo_pedido(1, 0)
+        cartao = Cartao(usuario_id=1, numero="4111111111111111", nome_impresso="A", cvv="123",
+                        validade=datetime(2030, 1, 31), bandeira="visa", tipo="credito", saldo=100)
+        db.session.add_all([pedido, cartao])
+        db.session.commit()
+        relay.encaminhar()
+        documento = containers["cartoes"].documentos[("1", f"sql-{cartao.id}")]
+        assert documento["numero"].endswith("1111") and "cvv" not in documento and documento["principal"] is False
+
+        antes = Outbox.query.count()
+        cartao.saldo = 50
+        db.session.commit()
+        assert Outbox.query.count() == antes  # saldo não é espelhado
+
+        documento["principal"] = True
+        cartao.nome_impresso = "B"
+        pedido.status = "Pago"
+        db.session.commit()
+        relay.encaminhar()
+        assert documento["principal"] is True and documento["nomeTitular"] == "B"  # patch preserva campos do Cosmos
+        assert containers["pedidos"].documentos[("1", f"sql-{pedido.id_pedido}")]["status"] == "Pago"
+
+        pedido.id_usuario = 2
+        db.session.commit()
+        relay.encaminhar()
+        assert ("1", f"sql-{pedido.id_pedido}") not in containers["pedidos"].documentos
+        assert ("2", f"sql-{pedido.id_pedido}") in containers["pedidos"].documentos
+
+        db.session.delete(pedido)
+        db.session.commit()
+        relay.encaminhar()
+        assert not containers["pedidos"].documentos
+
+        # Falha no envio: a marca não avança e o lote é reenviado
+        db.session.add(novo_pedido(1, 1))
+        db.session.commit()
+        relay.containers = {**containers, "pedidos": None}
+        try:
+            relay.encaminhar_lote()
+            raise AssertionError("o envio deveria falhar")
+        except AttributeError:
+            pass
+        relay.containers = containers
+        assert relay.encaminhar()["linhas"] == 1 and len(containers["pedidos"].documentos) == 1
+
+
+def medir_commit(app, repeticoes):
+    tempos = {}
+    with app.app_context():
+        for nome, ativo in (("sem outbox", False), ("com outbox", True)):
+            app.extensions["outbox"] = ativo
+            inicio = time.perf_counter()
+            for indice in range(repeticoes):
+                db.session.add(novo_pedido(1, indice))
+                db.session.commit()
+            tempos[nome] = (time.perf_counter() - inicio) / repeticoes * 1e6
+        app.extensions["outbox"] = True
+    return tempos
+
+
+def medir_relay(app, pedidos, usuarios):
+    containers = {"pedidos": ContainerMemoria(), "cartoes": ContainerMemoria(), "enderecos": ContainerMemoria()}
+    with app.app_context():
+        Relay(containers, atraso=0.0).encaminhar()  # esvazia o que a medição do commit gerou
+        containers["pedidos"] = ContainerMemoria()
+        db.session.add_all([Usuario(id=100 + i, nome=f"u{i}", email=f"u{i}@x") for i in range(usuarios)])
+        db.session.commit()
+        pendentes = [novo_pedido(100 + indice % usuarios, indice) for indice in range(pedidos)]
+        db.session.add_all(pendentes)
+        db.session.commit()
+        for pedido in pendentes[::2]:
+            pedido.status = "Pago"  # alterações do mesmo documento no lote são consolidadas
+        db.session.commit()
+
+        relay = Relay(containers, tamanho_lote=2000, atraso=0.0, paralelismo=8)
+        inicio = time.perf_counter()
+        total = relay.encaminhar()
+        segundos = time.perf_counter() - inicio
+    return total, segundos, containers["pedidos"]
+
+
+def main():
+    pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    usuarios = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(diretorio)
+        conferir(app)
+        print("captura conferida: criação, patch preservando campos do Cosmos, mudança de partição, exclusão e reenvio")
+
+        for nome, micros in medir_commit(app, 500).items():
+            print(f"commit de um pedido {nome}: {micros:.0f} µs")
+
+        total, segundos, container = medir_relay(app, pedidos, usuarios)
+        sequencial = total["linhas"] * LATENCIA_COSMOS
+        print(f"relay: {total['linhas']} linhas -> {total['documentos']} documentos em {total['lotes']} lotes, "
+              f"{container.chamadas} chamadas ao Cosmos, {segundos:.2f} s ({total['documentos'] / segundos:.0f} docs/s)")
+        print(f"uma escrita por linha ({LATENCIA_COSMOS * 1e3:.0f} ms cada) levaria {sequencial:.1f} s")
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
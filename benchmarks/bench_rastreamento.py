@@ -0,0 +1,138 @@
+"""Benchmark do custo do rastreamento no caminho quente.
+
+Uma rota no formato das rotas de escrita (validação Pydantic, consultas SQL, uma
+consulta e uma leitura pontual no Cosmos em memória, resposta JSON) é chamada pelo
+test client com o rastreamento desligado e ligado com amostragem 0, 10% e 100%.
+Mede o tempo por requisição e confere, no arquivo OTLP/JSON exportado, que cada
+trace tem o span raiz, os filhos ligados ao pai certo e o RU das chamadas ao Cosmos.
+
+Uso: python -m benchmarks.bench_rastreamento [requisicoes]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from flask import Flask
+from sqlalchemy import text
+
+from app.cosmosdb import ContainerPreguicoso
+from app.database import db
+from app.request.lote_request import LoteRequest
+from app.request.validacao import validar
+from app.response.serializacao import resposta_json
+from app.services import rastreamento
+from benchmarks.cosmos_fake import ContainerFake
+
+CONSULTAS_SQL = 3
+
+
+def criar_app(diretorio, amostragem):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{diretorio}/bench.db",
+        RASTREAMENTO_HABILITADO=amostragem is not None,
+        RASTREAMENTO_AMOSTRAGEM=amostragem or 0.0,
+        RASTREAMENTO_ARQUIVO=f"{diretorio}/spans-{amostragem}.jsonl",
+    )
+    db.init_app(app)
+    rastreamento.rastreador.configurar(None, 0.0)
+    rastreamento.init_rastreamento(app)
+
+    container = ContainerPreguicoso("produtos")
+    container._container = ContainerFake(partition_key="produtoCategoria")
+    for i in range(50):
+        container._container.create_item({"id": f"produto-{i}", "produtoCategoria": "c", "preco": i})
+
+    @app.post("/lote")
+    def lote():
+        corpo = validar(LoteRequest)
+        for _ in range(CONSULTAS_SQL):
+            db.session.execute(text("SELECT 1")).all()
+        documentos = list(container.query_items(
+            query="SELECT * FROM root r WHERE ARRAY_CONTAINS(@ids, r.id)",
+            parameters=[{"name": "@ids", "value": corpo.ids}], enable_cross_partition_query=True
+        ))
+        documentos.append(container.read_item("produto-0", partition_key="c"))
+        return resposta_json(documentos)
+
+    return app
+
+
+def medir(apps, requisicoes, rodadas=5):
+    """Melhor tempo por requisição de cada app, em rodadas intercaladas entre elas.
+
+    O test client e o SQLite oscilam mais que o custo medido; intercalar tira o efeito
+    da ordem, e cada app recoloca o seu estado no rastreador (que é do processo).
+    """
+    corpo = {"ids": [f"produto-{i}" for i in range(20)]}
+    clientes = [app.test_client() for app, _ in apps]
+    for cliente, (_, estado) in zip(clientes, apps):
+        rastreamento.rastreador.configurar(*estado)
+        for _ in range(300):
+            cliente.post("/lote", json=corpo)
+
+    melhores = [float("inf")] * len(apps)
+    por_rodada = requisicoes // rodadas
+    for _ in range(rodadas):
+        for indice, (cliente, (_, estado)) in enumerate(zip(clientes, apps)):
+            rastreamento.rastreador.configurar(*estado)
+            inicio = time.perf_counter()
+            for _ in range(por_rodada):
+                resposta = cliente.post("/lote", json=corpo)
+                assert resposta.status_code == 200
+            melhores[indice] = min(melhores[indice], (time.perf_counter() - inicio) / por_rodada)
+    return melhores
+
+
+def conferir(caminho):
+    """Spans por trace e RU total, conferindo a árvore de cada trace"""
+    spans = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            for recurso in json.loads(linha)["resourceSpans"]:
+                for escopo in recurso["scopeSpans"]:
+                    spans.extend(escopo["spans"])
+
+    por_trace = Counter(s["traceId"] for s in spans)
+    ids = {s["spanId"]: s for s in spans}
+    ru = 0.0
+    for s in spans:
+        atributos = {a["key"]: a["value"] for a in s["attributes"]}
+        if s["parentSpanId"]:
+            assert ids[s["parentSpanId"]]["traceId"] == s["traceId"], "filho fora do trace do pai"
+        else:
+            assert s["kind"] == rastreamento.SERVIDOR and atributos["http.route"]["stringValue"] == "/lote"
+        ru += atributos.get("db.cosmosdb.request_charge", {}).get("doubleValue", 0.0)
+    traces = len(por_trace)
+    return traces, len(spans) / traces if traces else 0, ru / traces if traces else 0
+
+
+def main():
+    requisicoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"{requisicoes} requisições (validação + {CONSULTAS_SQL} SQL + 2 Cosmos + JSON)")
+        print(f"{'rastreamento':>15} | {'µs/req':>8} | {'traces':>6} | {'spans/trace':>11} | {'RU/trace':>8}")
+        modos = (("desligado", None), ("amostragem 0", 0.0), ("amostragem 10%", 0.1), ("amostragem 100%", 1.0))
+        apps = []
+        for _, amostragem in modos:
+            app = criar_app(diretorio, amostragem)
+            rastreador = rastreamento.rastreador
+            apps.append((app, (rastreador.exportador, rastreador.razao, rastreador.sql_maximo)))
+
+        tempos = medir(apps, requisicoes)
+        for (nome, _), (app, (exportador, _, _)), por_requisicao in zip(modos, apps, tempos):
+            traces = spans = ru = 0
+            if exportador is not None:
+                # Parte dos spans já pode ter sido gravada pela thread do exportador
+                exportador.descarregar()
+                if os.path.exists(app.config["RASTREAMENTO_ARQUIVO"]):
+                    traces, spans, ru = conferir(app.config["RASTREAMENTO_ARQUIVO"])
+            print(f"{nome:>15} | {por_requisicao * 1e6:>8.0f} | {traces:>6} | {spans:>11.1f} | {ru:>8.1f}"
+                  f"  ({(por_requisicao / tempos[0] - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
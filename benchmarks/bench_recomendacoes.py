@@ -0,0 +1,86 @@
+"""Benchmark do índice de recomendações "comprados juntos".
+
+Gera cestas aleatórias com pares de produtos plantados (comprados juntos com
+frequência), monta o índice com ``gerar_indice`` e confere que cada par plantado
+aparece entre os primeiros vizinhos. Mede o tempo do job, o tamanho do ``.npz`` e
+a latência de ``recomendar`` servindo da memória. Também passa as cestas pelo
+container em memória para exercitar ``cestas_cosmos``.
+
+Uso: python -m benchmarks.bench_recomendacoes [pedidos] [produtos]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from app.services.recomendacoes import IndiceRecomendacoes, cestas_cosmos, gerar_indice
+from benchmarks.cosmos_fake import ContainerFake
+
+PARES = 200
+
+
+def gerar_cestas(pedidos, produtos, semente=17):
+    aleatorio = random.Random(semente)
+    pares = [(f"p-{2 * i}", f"p-{2 * i + 1}") for i in range(PARES)]
+    for _ in range(pedidos):
+        cesta = [f"p-{aleatorio.randrange(produtos)}" for _ in range(aleatorio.randint(1, 4))]
+        if aleatorio.random() < 0.3:
+            cesta.extend(aleatorio.choice(pares))
+        yield cesta
+
+
+def conferir_cosmos():
+    container = ContainerFake(partition_key="usuarioId")
+    for i, cesta in enumerate(gerar_cestas(2000, 300, semente=3)):
+        container.create_item({
+            "id": f"ped-{i}", "usuarioId": f"u-{i % 50}", "dataPedido": "2024-05-01T10:00:00",
+            "itens": [{"produtoId": p, "quantidade": 1, "precoUnitario": 10.0} for p in cesta]
+        })
+    indice = gerar_indice(cestas_cosmos(container), k=5)
+    assert indice.recomendar("p-0", 1)[0]["produtoId"] == "p-1"
+
+
+def main():
+    pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    produtos = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    conferir_cosmos()
+    print("cestas lidas do container em memória conferidas")
+
+    inicio = time.perf_counter()
+    indice = gerar_indice(gerar_cestas(pedidos, produtos))
+    job = time.perf_counter() - inicio
+
+    encontrados = sum(
+        [r["produtoId"] for r in indice.recomendar(f"p-{2 * i}", 1)] == [f"p-{2 * i + 1}"]
+        for i in range(PARES)
+    )
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "recomendacoes.npz")
+        indice.salvar(caminho)
+        tamanho = os.path.getsize(caminho)
+        inicio = time.perf_counter()
+        indice = IndiceRecomendacoes.carregar(caminho)
+        carga = time.perf_counter() - inicio
+
+    aleatorio = random.Random(1)
+    consultas = [f"p-{aleatorio.randrange(produtos)}" for _ in range(20000)]
+    tempos = []
+    for produto_id in consultas:
+        t = time.perf_counter()
+        indice.recomendar(produto_id, 10)
+        tempos.append(time.perf_counter() - t)
+    tempos.sort()
+
+    print(f"{pedidos} pedidos, {len(indice)} produtos: job em {job:.1f} s")
+    print(f"pares plantados no topo dos vizinhos: {encontrados}/{PARES}")
+    print(f"índice .npz: {tamanho / 2 ** 20:.1f} MiB, carregado em {carga * 1000:.0f} ms")
+    print(f"recomendar(): mediana {statistics.median(tempos) * 1e6:.1f} µs, "
+          f"p99 {tempos[int(len(tempos) * 0.99)] * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
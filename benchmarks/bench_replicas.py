@@ -0,0 +1,123 @@
+"""Benchmark do roteamento de leituras para réplicas.
+
+Sobe duas instâncias SQLite (primário e réplica, com dados diferentes para
+distinguir de onde veio cada leitura) e confere: GET lê da réplica, PUT escreve
+no primário, o cliente que acabou de escrever lê do primário durante a janela e
+uma réplica atrasada sai do rodízio. Mede também o custo da escolha da réplica
+por consulta.
+
+Uso: python -m benchmarks.bench_replicas [consultas]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from flask import Blueprint, Flask, jsonify
+
+from app.database import db
+from app.models.cartao import Cartao  # noqa: F401 - relacionamentos do Usuario
+from app.models.endereco import Endereco  # noqa: F401
+from app.models.pedido import Pedido  # noqa: F401
+from app.models.usuario import Usuario
+from app.services.replicas import init_replicas
+
+JANELA = 0.3
+
+
+def criar_app(diretorio):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(diretorio, 'primario.db')}",
+        SQLALCHEMY_BINDS={"replica_0": f"sqlite:///{os.path.join(diretorio, 'replica.db')}"},
+        LEITURA_PROPRIA_JANELA=JANELA,
+    )
+    db.init_app(app)
+    init_replicas(app)
+
+    rotas = Blueprint("usuarios", __name__)
+
+    @rotas.route("/<int:usuario_id>", methods=["GET"])
+    def buscar(usuario_id):
+        usuario = Usuario.query.get(usuario_id)
+        return jsonify({"nome": usuario.nome if usuario else None})
+
+    @rotas.route("/<int:usuario_id>", methods=["PUT"])
+    def renomear(usuario_id):
+        usuario = Usuario.query.get(usuario_id)
+        usuario.nome = "renomeado no primário"
+        db.session.commit()
+        return jsonify({"ok": True})
+
+    app.register_blueprint(rotas, url_prefix="/usuarios")
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines["replica_0"])
+        db.session.add(Usuario(id=1, nome="primário", email="p@exemplo.com"))
+        db.session.commit()
+        with db.engines["replica_0"].begin() as conexao:
+            conexao.execute(Usuario.__table__.insert(), [{"id": 1, "nome": "réplica", "email": "p@exemplo.com"}])
+    return app
+
+
+def conferir(app):
+    cliente = app.test_client()
+    assert cliente.get("/usuarios/1").json["nome"] == "réplica"
+
+    assert cliente.put("/usuarios/1").status_code == 200
+    assert cliente.get("/usuarios/1").json["nome"] == "renomeado no primário"  # leia-o-que-escreveu
+    assert app.test_client().get("/usuarios/1", environ_base={"REMOTE_ADDR": "10.0.0.2"}).json["nome"] == "réplica"
+
+    time.sleep(JANELA + 0.05)
+    assert cliente.get("/usuarios/1").json["nome"] == "réplica"
+
+    roteador = app.extensions["replicas"]()
+    roteador.medir = lambda engine: 30.0
+    roteador.verificar(forcar=True)
+    assert cliente.get("/usuarios/1").json["nome"] == "renomeado no primário"  # réplica atrasada
+    roteador.medir = lambda engine: 0.0
+    roteador.verificar(forcar=True)
+    return roteador.estado()
+
+
+def medir(app, consultas):
+    cliente = app.test_client(use_cookies=False)
+    resultados = {}
+    for nome in ("da réplica", "do primário"):
+        if nome == "do primário":
+            app.extensions["replicas"]().medir = lambda engine: 30.0
+            app.extensions["replicas"]().verificar(forcar=True)
+        tempos = []
+        for _ in range(consultas):
+            t = time.perf_counter()
+            cliente.get("/usuarios/1")
+            tempos.append(time.perf_counter() - t)
+        tempos.sort()
+        resultados[nome] = tempos[len(tempos) // 2] * 1e6
+    return resultados
+
+
+def main():
+    consultas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(diretorio)
+        estado = conferir(app)
+        print("roteamento conferido: GET na réplica, escrita no primário, leia-o-que-escreveu e réplica atrasada")
+        print(f"leituras por destino: {estado['leituras']}")
+
+        roteador = app.extensions["replicas"]()
+        inicio = time.perf_counter()
+        for _ in range(100_000):
+            roteador.escolher()
+        print(f"Roteador.escolher(): {(time.perf_counter() - inicio) / 100_000 * 1e6:.2f} µs por consulta")
+
+        for destino, mediana in medir(app, consultas).items():
+            print(f"GET completo lendo {destino}: mediana {mediana:.0f} µs")
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark do resumo de pedidos por usuário.
+
+Gera criações, alterações de status e exclusões lógicas de pedidos, processa o
+change feed com ``ChangeFeedWorker`` e confere o resumo contra o cálculo
+completo. Depois compara a leitura antiga (todos os pedidos do usuário somados no
+cliente) com o point read do resumo, em chamadas, documentos lidos e tempo.
+
+Uso: python -m benchmarks.bench_resumo_pedidos [pedidos_por_usuario] [latencia_ms]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.services.change_feed import Barramento, ChangeFeedWorker
+from app.services.resumo_pedidos import assinar_change_feed, buscar_resumo, publico, valor_pedido
+from benchmarks.cosmos_fake import ContainerFake
+
+USUARIOS = 20
+STATUS = ("Pendente", "Pago", "Enviado", "Entregue", "Cancelado")
+
+
+def gerar_operacoes(pedidos, resumos, por_usuario, semente=7):
+    aleatorio = random.Random(semente)
+    inicio = datetime(2024, 1, 1)
+    ids = []
+    for u in range(USUARIOS):
+        for p in range(por_usuario):
+            pedido = {
+                "id": f"p-{u}-{p}",
+                "usuarioId": f"u-{u}",
+                "itens": [{"produtoId": "x", "quantidade": aleatorio.randint(1, 3),
+                           "precoUnitario": round(aleatorio.uniform(5, 500), 2)}],
+                "status": "Pendente",
+                "dataPedido": (inicio + timedelta(hours=aleatorio.randint(0, 8760))).isoformat(timespec="seconds")
+            }
+            pedido["valorTotal"] = valor_pedido(pedido)
+            pedidos.create_item(pedido)
+            ids.append((pedido["id"], pedido["usuarioId"]))
+
+    barramento = Barramento()
+    assinar_change_feed(barramento, resumos)
+    worker = ChangeFeedWorker({"pedidos": pedidos}, barramento=barramento, desde_o_inicio=True)
+    worker.executar_uma_vez()
+
+    # Segunda rodada: mudanças de status e exclusões depois do primeiro processamento
+    for pedido_id, usuario_id in aleatorio.sample(ids, len(ids) // 3):
+        operacoes = [{"op": "set", "path": "/status", "value": aleatorio.choice(STATUS)}]
+        if aleatorio.random() < 0.3:
+            operacoes += [{"op": "set", "path": "/excluido", "value": True}, {"op": "set", "path": "/ttl", "value": 60}]
+        pedidos.patch_item(item=pedido_id, partition_key=usuario_id, patch_operations=operacoes)
+    worker.executar_uma_vez()
+    # Reprocessar o feed inteiro (worker sem checkpoint) não pode alterar os resumos
+    ChangeFeedWorker({"pedidos": pedidos}, barramento=barramento, desde_o_inicio=True).executar_uma_vez()
+
+
+def resumo_completo(pedidos, usuario_id):
+    """Leitura antiga: todos os pedidos do usuário, somados no cliente"""
+    query = "SELECT * FROM pedidos p WHERE NOT IS_DEFINED(p.excluido)"
+    documentos = list(pedidos.query_items(query=query, partition_key=usuario_id))
+    por_status = {}
+    for documento in documentos:
+        por_status[documento["status"]] = por_status.get(documento["status"], 0) + 1
+    return {
+        "usuarioId": usuario_id,
+        "quantidadePedidos": len(documentos),
+        "valorTotal": round(sum(d["valorTotal"] for d in documentos), 2),
+        "ultimoPedido": max((d["dataPedido"] for d in documentos), default=None),
+        "porStatus": por_status
+    }, len(documentos)
+
+
+def main():
+    por_usuario = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latencia = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+    pedidos = ContainerFake(partition_key="usuarioId")
+    resumos = ContainerFake(partition_key="usuarioId")
+
+    inicio = time.perf_counter()
+    gerar_operacoes(pedidos, resumos, por_usuario)
+    print(f"{USUARIOS * por_usuario} pedidos processados pelo change feed em {time.perf_counter() - inicio:.2f} s")
+
+    documentos_lidos = 0
+    for u in range(USUARIOS):
+        esperado, lidos = resumo_completo(pedidos, f"u-{u}")
+        documentos_lidos += lidos
+        assert publico(buscar_resumo(resumos, f"u-{u}")) == esperado, f"resumo divergente para u-{u}"
+    print(f"resumos conferidos com o cálculo completo ({USUARIOS} usuários)")
+
+    pedidos.latencia = resumos.latencia = latencia
+    pedidos.zerar_contadores()
+    resumos.zerar_contadores()
+    inicio = time.perf_counter()
+    for u in range(USUARIOS):
+        resumo_completo(pedidos, f"u-{u}")
+    antigo = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for u in range(USUARIOS):
+        publico(buscar_resumo(resumos, f"u-{u}"))
+    novo = time.perf_counter() - inicio
+
+    print(f"latência simulada por chamada: {latencia * 1000:.1f} ms")
+    print(f"{'versão':>8} | {'chamadas':>8} | {'docs lidos':>10} | {'ms/usuário':>10}")
+    print(f"{'consulta':>8} | {pedidos.total_chamadas():>8} | {documentos_lidos:>10} | {antigo * 1000 / USUARIOS:>10.2f}")
+    print(f"{'resumo':>8} | {resumos.total_chamadas():>8} | {USUARIOS:>10} | {novo * 1000 / USUARIOS:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Microbenchmark da camada de serialização com listas de 10k linhas.
+
+Compara, para o mesmo conteúdo:
+  * rota SQL de pedidos: objetos ORM completos + dict por linha + strftime + jsonify
+    contra projeção ``with_entities`` + serializador compilado (+ orjson);
+  * rota Cosmos de pedidos: ``marshal`` do flask-restx contra ``compilar_modelo``.
+
+Usa SQLite em memória, não precisa de MySQL nem de Cosmos.
+
+Uso: python -m benchmarks.bench_serializacao [linhas]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from flask import Flask, jsonify
+from flask_restx import marshal
+
+from app.database import db
+from app.models.usuario import Usuario
+from app.models.pedido import Pedido
+from app.models.endereco import Endereco  # noqa: F401 - relacionamentos do Usuario
+from app.models.cartao import Cartao  # noqa: F401 - relacionamentos do Usuario
+from app.response.serializacao import dumps, serializar_lista
+from app.controllers.pedido_controller import pedido_model, pedido_projecao, serializar_pedido
+
+
+def cronometrar(funcao, repeticoes=5):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000
+
+
+def popular_sql(linhas):
+    usuario = Usuario(nome="Cliente Benchmark", email="bench@example.com")
+    db.session.add(usuario)
+    db.session.flush()
+    inicio = date(2024, 1, 1)
+    db.session.bulk_insert_mappings(Pedido, [{
+        "nome_cliente": f"Cliente {i % 100}",
+        "data_pedido": inicio + timedelta(days=i % 365),
+        "nome_produto": f"Produto {i % 500}",
+        "valor_total": 10.0 + i % 1000,
+        "status": "Pendente",
+        "id_usuario": usuario.id
+    } for i in range(linhas)])
+    db.session.commit()
+
+
+def sql_antigo():
+    pedidos = Pedido.query.filter(Pedido.nome_cliente.ilike("%Cliente%")).all()
+    return jsonify([
+        {
+            "id": p.id_pedido,
+            "cliente": p.nome_cliente,
+            "produto": p.nome_produto,
+            "data": p.data_pedido.strftime("%d/%m/%Y"),
+            "valor": p.valor_total,
+            "status": p.status
+        } for p in pedidos
+    ])
+
+
+def sql_novo():
+    return dumps(pedido_projecao.listar(Pedido.query.filter(Pedido.nome_cliente.ilike("%Cliente%"))))
+
+
+def documentos_cosmos(linhas):
+    return [{
+        "id": str(uuid.uuid4()),
+        "usuarioId": str(i % 100),
+        "enderecoId": str(i),
+        "cartaoId": str(i),
+        "itens": [{"produtoId": str(j), "quantidade": 1 + j, "precoUnitario": 9.9 * j} for j in range(3)],
+        "status": "Pendente",
+        "dataPedido": "2024-01-01",
+        "valorTotal": 99.9,
+        "_rid": "x", "_etag": '"0"', "_ts": 0
+    } for i in range(linhas)]
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        popular_sql(linhas)
+
+        with app.test_request_context():
+            assert sql_antigo().get_json() == json.loads(sql_novo())
+            antigo = cronometrar(sql_antigo)
+            novo = cronometrar(sql_novo)
+        print(f"SQL    {linhas} linhas: ORM + dict + jsonify {antigo:8.1f} ms | projeção compilada {novo:8.1f} ms | {antigo / novo:4.1f}x")
+
+    documentos = documentos_cosmos(linhas)
+    assert marshal(documentos[:10], pedido_model) == serializar_lista(serializar_pedido, documentos[:10])
+    antigo = cronometrar(lambda: json.dumps(marshal(documentos, pedido_model)))
+    novo = cronometrar(lambda: dumps(serializar_lista(serializar_pedido, documentos)))
+    print(f"Cosmos {linhas} docs:   marshal + json       {antigo:8.1f} ms | serializador compilado {novo:8.1f} ms | {antigo / novo:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark do tempo de inicialização da aplicação.
+
+Cada medição roda em um processo novo (como um worker recém-criado) e separa o
+tempo de import do pacote, de create_app() e da primeira requisição.
+
+Uso: python -m benchmarks.bench_startup [repeticoes]
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+SCRIPT = """
+import json, time
+inicio = time.perf_counter()
+from app import create_app
+importado = time.perf_counter()
+app = create_app()
+criado = time.perf_counter()
+app.test_client().get("/swagger.json")
+respondido = time.perf_counter()
+print(json.dumps({
+    "import": importado - inicio,
+    "create_app": criado - importado,
+    "primeira_requisicao": respondido - criado,
+    "total": respondido - inicio,
+}))
+"""
+
+
+def medir():
+    saida = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    medicoes = [medir() for _ in range(repeticoes)]
+    for etapa in ("import", "create_app", "primeira_requisicao", "total"):
+        valores = [m[etapa] * 1000 for m in medicoes]
+        print(f"{etapa:>20}: mediana {statistics.median(valores):8.1f} ms | mín {min(valores):8.1f} ms | máx {max(valores):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
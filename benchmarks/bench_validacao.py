@@ -0,0 +1,105 @@
+"""Benchmark da validação dos corpos de requisição.
+
+Compara, por requisição, os modelos Pydantic validando o corpo cru
+(``model_validate_json``, como faz ``validar``) com a checagem manual anterior
+(``json.loads`` + ``dados.get`` + ``strptime``), que só via campos ausentes ou
+vazios. Mede também o custo de recusar um corpo inválido, que agora para antes
+de qualquer consulta.
+
+Uso: python -m benchmarks.bench_validacao [repeticoes]
+"""
+import json
+import sys
+import time
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from app.models.cartao import fim_do_mes
+from app.request.cartao_request import CartaoRequest
+from app.request.pedido_request import PedidoCosmosRequest, PedidoRequest
+from app.request.transacao_request import TransacaoRequest
+
+
+def pedido_manual(corpo):
+    dados = json.loads(corpo)
+    if not dados.get("nome_cliente") or not dados.get("nome_produto") or not dados.get("valor_total"):
+        return None
+    datetime.strptime(dados["data_pedido"], "%Y-%m-%d")
+    return dados
+
+
+def cartao_manual(corpo):
+    dados = json.loads(corpo)
+    for campo in ("numero", "nome_impresso", "validade", "cvv", "bandeira"):
+        if not dados.get(campo):
+            return None
+    mes, ano = map(int, dados["validade"].split("/"))
+    dados["validade"] = fim_do_mes(ano, mes)
+    return dados
+
+
+def pedido_cosmos_manual(corpo):
+    dados = json.loads(corpo)
+    if not dados.get("usuarioId") or not dados.get("enderecoId") or not dados.get("cartaoId") or not dados.get("itens"):
+        return None
+    return dados
+
+
+def transacao_manual(corpo):
+    dados = json.loads(corpo)
+    mes, ano = map(int, dados["dt_expiracao"].split("/"))
+    fim_do_mes(ano, mes)
+    return dados
+
+
+CASOS = (
+    ("PedidoRequest", PedidoRequest, pedido_manual,
+     {"nome_cliente": "Ana Souza", "nome_produto": "Notebook", "valor_total": 3500.0,
+      "data_pedido": "2024-05-10", "status": "Pendente"},
+     {"nome_cliente": "", "nome_produto": "Notebook", "valor_total": -1, "data_pedido": "10/05/2024"}),
+    ("CartaoRequest", CartaoRequest, cartao_manual,
+     {"numero": "4111111111111111", "nome_impresso": "ANA SOUZA", "validade": "12/2030", "cvv": "123",
+      "bandeira": "visa", "saldo": "1500.00"},
+     {"numero": "4111-1111", "nome_impresso": "ANA SOUZA", "validade": "13/2030", "cvv": "12", "bandeira": "visa"}),
+    ("PedidoCosmosRequest", PedidoCosmosRequest, pedido_cosmos_manual,
+     {"usuarioId": "u-1", "enderecoId": "e-1", "cartaoId": "c-1",
+      "itens": [{"produtoId": f"p-{i}", "quantidade": i + 1, "precoUnitario": 9.9 * (i + 1)} for i in range(5)]},
+     {"usuarioId": "u-1", "enderecoId": "e-1", "cartaoId": "c-1", "itens": [{"produtoId": "p-1", "quantidade": 0}]}),
+    ("TransacaoRequest", TransacaoRequest, transacao_manual,
+     {"numero": "4111111111111111", "dt_expiracao": "12/2030", "cvv": "123", "valor": 99.9},
+     {"numero": "abc", "dt_expiracao": "12/2030", "cvv": "123", "valor": 0}),
+)
+
+
+def cronometrar(funcao, corpo, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        try:
+            funcao(corpo)
+        except (ValidationError, ValueError):
+            pass
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    print(f"{'modelo':>20} {'pydantic':>10} {'manual':>10} {'inválido':>10}  (µs por requisição)")
+    for nome, modelo, manual, valido, invalido in CASOS:
+        corpo, corpo_invalido = json.dumps(valido).encode(), json.dumps(invalido).encode()
+        modelo.model_validate_json(corpo)  # confere que o exemplo válido passa
+        try:
+            modelo.model_validate_json(corpo_invalido)
+            raise AssertionError(f"{nome}: corpo inválido aceito")
+        except ValidationError:
+            pass
+
+        com_modelo = cronometrar(modelo.model_validate_json, corpo, repeticoes)
+        sem_modelo = cronometrar(manual, corpo, repeticoes)
+        recusa = cronometrar(modelo.model_validate_json, corpo_invalido, repeticoes)
+        print(f"{nome:>20} {com_modelo:10.2f} {sem_modelo:10.2f} {recusa:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Container do Cosmos DB em memória para benchmarks.
+
+Implementa o subconjunto da API de ``ContainerProxy`` usado pelos controllers e
+serviços (consultas parametrizadas, point reads, patch, batch transacional) e
+conta as idas ao servidor de cada operação. Uma latência artificial por chamada
+pode ser configurada para aproximar o custo de rede.
+
+O change feed segue o modo "latest version" do Cosmos: cada escrita recebe um
+``_lsn`` crescente, a leitura devolve a versão mais recente de cada documento
+alterado depois da continuação e exclusões não aparecem no feed.
+"""
+import operator
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+
+class ErroCosmosFake(Exception):
+    def __init__(self, status_code, mensagem):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+
+_TOKENS = re.compile(
+    r"\s*(?:(?P<num>-?\d+(?:\.\d+)?)|(?P<str>'[^']*')|(?P<param>@\w+)"
+    r"|(?P<op><=|>=|!=|<>|=|<|>|\(|\)|,)|(?P<nome>[A-Za-z_][\w.]*))"
+)
+
+
+def _tokenizar(texto):
+    tokens = []
+    pos = 0
+    texto = texto.strip()
+    while pos < len(texto):
+        m = _TOKENS.match(texto, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Consulta não suportada pelo fake: {texto[pos:]}")
+        pos = m.end()
+        tipo = m.lastgroup
+        tokens.append((tipo, m.group(tipo)))
+    return tokens
+
+
+class _Condicao:
+    """Parser recursivo para cláusulas WHERE simples"""
+
+    def __init__(self, texto, alias, parametros):
+        self.tokens = _tokenizar(texto)
+        self.pos = 0
+        self.alias = alias
+        self.parametros = parametros
+        self.arvore = self._ou()
+
+    def _ver(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _consumir(self):
+        token = self._ver()
+        self.pos += 1
+        return token
+
+    def _ou(self):
+        esquerda = self._e()
+        while self._ver()[1] and self._ver()[1].upper() == "OR":
+            self._consumir()
+            direita = self._e()
+            esquerda = ("or", esquerda, direita)
+        return esquerda
+
+    def _e(self):
+        esquerda = self._nao()
+        while self._ver()[1] and self._ver()[1].upper() == "AND":
+            self._consumir()
+            direita = self._nao()
+            esquerda = ("and", esquerda, direita)
+        return esquerda
+
+    def _nao(self):
+        if self._ver()[1] and self._ver()[1].upper() == "NOT":
+            self._consumir()
+            return ("not", self._nao())
+        return self._comparacao()
+
+    def _comparacao(self):
+        esquerda = self._operando()
+        tipo, valor = self._ver()
+        if tipo == "op" and valor in ("=", "!=", "<>", "<", "<=", ">", ">="):
+            self._consumir()
+            return ("cmp", valor, esquerda, self._operando())
+        return esquerda
+
+    def _operando(self):
+        tipo, valor = self._consumir()
+        if tipo == "op" and valor == "(":
+            expr = self._ou()
+            self._consumir()
+            return expr
+        if tipo == "num":
+            return ("lit", float(valor) if "." in valor else int(valor))
+        if tipo == "str":
+            return ("lit", valor[1:-1])
+        if tipo == "param":
+            return ("lit", self.parametros[valor])
+        if valor.lower() in ("true", "false"):
+            return ("lit", valor.lower() == "true")
+        if valor.lower() == "null":
+            return ("lit", None)
+        if self._ver() == ("op", "("):
+            self._consumir()
+            argumentos = []
+            while self._ver() != ("op", ")"):
+                argumentos.append(self._ou())
+                if self._ver() == ("op", ","):
+                    self._consumir()
+            self._consumir()
+            return ("fn", valor.upper(), argumentos)
+        return ("campo", valor.split(".")[1:] if valor.split(".")[0] == self.alias else valor.split("."))
+
+    def avaliar(self, documento, no=None):
+        no = self.arvore if no is None else no
+        tipo = no[0]
+        if tipo == "lit":
+            return no[1]
+        if tipo == "campo":
+            valor = documento
+            for parte in no[1]:
+                if not isinstance(valor, dict) or parte not in valor:
+                    return _INDEFINIDO
+                valor = valor[parte]
+            return valor
+        if tipo == "and":
+            return self.avaliar(documento, no[1]) is True and self.avaliar(documento, no[2]) is True
+        if tipo == "or":
+            return self.avaliar(documento, no[1]) is True or self.avaliar(documento, no[2]) is True
+        if tipo == "not":
+            return not self.avaliar(documento, no[1])
+        if tipo == "fn":
+            argumentos = [self.avaliar(documento, a) for a in no[2]]
+            if no[1] == "ARRAY_CONTAINS":
+                return argumentos[1] in (argumentos[0] or [])
+            if no[1] == "IS_DEFINED":
+                return argumentos[0] is not _INDEFINIDO
+            if no[1] == "STARTSWITH":
+                return isinstance(argumentos[0], str) and argumentos[0].startswith(argumentos[1])
+            raise ValueError(f"Função não suportada pelo fake: {no[1]}")
+        operador, esquerda, direita = no[1], self.avaliar(documento, no[2]), self.avaliar(documento, no[3])
+        if esquerda is _INDEFINIDO or direita is _INDEFINIDO:
+            return False
+        try:
+            return _COMPARADORES[operador](esquerda, direita)
+        except TypeError:
+            return False
+
+
+_INDEFINIDO = object()
+
+_COMPARADORES = {
+    "=": operator.eq, "!=": operator.ne, "<>": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+_SELECT = re.compile(
+    r"^\s*SELECT\s+(?P<value>VALUE\s+)?(?P<campos>.+?)\s+FROM\s+\w+(?:\s+(?P<alias>\w+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+ORDER\s+BY\s+(?P<ordem>[\w.]+)(?:\s+(?P<direcao>ASC|DESC))?)?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+class ContainerFake:
+    def __init__(self, partition_key="id", latencia=0.0):
+        self.partition_key = partition_key
+        self.latencia = latencia
+        self.itens = {}
+        self.chamadas = Counter()
+        self.documentos_escritos = 0
+        self._lsn = 0
+        self._lock = threading.RLock()
+        # Mesmo atributo usado pelo SDK para expor os headers da última resposta
+        self.client_connection = SimpleNamespace(last_response_headers={})
+
+    # Infraestrutura ---------------------------------------------------------
+    def _ida_ao_servidor(self, operacao, kwargs=None, **cabecalhos):
+        """Conta a chamada e entrega os headers da resposta ao ``response_hook``, como o SDK"""
+        self.chamadas[operacao] += 1
+        # RU simulado: leitura pontual custa 1, consulta ~3 e escrita ~6 (como um documento de 1 KB)
+        custo = 1.0 if operacao == "read_item" else 2.9 if operacao.startswith("query") else 6.2
+        cabecalhos = {"x-ms-request-charge": str(custo), **cabecalhos}
+        self.client_connection.last_response_headers = cabecalhos
+        if kwargs and kwargs.get("response_hook"):
+            kwargs["response_hook"](cabecalhos, None)
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _chave(self, documento):
+        return (documento.get(self.partition_key), documento["id"])
+
+    def _gravar(self, documento):
+        documento = dict(documento)
+        documento["_etag"] = f'"{uuid.uuid4()}"'
+        documento["_ts"] = int(time.time())
+        self._lsn += 1
+        documento["_lsn"] = self._lsn
+        self.itens[self._chave(documento)] = documento
+        self.documentos_escritos += 1
+        return dict(documento)
+
+    def _buscar(self, item, partition_key):
+        documento = self.itens.get((partition_key, item))
+        if documento is None:
+            raise ErroCosmosFake(404, "Documento não encontrado")
+        return documento
+
+    @staticmethod
+    def _checar_etag(documento, kwargs):
+        etag = kwargs.get("if_match_etag") or kwargs.get("etag")
+        if etag and documento["_etag"] != etag:
+            raise ErroCosmosFake(412, "Pré-condição falhou")
+
+    def total_chamadas(self):
+        return sum(self.chamadas.values())
+
+    def zerar_contadores(self):
+        self.chamadas.clear()
+        self.documentos_escritos = 0
+
+    # API do ContainerProxy ---------------------------------------------------
+    def create_item(self, body, **kwargs):
+        self._ida_ao_servidor("create_item", kwargs)
+        with self._lock:
+            if self._chave(body) in self.itens:
+                raise ErroCosmosFake(409, "Documento já existe")
+            return self._gravar(body)
+
+    def upsert_item(self, body, **kwargs):
+        self._ida_ao_servidor("upsert_item", kwargs)
+        with self._lock:
+            return self._gravar(body)
+
+    def read_item(self, item, partition_key, **kwargs):
+        self._ida_ao_servidor("read_item", kwargs)
+        with self._lock:
+            return dict(self._buscar(item, partition_key))
+
+    def replace_item(self, item, body, **kwargs):
+        self._ida_ao_servidor("replace_item", kwargs)
+        with self._lock:
+            chave = (body.get(self.partition_key), item)
+            if chave not in self.itens:
+                raise ErroCosmosFake(404, "Documento não encontrado")
+            self._checar_etag(self.itens[chave], kwargs)
+            return self._gravar(body)
+
+    def patch_item(self, item, partition_key, patch_operations, **kwargs):
+        self._ida_ao_servidor("patch_item", kwargs)
+        with self._lock:
+            return self._aplicar_patch(item, partition_key, patch_operations, kwargs)
+
+    def _aplicar_patch(self, item, partition_key, patch_operations, kwargs):
+        documento = dict(self._buscar(item, partition_key))
+        self._checar_etag(documento, kwargs)
+        for operacao in patch_operations:
+            campo = operacao["path"].lstrip("/")
+            if operacao["op"] in ("set", "add", "replace"):
+                documento[campo] = operacao["value"]
+            elif operacao["op"] == "incr":
+                documento[campo] = documento.get(campo, 0) + operacao["value"]
+            elif operacao["op"] == "remove":
+                documento.pop(campo, None)
+        return self._gravar(documento)
+
+    def delete_item(self, item, partition_key, **kwargs):
+        self._ida_ao_servidor("delete_item", kwargs)
+        with self._lock:
+            self._buscar(item, partition_key)
+            del self.itens[(partition_key, item)]
+
+    def execute_item_batch(self, batch_operations, partition_key, **kwargs):
+        """Executa as operações de forma atômica: qualquer falha desfaz o batch"""
+        self._ida_ao_servidor("execute_item_batch", kwargs)
+        with self._lock:
+            copia = dict(self.itens)
+            escritos = self.documentos_escritos
+            lsn = self._lsn
+            resultados = []
+            try:
+                for operacao in batch_operations:
+                    tipo, argumentos = operacao[0], operacao[1]
+                    opcoes = operacao[2] if len(operacao) > 2 else {}
+                    if tipo in ("create", "upsert"):
+                        if tipo == "create" and self._chave(argumentos[0]) in self.itens:
+                            raise ErroCosmosFake(409, "Documento já existe")
+                        resultados.append(self._gravar(argumentos[0]))
+                    elif tipo == "replace":
+                        self._checar_etag(self._buscar(argumentos[0], partition_key), opcoes)
+                        resultados.append(self._gravar(argumentos[1]))
+                    elif tipo == "patch":
+                        resultados.append(self._aplicar_patch(argumentos[0], partition_key, argumentos[1], opcoes))
+                    elif tipo == "read":
+                        resultados.append(dict(self._buscar(argumentos[0], partition_key)))
+                    elif tipo == "delete":
+                        self._buscar(argumentos[0], partition_key)
+                        del self.itens[(partition_key, argumentos[0])]
+                        resultados.append({})
+            except ErroCosmosFake:
+                self.itens = copia
+                self.documentos_escritos = escritos
+                self._lsn = lsn
+                raise
+            return resultados
+
+    def query_items(self, query, parameters=None, partition_key=None, enable_cross_partition_query=None, **kwargs):
+        self._ida_ao_servidor("query_items", kwargs)
+        m = _SELECT.match(query)
+        if not m:
+            raise ValueError(f"Consulta não suportada pelo fake: {query}")
+        alias = m.group("alias")
+        parametros = {p["name"]: p["value"] for p in parameters or []}
+        condicao = _Condicao(m.group("where"), alias, parametros) if m.group("where") else None
+
+        with self._lock:
+            documentos = [
+                d for (pk, _), d in self.itens.items()
+                if (partition_key is None or pk == partition_key)
+                and (condicao is None or condicao.avaliar(d) is True)
+            ]
+
+        if m.group("ordem"):
+            campo = m.group("ordem").split(".")[-1]
+            documentos.sort(key=lambda d: d.get(campo), reverse=(m.group("direcao") or "").upper() == "DESC")
+
+        campos = m.group("campos").strip()
+        if campos == "*":
+            return iter([dict(d) for d in documentos])
+        nomes = [c.strip().split(".")[-1] for c in campos.split(",")]
+        if m.group("value"):
+            return iter([d.get(nomes[0]) for d in documentos])
+        return iter([{n: d[n] for n in nomes if n in d} for d in documentos])
+
+    def query_items_change_feed(self, is_start_from_beginning=False, continuation=None, partition_key=None,
+                                max_item_count=None, **kwargs):
+        """Alterações depois de ``continuation``; a nova continuação fica no header 'etag'"""
+        with self._lock:
+            if continuation is not None:
+                desde = int(continuation)
+            elif is_start_from_beginning:
+                desde = 0
+            else:
+                desde = self._lsn
+            documentos = sorted(
+                (d for (pk, _), d in self.itens.items()
+                 if d["_lsn"] > desde and (partition_key is None or pk == partition_key)),
+                key=lambda d: d["_lsn"]
+            )
+            if max_item_count:
+                documentos = documentos[:max_item_count]
+            ultimo = documentos[-1]["_lsn"] if documentos else desde
+            documentos = [dict(d) for d in documentos]
+        self._ida_ao_servidor("query_items_change_feed", kwargs, etag=str(ultimo))
+        return iter(documentos)
@@ -0,0 +1,45 @@
+"""Configuração do gunicorn para produção; todos os valores podem ser ajustados por variáveis de ambiente."""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# Processos x threads: as rotas passam a maior parte do tempo esperando MySQL/Cosmos
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("THREADS", "4"))
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+
+# Carrega o create_app() uma vez no master; os workers herdam a aplicação já importada
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+
+# Encerramento gracioso: SIGTERM espera as requisições em andamento por até graceful_timeout
+timeout = int(os.getenv("TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Recicla os workers periodicamente para conter vazamentos de memória
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "200"))
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def _descartar_conexoes(fechar):
+    from wsgi import app
+    from app.database import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=fechar)
+
+
+def post_fork(server, worker):
+    # Com preload_app o pool de conexões foi criado no master; cada worker abre o seu
+    _descartar_conexoes(fechar=False)
+
+
+def worker_exit(server, worker):
+    _descartar_conexoes(fechar=True)
@@ -1,12 +1,12 @@
+import os
+
 from app import create_app
-from app.database import db
 
+# Servidor de desenvolvimento. Em produção use o gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+# ou o waitress (python wsgi.py). As tabelas são criadas com: flask --app wsgi init-db
 app = create_app()
 
-with app.app_context():
-    db.create_all()
-
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "8000")), debug=os.getenv("FLASK_DEBUG", "0") == "1")
 
 #http://localhost:8000/docs pra acessar o swagger localhost
@@ -0,0 +1,81 @@
+"""Fixtures dos testes: a aplicação completa sobre SQLite e os containers do Cosmos em memória.
+
+As variáveis de ambiente são definidas antes de importar ``app`` (a Config as lê no import);
+as threads em processo (fila, varredura do estoque, change feed) ficam desligadas.
+"""
+import os
+import tempfile
+
+_DIRETORIO = tempfile.mkdtemp(prefix="ibmec-mall-testes-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DIRETORIO}/testes.db",
+    "FILA_DB_PATH": f"{_DIRETORIO}/fila.db",
+    "FILA_INPROCESSO": "false",
+    "IMPORTACAO_DIRETORIO": f"{_DIRETORIO}/importacoes",
+    "ESTOQUE_VARREDURA_INPROCESSO": "false",
+    "CHANGE_FEED_INPROCESSO": "false",
+    "OUTBOX_INPROCESSO": "false",
+    "RECOMENDACOES_INDICE_PATH": f"{_DIRETORIO}/recomendacoes.npz",
+    "CHANGE_FEED_CHECKPOINTS": f"{_DIRETORIO}/checkpoints.json",
+})
+
+from datetime import date, datetime  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+import pytest  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app import cosmosdb  # noqa: E402
+from app.database import db  # noqa: E402
+from app.models.cartao import Cartao  # noqa: E402
+from app.models.usuario import Usuario  # noqa: E402
+from app.services import velocidade  # noqa: E402
+from benchmarks.cosmos_fake import ContainerFake  # noqa: E402
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Estado do processo que sobreviveria de um teste para o outro (ids se repetem após o drop_all)
+    monkeypatch.setattr(velocidade, "_motor", None)
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def cosmos():
+    """Containers do Cosmos em memória, com as partition keys de DEFINICOES_CONTAINERS"""
+    containers = {}
+    for nome, definicao in cosmosdb.DEFINICOES_CONTAINERS.items():
+        containers[nome] = ContainerFake(partition_key=definicao["partition_key"].lstrip("/"))
+        cosmosdb.get_container(nome)._container = containers[nome]
+    yield containers
+    for nome in containers:
+        cosmosdb.get_container(nome)._container = None
+
+
+@pytest.fixture
+def usuario(app):
+    usuario = Usuario(nome="Ana", email="ana@exemplo.com", dt_nascimento=date(1990, 1, 1), cpf="12345678909",
+                      telefone="21999990000")
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario
+
+
+@pytest.fixture
+def cartao(usuario):
+    cartao = Cartao(usuario_id=usuario.id, numero="4111111111111111", nome_impresso="ANA", validade=datetime(2030, 12, 31),
+                    cvv="123", bandeira="VISA", saldo=Decimal("100.00"))
+    db.session.add(cartao)
+    db.session.commit()
+    return cartao
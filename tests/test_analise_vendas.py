@@ -0,0 +1,119 @@
+import threading
+from datetime import date
+
+import pytest
+
+from app.database import db
+from app.models.pedido import Pedido
+from app.services.analise_vendas import CacheJanelas, ErroAnalise, ler_cosmos, ler_sql, resumo
+from benchmarks.cosmos_fake import ContainerFake
+
+
+def pedidos_com(*documentos):
+    container = ContainerFake(partition_key="usuarioId")
+    for i, documento in enumerate(documentos):
+        container.create_item({"id": f"p{i}", "usuarioId": "u1", "status": "Pago", **documento})
+    return container
+
+
+@pytest.mark.parametrize("documento", [
+    {"dataPedido": "2024-01-xx", "itens": []},
+    {"dataPedido": "2024-01-02", "itens": [{"produtoId": "a", "quantidade": "duas", "precoUnitario": 1.0}]},
+    {"dataPedido": "2024-01-02", "valorTotal": "caro", "itens": []},
+    {"dataPedido": "2024-01-02", "itens": ["a"]},
+])
+def test_pedido_malformado_vira_erro_de_analise(documento):
+    with pytest.raises(ErroAnalise):
+        ler_cosmos(pedidos_com(documento), ContainerFake(partition_key="produtoCategoria"),
+                   date(2024, 1, 1), date(2024, 2, 1))
+
+
+def test_locks_das_janelas_nao_ficam_para_tras():
+    cache = CacheJanelas(maximo=2)
+    for dia in range(1, 20):
+        cache.obter(("sql", dia), 60, lambda: dia)
+    with pytest.raises(RuntimeError):
+        cache.obter(("sql", 99), 60, lambda: (_ for _ in ()).throw(RuntimeError("falhou")))
+    assert cache._locks == {} and len(cache._entradas) <= 2
+
+
+def test_janela_montada_uma_vez_com_requisicoes_simultaneas():
+    cache = CacheJanelas()
+    montagens = []
+    liberar = threading.Event()
+
+    def montar():
+        montagens.append(1)
+        liberar.wait(2)
+        return "colunas"
+
+    threads = [threading.Thread(target=cache.obter, args=(("sql", 1), 60, montar)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert montagens == [1] and cache._locks == {}
+
+
+def catalogo():
+    container = ContainerFake(partition_key="produtoCategoria")
+    container.create_item({"id": "a", "produtoCategoria": "Roupas", "nome": "Camiseta"})
+    container.create_item({"id": "b", "produtoCategoria": "Livros", "nome": "Duna"})
+    container.create_item({"id": "c", "produtoCategoria": "", "nome": "Caneca"})
+    return container
+
+
+def test_relatorios_com_totais_conhecidos():
+    pedidos = pedidos_com(
+        {"dataPedido": "2024-01-01T10:00:00", "itens": [{"produtoId": "a", "quantidade": 2, "precoUnitario": 10.0},
+                                                        {"produtoId": "b", "quantidade": 1, "precoUnitario": 35.0}]},
+        {"dataPedido": "2024-01-01T15:00:00", "valorTotal": 25.5,
+         "itens": [{"produtoId": "c", "quantidade": 3, "precoUnitario": 8.5}]},
+        {"dataPedido": "2024-01-03", "status": "Pendente",
+         "itens": [{"produtoId": "a", "quantidade": 1, "precoUnitario": 10.0}]},
+        # Fora da conta: excluído, antes do início e no fim (exclusivo) da janela
+        {"dataPedido": "2024-01-03", "excluido": True, "itens": [{"produtoId": "b", "quantidade": 9, "precoUnitario": 35.0}]},
+        {"dataPedido": "2023-12-31", "itens": [{"produtoId": "b", "quantidade": 9, "precoUnitario": 35.0}]},
+        {"dataPedido": "2024-01-04", "itens": [{"produtoId": "b", "quantidade": 9, "precoUnitario": 35.0}]},
+    )
+    # Blocos de dois pedidos: o resultado não depende de como a leitura foi dividida
+    colunas = ler_cosmos(pedidos, catalogo(), date(2024, 1, 1), date(2024, 1, 4), tamanho_bloco=2)
+
+    assert resumo(colunas) == {
+        "inicio": "2024-01-01",
+        "fim": "2024-01-03",
+        "ticket": {"pedidos": 3, "receita": 90.5, "ticketMedio": 30.17, "ticketMediano": 25.5},
+        "status": [{"status": "Pago", "pedidos": 2, "receita": 80.5},
+                   {"status": "Pendente", "pedidos": 1, "receita": 10.0}],
+        "categorias": [{"categoria": "Livros", "receita": 35.0, "quantidade": 1},
+                       {"categoria": "Roupas", "receita": 30.0, "quantidade": 3},
+                       {"categoria": "Sem categoria", "receita": 25.5, "quantidade": 3}],
+        "produtosMaisVendidos": [{"produto": "b", "nome": "Duna", "receita": 35.0, "quantidade": 1},
+                                 {"produto": "a", "nome": "Camiseta", "receita": 30.0, "quantidade": 3},
+                                 {"produto": "c", "nome": "Caneca", "receita": 25.5, "quantidade": 3}],
+        "receitaDiaria": [{"data": "2024-01-01", "receita": 80.5, "pedidos": 2},
+                          {"data": "2024-01-03", "receita": 10.0, "pedidos": 1}],
+    }
+    assert [p["produto"] for p in resumo(colunas, limite=2)["produtosMaisVendidos"]] == ["b", "a"]
+
+
+def test_relatorios_do_sql(app, usuario):
+    db.session.add_all([
+        Pedido(nome_cliente="Ana", data_pedido=date(2024, 1, 1), nome_produto="Camiseta", valor_total=40.0,
+               status="Pago", id_usuario=usuario.id),
+        Pedido(nome_cliente="Ana", data_pedido=date(2024, 1, 1), nome_produto="Duna", valor_total=35.0,
+               status="Pago", id_usuario=usuario.id),
+        Pedido(nome_cliente="Ana", data_pedido=date(2024, 1, 2), nome_produto="Camiseta", valor_total=20.0,
+               status="Cancelado", id_usuario=usuario.id),
+    ])
+    db.session.commit()
+
+    relatorio = resumo(ler_sql(date(2024, 1, 1), date(2024, 1, 3), tamanho_bloco=2))
+    assert relatorio["receitaDiaria"] == [{"data": "2024-01-01", "receita": 75.0, "pedidos": 2},
+                                          {"data": "2024-01-02", "receita": 20.0, "pedidos": 1}]
+    assert relatorio["produtosMaisVendidos"] == [
+        {"produto": "Camiseta", "nome": None, "receita": 60.0, "quantidade": 2},
+        {"produto": "Duna", "nome": None, "receita": 35.0, "quantidade": 1},
+    ]
+    assert relatorio["categorias"] == [{"categoria": "Sem categoria", "receita": 95.0, "quantidade": 3}]
@@ -0,0 +1,31 @@
+import importlib.util
+import os
+
+from app.database import db
+
+
+def test_create_app_registra_rotas(app):
+    rotas = {regra.rule for regra in app.url_map.iter_rules()}
+    assert "/usuario/importar" in rotas
+    assert "/produtos/batch-get" in rotas
+    assert any(rota.startswith("/jobs/") for rota in rotas)
+
+
+def test_wsgi_expoe_a_aplicacao():
+    wsgi = importlib.import_module("wsgi")
+    assert wsgi.app.name == "app"
+
+
+def test_gunicorn_conf_carrega():
+    caminho = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", caminho)
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    assert conf.worker_class == "gthread" and conf.workers >= 1
+
+
+def test_init_db_cria_as_tabelas(app):
+    db.drop_all()
+    resultado = app.test_cli_runner().invoke(args=["init-db"])
+    assert resultado.exit_code == 0, resultado.output
+    assert "usuario" in db.inspect(db.engine).get_table_names()
@@ -0,0 +1,44 @@
+import threading
+from datetime import date
+
+from sqlalchemy import text
+
+from app.database import db
+from app.models.pedido import Pedido
+from app.models.usuario import Usuario
+from app.services.cache_entidades import cache_entidades
+
+
+def test_escrita_nao_parte_do_cache(cliente, usuario):
+    pedido = Pedido(nome_cliente="Ana", data_pedido=date(2024, 1, 2), nome_produto="Camiseta", valor_total=50.0,
+                    status="PENDENTE", id_usuario=usuario.id)
+    db.session.add(pedido)
+    db.session.commit()
+    id_pedido = pedido.id_pedido
+    db.session.expunge_all()
+    assert cache_entidades.buscar(Pedido, id_pedido) is not None
+
+    # Outro worker removeu o pedido: o cache local ainda tem a versão anterior
+    db.session.execute(text("DELETE FROM pedido WHERE id_pedido = :id"), {"id": id_pedido})
+    db.session.commit()
+    db.session.expunge_all()
+    assert cliente.put(f"/pedido/{id_pedido}", json={"status": "PAGO"}).status_code == 404
+    assert cliente.delete(f"/pedido/{id_pedido}").status_code == 404
+
+
+def test_contadores_concorrentes(app, usuario):
+    cache_entidades.buscar(Usuario, usuario.id)
+    antes = cache_entidades.estatisticas()["tabelas"]["usuario"]["local"]
+
+    def buscar():
+        with app.app_context():
+            for _ in range(500):
+                cache_entidades.buscar(Usuario, usuario.id)
+            db.session.remove()
+
+    threads = [threading.Thread(target=buscar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache_entidades.estatisticas()["tabelas"]["usuario"]["local"] - antes == 4000
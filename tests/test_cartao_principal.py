@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.cartao_principal import ID_GUARDA, buscar_cartao_principal, definir_cartao_principal
+from benchmarks.cosmos_fake import ContainerFake, ErroCosmosFake
+
+
+def container_com_cartoes(*ids):
+    container = ContainerFake(partition_key="usuarioId")
+    for cartao_id in ids:
+        container.create_item({"id": cartao_id, "usuarioId": "u1", "principal": False})
+    return container
+
+
+def test_trocas_concorrentes_sem_principal_nao_deixam_dois_principais():
+    container = container_com_cartoes("a", "b")
+    executar = container.execute_item_batch
+
+    def outra_troca_antes(**kwargs):
+        # A troca para "b" lê e grava entre a leitura e o batch da troca para "a"
+        container.execute_item_batch = executar
+        assert definir_cartao_principal(container, "u1", "b")
+        return executar(**kwargs)
+
+    container.execute_item_batch = outra_troca_antes
+    with pytest.raises(ErroCosmosFake):
+        definir_cartao_principal(container, "u1", "a")
+
+    principais = [d["id"] for d in container.itens.values() if d.get("principal")]
+    assert principais == ["b"]
+    assert buscar_cartao_principal(container, "u1")["id"] == "b"
+
+
+def test_troca_sequencial_atualiza_a_guarda():
+    container = container_com_cartoes("a", "b")
+    assert definir_cartao_principal(container, "u1", "a")
+    assert definir_cartao_principal(container, "u1", "b")
+    assert container.read_item(ID_GUARDA, partition_key="u1")["cartaoId"] == "b"
+    assert not definir_cartao_principal(container, "u1", ID_GUARDA)
+
+
+def test_listagens_nao_devolvem_a_guarda(cliente, cosmos):
+    container = cosmos["cartoes"]
+    for cartao_id in ("a", "b"):
+        container.create_item({"id": cartao_id, "usuarioId": "u1", "principal": False})
+    definir_cartao_principal(container, "u1", "a")
+
+    assert [c["id"] for c in cliente.get("/cartoes/usuario/u1").get_json()] == ["a", "b"]
+    assert ID_GUARDA not in [c["id"] for c in cliente.get("/cartoes").get_json()]
+    assert cliente.get(f"/cartoes/{ID_GUARDA}").status_code == 404
+    for corpo in ({"ids": [ID_GUARDA, "a"], "usuarioId": "u1"}, {"ids": [ID_GUARDA, "a"]}):
+        itens = cliente.post("/cartoes/batch-get", json=corpo).get_json()["itens"]
+        assert [(i["id"], i["encontrado"]) for i in itens] == [(ID_GUARDA, False), ("a", True)]
@@ -0,0 +1,62 @@
+import pytest
+
+from app.services import cep
+
+DATASET = """cep_inicio;cep_fim;logradouro;bairro;cidade;uf
+20040002;20040002;Rua da Assembleia;Centro;Rio de Janeiro;RJ
+20000001;23799999;;;Rio de Janeiro;RJ
+01001000;01001000;Praça da Sé;Sé;São Paulo;SP
+01000001;05999999;;;São Paulo;SP
+"""
+
+
+@pytest.fixture
+def indice(tmp_path):
+    origem = tmp_path / "ceps.csv"
+    origem.write_text(DATASET, encoding="utf-8")
+    cep.compilar_arquivo(str(origem), str(tmp_path / "ceps.idx"))
+    return cep.carregar_indice(str(tmp_path / "ceps.idx"))
+
+
+def test_cep_exato_e_faixa(indice):
+    assert len(indice) == 4
+    assert indice.buscar("20040-002") == {
+        "logradouro": "Rua da Assembleia", "bairro": "Centro", "cidade": "Rio de Janeiro", "uf": "RJ", "cep": "20040002"
+    }
+    assert indice.buscar("20550000") == {
+        "logradouro": "", "bairro": "", "cidade": "Rio de Janeiro", "uf": "RJ", "cep": "20550000"
+    }
+    assert indice.buscar("01001-000")["logradouro"] == "Praça da Sé"
+    assert indice.posicao_faixa(5999999) == 0 and indice.posicao_faixa(23799999) == 1
+
+
+def test_cep_fora_das_faixas_ou_invalido(indice):
+    assert indice.buscar("99999999") is None
+    assert indice.buscar("06000000") is None
+    assert indice.buscar("123") is None
+    assert indice.posicao_faixa(1000000) is None
+
+
+def test_faixas_sobrepostas_sao_rejeitadas():
+    linhas = [{"cep_inicio": "20000001", "cep_fim": "23799999", "cidade": "Rio de Janeiro", "uf": "RJ"},
+              {"cep_inicio": "23700000", "cep_fim": "23899999", "cidade": "Itaguaí", "uf": "RJ"}]
+    with pytest.raises(ValueError, match="sobrepostas"):
+        cep.compilar_dataset(linhas)
+
+
+def test_completar_endereco_nao_sobrescreve_o_que_veio(indice, monkeypatch):
+    monkeypatch.setattr(cep, "_indice", indice)
+    monkeypatch.setattr(cep, "_carregado", True)
+
+    dados = {"cep": "20040-002", "logradouro": "Rua da Assembleia, 10", "cidade": "rio de janeiro"}
+    assert cep.completar_endereco(dados) is None
+    assert dados == {"cep": "20040002", "logradouro": "Rua da Assembleia, 10", "cidade": "rio de janeiro",
+                     "bairro": "Centro", "uf": "RJ"}
+
+    dados = {"cep": "20550000", "bairro": "Maracanã"}
+    assert cep.completar_endereco(dados) is None
+    assert dados == {"cep": "20550000", "bairro": "Maracanã", "cidade": "Rio de Janeiro", "uf": "RJ"}
+
+    assert cep.completar_endereco({"cep": "20040002", "uf": "SP"}) == "O campo 'uf' não corresponde ao CEP informado"
+    assert cep.completar_endereco({"cep": "99999999"}) == "CEP não encontrado"
+    assert cep.completar_endereco({"cep": "2004"}) == "CEP inválido, informe 8 dígitos"
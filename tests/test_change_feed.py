@@ -0,0 +1,25 @@
+from app.services.change_feed import ler_alteracoes
+from benchmarks.cosmos_fake import ContainerFake
+
+
+class ContainerCompartilhado(ContainerFake):
+    """Outra thread usa o mesmo cliente logo depois da leitura do feed"""
+
+    def query_items_change_feed(self, **kwargs):
+        resultado = super().query_items_change_feed(**kwargs)
+        self.client_connection.last_response_headers = {"etag": "999"}
+        return resultado
+
+
+def test_continuacao_vem_da_propria_resposta():
+    container = ContainerCompartilhado(partition_key="usuarioId")
+    container.create_item({"id": "a", "usuarioId": "1"})
+    container.create_item({"id": "b", "usuarioId": "1"})
+
+    documentos, continuacao = ler_alteracoes(container)
+    assert [d["id"] for d in documentos] == ["a", "b"] and continuacao == "2"
+
+    container.upsert_item({"id": "a", "usuarioId": "1", "alterado": True})
+    documentos, continuacao = ler_alteracoes(container, continuacao)
+    assert [d["id"] for d in documentos] == ["a"] and continuacao == "3"
+    assert ler_alteracoes(container, continuacao) == ([], "3")
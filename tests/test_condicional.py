@@ -0,0 +1,16 @@
+def test_304_repete_o_etag_com_o_sufixo_da_compressao(app, cliente, cosmos):
+    app.config["COMPRESSAO_MIN_BYTES"] = 0
+    url = "/pedidos/usuario/1/resumo"
+    primeira = cliente.get(url, headers={"Accept-Encoding": "gzip"})
+    assert primeira.status_code == 200 and primeira.headers["Content-Encoding"] == "gzip"
+    etag = primeira.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    segunda = cliente.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert segunda.status_code == 304
+    assert segunda.headers["ETag"] == etag
+    assert "Accept-Encoding" in segunda.headers["Vary"]
+
+    sem_compressao = cliente.get(url)
+    assert cliente.get(url, headers={"If-None-Match": sem_compressao.headers["ETag"]}).headers["ETag"] == \
+        sem_compressao.headers["ETag"]
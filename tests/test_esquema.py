@@ -0,0 +1,42 @@
+from sqlalchemy import text
+
+from app.database import db
+from app.services.esquema import atualizar, pendencias
+
+
+def test_esquema_atual_nao_tem_pendencias(app):
+    with db.engine.begin() as conexao:
+        assert [p.descricao for p in pendencias(conexao)] == []
+
+
+def test_banco_antigo_recebe_coluna_e_restricoes(app):
+    with db.engine.begin() as conexao:
+        # Tabelas como eram antes das restrições e da chave de criação do pedido
+        conexao.execute(text("DROP TABLE pedido"))
+        conexao.execute(text(
+            "CREATE TABLE pedido (id_pedido INTEGER PRIMARY KEY, nome_cliente VARCHAR(50) NOT NULL, "
+            "data_pedido DATE NOT NULL, nome_produto VARCHAR(100) NOT NULL, valor_total FLOAT NOT NULL, "
+            "status VARCHAR(20) NOT NULL, criado_em DATETIME, atualizado_em DATETIME, id_usuario INTEGER NOT NULL)"
+        ))
+        conexao.execute(text("DROP TABLE usuario"))
+        conexao.execute(text(
+            "CREATE TABLE usuario (id INTEGER PRIMARY KEY, nome VARCHAR(100) NOT NULL, email VARCHAR(100) NOT NULL, "
+            "dt_nascimento DATE, cpf VARCHAR(11), telefone VARCHAR(20), criado_em DATETIME, atualizado_em DATETIME)"
+        ))
+        conexao.execute(text(
+            "INSERT INTO usuario (nome, email, cpf) VALUES ('A', 'a@x.com', '1'), ('B', 'a@x.com', '2')"
+        ))
+
+        lista = atualizar(conexao)
+        bloqueadas = {p.descricao: p.bloqueio for p in lista if p.bloqueio}
+        assert list(bloqueadas) == ["restrição uq_usuario_email"]
+        assert "a@x.com" in bloqueadas["restrição uq_usuario_email"]
+
+        conexao.execute(text("UPDATE usuario SET email = 'b@x.com' WHERE nome = 'B'"))
+        atualizar(conexao)
+        assert pendencias(conexao) == []
+
+
+def test_comando_imprime_o_ddl(app):
+    resultado = app.test_cli_runner().invoke(args=["atualizar-esquema", "--sql"])
+    assert resultado.exit_code == 0 and "Esquema atualizado" in resultado.output
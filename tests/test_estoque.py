@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import db
+from app.models.estoque import CONFIRMADA, EXPIRADA, LIBERADA, Estoque, ReservaEstoque
+from app.services import estoque
+
+
+def saldo(produto_id):
+    resultado = estoque.consultar(produto_id)
+    return resultado["disponivel"], resultado["reservado"]
+
+
+@pytest.fixture
+def produtos(app):
+    db.session.add_all([Estoque(produto_id="a", disponivel=10, reservado=0),
+                        Estoque(produto_id="b", disponivel=2, reservado=0)])
+    db.session.commit()
+
+
+def test_troca_de_itens_movimenta_so_a_diferenca(produtos):
+    estoque.reservar("p1", [("a", 3)], 900)
+    anterior = estoque.redefinir("p1", "Pendente", [("a", 1), ("b", 2), ("sem-controle", 5)])
+    assert saldo("a") == (9, 1) and saldo("b") == (0, 2)
+
+    # A gravação do pedido falhou: a reserva volta como estava
+    assert estoque.restaurar("p1", anterior)
+    assert saldo("a") == (7, 3) and saldo("b") == (2, 0)
+    assert estoque.reserva_do_pedido("p1")["itens"] == [{"produtoId": "a", "quantidade": 3}]
+
+
+def test_troca_de_itens_sem_saldo_nao_altera_nada(produtos):
+    estoque.reservar("p1", [("a", 1)], 900)
+    with pytest.raises(estoque.ErroEstoque) as erro:
+        estoque.redefinir("p1", "Pendente", [("a", 1), ("b", 3)])
+    assert erro.value.status == 409 and erro.value.produtos == ["b"]
+    assert saldo("a") == (9, 1) and saldo("b") == (2, 0)
+
+
+def test_confirmar_depois_de_cancelado_reserva_de_novo_ou_409(produtos):
+    estoque.reservar("p1", [("b", 2)], 900)
+    estoque.redefinir("p1", "Cancelado")
+    assert saldo("b") == (2, 0)
+
+    estoque.ajustar("b", -1)
+    with pytest.raises(estoque.ErroEstoque):
+        estoque.redefinir("p1", "Pago")
+    estoque.ajustar("b", 1)
+    estoque.redefinir("p1", "Pago")
+    assert saldo("b") == (0, 0)
+    assert estoque.reserva_do_pedido("p1")["status"] == CONFIRMADA
+
+
+def test_job_depois_do_prazo_renova_a_reserva(produtos):
+    estoque.reservar("p1", [("a", 4)], 900)
+    reserva = ReservaEstoque.query.filter_by(pedido_id="p1").one()
+    reserva.expira_em = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert estoque.expirar_vencidas() == 1
+    assert saldo("a") == (10, 0)
+
+    assert estoque.renovar("p1", 900)
+    assert saldo("a") == (6, 4)
+
+    estoque.redefinir("p1", "Cancelado")
+    assert estoque.reserva_do_pedido("p1")["status"] == LIBERADA
+    assert not estoque.renovar("p1", 900)
+
+
+def test_job_depois_do_prazo_sem_saldo(produtos):
+    estoque.reservar("p1", [("b", 2)], 900)
+    ReservaEstoque.query.filter_by(pedido_id="p1").one().status = EXPIRADA
+    estoque.ajustar("b", 2)  # unidades devolvidas pela varredura
+    estoque.ajustar("b", -1)
+    with pytest.raises(estoque.ErroEstoque):
+        estoque.renovar("p1", 900)
+
+
+def test_put_do_pedido_ajusta_a_reserva(cliente, cosmos, produtos):
+    resposta = cliente.post("/pedidos", json={
+        "usuarioId": "1", "enderecoId": "e", "cartaoId": "c",
+        "itens": [{"produtoId": "a", "quantidade": 2, "precoUnitario": 10.0}]
+    })
+    pedido_id = resposta.get_json()["id"]
+    assert saldo("a") == (8, 2)
+
+    resposta = cliente.put(f"/pedidos/{pedido_id}", json={
+        "itens": [{"produtoId": "a", "quantidade": 5, "precoUnitario": 10.0}], "status": "Pago"
+    })
+    assert resposta.status_code == 200 and resposta.get_json()["valorTotal"] == 50.0
+    assert saldo("a") == (5, 0)
+
+    resposta = cliente.put(f"/pedidos/{pedido_id}", json={
+        "itens": [{"produtoId": "b", "quantidade": 3, "precoUnitario": 1.0}]
+    })
+    assert resposta.status_code == 409
+    assert saldo("a") == (5, 0)
+
+
+def test_delete_so_libera_a_reserva_depois_da_exclusao(cliente, cosmos, produtos, monkeypatch):
+    resposta = cliente.post("/pedidos", json={
+        "usuarioId": "1", "enderecoId": "e", "cartaoId": "c",
+        "itens": [{"produtoId": "a", "quantidade": 2, "precoUnitario": 10.0}]
+    })
+    pedido_id = resposta.get_json()["id"]
+
+    def falhar(*args, **kwargs):
+        raise RuntimeError("Cosmos indisponível")
+
+    with monkeypatch.context() as contexto:
+        contexto.setattr(cosmos["pedidos"], "patch_item", falhar)
+        with pytest.raises(RuntimeError):
+            cliente.delete(f"/pedidos/{pedido_id}")
+    assert saldo("a") == (8, 2)
+
+    assert cliente.delete(f"/pedidos/{pedido_id}").status_code == 204
+    assert saldo("a") == (10, 0)
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.controllers.pedido_controller import criar_pedido_sql
+from app.models.pedido import Pedido
+from app.models.usuario import Usuario
+from app.services import fila, importacao
+
+
+@pytest.fixture
+def fila_local(tmp_path):
+    return fila.Fila(fila.ArmazemJobs(str(tmp_path / "fila.db")), backoff_base=0.0)
+
+
+def test_falha_nao_expoe_traceback_e_libera_recursos(fila_local, monkeypatch):
+    liberados = []
+
+    def falhar(valor):
+        raise RuntimeError("senha=segredo")
+
+    monkeypatch.setitem(fila.TAREFAS, "teste.falha", (falhar, 2, lambda valor: liberados.append(valor)))
+    job_id = fila_local.enfileirar("teste.falha", {"valor": 1})
+    fila_local.executar_pendentes()
+
+    job = fila_local.armazem.obter(job_id)
+    assert job["status"] == fila.FALHOU and job["tentativas"] == 2
+    assert job["erro"] == "Erro interno (RuntimeError)"
+    assert liberados == [1]
+
+
+def test_importacao_repetida_retoma_do_ultimo_lote(app, tmp_path, monkeypatch):
+    caminho = tmp_path / "usuarios.upload"
+    caminho.write_text("nome,email\n" + "".join(f"U{i},u{i}@exemplo.com\n" for i in range(5)), encoding="utf-8")
+    gravar_lote = importacao._gravar_lote
+    chamadas = []
+
+    def cair_no_segundo_lote(modelo, linhas, relatorio):
+        chamadas.append(len(linhas))
+        if len(chamadas) == 2:
+            raise OperationalError("INSERT", {}, Exception("conexão perdida"))
+        return gravar_lote(modelo, linhas, relatorio)
+
+    monkeypatch.setattr(importacao, "_gravar_lote", cair_no_segundo_lote)
+    with pytest.raises(OperationalError):
+        importacao.importar_arquivo("usuarios", str(caminho), "csv", 2)
+    # Falha transitória: o arquivo fica para a próxima tentativa
+    assert caminho.exists()
+
+    relatorio = importacao.importar_arquivo("usuarios", str(caminho), "csv", 2)
+    assert relatorio["lidos"] == 5 and relatorio["inseridos"] == 5 and relatorio["totalErros"] == 0
+    assert Usuario.query.count() == 5
+    assert not caminho.exists() and not (tmp_path / "usuarios.upload.progresso").exists()
+
+
+def test_criacao_assincrona_de_pedido_e_idempotente(app, usuario):
+    dados = {"nome_cliente": "Ana", "data_pedido": date(2024, 1, 2).isoformat(), "nome_produto": "Camiseta",
+             "valor_total": 50.0, "status": "PENDENTE"}
+    primeiro = criar_pedido_sql(dados, chave="job-1")
+    assert criar_pedido_sql(dados, chave="job-1") == primeiro
+    assert Pedido.query.count() == 1
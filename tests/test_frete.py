@@ -0,0 +1,54 @@
+import pytest
+
+from app.services.frete import CalculadoraFrete, ErroFrete
+
+
+def test_lote_com_carrinho_ou_item_malformado_responde_400(cliente):
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": ["01001000"]}).status_code == 400
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": [{"cep": "01001000", "itens": [3]}]}).status_code == 400
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": {"cep": "01001000"}}).status_code == 400
+    assert cliente.post("/frete/cotacao", json=[]).status_code == 400
+
+
+def test_lote_acima_do_maximo_responde_400(app, cliente):
+    carrinho = {"cep": "01001000", "itens": [{"quantidade": 1}]}
+    maximo = app.config["FRETE_LOTE_MAXIMO"]
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": [carrinho] * maximo}).status_code == 200
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": [carrinho] * (maximo + 1)}).status_code == 400
+
+
+def test_limites_vem_da_configuracao_da_aplicacao(app, cliente, tmp_path):
+    carrinho = {"cep": "01001000", "itens": [{"quantidade": 1}]}
+    app.config["FRETE_LOTE_MAXIMO"] = 2
+    resposta = cliente.post("/frete/cotacoes", json={"carrinhos": [carrinho] * 3})
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"] == [{"campo": "carrinhos", "erro": "Informe no máximo 2 carrinhos"}]
+
+    app.config["FRETE_LOTE_MAXIMO"] = 150
+    assert cliente.post("/frete/cotacoes", json={"carrinhos": [carrinho] * 150}).status_code == 200
+
+    # Peso padrão da configuração desta aplicação (a calculadora é montada por aplicação)
+    app.extensions.pop("frete", None)
+    app.config["FRETE_PESO_PADRAO_KG"] = 3.2
+    assert cliente.post("/frete/cotacao", json=carrinho).get_json()["pesoTarifado"] == 3.5
+
+
+def test_lote_devolve_erros_de_negocio_por_carrinho(cliente):
+    resposta = cliente.post("/frete/cotacoes", json={"carrinhos": [
+        {"cep": "01001000", "itens": [{"quantidade": 2, "peso": 1.2}]},
+        {"cep": "123", "itens": [{"quantidade": 1}]},
+    ]})
+    assert resposta.status_code == 200
+    primeiro, segundo = resposta.get_json()
+    assert primeiro["zona"] == "LOCAL" and primeiro["pesoTarifado"] == 2.5
+    assert segundo["erro"] == "CEP inválido, informe 8 dígitos"
+
+
+def test_peso_negativo_tem_mensagem_propria():
+    calculadora = CalculadoraFrete()
+    with pytest.raises(ErroFrete, match="peso"):
+        calculadora.peso_tarifado([{"quantidade": 1, "peso": -1}])
+    with pytest.raises(ErroFrete, match="objeto"):
+        calculadora.peso_tarifado(["item"])
+    with pytest.raises(ErroFrete, match="peso"):
+        calculadora.peso_tarifado([{"quantidade": 1, "peso": "nan"}])
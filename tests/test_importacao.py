@@ -0,0 +1,86 @@
+import io
+import json
+from datetime import date
+
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+
+from app.database import db
+from app.models.endereco import Endereco
+from app.models.outbox import CRIACAO, Outbox
+from app.models.usuario import Usuario
+from app.services import importacao
+from app.services.outbox import init_outbox
+
+
+def test_duplicado_concorrente_nao_derruba_o_lote(app, monkeypatch):
+    # Outra requisição grava o email depois da conferência do lote e antes do insert
+    gravar_lote = importacao._gravar_lote
+
+    def gravar_depois_de_outro(modelo, linhas, relatorio):
+        db.session.add(Usuario(nome="Outro", email="u1@exemplo.com"))
+        db.session.commit()
+        return gravar_lote(modelo, linhas, relatorio)
+
+    monkeypatch.setattr(importacao, "_gravar_lote", gravar_depois_de_outro)
+    fluxo = io.BytesIO(("nome,email\n" + "".join(f"U{i},u{i}@exemplo.com\n" for i in range(3))).encode())
+    relatorio = importacao.importar("usuarios", fluxo, "csv", 10)
+
+    assert relatorio["inseridos"] == 2 and relatorio["totalErros"] == 1
+    assert relatorio["erros"] == [{"linha": 3, "erro": "Email já cadastrado"}]
+    assert Usuario.query.count() == 3
+
+
+def test_cli_usa_o_lote_da_configuracao(app, tmp_path, monkeypatch):
+    usados = []
+    monkeypatch.setattr(importacao, "importar", lambda tipo, fluxo, formato, lote: usados.append(lote) or {
+        "erros": [], "inseridos": 0, "lidos": 0, "totalErros": 0, "segundos": 0, "linhasPorSegundo": None})
+    caminho = tmp_path / "usuarios.csv"
+    caminho.write_text("nome,email\n", encoding="utf-8")
+    app.config["IMPORTACAO_TAMANHO_LOTE"] = 37
+
+    resultado = app.test_cli_runner().invoke(args=["importar", "usuarios", str(caminho)])
+    assert resultado.exit_code == 0, resultado.output
+    assert usados == [37]
+
+
+def importar_enderecos(quantidade):
+    db.session.add(Usuario(id=7, nome="Ana", email="ana@exemplo.com", dt_nascimento=date(1990, 1, 1)))
+    db.session.commit()
+    fluxo = io.BytesIO(("usuario_id,logradouro,bairro,cidade,uf,cep\n" + "".join(
+        f"7,Rua {i},Centro,Rio de Janeiro,RJ,2000000{i}\n" for i in range(quantidade))).encode())
+    return importacao.importar("enderecos", fluxo, "csv", 10)
+
+
+def test_enderecos_importados_entram_no_outbox(app):
+    assert importar_enderecos(3)["inseridos"] == 3
+    linhas = Outbox.query.order_by(Outbox.id).all()
+    assert [(linha.chave, linha.operacao, linha.particao) for linha in linhas] == [
+        (f"sql-{endereco.id}", CRIACAO, "7") for endereco in Endereco.query.order_by(Endereco.id)
+    ]
+    assert json.loads(linhas[0].documento)["logradouro"] == "Rua 0"
+
+
+def test_lote_regravado_linha_a_linha_nao_reaproveita_ids(app, monkeypatch):
+    inserir = db.session.bulk_insert_mappings
+
+    def falhar_no_lote(modelo, mapeamentos, **opcoes):
+        inserir(modelo, mapeamentos, **opcoes)
+        if len(mapeamentos) > 1:
+            raise IntegrityError("INSERT", {}, Exception("duplicado"))
+
+    monkeypatch.setattr(db.session, "bulk_insert_mappings", falhar_no_lote)
+    assert importar_enderecos(3)["inseridos"] == 3
+    ids = [endereco.id for endereco in Endereco.query.order_by(Endereco.id)]
+    assert [linha.chave for linha in Outbox.query.order_by(Outbox.id)] == [f"sql-{i}" for i in ids]
+
+
+def test_outbox_desligado_em_outra_aplicacao_nao_afeta_esta(app):
+    outra = Flask("outra")
+    outra.config["OUTBOX_HABILITADO"] = False
+    init_outbox(outra)
+
+    with outra.app_context():
+        assert importacao.outbox.ativo() is False
+    assert importar_enderecos(2)["inseridos"] == 2
+    assert Outbox.query.count() == 2
@@ -0,0 +1,44 @@
+from flask import Flask
+
+from app.services import limites
+from app.services.limites import ArmazemLocal, init_limites
+
+
+def criar_app():
+    app = Flask(__name__)
+    app.config.update(LIMITE_CLIENTE=[2, 0.001], LIMITES_ROTAS={}, LIMITES_CONCORRENCIA={},
+                      LIMITES_CHAVES_API="chave-a, chave-b")
+
+    @app.get("/consultar")
+    def consultar():
+        return "ok"
+
+    init_limites(app)
+    return app
+
+
+def test_chave_desconhecida_conta_como_o_ip():
+    cliente = criar_app().test_client()
+    respostas = [cliente.get("/consultar", headers={"X-API-Key": f"inventada-{i}"}).status_code for i in range(3)]
+    assert respostas == [200, 200, 429]
+
+
+def test_chave_cadastrada_tem_balde_proprio():
+    app = criar_app()
+    cliente = app.test_client()
+    for _ in range(2):
+        assert cliente.get("/consultar").status_code == 200
+    assert cliente.get("/consultar").status_code == 429
+    assert cliente.get("/consultar", headers={"X-API-Key": "chave-a"}).status_code == 200
+    # O balde leva o hash da chave, não a chave
+    assert not any("chave-a" in chave for chave in app.extensions["limites"]._baldes)
+
+
+def test_armazem_local_fica_abaixo_do_maximo(monkeypatch):
+    monkeypatch.setattr(limites, "MAX_CHAVES_LOCAIS", 100)
+    armazem = ArmazemLocal(relogio=lambda: 1000.0)
+    for i in range(1000):
+        armazem.consumir(f"c:{i}", 10, 0.001)
+    assert len(armazem) <= 100
+    # Os mais recentes ficam
+    assert "c:999" in armazem._baldes
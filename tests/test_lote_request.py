@@ -0,0 +1,16 @@
+def test_limite_de_ids_vem_da_configuracao_da_aplicacao(app, cliente, cosmos):
+    app.config["BATCH_GET_MAXIMO"] = 3
+
+    resposta = cliente.post("/produtos/batch-get", json={"ids": ["a", "b", "c", "d"]})
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"] == [{"campo": "ids", "erro": "Informe no máximo 3 ids"}]
+
+    resposta = cliente.post("/produtos/batch-get", json={"ids": ["a", "b", "c"]})
+    assert resposta.status_code == 200 and len(resposta.get_json()["itens"]) == 3
+
+
+def test_limite_maior_que_o_padrao_e_respeitado(app, cliente, cosmos):
+    app.config["BATCH_GET_MAXIMO"] = 150
+    ids = [f"u{i}" for i in range(150)]
+    resposta = cliente.post("/usuarios/batch-get", json={"ids": ids})
+    assert resposta.status_code == 200 and len(resposta.get_json()["itens"]) == 150
@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta
+
+from app.database import db
+from app.models.outbox import EXCLUSAO, Outbox
+from app.models.pedido import Pedido
+from app.services.outbox import Relay, remover_de_lacunas
+from benchmarks.cosmos_fake import ContainerFake
+
+
+def criar_relay(enviados):
+    relay = Relay({}, atraso=60, ttl_exclusao=3600)
+    # Sem o SDK do Cosmos: registra os grupos em vez de enviá-los
+    relay._enviar_grupo = lambda grupo, operacoes: enviados.extend(operacoes) or len(operacoes)
+    return relay
+
+
+def linha(id_, segundos_atras=0):
+    db.session.add(Outbox(id=id_, entidade="pedido", chave=f"sql-{id_}", particao="1", operacao=EXCLUSAO,
+                          criado_em=datetime.utcnow() - timedelta(seconds=segundos_atras)))
+    db.session.commit()
+
+
+def test_exclusao_de_pedido_espelhada_como_exclusao_logica(app, usuario):
+    container = ContainerFake(partition_key="usuarioId")
+    enviados = []
+    relay = criar_relay(enviados)
+
+    def espelhar():
+        enviados.clear()
+        relay.encaminhar()
+        container.execute_item_batch(
+            batch_operations=[relay._operacao_batch(*operacao) for operacao in enviados], partition_key=str(usuario.id)
+        )
+
+    pedido = Pedido(nome_cliente="Ana", data_pedido=date(2024, 1, 2), nome_produto="Camiseta", valor_total=50.0,
+                    status="PENDENTE", id_usuario=usuario.id)
+    db.session.add(pedido)
+    db.session.commit()
+    espelhar()
+    chave = f"sql-{pedido.id_pedido}"
+    assert container.read_item(chave, partition_key=str(usuario.id))["itens"][0]["produtoId"] == "Camiseta"
+
+    db.session.delete(pedido)
+    db.session.commit()
+    espelhar()
+    documento = container.read_item(chave, partition_key=str(usuario.id))
+    assert documento["excluido"] is True and documento["ttl"] == 3600
+
+
+def test_marca_nao_pula_id_confirmado_depois(app):
+    enviados = []
+    relay = criar_relay(enviados)
+    linha(1)
+    linha(3)
+    assert relay.encaminhar_lote()["ate_id"] == 1
+
+    # O id 2 é confirmado depois do 3: entra no lote seguinte, antes do 3
+    linha(2)
+    relay.encaminhar_lote()
+    assert [chave for _, _, chave, _ in enviados] == ["sql-1", "sql-2", "sql-3"]
+
+
+def test_lacuna_antiga_e_procurada_depois_da_marca(app):
+    enviados = []
+    relay = criar_relay(enviados)
+    linha(1, 120)
+    linha(4, 120)
+    assert relay.encaminhar_lote()["ate_id"] == 4
+    assert relay.encaminhar_lote() is None
+
+    linha(3)
+    assert relay.encaminhar_lote()["linhas"] == 1
+    assert enviados[-1][2] == "sql-3"
+    assert app.test_client().get("/outbox/estado").get_json()["lacunas"] == 1
+
+
+def test_remover_de_lacunas_divide_faixas():
+    assert remover_de_lacunas([[2, 6, 0]], {2, 4}) == [[3, 3, 0], [5, 6, 0]]
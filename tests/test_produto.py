@@ -0,0 +1,46 @@
+import pytest
+
+from app.models.produto import Produto
+
+
+def test_to_dict_e_from_dict_mantem_o_id():
+    produto = Produto("livros", "Duna", 59.9, descricao="Ficção")
+    documento = produto.to_dict()
+    assert documento == {"id": produto.id, "produtoCategoria": "livros", "nome": "Duna", "preco": 59.9,
+                         "urlImagem": None, "descricao": "Ficção"}
+
+    copia = Produto.from_dict({**documento, "_etag": '"e1"', "_ts": 1700000000})
+    assert copia.id == produto.id and copia.to_dict() == documento
+    assert copia.get("_etag") == '"e1"' and copia.get("_ts") == 1700000000 and copia.get("nome") == "Duna"
+
+
+def test_from_dict_sem_id_gera_um_novo():
+    primeiro = Produto.from_dict({"produtoCategoria": "livros", "nome": "Duna", "preco": 59.9})
+    segundo = Produto.from_dict({"produtoCategoria": "livros", "nome": "Duna", "preco": 59.9})
+    assert primeiro.id and primeiro.id != segundo.id
+
+
+def test_conversao_em_lote_com_campos_opcionais_ausentes():
+    documentos = [
+        {"id": "p1", "produtoCategoria": "".join(["li", "vros"]), "nome": "Duna", "preco": 59.9},
+        {"id": "p2", "produtoCategoria": "livros", "nome": "Neuromancer", "preco": 45.0,
+         "urlImagem": "https://img/p2.png", "descricao": "Cyberpunk", "_etag": '"e2"', "_ts": 2},
+    ]
+    produtos = Produto.from_rows(documentos)
+    assert [p.id for p in produtos] == ["p1", "p2"]
+    assert produtos[0].urlImagem is None and produtos[0].descricao is None and produtos[0].etag is None
+    assert produtos[1].etag == '"e2"' and produtos[1].ts == 2
+    # Categorias internadas: uma string por categoria no catálogo inteiro
+    assert produtos[0].produtoCategoria is produtos[1].produtoCategoria
+
+    assert Produto.to_rows(produtos) == [
+        {"id": "p1", "produtoCategoria": "livros", "nome": "Duna", "preco": 59.9, "urlImagem": None, "descricao": None},
+        {"id": "p2", "produtoCategoria": "livros", "nome": "Neuromancer", "preco": 45.0,
+         "urlImagem": "https://img/p2.png", "descricao": "Cyberpunk"},
+    ]
+    assert Produto.to_rows(produtos) == [p.to_dict() for p in produtos]
+
+
+def test_produto_tem_slots():
+    with pytest.raises(AttributeError):
+        Produto("livros", "Duna", 59.9).outro = 1
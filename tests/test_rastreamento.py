@@ -0,0 +1,47 @@
+from app.services import rastreamento
+from benchmarks.cosmos_fake import ContainerFake
+
+
+class Coletor:
+    def __init__(self):
+        self.spans = []
+
+    def registrar(self, s):
+        self.spans.append(s)
+
+
+class ContainerCompartilhado(ContainerFake):
+    """Outra thread usa o mesmo cliente logo depois de cada chamada"""
+
+    def read_item(self, *args, **kwargs):
+        resultado = super().read_item(*args, **kwargs)
+        self.client_connection.last_response_headers = {"x-ms-request-charge": "50"}
+        return resultado
+
+    def query_items(self, *args, **kwargs):
+        resultado = super().query_items(*args, **kwargs)
+        self.client_connection.last_response_headers = {"x-ms-request-charge": "50"}
+        return resultado
+
+
+def test_ru_vem_da_propria_resposta(monkeypatch):
+    coletor = Coletor()
+    monkeypatch.setattr(rastreamento.rastreador, "exportador", coletor)
+    container = ContainerCompartilhado(partition_key="categoria")
+    container.create_item({"id": "p1", "categoria": "c"})
+    ganchos = []
+
+    raiz = rastreamento.Span("1" * 32, "", "raiz")
+    token = rastreamento._atual.set(raiz)
+    try:
+        ler = rastreamento.instrumentar_cosmos("produtos", "read_item", container.read_item)
+        ler("p1", partition_key="c", response_hook=lambda cabecalhos, _: ganchos.append(cabecalhos))
+        consultar = rastreamento.instrumentar_cosmos("produtos", "query_items", container.query_items)
+        assert len(list(consultar(query="SELECT * FROM c"))) == 1
+    finally:
+        rastreamento._atual.reset(token)
+
+    cobrancas = {s.nome: s.atributos["db.cosmosdb.request_charge"] for s in coletor.spans}
+    assert cobrancas == {"read_item produtos": 1.0, "query_items produtos": 2.9}
+    # O hook do chamador continua sendo chamado
+    assert ganchos == [{"x-ms-request-charge": "1.0"}]
@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.recomendacoes import IndiceRecomendacoes, cestas_cosmos, gerar_indice
+from benchmarks.cosmos_fake import ContainerFake
+
+
+def itens(*produtos):
+    return [{"produtoId": produto, "quantidade": 1, "precoUnitario": 1.0} for produto in produtos]
+
+
+@pytest.fixture
+def pedidos():
+    container = ContainerFake(partition_key="usuarioId")
+    cestas = [("a", "b", "c"), ("a", "b", "b"), ("a", "b", "d"), ("a", "c"), ("d",)]
+    for i, cesta in enumerate(cestas):
+        container.create_item({"id": f"p{i}", "usuarioId": "u1", "dataPedido": "2024-01-02", "itens": itens(*cesta)})
+    # Excluídos e espelhados do SQL não entram: formariam o par c-d
+    for i in range(3):
+        container.create_item({"id": f"x{i}", "usuarioId": "u2", "excluido": True, "itens": itens("c", "d")})
+        container.create_item({"id": f"sql-{i}", "usuarioId": "u3", "itens": itens("c", "d")})
+    return container
+
+
+def test_comprados_juntos_por_coocorrencia(pedidos):
+    indice = gerar_indice(cestas_cosmos(pedidos))
+
+    # a: 4 pedidos; b: 3 (com a em 3); c: 2 (com a em 2); pares com um pedido só ficam de fora
+    assert indice.recomendar("a") == [{"produtoId": "b", "pontuacao": 0.866}, {"produtoId": "c", "pontuacao": 0.7071}]
+    assert indice.recomendar("b") == [{"produtoId": "a", "pontuacao": 0.866}]
+    assert indice.recomendar("c") == [{"produtoId": "a", "pontuacao": 0.7071}]
+    assert indice.recomendar("d") == []
+    assert indice.recomendar("inexistente") == []
+    assert indice.recomendar("a", limite=1) == [{"produtoId": "b", "pontuacao": 0.866}]
+
+
+def test_suporte_minimo_e_k(pedidos):
+    indice = gerar_indice(cestas_cosmos(pedidos), k=1, min_suporte=1)
+    assert indice.recomendar("a") == [{"produtoId": "b", "pontuacao": 0.866}]
+    # Com suporte 1 o par b-d entra; o produto nunca recomenda a si mesmo
+    assert [r["produtoId"] for r in gerar_indice(cestas_cosmos(pedidos), min_suporte=1).recomendar("d")] == ["b", "a"]
+
+
+def test_indice_salvo_e_carregado(pedidos, tmp_path):
+    indice = gerar_indice(cestas_cosmos(pedidos))
+    caminho = str(tmp_path / "recomendacoes.npz")
+    indice.salvar(caminho)
+    carregado = IndiceRecomendacoes.carregar(caminho)
+    assert len(carregado) == len(indice) and carregado.recomendar("a") == indice.recomendar("a")
@@ -0,0 +1,29 @@
+import time
+
+from sqlalchemy import create_engine
+
+from app.services.replicas import Roteador
+
+
+def test_escolher_nao_mede_o_atraso_e_a_thread_atualiza_o_rodizio():
+    atrasos = {"valor": 0.0}
+    medicoes = []
+
+    def medir(engine):
+        medicoes.append(engine)
+        return atrasos["valor"]
+
+    engine = create_engine("sqlite://")
+    roteador = Roteador({"replica_0": engine}, atraso_maximo=2.0, intervalo=0.02, medir=medir)
+    roteador.verificar(forcar=True)
+    medicoes.clear()
+    for _ in range(100):
+        assert roteador.escolher() is engine
+    assert medicoes == []
+
+    atrasos["valor"] = 30.0
+    roteador.iniciar_verificacao()
+    limite = time.monotonic() + 2
+    while roteador.escolher() is not None and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert roteador.escolher() is None
@@ -0,0 +1,50 @@
+from app.services.resumo_pedidos import buscar_resumo, processar_pedidos, publico, reconstruir
+from benchmarks.cosmos_fake import ContainerFake
+
+
+def pedido(id_, status="Pendente", valor=10.0, data="2024-01-01T10:00:00", **extras):
+    return {"id": id_, "usuarioId": "u", "status": status, "valorTotal": valor, "dataPedido": data, **extras}
+
+
+def test_resumo_guarda_so_agregados_e_reaplicar_nao_altera():
+    resumos = ContainerFake(partition_key="usuarioId")
+    lote = [pedido("a"), pedido("b", valor=5.0, data="2024-02-01T10:00:00")]
+    assert processar_pedidos(resumos, lote) == 1
+    assert processar_pedidos(resumos, lote) == 0
+
+    resumo = buscar_resumo(resumos, "u")
+    assert "pedidos" not in resumo
+    assert publico(resumo) == {"usuarioId": "u", "quantidadePedidos": 2, "valorTotal": 15.0,
+                               "ultimoPedido": "2024-02-01T10:00:00", "porStatus": {"Pendente": 2}}
+
+    # O último pedido excluído: a data volta para a do anterior
+    processar_pedidos(resumos, [pedido("a", status="Pago"), pedido("b", valor=5.0, excluido=True)])
+    assert publico(buscar_resumo(resumos, "u")) == {"usuarioId": "u", "quantidadePedidos": 1, "valorTotal": 10.0,
+                                                    "ultimoPedido": "2024-01-01T10:00:00", "porStatus": {"Pago": 1}}
+
+
+def test_resumo_no_formato_anterior_e_migrado():
+    resumos = ContainerFake(partition_key="usuarioId")
+    resumos.create_item({
+        "id": "u", "usuarioId": "u", "quantidadePedidos": 1, "valorTotal": 10.0,
+        "ultimoPedido": "2024-01-01T10:00:00", "porStatus": {"Pendente": 1},
+        "pedidos": {"a": ["Pendente", 10.0, "2024-01-01T10:00:00"]}
+    })
+    processar_pedidos(resumos, [pedido("a", status="Pago")])
+    resumo = buscar_resumo(resumos, "u")
+    assert "pedidos" not in resumo
+    assert resumo["quantidadePedidos"] == 1 and resumo["porStatus"] == {"Pago": 1}
+
+
+def test_reconstruir_a_partir_dos_pedidos():
+    pedidos = ContainerFake(partition_key="usuarioId")
+    resumos = ContainerFake(partition_key="usuarioId")
+    processar_pedidos(resumos, [pedido("antigo")])
+    pedidos.create_item(pedido("a", valor=7.5))
+    pedidos.create_item(pedido("b", excluido=True))
+
+    assert reconstruir(pedidos, resumos) == 1
+    assert publico(buscar_resumo(resumos, "u"))["quantidadePedidos"] == 1
+    # A contribuição do pedido que não existe mais foi removida: excluí-lo agora não muda nada
+    assert processar_pedidos(resumos, [pedido("antigo", excluido=True)]) == 0
+    assert processar_pedidos(resumos, [pedido("a", valor=7.5)]) == 0
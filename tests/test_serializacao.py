@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask_restx import marshal
+
+from app.controllers import cartao_controller, endereco_controller, pedido_controller, produto_controller
+from app.controllers import usuario_controller
+from app.database import db
+from app.models.cartao import Cartao
+from app.models.pedido import Pedido
+from app.models.produto import Produto
+from app.response.serializacao import dumps
+
+MODELOS = [
+    (pedido_controller.serializar_pedido, pedido_controller.pedido_model),
+    (usuario_controller.serializar_usuario, usuario_controller.usuario_model),
+    (endereco_controller.serializar_endereco, endereco_controller.endereco_model),
+    (cartao_controller.serializar_cartao, cartao_controller.cartao_model),
+]
+
+DOCUMENTOS = [
+    # Tudo preenchido, com tipos que o marshal converte (Decimal, datetime, números em campos texto)
+    {"id": "x1", "usuarioId": 7, "nome": "Ana", "email": "ana@exemplo.com", "cpf": 12345678909,
+     "dataNascimento": date(1990, 1, 2), "dataPedido": datetime(2024, 1, 2, 3, 4, 5), "valorTotal": Decimal("10.50"),
+     "itens": [{"produtoId": "p1", "quantidade": Decimal("2"), "precoUnitario": Decimal("5.25")}],
+     "status": "Pago", "numero": "4111", "principal": 1, "cep": "20040002", "estado": "RJ", "_etag": '"e"'},
+    # Campos ausentes, None e item de lista incompleto
+    {"id": "x2", "itens": [{"produtoId": None}], "valorTotal": None, "principal": None},
+    {"id": "x3", "itens": None},
+    {},
+]
+
+
+@pytest.mark.parametrize("serializar, modelo", MODELOS, ids=lambda m: getattr(m, "name", ""))
+def test_serializador_compilado_igual_ao_marshal(serializar, modelo):
+    for documento in DOCUMENTOS:
+        esperado = marshal(documento, modelo)
+        obtido = serializar(documento)
+        assert obtido == esperado and list(obtido) == list(esperado)
+        assert dumps(obtido) == dumps(esperado)
+
+
+def test_serializador_por_atributo_do_produto_igual_ao_marshal():
+    produtos = [Produto("livros", "Duna", Decimal("59.90"), id="p1"), Produto("livros", "Sem preço", None, id="p2")]
+    for produto in produtos:
+        assert produto_controller.serializar_produto(produto) == marshal(produto.to_dict(), produto_controller.produto_model)
+
+
+def test_projecoes_iguais_a_serializacao_do_objeto_completo(app, cartao):
+    sem_tipo = Cartao(usuario_id=cartao.usuario_id, numero="5500000000000004", nome_impresso="ANA",
+                      validade=datetime(2031, 1, 31, 23, 59), cvv="321", bandeira="MASTER", saldo=Decimal("0.10"))
+    db.session.add_all([sem_tipo, Pedido(nome_cliente="Ana", data_pedido=date(2024, 3, 9), nome_produto="Camiseta",
+                                         valor_total=50.5, status="PENDENTE", id_usuario=cartao.usuario_id)])
+    db.session.commit()
+
+    cartoes = Cartao.query.order_by(Cartao.id)
+    assert cartao_controller.cartao_projecao.listar(cartoes) == [{
+        "id": c.id, "numero": c.numero, "nome_impresso": c.nome_impresso, "validade": c.validade.strftime("%m/%Y"),
+        "cvv": c.cvv, "bandeira": c.bandeira, "tipo": c.tipo, "saldo": float(c.saldo)
+    } for c in cartoes.all()]
+
+    pedidos = Pedido.query
+    assert pedido_controller.pedido_projecao.listar(pedidos) == [{
+        "id": p.id_pedido, "cliente": p.nome_cliente, "produto": p.nome_produto,
+        "data": p.data_pedido.strftime("%d/%m/%Y"), "valor": p.valor_total, "status": p.status
+    } for p in pedidos.all()]
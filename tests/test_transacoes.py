@@ -0,0 +1,63 @@
+from sqlalchemy.dialects import mysql
+
+from app.database import db
+from app.models.cartao import Cartao
+from app.services import transacoes
+
+
+def autorizar(cliente, cartao, valor=10):
+    resposta = cliente.post(f"/cartao/authorize/usuario/{cartao.usuario_id}", json={
+        "numero": cartao.numero, "dt_expiracao": "12/2030", "cvv": cartao.cvv, "valor": valor
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    return resposta.get_json()["codigo_autorizacao"]
+
+
+def saldo(cartao_id):
+    db.session.expire_all()
+    return float(db.session.get(Cartao, cartao_id).saldo)
+
+
+def test_captura_e_estornos(cliente, cartao):
+    codigo = autorizar(cliente, cartao, 40)
+    assert saldo(cartao.id) == 60.0
+    assert cliente.post(f"/cartao/transacao/{codigo}/captura").status_code == 200
+
+    resposta = cliente.post(f"/cartao/transacao/{codigo}/estorno", json={"valor": 15})
+    assert resposta.status_code == 200 and resposta.get_json()["status"] == "ESTORNADA_PARCIAL"
+    resposta = cliente.post(f"/cartao/transacao/{codigo}/estorno", json={})
+    assert resposta.get_json()["status"] == "ESTORNADA"
+    # O segundo estorno total não credita de novo
+    assert cliente.post(f"/cartao/transacao/{codigo}/estorno", json={}).status_code == 409
+    assert saldo(cartao.id) == 100.0
+
+
+def test_cancelamento_repetido_nao_credita_duas_vezes(cliente, cartao):
+    codigo = autorizar(cliente, cartao, 30)
+    assert cliente.post(f"/cartao/transacao/{codigo}/cancelamento").status_code == 200
+    assert cliente.post(f"/cartao/transacao/{codigo}/cancelamento").status_code == 409
+    assert saldo(cartao.id) == 100.0
+
+
+def test_leituras_das_operacoes_sao_bloqueantes(app):
+    sql = str(transacoes.consulta_lancamentos("x", bloquear=True).statement.compile(dialect=mysql.dialect()))
+    assert sql.rstrip().endswith("FOR UPDATE")
+
+
+def test_estorno_com_valor_invalido_responde_400(cliente, cartao):
+    codigo = autorizar(cliente, cartao)
+    cliente.post(f"/cartao/transacao/{codigo}/captura")
+    for valor in ("abc", "1e999", "0.001", "NaN", [1]):
+        resposta = cliente.post(f"/cartao/transacao/{codigo}/estorno", json={"valor": valor})
+        assert resposta.status_code == 400, valor
+
+
+def test_historico_limita_e_valida_o_limite(cliente, cartao):
+    for _ in range(3):
+        autorizar(cliente, cartao, 1)
+    resposta = cliente.get(f"/cartao/{cartao.id}/transacoes?limite=0")
+    assert resposta.status_code == 200
+    assert len(resposta.get_json()["transacoes"]) == 1 and resposta.get_json()["proximo"] is not None
+    assert len(cliente.get(f"/cartao/{cartao.id}/transacoes?limite=9999").get_json()["transacoes"]) == 3
+    assert cliente.get(f"/cartao/{cartao.id}/transacoes?limite=abc").status_code == 400
+    assert cliente.get(f"/cartao/{cartao.id}/transacoes?antes_de=x").status_code == 400
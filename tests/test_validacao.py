@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import event
+
+from app.database import db
+
+
+@pytest.fixture
+def sem_io(app, cosmos, monkeypatch):
+    """Falha o teste se a requisição chegar ao Cosmos; devolve os comandos SQL executados"""
+    def chamada_ao_cosmos(*args, **kwargs):
+        raise AssertionError("corpo inválido chegou ao Cosmos")
+
+    for container in cosmos.values():
+        for metodo in ("query_items", "read_item", "create_item", "upsert_item", "replace_item", "patch_item"):
+            monkeypatch.setattr(container, metodo, chamada_ao_cosmos)
+
+    comandos = []
+    registrar = lambda conexao, cursor, sql, *args: comandos.append(sql)  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", registrar)
+    yield comandos
+    event.remove(db.engine, "before_cursor_execute", registrar)
+
+
+def test_namespace_responde_400_com_os_erros_por_campo(cliente, sem_io):
+    resposta = cliente.post("/produtos", json={"produtoCategoria": " ", "nome": "Caneca", "preco": -1})
+    assert resposta.status_code == 400
+    corpo = resposta.get_json()
+    assert [erro["campo"] for erro in corpo["erros"]] == ["produtoCategoria", "preco"]
+    assert corpo["message"].startswith("produtoCategoria: ")
+
+
+def test_blueprint_responde_400_antes_de_consultar_o_banco(cliente, sem_io):
+    resposta = cliente.post("/pedido/", json={
+        "nome_cliente": "Ana", "nome_produto": "Camiseta", "valor_total": 0, "data_pedido": "02/01/2024", "status": "Pago"
+    })
+    assert resposta.status_code == 400
+    assert [erro["campo"] for erro in resposta.get_json()["erros"]] == ["valor_total", "data_pedido"]
+    assert "erro" in resposta.get_json()
+    assert sem_io == []
+
+
+@pytest.mark.parametrize("rota, corpo, desconhecido", [
+    ("/produtos", {"produtoCategoria": "casa", "nome": "Caneca", "preco": 10, "precoPromocional": 5},
+     "precoPromocional"),
+    ("/pedidos", {"usuarioId": "1", "enderecoId": "e", "cartaoId": "c", "cupom": "X",
+                  "itens": [{"produtoId": "a", "quantidade": 1, "precoUnitario": 1.0}]}, "cupom"),
+    ("/endereco/usuario/1", {"logradouro": "Rua A", "bairro": "Centro", "cidade": "Rio", "uf": "RJ",
+                             "cep": "20040002", "numeroCasa": "10"}, "numeroCasa"),
+])
+def test_criacao_rejeita_campos_desconhecidos(cliente, sem_io, rota, corpo, desconhecido):
+    resposta = cliente.post(rota, json=corpo)
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"] == [{"campo": desconhecido, "erro": "Extra inputs are not permitted"}]
+    assert sem_io == []
+
+
+def test_json_malformado_e_corpo_que_nao_e_objeto(cliente, sem_io):
+    resposta = cliente.post("/produtos", data=b"{nome:", content_type="application/json")
+    assert resposta.status_code == 400 and resposta.get_json()["erros"][0]["erro"].startswith("Invalid JSON")
+    assert cliente.post("/pedido/", json=["Ana"]).status_code == 400
+    assert sem_io == []
+
+
+def test_atualizacao_ignora_campos_a_mais_sem_grava_los(cliente, cosmos):
+    cosmos["produtos"].create_item({"id": "p1", "produtoCategoria": "casa", "nome": "Caneca", "preco": 10.0})
+
+    # GET editado e reenviado: id e campos desconhecidos vêm junto e não são gravados
+    resposta = cliente.put("/produtos/p1", json={"id": "outro", "nome": "Caneca grande", "admin": True})
+    assert resposta.status_code == 200
+    documento = cosmos["produtos"].read_item("p1", partition_key="casa")
+    assert documento["nome"] == "Caneca grande" and "admin" not in documento
+
+    assert cliente.put("/produtos/p1", json={"admin": True}).status_code == 400
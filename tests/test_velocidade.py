@@ -0,0 +1,104 @@
+import gc
+import time
+
+from app.services.velocidade import MotorVelocidade
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_limpeza_em_segundo_plano_descarta_chaves_ociosas():
+    relogio = Relogio()
+    motor = MotorVelocidade(shards=4, relogio=relogio)
+    for i in range(20):
+        motor.avaliar(f"c{i}", "u1", 10)
+    assert len(motor) == 21 and motor.operacoes == 40
+
+    relogio.agora += 7200
+    motor.iniciar_varredura(0.02)
+    limite = time.monotonic() + 2
+    while len(motor) and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert len(motor) == 0
+
+
+def test_thread_da_limpeza_termina_com_o_motor():
+    motor = MotorVelocidade(shards=2)
+    thread = motor.iniciar_varredura(0.02)
+    del motor
+    gc.collect()
+    thread.join(2)
+    assert not thread.is_alive()
+
+
+def test_quantidade_por_janela_recusa_acima_do_limite():
+    relogio = Relogio()
+    motor = MotorVelocidade(regras=(("cartao", 60, 3, 1e9),), relogio=relogio)
+    for _ in range(3):
+        resultado = motor.avaliar("c1", "u1", 1)
+        assert resultado.aprovado and resultado.mensagem() == "velocidade: ok"
+
+    resultado = motor.avaliar("c1", "u1", 1)
+    assert not resultado.aprovado and resultado.mensagem() == "velocidade: cartao_qtd_1min 4/3"
+    # Outro cartão tem os seus contadores
+    assert motor.avaliar("c2", "u1", 1).aprovado
+
+
+def test_valor_por_janela_recusa_acima_do_limite():
+    relogio = Relogio()
+    motor = MotorVelocidade(regras=(("usuario", 3600, 100, 500.0),), relogio=relogio)
+    assert motor.avaliar("c1", "u1", 300).aprovado
+    assert motor.avaliar("c2", "u1", 200).aprovado  # exatamente no limite
+
+    resultado = motor.avaliar("c3", "u1", 0.01)
+    assert resultado.mensagem() == "velocidade: usuario_valor_1h 500.01/500.00"
+
+
+def test_tentativas_recusadas_tambem_contam_e_janela_zera_depois_de_expirar():
+    relogio = Relogio()
+    motor = MotorVelocidade(regras=(("cartao", 60, 2, 1e9), ("cartao", 3600, 100, 1e9)), relogio=relogio)
+    for _ in range(2):
+        assert motor.avaliar("c1", "u1", 1).aprovado
+    assert not motor.avaliar("c1", "u1", 1).aprovado
+
+    # Ainda dentro do minuto: a recusa anterior mantém o bloqueio
+    relogio.agora += 30
+    assert motor.avaliar("c1", "u1", 1).mensagem() == "velocidade: cartao_qtd_1min 4/2"
+
+    # Um minuto sem tentativas: a janela de 1 min zerou, a de 1 h continua somando
+    relogio.agora += 61
+    assert motor.avaliar("c1", "u1", 1).aprovado
+    janelas = motor._shards[hash(("cartao", "c1")) % len(motor._shards)][0][("cartao", "c1")]
+    assert janelas[60].total_contagem == 1 and janelas[3600].total_contagem == 5
+
+
+def test_buckets_expiram_um_a_um_na_janela_deslizante():
+    relogio = Relogio()
+    motor = MotorVelocidade(regras=(("cartao", 60, 2, 1e9),), relogio=relogio)
+    assert motor.avaliar("c1", "u1", 1).aprovado
+    relogio.agora += 40
+    assert motor.avaliar("c1", "u1", 1).aprovado
+    # 25 s depois a primeira tentativa (65 s atrás) já saiu da janela; a segunda não
+    relogio.agora += 25
+    assert motor.avaliar("c1", "u1", 1).aprovado
+    assert not motor.avaliar("c1", "u1", 1).aprovado
+
+
+def test_autorizacao_recusada_pela_regra_de_velocidade(cliente, cartao):
+    for valor in (1, 1, 1, 1, 1):
+        resposta = cliente.post(f"/cartao/authorize/usuario/{cartao.usuario_id}", json={
+            "numero": cartao.numero, "dt_expiracao": "12/2030", "cvv": cartao.cvv, "valor": valor
+        })
+        assert resposta.status_code == 200 and "velocidade: ok" in resposta.get_json()["message"]
+
+    resposta = cliente.post(f"/cartao/authorize/usuario/{cartao.usuario_id}", json={
+        "numero": cartao.numero, "dt_expiracao": "12/2030", "cvv": cartao.cvv, "valor": 1
+    })
+    assert resposta.status_code == 400
+    assert resposta.get_json()["status"] == "NOT_AUTHORIZED"
+    assert resposta.get_json()["message"] == "Transação bloqueada por regra de velocidade (velocidade: cartao_qtd_1min 6/5)"
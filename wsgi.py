@@ -0,0 +1,22 @@
+"""Ponto de entrada WSGI de produção.
+
+gunicorn:  gunicorn -c gunicorn.conf.py wsgi:app
+waitress:  python wsgi.py   (alternativa para Windows, sem fork)
+"""
+import os
+
+from app import create_app
+
+app = create_app()
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    serve(
+        app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        threads=int(os.getenv("THREADS", "8")),
+        connection_limit=int(os.getenv("CONNECTION_LIMIT", "1000")),
+        channel_timeout=int(os.getenv("TIMEOUT", "30")),
+    )